@@ -30,6 +30,17 @@ import picolog
 
 from aioble import scan
 import bluetooth
+from micropython import const
+
+# The length of a command or response packet
+_PACKET_LENGTH = const(20)
+
+# Preferred ATT MTU (the MTU less the 3 byte ATT header carries the characteristic's value)
+_PREFERRED_MTU = const(247)
+_ATT_HEADER_LENGTH = const(3)
+
+# The most packets sent in one write or accepted in one notification (the robot may allow fewer)
+_MAX_FRAME_PACKETS = const(8)
 
 class BleCentral:
     __ADVERTISING_NAME = "vt2-robot"
@@ -43,6 +54,10 @@ class BleCentral:
         # Command service characteristics setup
         self._tx_p2c_characteristic_uuid = bluetooth.UUID(0xFBA0)
         self._rx_c2p_characteristic_uuid = bluetooth.UUID(0xFBA1)
+        self._framing_characteristic_uuid = bluetooth.UUID(0xFBA4)
+
+        # The number of packets in each write or notification (agreed with the robot once connected)
+        self._frame_packets = 1
 
         # Flag to show connected status
         self._discovered = False
@@ -62,6 +77,9 @@ class BleCentral:
         self._p2c_queue_event = asyncio.Event()
         self._p2c_notification_event = asyncio.Event()
 
+        # Function called with each response received (returns False if no command was waiting for it)
+        self._response_handler = None
+
         # Tx/Rx characteristic objects
         self._tx_p2c_characteristic = None
         self._rx_c2p_characteristic = None
@@ -72,7 +90,11 @@ class BleCentral:
     
     @property
     def p2c_queue(self):
-        return self._c2p_queue
+        return self._p2c_queue
+
+    def set_response_handler(self, handler):
+        """Set the function called with each response received from the peripheral"""
+        self._response_handler = handler
     
     def add_to_c2p_queue(self, data):
         if len(self._c2p_queue) < self._max_queue_elements:
@@ -161,8 +183,43 @@ class BleCentral:
 
         # Subscribe to characteristic notifications
         await self._tx_p2c_characteristic.subscribe(notify = True)
+        await self.__set_up_framing(command_service)
         self._connected = True
 
+    async def __set_up_framing(self, command_service):
+        # Agree how many packets can share a write or notification. The robot gives the most it
+        # can handle, and the frame has to fit in the MTU (older firmware has no framing
+        # characteristic, so it gets one packet at a time)
+        self._frame_packets = 1
+        try:
+            mtu = await self._connection.exchange_mtu(_PREFERRED_MTU)
+            framing_characteristic = await command_service.characteristic(self._framing_characteristic_uuid)
+            if framing_characteristic is None:
+                picolog.info("BleCentral::__set_up_framing - Framing is not available")
+                return
+
+            robot_packets = (await framing_characteristic.read())[0]
+            frame_packets = max(1, min(robot_packets, _MAX_FRAME_PACKETS, (mtu - _ATT_HEADER_LENGTH) // _PACKET_LENGTH))
+            await framing_characteristic.write(bytes([frame_packets]), response=True)
+        except Exception as e:
+            picolog.info("BleCentral::__set_up_framing - Framing is not available: {}", e)
+            return
+
+        self._frame_packets = frame_packets
+        picolog.info("BleCentral::__set_up_framing - MTU is {}, sending up to {} packets in each write", mtu, frame_packets)
+
+    def __receive_packet(self, service_data):
+        # Check the first byte to see if it is a valid commmand response
+        # If the first byte is 0x00, then it is a NOP response
+        if service_data[0] != 0x00:
+            # Pass the response straight to the command waiting for it. Anything else
+            # is queued (the serial link relays it to the host in packet mode)
+            if self._response_handler is not None and self._response_handler(service_data):
+                pass
+            elif len(self._p2c_queue) < self._max_queue_elements:
+                self._p2c_queue.append(service_data)
+                self._p2c_queue_event.set()
+
     async def __maintain_connection(self):
         picolog.info("BleCentral::__maintain_connection - Running maintain connection task")
         while True:
@@ -213,15 +270,12 @@ class BleCentral:
                     self.disconnect()
 
                 if self._connected:
-                    if len(service_data) == 20:
-                        # Check the first byte to see if it is a valid commmand response
-                        # If the first byte is 0x00, then it is a NOP response
-                        if service_data[0] != 0x00:
-                            # Queue the data packet for processing
-                            if len(self._p2c_queue) < self._max_queue_elements:
-                                self._p2c_queue.append(service_data)
-                                #picolog.info(f"Received data from peripheral: {service_data}, appended to queue ({len(self._p2c_queue)} elements)")
-                                self._p2c_queue_event.set()
+                    # A notification is a packet or a frame of packets (one after another)
+                    if len(service_data) == _PACKET_LENGTH:
+                        self.__receive_packet(service_data)
+                    elif len(service_data) > _PACKET_LENGTH and len(service_data) % _PACKET_LENGTH == 0:
+                        for offset in range(0, len(service_data), _PACKET_LENGTH):
+                            self.__receive_packet(service_data[offset:offset + _PACKET_LENGTH])
                     else:
                         picolog.info(f"BleCentral::__handle_commands - Received data from peripheral: {service_data} - invalid length")
 
@@ -232,12 +286,19 @@ class BleCentral:
                     if len(self._c2p_queue) > 0:
                         # Send all waiting data
                         while len(self._c2p_queue) > 0:
-                            data_packet = self._c2p_queue.pop(0)
-                            #picolog.info(f"Sending data to peripheral: {data_packet}")
+                            if self._frame_packets == 1 or len(self._c2p_queue) == 1:
+                                data_packet = self._c2p_queue.pop(0)
+                            else:
+                                # Send several packets (padded to full length) in one write
+                                data_packet = bytearray()
+                                while len(self._c2p_queue) > 0 and len(data_packet) < self._frame_packets * _PACKET_LENGTH:
+                                    packet = self._c2p_queue.pop(0)
+                                    data_packet.extend(packet)
+                                    data_packet.extend(bytes(_PACKET_LENGTH - len(packet)))
                             await self._rx_c2p_characteristic.write(data_packet)
                     else:
                         # If the queue is empty, send a nop
-                        data_packet = bytearray(20)
+                        data_packet = bytearray(_PACKET_LENGTH)
                         await self._rx_c2p_characteristic.write(data_packet)
 
                     # Clear the notification event
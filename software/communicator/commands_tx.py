@@ -27,46 +27,40 @@
 
 import asyncio
 import picolog
-import struct
+import protocol_central as protocol
 from ble_central import BleCentral
+from response_router import ResponseRouter
 
-# Note: The commands are defined in the BLE peripheral firmware
-# and the ControlRx class must match the ControlTx class otherwise
-# bad things will happen :)
+# Note: The commands are defined by the protocol schema (software/protocol/schema.py)
+# and encoded and decoded by the generated protocol_central module
 
 class CommandsTx:
     def __init__(self, ble_central: BleCentral):
         self._ble_central = ble_central
         self._command_sequence = 1
 
+        # Responses are routed to the waiting commands by sequence ID
+        self._router = ResponseRouter()
+        self._ble_central.set_response_handler(self._router.route)
+
         self._short_timeout = 5.0
         self._long_timeout = 60.0
 
     def __next_seq(self) -> int:
-        self._command_sequence += 1
-        if self._command_sequence > 255:
-            self._command_sequence = 1
+        # Skip any sequence IDs that are still waiting for a response (or a late response)
+        while True:
+            self._command_sequence += 1
+            if self._command_sequence > 255:
+                self._command_sequence = 1
+            if not self._router.in_use(self._command_sequence):
+                break
+
+        self._router.expect(self._command_sequence)
         return self._command_sequence
     
     async def __wait_for_command_response(self, seq_id: int):
-        while True:
-            await self._ble_central._p2c_queue_event.wait()
-            try:
-                data = self._ble_central._p2c_queue.pop(0)
-            except IndexError:
-                picolog.error("CommandsTx::_wait_for_command_response - Got P2C queue event but the queue was empty?")
-                seq_id_rx = 0
-                return None
-
-            self._ble_central._p2c_queue_event.clear()
-            seq_id_rx = data[0]
-
-            # Check if the sequence ID matches
-            if seq_id_rx == seq_id:
-                #picolog.info(f"CommandsTx::_wait_for_command_response - Sequence ID = {seq_id_rx} matched")
-                return data
-            else:
-                picolog.info(f"CommandsTx::_wait_for_command_response - Sequence ID = {seq_id_rx} did not match received sequence ID = {seq_id}")
+        # The response is delivered by the router as soon as BleCentral receives it
+        return await self._router.wait(seq_id)
 
     @property
     def connected(self):
@@ -79,7 +73,7 @@ class CommandsTx:
             picolog.info("CommandsTx::motors - Not connected to a robot")
             return False
         
-        command_id = 1
+        command_id = protocol.MOTORS
 
         # Command to enable or disable the motors
         if enable:
@@ -89,7 +83,7 @@ class CommandsTx:
 
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBB", seq_id, command_id, parameter)
+        data = protocol.encode_motors(seq_id, parameter)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::motors - Command ID = {command_id}, Sequence ID = {seq_id}, enable = {enable}")
         
@@ -109,12 +103,12 @@ class CommandsTx:
             picolog.error("CommandsTx::forward - Not connected to a robot")
             return False, 0.0, 0.0, 0.0
         
-        command_id = 2
+        command_id = protocol.FORWARD
 
         # Command to move the robot forward
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, distance_mm)
+        data = protocol.encode_forward(seq_id, distance_mm)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::forward - Command ID = {command_id}, Sequence ID = {seq_id}, distance = {distance_mm}")
 
@@ -128,7 +122,7 @@ class CommandsTx:
 
         # Extract the position and heading from the response
         try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
+            x, y, heading = protocol.decode_forward(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::forward - Error unpacking response: {e}")
             return False, 0.0, 0.0, 0.0
@@ -144,12 +138,12 @@ class CommandsTx:
             picolog.error("CommandsTx::backward - Not connected to a robot")
             return False, 0.0, 0.0, 0.0
         
-        command_id = 3
+        command_id = protocol.BACKWARD
 
         # Command to move the robot backward
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, distance_mm)
+        data = protocol.encode_backward(seq_id, distance_mm)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::backward - Command ID = {command_id}, Sequence ID = {seq_id}, distance = {distance_mm}")
         
@@ -163,7 +157,7 @@ class CommandsTx:
 
         # Extract the position and heading from the response
         try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
+            x, y, heading = protocol.decode_backward(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::backward - Error unpacking response: {e}")
             return False, 0.0, 0.0, 0.0
@@ -179,12 +173,12 @@ class CommandsTx:
             picolog.error("CommandsTx::left - Not connected to a robot")
             return False, 0.0, 0.0, 0.0
         
-        command_id = 4
+        command_id = protocol.LEFT
 
         # Command to turn the robot left
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, angle_degrees)
+        data = protocol.encode_left(seq_id, angle_degrees)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::left - Command ID = {command_id}, Sequence ID = {seq_id}, angle = {angle_degrees}")
         
@@ -198,7 +192,7 @@ class CommandsTx:
 
         # Extract the position and heading from the response
         try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
+            x, y, heading = protocol.decode_left(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::left - Error unpacking response: {e}")
             return False, 0.0, 0.0, 0.0
@@ -214,12 +208,12 @@ class CommandsTx:
             picolog.error("CommandsTx::right - Not connected to a robot")
             return False, 0.0, 0.0, 0.0
         
-        command_id = 5
+        command_id = protocol.RIGHT
 
         # Command to turn the robot right
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, angle_degrees)
+        data = protocol.encode_right(seq_id, angle_degrees)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::right - Command ID = {command_id}, Sequence ID = {seq_id}, angle = {angle_degrees}")
         
@@ -233,7 +227,7 @@ class CommandsTx:
 
         # Extract the position and heading from the response
         try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
+            x, y, heading = protocol.decode_right(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::right - Error unpacking response: {e}")
             return False, 0.0, 0.0, 0.0
@@ -249,12 +243,12 @@ class CommandsTx:
             picolog.error("CommandsTx::circle - Not connected to a robot")
             return False, 0.0, 0.0, 0.0
         
-        command_id = 6
+        command_id = protocol.CIRCLE
 
         # Command to turn the robot left on an arc
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBff", seq_id, command_id, radius_mm, extent_degrees)
+        data = protocol.encode_circle(seq_id, radius_mm, extent_degrees)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::circle - Command ID = {command_id}, Sequence ID = {seq_id}, radius = {radius_mm}, extent = {extent_degrees}")
         
@@ -268,7 +262,7 @@ class CommandsTx:
 
         # Extract the position and heading from the response
         try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
+            x, y, heading = protocol.decode_circle(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::circle - Error unpacking response: {e}")
             return False, 0.0, 0.0, 0.0
@@ -284,12 +278,12 @@ class CommandsTx:
             picolog.error("CommandsTx::setheading - Not connected to a robot")
             return False
         
-        command_id = 7
+        command_id = protocol.SETHEADING
 
         # Command to set the robot heading
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, angle_degrees)
+        data = protocol.encode_setheading(seq_id, angle_degrees)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::setheading - Command ID = {command_id}, Sequence ID = {seq_id}, angle = {angle_degrees}")
         
@@ -309,12 +303,12 @@ class CommandsTx:
             picolog.error("CommandsTx::setx - Not connected to a robot")
             return False, 0.0, 0.0, 0.0
         
-        command_id = 8
+        command_id = protocol.SETX
 
         # Command to set the robot X position
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, x_mm)
+        data = protocol.encode_setx(seq_id, x_mm)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::setx - Command ID = {command_id}, Sequence ID = {seq_id}, x = {x_mm}")
         
@@ -328,7 +322,7 @@ class CommandsTx:
 
         # Extract the position and heading from the response
         try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
+            x, y, heading = protocol.decode_setx(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::setx - Error unpacking response: {e}")
             return False, 0.0, 0.0, 0.0
@@ -344,12 +338,12 @@ class CommandsTx:
             picolog.error("CommandsTx::sety - Not connected to a robot")
             return False, 0.0, 0.0, 0.0
         
-        command_id = 9
+        command_id = protocol.SETY
 
         # Command to set the robot Y position
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, y_mm)
+        data = protocol.encode_sety(seq_id, y_mm)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::sety - Command ID = {command_id}, Sequence ID = {seq_id}, y = {y_mm}")
         
@@ -363,7 +357,7 @@ class CommandsTx:
 
         # Extract the position and heading from the response
         try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
+            x, y, heading = protocol.decode_sety(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::sety - Error unpacking response: {e}")
             return False, 0.0, 0.0, 0.0
@@ -379,12 +373,12 @@ class CommandsTx:
             picolog.error("CommandsTx::setposition - Not connected to a robot")
             return False, 0.0, 0.0, 0.0
         
-        command_id = 10
+        command_id = protocol.SETPOSITION
 
         # Command to set the robot position
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBff", seq_id, command_id, x_mm, y_mm)
+        data = protocol.encode_setposition(seq_id, x_mm, y_mm)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::setposition - Command ID = {command_id}, Sequence ID = {seq_id}, x = {x_mm}, y = {y_mm}")
         
@@ -398,7 +392,7 @@ class CommandsTx:
 
         # Extract the position and heading from the response
         try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
+            x, y, heading = protocol.decode_setposition(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::setposition - Error unpacking response: {e}")
             return False, 0.0, 0.0, 0.0
@@ -414,12 +408,12 @@ class CommandsTx:
             picolog.error("CommandsTx::towards - Not connected to a robot")
             return False, 0.0, 0.0, 0.0
         
-        command_id = 11
+        command_id = protocol.TOWARDS
 
         # Command to move the robot towards a point
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBff", seq_id, command_id, x_mm, y_mm)
+        data = protocol.encode_towards(seq_id, x_mm, y_mm)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::towards - Command ID = {command_id}, Sequence ID = {seq_id}, x = {x_mm}, y = {y_mm}")
         
@@ -433,7 +427,7 @@ class CommandsTx:
 
         # Extract the position and heading from the response
         try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
+            x, y, heading = protocol.decode_towards(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::towards - Error unpacking response: {e}")
             return False, 0.0, 0.0, 0.0
@@ -449,12 +443,12 @@ class CommandsTx:
             picolog.error("CommandsTx::reset_origin - Not connected to a robot")
             return False
         
-        command_id = 12
+        command_id = protocol.RESET_ORIGIN
 
         # Command to reset the x,y origin and heading
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_reset_origin(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::reset_origin - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -474,12 +468,12 @@ class CommandsTx:
             picolog.error("CommandsTx::heading - Not connected to a robot")
             return False, 0.0
         
-        command_id = 13
+        command_id = protocol.HEADING
 
         # Command to get the robot heading
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_heading(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::heading - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -493,7 +487,7 @@ class CommandsTx:
 
         # Extract the heading from the response
         try:
-            seq_id, heading = struct.unpack("<Bf", response[:5])
+            heading = protocol.decode_heading(response)[0]
         except ValueError as e:
             picolog.error(f"CommandsTx::heading - Error unpacking response: {e}")
             return False, 0.0
@@ -507,12 +501,12 @@ class CommandsTx:
             picolog.error("CommandsTx::position - Not connected to a robot")
             return False, 0.0, 0.0
         
-        command_id = 14
+        command_id = protocol.POSITION
 
         # Command to get the robot position
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_position(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::position - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -526,7 +520,7 @@ class CommandsTx:
 
         # Extract the position from the response
         try:
-            seq_id, x, y = struct.unpack("<Bff", response[:9])
+            x, y = protocol.decode_position(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::position - Error unpacking response: {e}")
             return False, 0.0, 0.0
@@ -541,12 +535,12 @@ class CommandsTx:
             picolog.error("CommandsTx::penup - Not connected to a robot")
             return False
         
-        command_id = 15
+        command_id = protocol.PENUP
 
         # Command to raise the pen
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_penup(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::penup - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -566,12 +560,12 @@ class CommandsTx:
             picolog.error("CommandsTx::pendown - Not connected to a robot")
             return False
         
-        command_id = 16
+        command_id = protocol.PENDOWN
 
         # Command to raise the pen
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_pendown(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::pendown - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -591,12 +585,12 @@ class CommandsTx:
             picolog.error("CommandsTx::eyes - Not connected to a robot")
             return False
         
-        command_id = 17
+        command_id = protocol.EYES
 
         # Command to set the eye colour
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBBBBB", seq_id, command_id, eye_id, red, green, blue)
+        data = protocol.encode_eyes(seq_id, eye_id, red, green, blue)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::eyes - Command ID = {command_id}, Sequence ID = {seq_id}, eye_id = {eye_id}, red = {red}, green = {green}, blue = {blue}")
         
@@ -616,12 +610,12 @@ class CommandsTx:
             picolog.error("CommandsTx::power - Not connected to a robot")
             return False, 0, 0, 0
         
-        command_id = 18
+        command_id = protocol.POWER
 
         # Command to get the robot power
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_power(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::power - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -635,7 +629,7 @@ class CommandsTx:
 
         # Extract the power from the response
         try:
-            seq_id, mv, ma, mw = struct.unpack("<Blll", response[:13])
+            mv, ma, mw = protocol.decode_power(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::power - Error unpacking response: {e}")
             return False, 0, 0, 0
@@ -647,12 +641,12 @@ class CommandsTx:
             picolog.error("CommandsTx::isdown - Not connected to a robot")
             return False, False
         
-        command_id = 19
+        command_id = protocol.ISDOWN
 
         # Command to get the pen status (True = down, False = up)
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_isdown(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::isdown - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -666,7 +660,7 @@ class CommandsTx:
 
         # Extract the pen status from the response
         try:
-            seq_id, pen_down = struct.unpack("<BB", response[:2])
+            pen_down = protocol.decode_isdown(response)[0]
         except ValueError as e:
             picolog.error(f"CommandsTx::isdown - Error unpacking response: {e}")
             return False, False
@@ -678,12 +672,12 @@ class CommandsTx:
             picolog.error("CommandsTx::set_linear_velocity - Not connected to a robot")
             return False
         
-        command_id = 20
+        command_id = protocol.SET_LINEAR_VELOCITY
 
         # Command to set the linear velocity
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBll", seq_id, command_id, target_speed, acceleration)
+        data = protocol.encode_set_linear_velocity(seq_id, target_speed, acceleration)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::set_linear_velocity - Command ID = {command_id}, Sequence ID = {seq_id}, target_speed = {target_speed}, acceleration = {acceleration}")
         
@@ -703,12 +697,12 @@ class CommandsTx:
             picolog.error("CommandsTx::set_rotational_velocity - Not connected to a robot")
             return False
         
-        command_id = 21
+        command_id = protocol.SET_ROTATIONAL_VELOCITY
 
         # Command to set the rotational velocity
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BBll", seq_id, command_id, target_speed, acceleration)
+        data = protocol.encode_set_rotational_velocity(seq_id, target_speed, acceleration)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::set_rotational_velocity - Command ID = {command_id}, Sequence ID = {seq_id}, target_speed = {target_speed}, acceleration = {acceleration}")
         
@@ -723,17 +717,17 @@ class CommandsTx:
         # This command does not return any data, so we don't need to return any
         return True
     
-    async def get_linear_velocity(self) -> tuple[bool, int, int]:
+    async def get_linear_velocity(self) -> tuple[bool, int, int, int]:
         if not self._ble_central.connected:
             picolog.error("CommandsTx::get_linear_velocity - Not connected to a robot")
-            return False, 0, 0
+            return False, 0, 0, 0
         
-        command_id = 22
+        command_id = protocol.GET_LINEAR_VELOCITY
 
         # Command to get the linear velocity
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_get_linear_velocity(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::get_linear_velocity - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -743,28 +737,28 @@ class CommandsTx:
         except asyncio.TimeoutError:
             picolog.error(f"CommandsTx::get_linear_velocity - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
             self._ble_central.disconnect()
-            return False, 0, 0
+            return False, 0, 0, 0
 
         # Extract the linear velocity from the response
         try:
-            seq_id, target_speed, acceleration = struct.unpack("<Bll", response[:9])
+            target_speed, acceleration, jerk = protocol.decode_get_linear_velocity(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::get_linear_velocity - Error unpacking response: {e}")
-            return False, 0, 0
-        picolog.info(f"CommandsTx::get_linear_velocity - Target speed = {target_speed}, Acceleration = {acceleration}")
-        return True, target_speed, acceleration
+            return False, 0, 0, 0
+        picolog.info(f"CommandsTx::get_linear_velocity - Target speed = {target_speed}, Acceleration = {acceleration}, Jerk = {jerk}")
+        return True, target_speed, acceleration, jerk
     
-    async def get_rotational_velocity(self) -> tuple[bool, int, int]:
+    async def get_rotational_velocity(self) -> tuple[bool, int, int, int]:
         if not self._ble_central.connected:
             picolog.error("CommandsTx::get_rotational_velocity - Not connected to a robot")
-            return False, 0, 0
+            return False, 0, 0, 0
         
-        command_id = 23
+        command_id = protocol.GET_ROTATIONAL_VELOCITY
 
         # Command to get the rotational velocity
         # Generate a sequence ID and queue the command
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_get_rotational_velocity(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::get_rotational_velocity - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -774,27 +768,27 @@ class CommandsTx:
         except asyncio.TimeoutError:
             picolog.error(f"CommandsTx::get_rotational_velocity - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
             self._ble_central.disconnect()
-            return False, 0, 0
+            return False, 0, 0, 0
 
         # Extract the rotational velocity from the response
         try:
-            seq_id, target_speed, acceleration = struct.unpack("<Bll", response[:9])
+            target_speed, acceleration, jerk = protocol.decode_get_rotational_velocity(response)
         except ValueError as e:
             picolog.error(f"CommandsTx::get_rotational_velocity - Error unpacking response: {e}")
-            return False, 0, 0
-        picolog.info(f"CommandsTx::get_rotational_velocity - Target speed = {target_speed}, Acceleration = {acceleration}")
-        return True, target_speed, acceleration
+            return False, 0, 0, 0
+        picolog.info(f"CommandsTx::get_rotational_velocity - Target speed = {target_speed}, Acceleration = {acceleration}, Jerk = {jerk}")
+        return True, target_speed, acceleration, jerk
 
     async def set_wheel_diameter_calibration(self, wheel_diameter: int) -> bool:
         if not self._ble_central.connected:
             picolog.error("CommandsTx::set_wheel_diameter_calibration - Not connected to a robot")
             return False
         
-        command_id = 24
+        command_id = protocol.SET_WHEEL_DIAMETER_CALIBRATION
 
         # Command to set the wheel diameter calibration
         seq_id = self.__next_seq()
-        data = struct.pack("<BBi", seq_id, command_id, wheel_diameter)
+        data = protocol.encode_set_wheel_diameter_calibration(seq_id, wheel_diameter)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::set_wheel_diameter_calibration - Command ID = {command_id}, Sequence ID = {seq_id}, wheel_diameter = {wheel_diameter}")
         
@@ -812,11 +806,11 @@ class CommandsTx:
             picolog.error("CommandsTx::set_axel_distance_calibration - Not connected to a robot")
             return False
         
-        command_id = 25
+        command_id = protocol.SET_AXEL_DISTANCE_CALIBRATION
 
         # Command to set the axel distance calibration
         seq_id = self.__next_seq()
-        data = struct.pack("<BBi", seq_id, command_id, axel_distance)
+        data = protocol.encode_set_axel_distance_calibration(seq_id, axel_distance)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::set_axel_distance_calibration - Command ID = {command_id}, Sequence ID = {seq_id}, axel_distance = {axel_distance}")
         
@@ -834,11 +828,11 @@ class CommandsTx:
             picolog.error("CommandsTx::get_wheel_diameter_calibration - Not connected to a robot")
             return False, 0
         
-        command_id = 26
+        command_id = protocol.GET_WHEEL_DIAMETER_CALIBRATION
 
         # Command to get the wheel diameter calibration
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_get_wheel_diameter_calibration(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::get_wheel_diameter_calibration - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -850,7 +844,7 @@ class CommandsTx:
             return False, 0
 
         try:
-            seq_id, cali_wheel = struct.unpack("<Bi", response[:5])
+            cali_wheel = protocol.decode_get_wheel_diameter_calibration(response)[0]
         except ValueError as e:
             picolog.error(f"CommandsTx::get_wheel_diameter_calibration - Error unpacking response: {e}")
             return False, 0
@@ -862,11 +856,11 @@ class CommandsTx:
             picolog.error("CommandsTx::get_axel_distance_calibration - Not connected to a robot")
             return False, 0
         
-        command_id = 27
+        command_id = protocol.GET_AXEL_DISTANCE_CALIBRATION
 
         # Command to get the axel distance calibration
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_get_axel_distance_calibration(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::get_axel_distance_calibration - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -878,7 +872,7 @@ class CommandsTx:
             return False, 0
 
         try:
-            seq_id, cali_axel = struct.unpack("<Bi", response[:5])
+            cali_axel = protocol.decode_get_axel_distance_calibration(response)[0]
         except ValueError as e:
             picolog.error(f"CommandsTx::get_axel_distance_calibration - Error unpacking response: {e}")
             return False, 0
@@ -890,11 +884,11 @@ class CommandsTx:
             picolog.error("CommandsTx::set_turtle_id - Not connected to a robot")
             return False
         
-        command_id = 28
+        command_id = protocol.SET_TURTLE_ID
 
         # Command to set the turtle ID
         seq_id = self.__next_seq()
-        data = struct.pack("<BBB", seq_id, command_id, turtle_id)
+        data = protocol.encode_set_turtle_id(seq_id, turtle_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::set_turtle_id - Command ID = {command_id}, Sequence ID = {seq_id}, turtle_id = {turtle_id}")
         
@@ -912,11 +906,11 @@ class CommandsTx:
             picolog.error("CommandsTx::get_turtle_id - Not connected to a robot")
             return False, 0
         
-        command_id = 29
+        command_id = protocol.GET_TURTLE_ID
 
         # Command to get the turtle ID
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_get_turtle_id(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::get_turtle_id - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -928,7 +922,7 @@ class CommandsTx:
             return False, 0
 
         try:
-            seq_id, turtle_id = struct.unpack("<BB", response[:2])
+            turtle_id = protocol.decode_get_turtle_id(response)[0]
         except ValueError as e:
             picolog.error(f"CommandsTx::get_turtle_id - Error unpacking response: {e}")
             return False, 0
@@ -940,11 +934,11 @@ class CommandsTx:
             picolog.error("CommandsTx::load_config - Not connected to a robot")
             return False
         
-        command_id = 30
+        command_id = protocol.LOAD_CONFIG
 
         # Command to load the configuration
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_load_config(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::load_config - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -962,11 +956,11 @@ class CommandsTx:
             picolog.error("CommandsTx::save_config - Not connected to a robot")
             return False
         
-        command_id = 31
+        command_id = protocol.SAVE_CONFIG
 
         # Command to save the configuration
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_save_config(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::save_config - Command ID = {command_id}, Sequence ID = {seq_id}")
         
@@ -984,11 +978,11 @@ class CommandsTx:
             picolog.error("CommandsTx::reset_config - Not connected to a robot")
             return False
         
-        command_id = 32
+        command_id = protocol.RESET_CONFIG
 
         # Command to reset the configuration
         seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
+        data = protocol.encode_reset_config(seq_id)
         self._ble_central.add_to_c2p_queue(data)
         picolog.info(f"CommandsTx::reset_config - Command ID = {command_id}, Sequence ID = {seq_id}")
         
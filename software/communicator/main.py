@@ -130,7 +130,7 @@ def main():
     # Create the required objects before going asynchronous
     ble_central = BleCentral()
     commands_tx = CommandsTx(ble_central)
-    serial_comms = SerialComms(uart1, commands_tx)
+    serial_comms = SerialComms(uart1, commands_tx, ble_central)
     
     while True:
         asyncio.run(aio_main(ble_central, serial_comms, leds))
@@ -0,0 +1,318 @@
+#************************************************************************
+#
+#   protocol_central.py
+#
+#   Command protocol codec (central)
+#   Valiant Turtle 2 - Communicator firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Generated from software/protocol/schema.py by software/protocol/codegen.py - do not edit
+
+import struct
+from micropython import const
+
+# The length of every packet
+PACKET_LENGTH = const(20)
+
+# Response types (stored in the last byte of the response)
+RESPONSE_TYPE_OFFSET = const(19)
+RESPONSE_RESULT = const(0x00)
+RESPONSE_ACCEPTED = const(0x01)
+RESPONSE_COMPLETED = const(0x02)
+
+# Command IDs
+MOTORS = const(1)
+FORWARD = const(2)
+BACKWARD = const(3)
+LEFT = const(4)
+RIGHT = const(5)
+CIRCLE = const(6)
+SETHEADING = const(7)
+SETX = const(8)
+SETY = const(9)
+SETPOSITION = const(10)
+TOWARDS = const(11)
+RESET_ORIGIN = const(12)
+HEADING = const(13)
+POSITION = const(14)
+PENUP = const(15)
+PENDOWN = const(16)
+EYES = const(17)
+POWER = const(18)
+ISDOWN = const(19)
+SET_LINEAR_VELOCITY = const(20)
+SET_ROTATIONAL_VELOCITY = const(21)
+GET_LINEAR_VELOCITY = const(22)
+GET_ROTATIONAL_VELOCITY = const(23)
+SET_WHEEL_DIAMETER_CALIBRATION = const(24)
+SET_AXEL_DISTANCE_CALIBRATION = const(25)
+GET_WHEEL_DIAMETER_CALIBRATION = const(26)
+GET_AXEL_DISTANCE_CALIBRATION = const(27)
+SET_TURTLE_ID = const(28)
+GET_TURTLE_ID = const(29)
+LOAD_CONFIG = const(30)
+SAVE_CONFIG = const(31)
+RESET_CONFIG = const(32)
+MOTION_QUEUE = const(33)
+SET_TELEMETRY_INTERVAL = const(34)
+SET_LOG_STREAM = const(35)
+COMMAND_COUNT = const(36) # The highest command ID + 1
+
+# Commands that are acknowledged as soon as they are queued (when the motion queue
+# is enabled) and then report completion once they have been executed
+DEFERRED_COMMANDS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 15, 16, 17, 20, 21, 24, 25)
+
+# Commands that are given to the motion planner (so the following moves can be planned
+# whilst they are executing)
+PLANNED_COMMANDS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11)
+
+# Commands that only read the robot's state (answered straight away, even with moves queued)
+QUERY_COMMANDS = (13, 14, 18, 19, 22, 23, 26, 27, 29)
+
+# The command names indexed by command ID
+NAMES = (
+    None,
+    'motors', # 1
+    'forward', # 2
+    'backward', # 3
+    'left', # 4
+    'right', # 5
+    'circle', # 6
+    'setheading', # 7
+    'setx', # 8
+    'sety', # 9
+    'setposition', # 10
+    'towards', # 11
+    'reset_origin', # 12
+    'heading', # 13
+    'position', # 14
+    'penup', # 15
+    'pendown', # 16
+    'eyes', # 17
+    'power', # 18
+    'isdown', # 19
+    'set_linear_velocity', # 20
+    'set_rotational_velocity', # 21
+    'get_linear_velocity', # 22
+    'get_rotational_velocity', # 23
+    'set_wheel_diameter_calibration', # 24
+    'set_axel_distance_calibration', # 25
+    'get_wheel_diameter_calibration', # 26
+    'get_axel_distance_calibration', # 27
+    'set_turtle_id', # 28
+    'get_turtle_id', # 29
+    'load_config', # 30
+    'save_config', # 31
+    'reset_config', # 32
+    'motion_queue', # 33
+    'set_telemetry_interval', # 34
+    'set_log_stream', # 35
+)
+
+# Motion queue responses
+
+def decode_accepted(response: bytes) -> tuple:
+    # Command accepted into the motion queue - slot, depth
+    return struct.unpack_from('<BB', response, 1)
+
+def decode_completed(response: bytes) -> tuple:
+    # Queued command completed - x_mm, y_mm, heading_degrees
+    return struct.unpack_from('<fff', response, 1)
+
+# Commands
+
+def encode_motors(seq: int, enable: bool) -> bytes:
+    return struct.pack('<BBB', seq, 1, enable)
+
+def encode_forward(seq: int, distance_mm: float) -> bytes:
+    return struct.pack('<BBf', seq, 2, distance_mm)
+
+def decode_forward(response: bytes) -> tuple:
+    # Result of forward - x_mm, y_mm, heading_degrees
+    return struct.unpack_from('<fff', response, 1)
+
+def encode_backward(seq: int, distance_mm: float) -> bytes:
+    return struct.pack('<BBf', seq, 3, distance_mm)
+
+def decode_backward(response: bytes) -> tuple:
+    # Result of backward - x_mm, y_mm, heading_degrees
+    return struct.unpack_from('<fff', response, 1)
+
+def encode_left(seq: int, angle_degrees: float) -> bytes:
+    return struct.pack('<BBf', seq, 4, angle_degrees)
+
+def decode_left(response: bytes) -> tuple:
+    # Result of left - x_mm, y_mm, heading_degrees
+    return struct.unpack_from('<fff', response, 1)
+
+def encode_right(seq: int, angle_degrees: float) -> bytes:
+    return struct.pack('<BBf', seq, 5, angle_degrees)
+
+def decode_right(response: bytes) -> tuple:
+    # Result of right - x_mm, y_mm, heading_degrees
+    return struct.unpack_from('<fff', response, 1)
+
+def encode_circle(seq: int, radius_mm: float, extent_degrees: float) -> bytes:
+    return struct.pack('<BBff', seq, 6, radius_mm, extent_degrees)
+
+def decode_circle(response: bytes) -> tuple:
+    # Result of circle - x_mm, y_mm, heading_degrees
+    return struct.unpack_from('<fff', response, 1)
+
+def encode_setheading(seq: int, heading_degrees: float) -> bytes:
+    return struct.pack('<BBf', seq, 7, heading_degrees)
+
+def encode_setx(seq: int, x_mm: float) -> bytes:
+    return struct.pack('<BBf', seq, 8, x_mm)
+
+def decode_setx(response: bytes) -> tuple:
+    # Result of setx - x_mm, y_mm, heading_degrees
+    return struct.unpack_from('<fff', response, 1)
+
+def encode_sety(seq: int, y_mm: float) -> bytes:
+    return struct.pack('<BBf', seq, 9, y_mm)
+
+def decode_sety(response: bytes) -> tuple:
+    # Result of sety - x_mm, y_mm, heading_degrees
+    return struct.unpack_from('<fff', response, 1)
+
+def encode_setposition(seq: int, x_mm: float, y_mm: float) -> bytes:
+    return struct.pack('<BBff', seq, 10, x_mm, y_mm)
+
+def decode_setposition(response: bytes) -> tuple:
+    # Result of setposition - x_mm, y_mm, heading_degrees
+    return struct.unpack_from('<fff', response, 1)
+
+def encode_towards(seq: int, x_mm: float, y_mm: float) -> bytes:
+    return struct.pack('<BBff', seq, 11, x_mm, y_mm)
+
+def decode_towards(response: bytes) -> tuple:
+    # Result of towards - x_mm, y_mm, heading_degrees
+    return struct.unpack_from('<fff', response, 1)
+
+def encode_reset_origin(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 12)
+
+def encode_heading(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 13)
+
+def decode_heading(response: bytes) -> tuple:
+    # Result of heading - heading_degrees
+    return struct.unpack_from('<f', response, 1)
+
+def encode_position(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 14)
+
+def decode_position(response: bytes) -> tuple:
+    # Result of position - x_mm, y_mm
+    return struct.unpack_from('<ff', response, 1)
+
+def encode_penup(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 15)
+
+def encode_pendown(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 16)
+
+def encode_eyes(seq: int, eye_id: int, red: int, green: int, blue: int) -> bytes:
+    return struct.pack('<BBBBBB', seq, 17, eye_id, red, green, blue)
+
+def encode_power(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 18)
+
+def decode_power(response: bytes) -> tuple:
+    # Result of power - voltage_mv, current_ma, power_mw
+    return struct.unpack_from('<iii', response, 1)
+
+def encode_isdown(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 19)
+
+def decode_isdown(response: bytes) -> tuple:
+    # Result of isdown - pen_down
+    return struct.unpack_from('<B', response, 1)
+
+def encode_set_linear_velocity(seq: int, max_speed: int, acceleration: int, jerk: int = 0) -> bytes:
+    return struct.pack('<BBiii', seq, 20, max_speed, acceleration, jerk)
+
+def encode_set_rotational_velocity(seq: int, max_speed: int, acceleration: int, jerk: int = 0) -> bytes:
+    return struct.pack('<BBiii', seq, 21, max_speed, acceleration, jerk)
+
+def encode_get_linear_velocity(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 22)
+
+def decode_get_linear_velocity(response: bytes) -> tuple:
+    # Result of get_linear_velocity - max_speed, acceleration, jerk
+    return struct.unpack_from('<iii', response, 1)
+
+def encode_get_rotational_velocity(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 23)
+
+def decode_get_rotational_velocity(response: bytes) -> tuple:
+    # Result of get_rotational_velocity - max_speed, acceleration, jerk
+    return struct.unpack_from('<iii', response, 1)
+
+def encode_set_wheel_diameter_calibration(seq: int, wheel_diameter: int) -> bytes:
+    return struct.pack('<BBi', seq, 24, wheel_diameter)
+
+def encode_set_axel_distance_calibration(seq: int, axel_distance: int) -> bytes:
+    return struct.pack('<BBi', seq, 25, axel_distance)
+
+def encode_get_wheel_diameter_calibration(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 26)
+
+def decode_get_wheel_diameter_calibration(response: bytes) -> tuple:
+    # Result of get_wheel_diameter_calibration - wheel_diameter
+    return struct.unpack_from('<i', response, 1)
+
+def encode_get_axel_distance_calibration(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 27)
+
+def decode_get_axel_distance_calibration(response: bytes) -> tuple:
+    # Result of get_axel_distance_calibration - axel_distance
+    return struct.unpack_from('<i', response, 1)
+
+def encode_set_turtle_id(seq: int, turtle_id: int) -> bytes:
+    return struct.pack('<BBB', seq, 28, turtle_id)
+
+def encode_get_turtle_id(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 29)
+
+def decode_get_turtle_id(response: bytes) -> tuple:
+    # Result of get_turtle_id - turtle_id
+    return struct.unpack_from('<B', response, 1)
+
+def encode_load_config(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 30)
+
+def encode_save_config(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 31)
+
+def encode_reset_config(seq: int) -> bytes:
+    return struct.pack('<BB', seq, 32)
+
+def encode_motion_queue(seq: int, enable: bool) -> bytes:
+    return struct.pack('<BBB', seq, 33, enable)
+
+def encode_set_telemetry_interval(seq: int, interval_ms: int) -> bytes:
+    return struct.pack('<BBH', seq, 34, interval_ms)
+
+def encode_set_log_stream(seq: int, enable: bool) -> bytes:
+    return struct.pack('<BBB', seq, 35, enable)
@@ -0,0 +1,119 @@
+#************************************************************************
+#
+#   response_router.py
+#
+#   Matches the robot's responses to the commands waiting for them
+#   Valiant Turtle 2 - Communicator firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import asyncio
+import picolog
+import time
+from micropython import const
+
+# The number of sequence IDs (the tables are indexed by sequence ID, 0 is the NOP response)
+_SEQUENCE_IDS = const(256)
+
+# How long a late response is waited for before its sequence ID can be reused
+_LATE_EXPIRY_MS = const(120000)
+
+class ResponseRouter:
+    """
+    Routes each response from the robot straight to the command waiting for it (looked up by
+    sequence ID), so more than one command can wait at once and no response is taken by the
+    wrong waiter.
+
+    route() is called by BleCentral as each notification is received. A sequence ID whose command
+    gave up waiting is kept in the late table until its response arrives (or the entry expires), and
+    isn't reused until then - otherwise a late response could complete a newer command that was given
+    the same sequence ID.
+    """
+
+    def __init__(self):
+        # Events of the commands waiting for a response and the responses received (indexed by sequence ID)
+        self._events = [None] * _SEQUENCE_IDS
+        self._responses = [None] * _SEQUENCE_IDS
+
+        # Time (ticks_ms) that each command waiting for a late response gave up (indexed by sequence ID)
+        self._late = [None] * _SEQUENCE_IDS
+
+        # Counts of the late responses and the responses that no command was waiting for
+        self._late_count = 0
+        self._orphan_count = 0
+
+    @property
+    def late_count(self) -> int:
+        return self._late_count
+
+    @property
+    def orphan_count(self) -> int:
+        return self._orphan_count
+
+    def in_use(self, seq_id: int) -> bool:
+        """True if the sequence ID can't be given to a new command (it's waiting for a response or a late response)"""
+        if self._events[seq_id] is not None:
+            return True
+        gave_up = self._late[seq_id]
+        if gave_up is None:
+            return False
+        if time.ticks_diff(time.ticks_ms(), gave_up) > _LATE_EXPIRY_MS:
+            self._late[seq_id] = None
+            return False
+        return True
+
+    def expect(self, seq_id: int):
+        """Register a command that is about to be sent (call before queuing the command)"""
+        if self.in_use(seq_id):
+            raise ValueError("ResponseRouter::expect - Sequence ID is already in use")
+        self._events[seq_id] = asyncio.Event()
+        self._responses[seq_id] = None
+
+    async def wait(self, seq_id: int):
+        """Wait for the response to a command (cancel the wait, e.g. with asyncio.wait_for, to give up)"""
+        try:
+            await self._events[seq_id].wait()
+            return self._responses[seq_id]
+        finally:
+            # If the response hasn't arrived, it's now late
+            if self._responses[seq_id] is None:
+                self._late[seq_id] = time.ticks_ms()
+            self._events[seq_id] = None
+            self._responses[seq_id] = None
+
+    def route(self, data) -> bool:
+        """Deliver a response to the command waiting for it. Returns False if no command was waiting"""
+        seq_id = data[0]
+
+        event = self._events[seq_id]
+        if event is not None and self._responses[seq_id] is None:
+            self._responses[seq_id] = data
+            event.set()
+            return True
+
+        if self._late[seq_id] is not None:
+            self._late[seq_id] = None
+            self._late_count += 1
+            picolog.info("ResponseRouter::route - Sequence ID = {} responded after its command stopped waiting", seq_id)
+            return False
+
+        self._orphan_count += 1
+        return False
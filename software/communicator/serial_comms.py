@@ -29,18 +29,45 @@ import asyncio
 import picolog
 from machine import UART
 import struct
+from micropython import const
 from commands_tx import CommandsTx
+from ble_central import BleCentral
+
+# Command packets are passed straight through to the robot using command ID 44
+# (packet mode). This lets a host run its own CommandsTx over the serial link
+_COMMAND_PACKET = const(44)
+_COMMAND_PACKET_MODE_OFF = const(45)
+_COMMAND_STATUS = const(46)
+
+# The length of a command or response packet
+_PACKET_LENGTH = const(20)
+
+# Packets from the robot are sent to the host with this start byte (shell responses
+# start with the result code, which is never 0xFE)
+_PACKET_FRAME = const(0xFE)
 
 class SerialComms:
-    def __init__(self, uart: UART, command_tx: CommandsTx):
+    def __init__(self, uart: UART, command_tx: CommandsTx, ble_central: BleCentral):
             """A simple command shell using asyncio streams via UART"""
             self._commands_tx = command_tx
+            self._ble_central = ble_central
+
+            # In packet mode the robot's responses are relayed to the host (and the
+            # shell's own commands are refused so they don't take the host's responses)
+            self._packet_mode = False
 
             # Use the UART stream
             self.reader = asyncio.StreamReader(uart)
             self.writer = asyncio.StreamWriter(uart)
 
     async def run(self):
+        tasks = [
+            asyncio.create_task(self.__process_commands()),
+            asyncio.create_task(self.__relay_packets()),
+        ]
+        await asyncio.gather(*tasks)
+
+    async def __process_commands(self):
         while True:
             command = None
             parameters = None
@@ -49,7 +76,15 @@ class SerialComms:
                 while not command:
                     command_bytes = await self.__read_command_bytes()
 
-                    if command_bytes:
+                    if len(command_bytes) == _PACKET_LENGTH + 2 and struct.unpack("<h", command_bytes[:2])[0] == _COMMAND_PACKET:
+                        # Pass the packet through to the robot (there is no shell response)
+                        if not self._packet_mode:
+                            # Discard anything left in the queue from before packet mode
+                            self._ble_central._p2c_queue.clear()
+                            self._packet_mode = True
+                        if self._ble_central.connected:
+                            self._ble_central.add_to_c2p_queue(bytes(command_bytes[2:]))
+                    elif command_bytes:
                         # Parse the command and parameters (into a list)
                         valid, command_id, parameters = self.__parse_command(command_bytes)
 
@@ -72,6 +107,12 @@ class SerialComms:
                 break
             command_bytes.extend(data)
 
+            # A packet can contain any byte value (including CR) so it is read by length
+            if len(command_bytes) == 2 and struct.unpack("<h", command_bytes)[0] == _COMMAND_PACKET:
+                command_bytes.extend(await self.reader.readexactly(_PACKET_LENGTH))
+                await self.reader.read(1) # CR
+                break
+
         picolog.debug(f"HostShell::read_command - Host mode command bytes = {command_bytes}")
         return command_bytes
     
@@ -117,6 +158,9 @@ class SerialComms:
         # Command ID 41: power_mv
         # Command ID 42: power_ma
         # Command ID 43: power_mw
+        # Command ID 44: Packet (20 bytes) - passed through to the robot (see __read_command_bytes)
+        # Command ID 45: Packet mode off
+        # Command ID 46: Is the robot connected? (0=No, 1=Yes)
 
         # Result codes:
         # -1: Error
@@ -124,6 +168,18 @@ class SerialComms:
 
         # How will this send a negative command response?  it won't...
 
+        if command_id == _COMMAND_PACKET_MODE_OFF:
+            self._packet_mode = False
+            return result_code, command_response
+        elif command_id == _COMMAND_STATUS:
+            if self._ble_central.connected:
+                command_response = 1
+            return result_code, command_response
+        elif self._packet_mode:
+            # The host is sending its own packets, so the shell's commands are refused
+            picolog.debug(f"SerialComms::__dispatch_command - Command ID {command_id} refused in packet mode")
+            return 1, command_response
+
         if command_id == 32: # Motors
             if parameters[0] == 0:
                 if not await self._commands_tx.motors(False):
@@ -185,6 +241,29 @@ class SerialComms:
 
         return result_code, command_response
     
+    async def __relay_packets(self):
+        """Send the robot's responses to the host whilst in packet mode"""
+        while True:
+            if not self._packet_mode:
+                await asyncio.sleep_ms(100)
+                continue
+
+            await self._ble_central._p2c_queue_event.wait()
+            self._ble_central._p2c_queue_event.clear()
+
+            # Send everything waiting in one write
+            frames = bytearray()
+            while len(self._ble_central._p2c_queue) > 0:
+                frames.append(_PACKET_FRAME)
+                frames.extend(self._ble_central._p2c_queue.pop(0))
+
+            if frames:
+                try:
+                    self.writer.write(frames)
+                    await self.writer.drain()
+                except Exception as e:
+                    picolog.debug(f"SerialComms::__relay_packets - Failed to send packets: {e}")
+
     async def __send_response(self, result_code: int, command_response: int) -> None:
         if not isinstance(result_code, int) or result_code < 0 or result_code > 255:
             raise ValueError("Result code must be an unsigned byte (0-255)")
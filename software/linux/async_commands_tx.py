@@ -0,0 +1,423 @@
+#************************************************************************
+#
+#   async_commands_tx.py
+#
+#   Asynchronous command Tx handling
+#   Valiant Turtle 2 - Linux host
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import asyncio
+import logging
+import struct
+import protocol_central as protocol
+from transport import Transport, create_transport
+from telemetry_rx import TelemetryBuffer
+from log_rx import RobotLog
+from response_router import ResponseRouter
+
+# Note: The commands are defined by the protocol schema (software/protocol/schema.py)
+# and encoded and decoded by the generated protocol_central module
+
+# Commands that move the robot (or wait for it to stop moving) are given the long timeout
+_LONG_TIMEOUT_COMMANDS = protocol.PLANNED_COMMANDS + (protocol.MOTION_QUEUE,)
+
+class AsyncCommandsTx:
+    """
+    Sends commands to the robot from the caller's own event loop. Every command is a coroutine
+    (for example await robot.forward(100)) so an asyncio application doesn't need a thread.
+
+    Commands can be awaited one at a time or run at once (with asyncio.gather or as tasks); the
+    responses are matched to the waiting commands by their sequence ID. Up to max_in_flight
+    commands are sent to the robot at once, the rest wait for a slot.
+
+    When the robot's motion queue is enabled (see motion_queue) a move returns as soon as the robot
+    has accepted it, before it has been executed, so the pose in its result is None. The pose the
+    robot reports once the queued moves have completed is returned by wait_for_completion.
+
+    Example:
+        async with AsyncCommandsTx(transport) as robot:
+            await robot.wait_for_connection()
+            await robot.motors(True)
+            await robot.forward(100)
+
+    (CommandsTx is a synchronous wrapper around this class that runs it on a background thread.)
+    """
+
+    # The maximum number of commands that can be in flight at once.  The transport
+    # and the robot both buffer up to 50 packets, so this leaves plenty of headroom
+    MAX_IN_FLIGHT = 32
+
+    def __init__(self, transport: Transport = None, max_in_flight: int = MAX_IN_FLIGHT):
+        # The link to the robot (BLE unless another transport is given)
+        self._transport = transport if transport is not None else create_transport("ble")
+        self._command_sequence = 1
+
+        self._short_timeout = 5.0
+        self._long_timeout = 60.0
+
+        if max_in_flight < 1 or max_in_flight > AsyncCommandsTx.MAX_IN_FLIGHT:
+            raise ValueError(f"AsyncCommandsTx::__init__ - Commands in flight must be between 1 and {AsyncCommandsTx.MAX_IN_FLIGHT}")
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+
+        # Responses are delivered to the waiting commands as soon as the transport receives them
+        self._router = ResponseRouter()
+        self._transport.set_response_handler(self.__route_response)
+
+        # Robot motion queue state (see motion_queue)
+        self._motion_queue_enabled = False
+        self._queued_commands = set()
+        self._queue_drained = asyncio.Event()
+        self._queue_drained.set()
+        self._last_pose = (0.0, 0.0, 0.0)
+
+        # Telemetry frames received from the robot (see set_telemetry_interval)
+        self._telemetry = TelemetryBuffer()
+        self._transport.set_telemetry_handler(self._telemetry.receive)
+
+        # Log lines received from the robot (see set_log_stream)
+        self._robot_log = RobotLog()
+        self._transport.set_log_handler(self._robot_log.receive)
+
+        # The task running the transport (when used as an async context manager)
+        self._task = None
+
+    @property
+    def transport(self) -> Transport:
+        return self._transport
+
+    @property
+    def connected(self) -> bool:
+        return self._transport.connected
+
+    @property
+    def motion_queue_enabled(self) -> bool:
+        return self._motion_queue_enabled
+
+    @property
+    def last_pose(self) -> tuple[float, float, float]:
+        # The pose (x, y, heading) reported by the most recent motion queue completion event
+        return self._last_pose
+
+    @property
+    def telemetry(self) -> TelemetryBuffer:
+        # The telemetry frames received from the robot (sinks can be added to the buffer)
+        return self._telemetry
+
+    @property
+    def robot_log(self) -> RobotLog:
+        # The log lines received from the robot (sinks can be added to the log)
+        return self._robot_log
+
+    @property
+    def queued_commands(self) -> int:
+        # The number of commands accepted by the robot's motion queue that have not completed
+        return len(self._queued_commands)
+
+    @property
+    def in_flight(self) -> int:
+        # The number of commands waiting for a response from the robot
+        return self._router.pending
+
+    @property
+    def router(self) -> ResponseRouter:
+        # The response router (its late and orphan counts show responses no command received)
+        return self._router
+
+    async def run(self):
+        # Run the transport (or use the class as an async context manager to run it in the background)
+        await self._transport.run()
+
+    async def __aenter__(self):
+        self._task = asyncio.create_task(self.run())
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """Disconnect from the robot and stop the transport (if it was started by the context manager)"""
+        logging.info(f"AsyncCommandsTx::close - Disconnecting {self._transport.name}")
+        self._transport.disconnect()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait_for_connection(self, timeout: float = None) -> bool:
+        """Wait until the transport is connected to the robot. Returns False if the timeout expires first"""
+        try:
+            await asyncio.wait_for(self.__connected(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def __connected(self):
+        while not self._transport.connected:
+            await asyncio.sleep(0.1)
+
+    async def __next_seq(self) -> int:
+        # Wait for a slot (released once the response has been received or the command has timed out)
+        await self._in_flight.acquire()
+
+        # Skip any sequence IDs that are still waiting for a response (or a late response)
+        while True:
+            self._command_sequence += 1
+            if self._command_sequence > 255:
+                self._command_sequence = 1
+            if not self._router.in_use(self._command_sequence):
+                break
+
+        self._router.expect(self._command_sequence)
+        return self._command_sequence
+
+    def __route_response(self, data: bytes):
+        # Called by the transport with each response as it is received
+
+        # Completion events from the robot's motion queue are not a response to a waiting
+        # command (the sequence ID may already have been reused) so handle them here
+        if data[protocol.RESPONSE_TYPE_OFFSET] == protocol.RESPONSE_COMPLETED:
+            self.__handle_completion_event(data)
+            return
+        if data[protocol.RESPONSE_TYPE_OFFSET] == protocol.RESPONSE_ACCEPTED:
+            self._queued_commands.add(data[0])
+            self._queue_drained.clear()
+
+        self._router.route(data)
+
+    def __handle_completion_event(self, data: bytes):
+        seq_id = data[0]
+        x, y, heading = protocol.decode_completed(data)
+        self._queued_commands.discard(seq_id)
+        self._last_pose = (round(x, 2), round(y, 2), round(heading, 2))
+        logging.info(f"AsyncCommandsTx::__handle_completion_event - Sequence ID = {seq_id} completed, X = {self._last_pose[0]}, Y = {self._last_pose[1]}, heading = {self._last_pose[2]}")
+        if len(self._queued_commands) == 0:
+            self._queue_drained.set()
+
+    async def wait_for_completion(self, timeout: float = None) -> tuple[bool, float, float, float]:
+        """
+        Wait until the robot has completed every command accepted into its motion queue.
+        Returns:
+            tuple: (success, x, y, heading) - the pose reported by the last command to complete
+                   (success is False if the timeout expires first).
+        """
+        try:
+            await asyncio.wait_for(self._queue_drained.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logging.error(f"AsyncCommandsTx::wait_for_completion - {len(self._queued_commands)} queued commands did not complete")
+            return False, 0.0, 0.0, 0.0
+        return (True,) + self._last_pose
+
+    def __is_accepted(self, response: bytes) -> bool:
+        # Check if the response is an acknowledgement from the robot's motion queue
+        if len(response) == protocol.PACKET_LENGTH and response[protocol.RESPONSE_TYPE_OFFSET] == protocol.RESPONSE_ACCEPTED:
+            seq_id = response[0]
+            slot, depth = protocol.decode_accepted(response)
+            logging.info(f"AsyncCommandsTx::__is_accepted - Sequence ID = {seq_id} accepted into motion queue slot {slot} of {depth}")
+            return True
+        return False
+
+    async def __wait_for_command_response(self, seq_id: int, timeout: float) -> bytes:
+        # The robot executes the commands in order, so a command may first have to wait for the commands
+        # sent before it (such as a long move). Each command's timeout starts once the commands ahead of it
+        # have been answered (they have timeouts of their own) or have given up
+        future = self._router.future(seq_id)
+        try:
+            ahead = self._router.ahead(seq_id)
+            while len(ahead) > 0 and not future.done():
+                await asyncio.wait(ahead + [future], return_when=asyncio.FIRST_COMPLETED)
+                ahead = [waiting for waiting in ahead if not waiting.done()]
+            return await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        finally:
+            self._router.finish(seq_id)
+            self._in_flight.release()
+
+    # Commands ----------------------------------------------------------------------------------------------------------
+
+    async def _call(self, command_id: int, *parameters):
+        """
+        Send a command to the robot and wait for its response. The parameters are encoded and the result
+        decoded by the generated protocol codec (see software/protocol/schema.py).
+        Returns:
+            bool: For a command without a result, True if the command succeeded.
+            tuple: For a command with a result, (success, result fields...) - the fields are zero on failure
+                   and None if the command was accepted into the robot's motion queue.
+        """
+        name = protocol.NAMES[command_id]
+        decoder = protocol.DECODERS[command_id]
+        defaults = protocol.RESULT_DEFAULTS[command_id]
+        failed = (False,) + defaults if decoder is not None else False
+
+        if not self._transport.connected:
+            logging.error(f"AsyncCommandsTx::{name} - Not connected to a robot")
+            return failed
+
+        # Generate a sequence ID and queue the command
+        seq_id = await self.__next_seq()
+        data = protocol.ENCODERS[command_id](seq_id, *parameters)
+        self._transport.add_to_c2p_queue(data)
+        logging.info(f"AsyncCommandsTx::{name} - Command ID = {command_id}, Sequence ID = {seq_id}, parameters = {parameters}")
+
+        # Wait for the command to be processed (with a long timeout for the commands that move the robot)
+        timeout = self._long_timeout if command_id in _LONG_TIMEOUT_COMMANDS else self._short_timeout
+        try:
+            response = await self.__wait_for_command_response(seq_id, timeout)
+        except asyncio.TimeoutError:
+            logging.error(f"AsyncCommandsTx::{name} - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
+            self._transport.disconnect()
+            return failed
+
+        # This command does not return any data, so we don't need to return any
+        if decoder is None:
+            return True
+
+        # If the robot queued the command there is no result yet (the pose is reported by a
+        # completion event once the command has been executed, see wait_for_completion)
+        if self.__is_accepted(response):
+            return (True,) + (None,) * len(defaults)
+
+        # Extract the result from the response (floats are rounded to 2 decimal places)
+        try:
+            values = decoder(response)
+        except struct.error as e:
+            logging.error(f"AsyncCommandsTx::{name} - Error unpacking response: {e}")
+            return failed
+        result = tuple(round(value, 2) if isinstance(default, float) else type(default)(value)
+            for value, default in zip(values, defaults))
+        logging.info(f"AsyncCommandsTx::{name} - Result = {result}")
+        return (True,) + result
+
+    async def motors(self, enable: bool) -> bool:
+        return await self._call(protocol.MOTORS, bool(enable))
+
+    async def forward(self, distance_mm: float) -> tuple[bool, float, float, float]:
+        return await self._call(protocol.FORWARD, distance_mm)
+
+    async def backward(self, distance_mm: float) -> tuple[bool, float, float, float]:
+        return await self._call(protocol.BACKWARD, distance_mm)
+
+    async def left(self, angle_degrees: float) -> tuple[bool, float, float, float]:
+        return await self._call(protocol.LEFT, angle_degrees)
+
+    async def right(self, angle_degrees: float) -> tuple[bool, float, float, float]:
+        return await self._call(protocol.RIGHT, angle_degrees)
+
+    async def circle(self, radius_mm: float, extent_degrees: float) -> tuple[bool, float, float, float]:
+        return await self._call(protocol.CIRCLE, radius_mm, extent_degrees)
+
+    async def setheading(self, angle_degrees: float) -> bool:
+        return await self._call(protocol.SETHEADING, angle_degrees)
+
+    async def setx(self, x_mm: float) -> tuple[bool, float, float, float]:
+        return await self._call(protocol.SETX, x_mm)
+
+    async def sety(self, y_mm: float) -> tuple[bool, float, float, float]:
+        return await self._call(protocol.SETY, y_mm)
+
+    async def setposition(self, x_mm: float, y_mm: float) -> tuple[bool, float, float, float]:
+        return await self._call(protocol.SETPOSITION, x_mm, y_mm)
+
+    async def towards(self, x_mm: float, y_mm: float) -> tuple[bool, float, float, float]:
+        return await self._call(protocol.TOWARDS, x_mm, y_mm)
+
+    async def reset_origin(self) -> bool:
+        return await self._call(protocol.RESET_ORIGIN)
+
+    async def heading(self) -> tuple[bool, float]:
+        return await self._call(protocol.HEADING)
+
+    async def position(self) -> tuple[bool, float, float]:
+        return await self._call(protocol.POSITION)
+
+    async def penup(self) -> bool:
+        return await self._call(protocol.PENUP)
+
+    async def pendown(self) -> bool:
+        return await self._call(protocol.PENDOWN)
+
+    async def eyes(self, eye_id, red, green, blue) -> bool:
+        return await self._call(protocol.EYES, eye_id, red, green, blue)
+
+    async def power(self) -> tuple[bool, int, int, int]:
+        return await self._call(protocol.POWER)
+
+    async def isdown(self) -> tuple[bool, bool]:
+        return await self._call(protocol.ISDOWN)
+
+    async def set_linear_velocity(self, target_speed: int, acceleration: int, jerk: int = 0) -> bool:
+        return await self._call(protocol.SET_LINEAR_VELOCITY, target_speed, acceleration, jerk)
+
+    async def set_rotational_velocity(self, target_speed: int, acceleration: int, jerk: int = 0) -> bool:
+        return await self._call(protocol.SET_ROTATIONAL_VELOCITY, target_speed, acceleration, jerk)
+
+    async def get_linear_velocity(self) -> tuple[bool, int, int, int]:
+        return await self._call(protocol.GET_LINEAR_VELOCITY)
+
+    async def get_rotational_velocity(self) -> tuple[bool, int, int, int]:
+        return await self._call(protocol.GET_ROTATIONAL_VELOCITY)
+
+    async def set_wheel_diameter_calibration(self, wheel_diameter: int) -> bool:
+        return await self._call(protocol.SET_WHEEL_DIAMETER_CALIBRATION, wheel_diameter)
+
+    async def set_axel_distance_calibration(self, axel_distance: int) -> bool:
+        return await self._call(protocol.SET_AXEL_DISTANCE_CALIBRATION, axel_distance)
+
+    async def get_wheel_diameter_calibration(self) -> tuple[bool, int]:
+        return await self._call(protocol.GET_WHEEL_DIAMETER_CALIBRATION)
+
+    async def get_axel_distance_calibration(self) -> tuple[bool, int]:
+        return await self._call(protocol.GET_AXEL_DISTANCE_CALIBRATION)
+
+    async def set_turtle_id(self, turtle_id: int) -> bool:
+        return await self._call(protocol.SET_TURTLE_ID, turtle_id)
+
+    async def get_turtle_id(self) -> tuple[bool, int]:
+        return await self._call(protocol.GET_TURTLE_ID)
+
+    async def load_config(self) -> bool:
+        return await self._call(protocol.LOAD_CONFIG)
+
+    async def save_config(self) -> bool:
+        return await self._call(protocol.SAVE_CONFIG)
+
+    async def reset_config(self) -> bool:
+        return await self._call(protocol.RESET_CONFIG)
+
+    async def motion_queue(self, enable: bool) -> bool:
+        # When the motion queue is enabled, motion commands are acknowledged as soon as they are
+        # queued by the robot (disabling it waits for the queued commands to complete)
+        if not await self._call(protocol.MOTION_QUEUE, bool(enable)):
+            return False
+        self._motion_queue_enabled = bool(enable)
+        return True
+
+    async def set_telemetry_interval(self, interval_ms: int) -> bool:
+        # The interval between the robot's telemetry frames (0 = off)
+        if interval_ms < 0 or interval_ms > 65535:
+            raise ValueError("AsyncCommandsTx::set_telemetry_interval - Interval must be between 0 and 65535 ms")
+        return await self._call(protocol.SET_TELEMETRY_INTERVAL, interval_ms)
+
+    async def set_log_stream(self, enable: bool) -> bool:
+        # Start (from the oldest record the robot holds) or stop the robot's log stream
+        return await self._call(protocol.SET_LOG_STREAM, bool(enable))
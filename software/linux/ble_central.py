@@ -29,14 +29,61 @@ import asyncio
 import logging
 
 from bleak import BleakScanner, BleakClient
+from bleak.exc import BleakError
 from bleak.uuids import normalize_uuid_16
 from bleak.backends.characteristic import BleakGATTCharacteristic
 
-class BleCentral:
-    __ADVERTISING_NAME = "vt2-robot"
+from transport import Transport, PACKET_LENGTH
+
+# The robot adds its turtle ID to the end of its advertised manufacturer data
+_MANUFACTURER_ID = 0xFFE1
+_ADVERTISING_NAME = "vt2-robot"
+
+# The most packets sent in one write or accepted in one notification (the robot may allow fewer)
+_MAX_FRAME_PACKETS = 8
+
+# The ATT header (the rest of the MTU carries the characteristic's value)
+_ATT_HEADER_LENGTH = 3
+
+# The MTU before a larger one has been negotiated (room for a single packet)
+_DEFAULT_MTU = 23
+
+async def discover_robots(timeout: float = 5.0) -> dict:
+    """
+    Scan for robots.
+    Returns:
+        dict: The address of each robot found, indexed by turtle ID.
+    """
+
+    robots = {}
+    devices = await BleakScanner.discover(timeout=timeout, return_adv=True)
+    for device, advertisement in devices.values():
+        manufacturer_data = advertisement.manufacturer_data.get(_MANUFACTURER_ID)
+        if advertisement.local_name == _ADVERTISING_NAME and manufacturer_data:
+            turtle_id = manufacturer_data[-1]
+            if turtle_id in robots:
+                logging.warning(f"Robots at {robots[turtle_id]} and {device.address} both have turtle ID {turtle_id}")
+            robots[turtle_id] = device.address
+    return robots
+
+class BleCentral(Transport):
+    __ADVERTISING_NAME = _ADVERTISING_NAME
     __ADVERTISING_UUID = 0xF910
 
-    def __init__(self):
+    name = "BLE"
+
+    def __init__(self, address: str = None, turtle_id: int = None):
+        """
+        Args:
+            address (str): Optional address of the robot (otherwise the central scans for it).
+            turtle_id (int): Optional turtle ID of the robot to connect to (otherwise the first robot found is used).
+        """
+
+        super().__init__()
+        if turtle_id is not None:
+            self.name = f"BLE (turtle {turtle_id})"
+        self._turtle_id = turtle_id
+
         # Remote device advertising definitions
         self._peripheral_advertising_uuid = BleCentral.__ADVERTISING_UUID
         self._peripheral_advertising_name = BleCentral.__ADVERTISING_NAME
@@ -44,134 +91,164 @@ class BleCentral:
         # Command service characteristics setup
         self._tx_p2c_characteristic_uuid = normalize_uuid_16(0xFBA0)
         self._rx_c2p_characteristic_uuid = normalize_uuid_16(0xFBA1)
+        self._telemetry_characteristic_uuid = normalize_uuid_16(0xFBA2)
+        self._log_characteristic_uuid = normalize_uuid_16(0xFBA3)
+        self._framing_characteristic_uuid = normalize_uuid_16(0xFBA4)
 
-        # Flag to show connected status
-        self._connected = False
-
-        # Maximum number of elements to store in the queues (note: maximum is 128 since command sequence is 8 bits)
-        # Note: Queue elements are 20 bytes long
-        self._max_queue_elements = 50
-
-        # Transmission queue for sending service data from central
-        self._c2p_queue = []
+        # The number of packets in each write or notification (agreed with the robot once connected)
+        self._frame_packets = 1
 
-        # Reception queue for receiving service data to central
-        self._p2c_queue = []
-        self._p2c_queue_event = None
+        # Address of the last peripheral found (reused when reconnecting, so the
+        # central doesn't have to scan again after the link drops)
+        self._device_address = address
 
         # Notification event for when data is received from the peripheral
         self._p2c_notification_event = None
 
     @property
-    def connected(self):
-        return self._connected
-    
-    @property
-    def p2c_queue(self):
-        return self._c2p_queue
-    
-    def add_to_c2p_queue(self, data):
-        if len(self._c2p_queue) < self._max_queue_elements:
-            self._c2p_queue.append(data)
-        else:
-            logging.info("C2P queue is full - data not added")
+    def frame_packets(self) -> int:
+        return self._frame_packets
 
     def disconnect(self):
         logging.info("Disconnecting from BLE peripheral")
         self._connected = False
 
     async def run(self):
-        logging.info("Running BLE central async tasks") 
-
-        self._p2c_queue_event = asyncio.Event()
         self._p2c_notification_event = asyncio.Event()
+        await super().run()
+
+    async def __find_peripheral(self):
+        # Reuse the address of the peripheral from the last connection if there is one
+        if self._device_address is not None:
+            return self._device_address
+
+        # Look for a particular robot
+        if self._turtle_id is not None:
+            logging.info(f"Scanning for BLE peripheral with turtle ID {self._turtle_id}...")
+            address = (await discover_robots()).get(self._turtle_id)
+            if address is not None:
+                logging.info(f"BLE peripheral with turtle ID {self._turtle_id} found with address {address}")
+            else:
+                logging.info(f"BLE peripheral with turtle ID {self._turtle_id} not found")
+            return address
 
-        tasks = [
-            asyncio.create_task(self.__maintain_connection()),
-            asyncio.create_task(self.__handle_commands()),
-        ]
-        await asyncio.gather(*tasks)
+        logging.info("Scanning for BLE peripheral...")
+        scanner = BleakScanner()
+        device = await scanner.find_device_by_name(self._peripheral_advertising_name, timeout=5, return_adv=True)
+        if device:
+            logging.info(f"BLE peripheral found with address {device.address}")
+            return device.address
 
-    async def __maintain_connection(self):
+        logging.info("BLE peripheral not found")
+        return None
+
+    async def _maintain_connection(self):
         logging.info("Running maintain connection task")
         while True:
-            # If we are not connected, advertise and wait for connection
+            # If we are not connected, scan for the peripheral and connect
             if not self._connected:
                 # Clear the queues
-                self._c2p_queue.clear()
-                self._p2c_queue.clear()
-
-                # Scan for the peripheral
-                logging.info("Scanning for BLE peripheral...")
-                scanner = BleakScanner()
-                self._device = await scanner.find_device_by_name(self._peripheral_advertising_name, timeout=5, return_adv=True)
-                if self._device:
-                    logging.info(f"BLE peripheral found with address {self._device.address}")
+                self._clear_queues()
 
+                address = await self.__find_peripheral()
+                if address is not None:
                     # Attempt to connect to the peripheral
                     try:
-                        async with BleakClient(self._device.address) as self._client:
+                        async with BleakClient(address) as self._client:
                             if self._client.is_connected:
                                 # We should probably pair here... but bleak doesn't support programmatic pairing
 
                                 # Subscribe to notifications on the tx_p2c_characteristic
                                 await self._client.start_notify(self._tx_p2c_characteristic_uuid, self.__p2c_notification_handler)
                                 logging.info("Subscribed to P2C notifications")
+
+                                # Subscribe to the telemetry notifications (older firmware doesn't have them)
+                                try:
+                                    await self._client.start_notify(self._telemetry_characteristic_uuid, self.__telemetry_notification_handler)
+                                    logging.info("Subscribed to telemetry notifications")
+                                except BleakError as e:
+                                    logging.info(f"Telemetry is not available: {e}")
+
+                                # Subscribe to the log notifications (older firmware doesn't have them)
+                                try:
+                                    await self._client.start_notify(self._log_characteristic_uuid, self.__log_notification_handler)
+                                    logging.info("Subscribed to log notifications")
+                                except BleakError as e:
+                                    logging.info(f"Robot log is not available: {e}")
+
+                                await self.__set_up_framing()
+
+                                self._device_address = address
                                 self._connected = True
 
                                 # Wait for disconnection
                                 while self._client.is_connected and self._connected:
                                     await asyncio.sleep(0.25)
                     except BleakError as e:
+                        # The peripheral may have a new address (or be out of range), so scan again next time
                         logging.error(f"Failed to connect or discover services: {e}")
+                        self._device_address = None
                         await asyncio.sleep(1)  # Wait before retrying
-                else:
-                    logging.info("BLE peripheral not found")
                     self._connected = False
 
             # Wait for 1 second before checking again
             await asyncio.sleep(1)
 
-    async def __handle_commands(self):
+    async def __set_up_framing(self):
+        # Agree how many packets can share a write or notification. The robot gives the most it
+        # can handle, and the frame has to fit in the MTU (older firmware has no framing
+        # characteristic, so it gets one packet at a time). Note: mtu_size needs the bleak version
+        # in requirements.txt; if the MTU isn't known it's taken as the default (one packet per write)
+        self._frame_packets = 1
+
+        try:
+            robot_packets = (await self._client.read_gatt_char(self._framing_characteristic_uuid))[0]
+        except (BleakError, IndexError) as e:
+            logging.info(f"Framing is not available: {e}")
+            return
+
+        mtu = self._client.mtu_size or _DEFAULT_MTU
+        frame_packets = max(1, min(robot_packets, _MAX_FRAME_PACKETS, (mtu - _ATT_HEADER_LENGTH) // PACKET_LENGTH))
+        await self._client.write_gatt_char(self._framing_characteristic_uuid, bytes([frame_packets]), response=True)
+        self._frame_packets = frame_packets
+        logging.info(f"MTU is {mtu}, sending up to {frame_packets} packets in each write")
+
+    async def _handle_commands(self):
         logging.info("Running handle commands task")
         while True:
             while self._connected:
-                # Wait for a notification to be received
-                #logging.info("Waiting for P2C notification event")
-                await self._p2c_notification_event.wait()
-                #logging.info("P2C notification event received")
+                # Wait for a notification to be received (or data to send)
+                await self._wake_event.wait()
+                self._wake_event.clear()
+                notified = self._p2c_notification_event.is_set()
+                self._p2c_notification_event.clear()
     
                 # Send any data in the c2p queue to the peripheral
                 if len(self._c2p_queue) > 0:
                     # Send all waiting data
-                    while len(self._c2p_queue) > 0:
-                        data_packet = self._c2p_queue.pop(0)
+                    for data_packet in self._take_c2p_frames(self._frame_packets):
                         #logging.info(f"Sending data to peripheral: {data_packet}")
                         await self._client.write_gatt_char(self._rx_c2p_characteristic_uuid, data_packet, response=False)
-                else:
-                    # If the queue is empty, send a nop
-                    data_packet = bytearray(20)
+                elif notified:
+                    # If the queue is empty, respond to the notification with a nop
+                    data_packet = bytearray(PACKET_LENGTH)
                     await self._client.write_gatt_char(self._rx_c2p_characteristic_uuid, data_packet, response=False)
-
-                # Clear the notification event
-                self._p2c_notification_event.clear()
             else:
                 # If we are not connected, wait for 250ms
                 await asyncio.sleep(0.25)
 
+    def __telemetry_notification_handler(self, characteristic: BleakGATTCharacteristic, telemetry_data: bytearray):
+        """Handle telemetry notifications from the peripheral."""
+        self._receive_telemetry(telemetry_data)
+
+    def __log_notification_handler(self, characteristic: BleakGATTCharacteristic, log_data: bytearray):
+        """Handle log notifications from the peripheral."""
+        self._receive_log(log_data)
+
     def __p2c_notification_handler(self, characteristic: BleakGATTCharacteristic, service_data: bytearray):
-        """Handle notifications from the peripheral."""
-        if len(service_data) == 20:
-            # Check the first byte to see if it is a valid commmand response
-            # If the first byte is 0x00, then it is a NOP response
-            if service_data[0] != 0x00:
-                # Queue the data packet for processing
-                if len(self._p2c_queue) < self._max_queue_elements:
-                    self._p2c_queue.append(service_data)
-                    #logging.info(f"Received data from peripheral: {service_data}, appended to queue ({len(self._p2c_queue)} elements)")
-                    self._p2c_queue_event.set()
-        else:
-            logging.info(f"Received data from peripheral: {service_data} - invalid length")
+        """Handle notifications from the peripheral (a packet or a frame of packets)."""
+        self._receive_frame(service_data)
 
         # Notify the main async task that data has been received
         self._p2c_notification_event.set()
+        self._wake_event.set()
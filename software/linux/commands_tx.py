@@ -27,39 +27,115 @@
 
 import asyncio
 import logging
-import struct
 import threading
-from ble_central import BleCentral
-
-# Note: The commands are defined in the BLE peripheral firmware
-# and the ControlRx class must match the ControlTx class otherwise
-# bad things will happen :)
+from concurrent.futures import Future
+import protocol_central as protocol
+from async_commands_tx import AsyncCommandsTx
+from transport import Transport
+from telemetry_rx import TelemetryBuffer
+from log_rx import RobotLog
 
 class CommandsTx:
-    def __init__(self):
-        self._ble_central = BleCentral()
-        self._command_sequence = 1
+    """
+    Sends commands to the robot from synchronous code. The commands are run by an AsyncCommandsTx
+    on an event loop in a background thread (started by connect). Async applications should use
+    AsyncCommandsTx directly (so there is no thread switch for each command).
+
+    Every command method blocks and returns the command's result. To keep several commands in flight
+    (pipelined mode, a window size greater than 1) send them with submit instead, which returns a
+    concurrent.futures.Future of the result as soon as the command has a slot in the window; call
+    result() on the future to wait for that command's result, or call flush() to wait for every
+    outstanding command (it returns False if any of them failed).
+    """
 
-        self._short_timeout = 5.0
-        self._long_timeout = 60.0
+    # The maximum number of commands that can be in flight at once
+    __MAX_WINDOW_SIZE = AsyncCommandsTx.MAX_IN_FLIGHT
+
+    def __init__(self, window_size: int = 1, transport: Transport = None):
+        # The commands (and the link to the robot, BLE unless another transport is given)
+        self._commands = AsyncCommandsTx(transport)
 
         self._connect = False
+
+        # Sliding window of outstanding commands.  With a window size of 1 every command
+        # waits for the robot to respond before the next is sent.  With a larger window
+        # (pipelined mode) submitted commands are queued and the caller only blocks when
+        # the window is full (blocking commands wait behind any commands queued before them)
+        if window_size < 1 or window_size > CommandsTx.__MAX_WINDOW_SIZE:
+            raise ValueError(f"CommandsTx::__init__ - Window size must be between 1 and {CommandsTx.__MAX_WINDOW_SIZE}")
+        self._window_size = window_size
+        self._window_slots = threading.BoundedSemaphore(window_size)
+
+        # Commands submitted by the synchronous methods that have not completed yet
+        self._outstanding = set()
+        self._outstanding_lock = threading.Lock()
+        self._outstanding_failed = False
         
+    @property
+    def commands(self) -> AsyncCommandsTx:
+        # The asynchronous commands (only for use from the background event loop)
+        return self._commands
+
+    @property
+    def window_size(self) -> int:
+        return self._window_size
+
+    @property
+    def transport(self) -> Transport:
+        return self._commands.transport
+
+    @property
+    def pipelined(self) -> bool:
+        return self._window_size > 1
+
+    @property
+    def motion_queue_enabled(self) -> bool:
+        return self._commands.motion_queue_enabled
+
+    @property
+    def last_pose(self) -> tuple[float, float, float]:
+        # The pose (x, y, heading) reported by the most recent motion queue completion event
+        return self._commands.last_pose
+
+    @property
+    def telemetry(self) -> TelemetryBuffer:
+        # The telemetry frames received from the robot (sinks can be added to the buffer)
+        return self._commands.telemetry
+
+    @property
+    def robot_log(self) -> RobotLog:
+        # The log lines received from the robot (sinks can be added to the log)
+        return self._commands.robot_log
+
+    @property
+    def queued_commands(self) -> int:
+        # The number of commands accepted by the robot's motion queue that have not completed
+        return self._commands.queued_commands
+
+    @property
+    def connected(self):
+        return self._commands.connected
+
     def connect(self):
         if not self._connect:
-            logging.info("CommandsTx::connect - Staring the BLE central role")
-            # Start the BleCentral event loop in the background
+            logging.info(f"CommandsTx::connect - Starting the {self._commands.transport.name} transport")
+            # Start the transport's event loop in the background
             self._loop = asyncio.new_event_loop()
             self._thread = threading.Thread(target=self._start_event_loop, args=(self._loop,))
             self._thread.start()
-            self._loop.call_soon_threadsafe(self._loop.create_task, self._ble_central.run())
+            self._loop.call_soon_threadsafe(self._loop.create_task, self.run())
             self._connect = True
 
     def disconnect(self):
         if self._connect:
-            # Disconnect the BLE
-            logging.info("CommandsTx::disconnect - Disconnecting BLE")
-            self._ble_central.disconnect()
+            # Allow any pipelined commands to complete
+            if self._commands.transport.connected:
+                logging.info("CommandsTx::disconnect - Waiting for outstanding commands")
+                self.flush()
+
+            # Disconnect the transport
+            logging.info(f"CommandsTx::disconnect - Disconnecting {self._commands.transport.name}")
+            self._commands.transport.disconnect()
             
             # Stop the event loop
             logging.info("CommandsTx::disconnect - Stopping event loop")
@@ -69,1132 +145,264 @@ class CommandsTx:
             logging.info("CommandsTx::disconnect - Waiting for thread to finish")
             self._thread.join()
 
-            logging.info("CommandsTx::disconnect - Stopped the BLE central role")
+            logging.info(f"CommandsTx::disconnect - Stopped the {self._commands.transport.name} transport")
             self._loop = None
             self._thread = None
             self._connect = False
 
+    def flush(self) -> bool:
+        """Wait for all outstanding commands to complete. Returns False if any of them failed"""
+        with self._outstanding_lock:
+            outstanding = list(self._outstanding)
+
+        for future in outstanding:
+            try:
+                future.result()
+            except Exception:
+                # The failure is recorded by __command_done
+                pass
+
+        with self._outstanding_lock:
+            success = not self._outstanding_failed
+            self._outstanding_failed = False
+        return success
+
+    async def run(self):
+        # Run the transport and response dispatcher tasks on the background thread (started by connect)
+        await self._commands.run()
+
     def _start_event_loop(self, loop):
         asyncio.set_event_loop(loop)
         loop.run_forever()
 
-    def __next_seq(self) -> int:
-        self._command_sequence += 1
-        if self._command_sequence > 255:
-            self._command_sequence = 1
-        return self._command_sequence
-    
-    async def __wait_for_command_response(self, seq_id: int) -> bytes:
-        while True:
-            await self._ble_central._p2c_queue_event.wait()
-            try:
-                data = self._ble_central._p2c_queue.pop(0)
-            except IndexError:
-                logging.error("CommandsTx::__wait_for_command_response - Got P2C queue event but the queue was empty?")
-                seq_id_rx = 0
-                return None
-
-            self._ble_central._p2c_queue_event.clear()
-            seq_id_rx = data[0]
-
-            # Check if the sequence ID matches
-            if seq_id_rx == seq_id:
-                #logging.info(f"CommandsTx::__wait_for_command_response - Sequence ID = {seq_id_rx} matched")
-                return data
-            else:
-                logging.info(f"CommandsTx::__wait_for_command_response - Sequence ID = {seq_id_rx} did not match received sequence ID = {seq_id}")
-
-    @property
-    def connected(self):
-        return self._ble_central.connected
+    def submit(self, command: str, *args) -> Future:
+        """
+        Send a command without waiting for its result (blocking only while the window is full).
+        Args:
+            command (str): The name of the command (as the method, for example "forward").
+            args: The command's parameters.
+        Returns:
+            Future: A concurrent.futures.Future of the command's result (the blocking method's return value).
+        """
+        if command is None or command not in protocol.NAMES:
+            raise ValueError(f"CommandsTx::submit - Unknown command '{command}'")
+        if not self._commands.connected:
+            raise RuntimeError("CommandsTx::submit - The connect method must be called before sending commands")
+        return self.__submit(getattr(self._commands, command)(*args))
+
+    def __submit(self, coroutine) -> Future:
+        # Take a slot in the window (blocking if the window is full) and run the
+        # command on the transport event loop
+        self._window_slots.acquire()
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        with self._outstanding_lock:
+            self._outstanding.add(future)
+        future.add_done_callback(self.__command_done)
+        return future
+
+    def __run(self, coroutine):
+        # Run a command (in its turn in the window) and wait for its result
+        return self.__submit(coroutine).result()
+
+    def __command_done(self, future):
+        # Record the outcome and free the command's slot in the window
+        try:
+            result = future.result()
+            success = result[0] if isinstance(result, tuple) else result
+        except Exception as e:
+            logging.error(f"CommandsTx::__command_done - Command raised an exception: {e}")
+            success = False
+
+        with self._outstanding_lock:
+            self._outstanding.discard(future)
+            if not success:
+                self._outstanding_failed = True
+        self._window_slots.release()
 
     # Synchronous methods to call the asynchronous methods ------------------------------------------------------------
 
     def motors(self, enable: bool) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::motors - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._motors(enable), self._loop).result()
+        return self.__run(self._commands.motors(enable))
 
     def forward(self, distance_mm: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::forward - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._forward(distance_mm), self._loop).result()
+        return self.__run(self._commands.forward(distance_mm))
 
     def backward(self, distance_mm: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::backward - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._backward(distance_mm), self._loop).result()
+        return self.__run(self._commands.backward(distance_mm))
 
     def left(self, angle_degrees: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::left - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._left(angle_degrees), self._loop).result()
+        return self.__run(self._commands.left(angle_degrees))
 
     def right(self, angle_degrees: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::right - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._right(angle_degrees), self._loop).result()
+        return self.__run(self._commands.right(angle_degrees))
     
     def circle(self, radius_mm: float, extent_degrees: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::circle - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._circle(radius_mm, extent_degrees), self._loop).result()
+        return self.__run(self._commands.circle(radius_mm, extent_degrees))
 
     def setheading(self, angle_degrees: float) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::setheading - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._setheading(angle_degrees), self._loop).result()
+        return self.__run(self._commands.setheading(angle_degrees))
 
-    def setx(self, x_mm: float) -> bool:
-        if not self._ble_central.connected:
+    def setx(self, x_mm: float) -> tuple[bool, float, float, float]:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::setx - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._setx(x_mm), self._loop).result()
+        return self.__run(self._commands.setx(x_mm))
 
-    def sety(self, y_mm: float) -> bool:
-        if not self._ble_central.connected:
+    def sety(self, y_mm: float) -> tuple[bool, float, float, float]:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::sety - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._sety(y_mm), self._loop).result()
+        return self.__run(self._commands.sety(y_mm))
 
-    def setposition(self, x_mm: float, y_mm: float) -> bool:
-        if not self._ble_central.connected:
+    def setposition(self, x_mm: float, y_mm: float) -> tuple[bool, float, float, float]:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::setposition - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._goto(x_mm, y_mm), self._loop).result()
+        return self.__run(self._commands.setposition(x_mm, y_mm))
 
-    def towards(self, x_mm: float, y_mm: float) -> bool:
-        if not self._ble_central.connected:
+    def towards(self, x_mm: float, y_mm: float) -> tuple[bool, float, float, float]:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::towards - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._towards(x_mm, y_mm), self._loop).result()
+        return self.__run(self._commands.towards(x_mm, y_mm))
 
     def reset_origin(self) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::reset_origin - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._reset_origin(), self._loop).result()
+        return self.__run(self._commands.reset_origin())
 
     def heading(self) -> tuple[bool, float]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::heading - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._heading(), self._loop).result()
+        return self.__run(self._commands.heading())
 
     def position(self) -> tuple[bool, float, float]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::position - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._position(), self._loop).result()
+        return self.__run(self._commands.position())
 
     def penup(self) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::penup - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._penup(), self._loop).result()
+        return self.__run(self._commands.penup())
     
     def pendown(self) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::pendown - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._pendown(), self._loop).result()
+        return self.__run(self._commands.pendown())
 
     def eyes(self, eye_id, red, green, blue) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::eyes - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._eyes(eye_id, red, green, blue), self._loop).result()
+        return self.__run(self._commands.eyes(eye_id, red, green, blue))
 
     def power(self) -> tuple[bool, int, int, int]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::power - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._power(), self._loop).result()
+        return self.__run(self._commands.power())
 
     def isdown(self) -> tuple[bool, bool]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::isdown - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._isdown(), self._loop).result()
+        return self.__run(self._commands.isdown())
 
-    def set_linear_velocity(self, target_speed: int, acceleration: int) -> bool:
-        if not self._ble_central.connected:
+    def set_linear_velocity(self, target_speed: int, acceleration: int, jerk: int = 0) -> bool:
+        # Note: A jerk of 0 uses a trapezoidal (rather than S-curve) velocity profile
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::set_linear_velocity - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._set_linear_velocity(target_speed, acceleration), self._loop).result()
+        return self.__run(self._commands.set_linear_velocity(target_speed, acceleration, jerk))
 
-    def set_rotational_velocity(self, target_speed: int, acceleration: int) -> bool:
-        if not self._ble_central.connected:
+    def set_rotational_velocity(self, target_speed: int, acceleration: int, jerk: int = 0) -> bool:
+        # Note: A jerk of 0 uses a trapezoidal (rather than S-curve) velocity profile
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::set_rotational_velocity - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._set_rotational_velocity(target_speed, acceleration), self._loop).result()
+        return self.__run(self._commands.set_rotational_velocity(target_speed, acceleration, jerk))
 
-    def get_linear_velocity(self) -> tuple[bool, int, int]:
-        if not self._ble_central.connected:
+    def get_linear_velocity(self) -> tuple[bool, int, int, int]:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::get_linear_velocity - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._get_linear_velocity(), self._loop).result()
+        return self.__run(self._commands.get_linear_velocity())
 
-    def get_rotational_velocity(self) -> tuple[bool, int, int]:
-        if not self._ble_central.connected:
+    def get_rotational_velocity(self) -> tuple[bool, int, int, int]:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::get_rotational_velocity - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._get_rotational_velocity(), self._loop).result()
+        return self.__run(self._commands.get_rotational_velocity())
 
     def set_wheel_diameter_calibration(self, wheel_diameter: int) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::set_wheel_diameter_calibration - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._set_wheel_diameter_calibration(wheel_diameter), self._loop).result()
+        return self.__run(self._commands.set_wheel_diameter_calibration(wheel_diameter))
 
     def set_axel_distance_calibration(self, axel_distance: int) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::set_axel_distance_calibration - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._set_axel_distance_calibration(axel_distance), self._loop).result()
+        return self.__run(self._commands.set_axel_distance_calibration(axel_distance))
 
     def get_wheel_diameter_calibration(self) -> tuple[bool, int]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::get_wheel_diameter_calibration - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._get_wheel_diameter_calibration(), self._loop).result()
+        return self.__run(self._commands.get_wheel_diameter_calibration())
 
     def get_axel_distance_calibration(self) -> tuple[bool, int]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::get_axel_distance_calibration - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._get_axel_distance_calibration(), self._loop).result()
+        return self.__run(self._commands.get_axel_distance_calibration())
 
     def set_turtle_id(self, turtle_id: int) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::set_turtle_id - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._set_turtle_id(turtle_id), self._loop).result()
+        return self.__run(self._commands.set_turtle_id(turtle_id))
 
     def get_turtle_id(self) -> tuple[bool, int]:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::get_turtle_id - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._get_turtle_id(), self._loop).result()
+        return self.__run(self._commands.get_turtle_id())
 
     def load_config(self) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::load_config - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._load_config(), self._loop).result()
+        return self.__run(self._commands.load_config())
 
     def save_config(self) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::save_config - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._save_config(), self._loop).result()
+        return self.__run(self._commands.save_config())
 
     def reset_config(self) -> bool:
-        if not self._ble_central.connected:
+        if not self._commands.connected:
             raise RuntimeError("CommandsTx::reset_config - The connect method must be called before sending commands")
-        return asyncio.run_coroutine_threadsafe(self._reset_config(), self._loop).result()
-    
-    # Asynchronous methods to send commands to the BLE peripheral -----------------------------------------------------
-
-    async def _motors(self, enable: bool) -> bool:
-        if not self._ble_central.connected:
-            logging.info("CommandsTx::motors - Not connected to a robot")
-            return False
-        
-        command_id = 1
-
-        # Command to enable or disable the motors
-        if enable:
-            parameter = 1
-        else:
-            parameter = 0
-
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBB", seq_id, command_id, parameter)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::motors - Command ID = {command_id}, Sequence ID = {seq_id}, enable = {enable}")
-        
-        # Wait for the command to be processed with a short timeout
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::motors - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        # This command does not return any data, so we don't need to return any
-        return True
-
-    async def _forward(self, distance_mm: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_forward - Not connected to a robot")
-            return False, 0.0, 0.0, 0.0
-        
-        command_id = 2
-
-        # Command to move the robot forward
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, distance_mm)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_forward - Command ID = {command_id}, Sequence ID = {seq_id}, distance = {distance_mm}")
-
-        # Wait for the command to be processed with a long timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._long_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_forward - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0.0, 0.0, 0.0
-
-        # Extract the position and heading from the response
-        try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_forward - Error unpacking response: {e}")
-            return False, 0.0, 0.0, 0.0
-        
-        x = round(x, 2)
-        y = round(y, 2)
-        heading = round(heading, 2)
-        logging.info(f"CommandsTx::_forward - X = {x}, Y = {y}, heading = {heading}")
-        return True, x, y, heading
-    
-    async def _backward(self, distance_mm: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_backward - Not connected to a robot")
-            return False, 0.0, 0.0, 0.0
-        
-        command_id = 3
-
-        # Command to move the robot backward
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, distance_mm)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_backward - Command ID = {command_id}, Sequence ID = {seq_id}, distance = {distance_mm}")
-        
-        # Wait for the command to be processed with a long timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._long_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_backward - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0.0, 0.0, 0.0
-
-        # Extract the position and heading from the response
-        try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_backward - Error unpacking response: {e}")
-            return False, 0.0, 0.0, 0.0
-        
-        x = round(x, 2)
-        y = round(y, 2)
-        heading = round(heading, 2)
-        logging.info(f"CommandsTx::_backward - X = {x}, Y = {y}, heading = {heading}")
-        return True, x, y, heading
-    
-    async def _left(self, angle_degrees: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_left - Not connected to a robot")
-            return False, 0.0, 0.0, 0.0
-        
-        command_id = 4
-
-        # Command to turn the robot left
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, angle_degrees)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_left - Command ID = {command_id}, Sequence ID = {seq_id}, angle = {angle_degrees}")
-        
-        # Wait for the command to be processed with a long timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._long_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_left - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0.0, 0.0, 0.0
-
-        # Extract the position and heading from the response
-        try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_left - Error unpacking response: {e}")
-            return False, 0.0, 0.0, 0.0
-        
-        x = round(x, 2)
-        y = round(y, 2)
-        heading = round(heading, 2)
-        logging.info(f"CommandsTx::_left - X = {x}, Y = {y}, heading = {heading}")
-        return True, x, y, heading
-    
-    async def _right(self, angle_degrees: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_right - Not connected to a robot")
-            return False, 0.0, 0.0, 0.0
-        
-        command_id = 5
-
-        # Command to turn the robot right
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, angle_degrees)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_right - Command ID = {command_id}, Sequence ID = {seq_id}, angle = {angle_degrees}")
-        
-        # Wait for the command to be processed with a long timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._long_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_right - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0.0, 0.0, 0.0
-
-        # Extract the position and heading from the response
-        try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_right - Error unpacking response: {e}")
-            return False, 0.0, 0.0, 0.0
-        
-        x = round(x, 2)
-        y = round(y, 2)
-        heading = round(heading, 2)
-        logging.info(f"CommandsTx::_right - X = {x}, Y = {y}, heading = {heading}")
-        return True, x, y, heading
-    
-    async def _circle(self, radius_mm: float, extent_degrees: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_circle - Not connected to a robot")
-            return False, 0.0, 0.0, 0.0
-        
-        command_id = 6
-
-        # Command to turn the robot left on an arc
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBff", seq_id, command_id, radius_mm, extent_degrees)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_circle - Command ID = {command_id}, Sequence ID = {seq_id}, radius = {radius_mm}, extent = {extent_degrees}")
-        
-        # Wait for the command to be processed with a long timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._long_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_circle - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0.0, 0.0, 0.0
-
-        # Extract the position and heading from the response
-        try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_circle - Error unpacking response: {e}")
-            return False, 0.0, 0.0, 0.0
-        
-        x = round(x, 2)
-        y = round(y, 2)
-        heading = round(heading, 2)
-        logging.info(f"CommandsTx::_circle - X = {x}, Y = {y}, heading = {heading}")
-        return True, x, y, heading
-
-    async def _setheading(self, angle_degrees: float) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_setheading - Not connected to a robot")
-            return False
-        
-        command_id = 7
-
-        # Command to set the robot heading
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, angle_degrees)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_setheading - Command ID = {command_id}, Sequence ID = {seq_id}, angle = {angle_degrees}")
-        
-        # Wait for the command to be processed with a long timeout
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._long_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_setheading - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        # This command does not return any data, so we don't need to return any
-        return True
-    
-    async def _setx(self, x_mm: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_setx - Not connected to a robot")
-            return False, 0.0, 0.0, 0.0
-        
-        command_id = 8
-
-        # Command to set the robot X position
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, x_mm)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_setx - Command ID = {command_id}, Sequence ID = {seq_id}, x = {x_mm}")
-        
-        # Wait for the command to be processed with a long timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._long_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_setx - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0.0, 0.0, 0.0
-
-        # Extract the position and heading from the response
-        try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_setx - Error unpacking response: {e}")
-            return False, 0.0, 0.0, 0.0
-        
-        x = round(x, 2)
-        y = round(y, 2)
-        heading = round(heading, 2)
-        logging.info(f"CommandsTx::_setx - X = {x}, Y = {y}, heading = {heading}")
-        return True, x, y, heading
-    
-    async def _sety(self, y_mm: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_sety - Not connected to a robot")
-            return False, 0.0, 0.0, 0.0
-        
-        command_id = 9
-
-        # Command to set the robot Y position
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBf", seq_id, command_id, y_mm)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_sety - Command ID = {command_id}, Sequence ID = {seq_id}, y = {y_mm}")
-        
-        # Wait for the command to be processed with a long timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._long_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_sety - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0.0, 0.0, 0.0
-
-        # Extract the position and heading from the response
-        try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_sety - Error unpacking response: {e}")
-            return False, 0.0, 0.0, 0.0
-        
-        x = round(x, 2)
-        y = round(y, 2)
-        heading = round(heading, 2)
-        logging.info(f"CommandsTx::_sety - X = {x}, Y = {y}, heading = {heading}")
-        return True, x, y, heading
-    
-    async def _goto(self, x_mm: float, y_mm: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_setposition - Not connected to a robot")
-            return False, 0.0, 0.0, 0.0
-        
-        command_id = 10
-
-        # Command to set the robot position
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBff", seq_id, command_id, x_mm, y_mm)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_setposition - Command ID = {command_id}, Sequence ID = {seq_id}, x = {x_mm}, y = {y_mm}")
-        
-        # Wait for the command to be processed with a long timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._long_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_setposition - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0.0, 0.0, 0.0
-
-        # Extract the position and heading from the response
-        try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_setposition - Error unpacking response: {e}")
-            return False, 0.0, 0.0, 0.0
-        
-        x = round(x, 2)
-        y = round(y, 2)
-        heading = round(heading, 2)
-        logging.info(f"CommandsTx::_setposition - X = {x}, Y = {y}, heading = {heading}")
-        return True, x, y, heading
-    
-    async def _towards(self, x_mm: float, y_mm: float) -> tuple[bool, float, float, float]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_towards - Not connected to a robot")
-            return False, 0.0, 0.0, 0.0
-        
-        command_id = 11
-
-        # Command to move the robot towards a point
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBff", seq_id, command_id, x_mm, y_mm)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_towards - Command ID = {command_id}, Sequence ID = {seq_id}, x = {x_mm}, y = {y_mm}")
-        
-        # Wait for the command to be processed with a long timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._long_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_towards - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0.0, 0.0, 0.0
-
-        # Extract the position and heading from the response
-        try:
-            seq_id, x, y, heading = struct.unpack("<Bfff", response[:13])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_towards - Error unpacking response: {e}")
-            return False, 0.0, 0.0, 0.0
-        
-        x = round(x, 2)
-        y = round(y, 2)
-        heading = round(heading, 2)
-        logging.info(f"CommandsTx::_towards - X = {x}, Y = {y}, heading = {heading}")
-        return True, x, y, heading
-    
-    async def _reset_origin(self) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_reset_origin - Not connected to a robot")
-            return False
-        
-        command_id = 12
-
-        # Command to reset the x,y origin and heading
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_reset_origin - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        # Wait for the command to be processed with a short timeout
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_reset_origin - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        # This command does not return any data, so we don't need to return any
-        return True
-    
-    async def _heading(self) -> tuple[bool, float]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_heading - Not connected to a robot")
-            return False, 0.0
-        
-        command_id = 13
-
-        # Command to get the robot heading
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_heading - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        # Wait for the command to be processed with a long timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_heading - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0.0
-
-        # Extract the heading from the response
-        try:
-            seq_id, heading = struct.unpack("<Bf", response[:5])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_heading - Error unpacking response: {e}")
-            return False, 0.0
-        
-        heading = round(heading, 2)
-        logging.info(f"CommandsTx::_heading - Heading = {heading}")
-        return True, heading
-    
-    async def _position(self) -> tuple[bool, float, float]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_position - Not connected to a robot")
-            return False, 0.0, 0.0
-        
-        command_id = 14
-
-        # Command to get the robot position
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_position - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        # Wait for the command to be processed with a long timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._long_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_position - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0.0, 0.0
-
-        # Extract the position from the response
-        try:
-            seq_id, x, y = struct.unpack("<Bff", response[:9])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_position - Error unpacking response: {e}")
-            return False, 0.0, 0.0
-        
-        x = round(x, 2)
-        y = round(y, 2)
-        logging.info(f"CommandsTx::_position - X = {x}, Y = {y}")
-        return True, x, y
-    
-    async def _penup(self) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_penup - Not connected to a robot")
-            return False
-        
-        command_id = 15
-
-        # Command to raise the pen
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_penup - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        # Wait for the command to be processed with a short timeout
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_penup - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        # This command does not return any data, so we don't need to return any
-        return True
-    
-    async def _pendown(self) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_pendown - Not connected to a robot")
-            return False
-        
-        command_id = 16
-
-        # Command to raise the pen
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_pendown - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        # Wait for the command to be processed with a short timeout
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_pendown - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        # This command does not return any data, so we don't need to return any
-        return True
-    
-    async def _eyes(self, eye_id, red, green, blue) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_eyes - Not connected to a robot")
-            return False
-        
-        command_id = 17
-
-        # Command to set the eye colour
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBBBBB", seq_id, command_id, eye_id, red, green, blue)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_eyes - Command ID = {command_id}, Sequence ID = {seq_id}, eye_id = {eye_id}, red = {red}, green = {green}, blue = {blue}")
-        
-        # Wait for the command to be processed with a short timeout
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_eyes - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        # This command does not return any data, so we don't need to return any
-        return True
-    
-    async def _power(self) -> tuple[bool, int, int, int]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_power - Not connected to a robot")
-            return False, 0, 0, 0
-        
-        command_id = 18
-
-        # Command to get the robot power
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_power - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        # Wait for the command to be processed with a short timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_power - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0, 0, 0
-
-        # Extract the power from the response
-        try:
-            seq_id, mv, ma, mw = struct.unpack("<Blll", response[:13])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_power - Error unpacking response: {e}")
-            return False, 0, 0, 0
-        logging.info(f"CommandsTx::_power - mV = {mv}, mA = {ma}, mW = {mw}")
-        return True, mv, ma, mw 
-    
-    async def _isdown(self) -> tuple[bool, bool]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_isdown - Not connected to a robot")
-            return False, False
-        
-        command_id = 19
-
-        # Command to get the pen status (True = down, False = up)
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_isdown - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        # Wait for the command to be processed with a short timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_isdown - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, False
-
-        # Extract the pen status from the response
-        try:
-            seq_id, pen_down = struct.unpack("<BB", response[:2])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_isdown - Error unpacking response: {e}")
-            return False, False
-        logging.info(f"CommandsTx::_isdown - Pen down = {pen_down}")
-        return True, pen_down
-    
-    async def _set_linear_velocity(self, target_speed: int, acceleration: int) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_set_linear_velocity - Not connected to a robot")
-            return False
-        
-        command_id = 20
-
-        # Command to set the linear velocity
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBll", seq_id, command_id, target_speed, acceleration)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::set_linear_velocity - Command ID = {command_id}, Sequence ID = {seq_id}, target_speed = {target_speed}, acceleration = {acceleration}")
-        
-        # Wait for the command to be processed with a short timeout
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::set_linear_velocity - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        # This command does not return any data, so we don't need to return any
-        return True
-    
-    async def _set_rotational_velocity(self, target_speed: int, acceleration: int) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_set_rotational_velocity - Not connected to a robot")
-            return False
-        
-        command_id = 21
-
-        # Command to set the rotational velocity
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBll", seq_id, command_id, target_speed, acceleration)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_set_rotational_velocity - Command ID = {command_id}, Sequence ID = {seq_id}, target_speed = {target_speed}, acceleration = {acceleration}")
-        
-        # Wait for the command to be processed with a short timeout
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_set_rotational_velocity - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        # This command does not return any data, so we don't need to return any
-        return True
-    
-    async def _get_linear_velocity(self) -> tuple[bool, int, int]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_get_linear_velocity - Not connected to a robot")
-            return False, 0, 0
-        
-        command_id = 22
-
-        # Command to get the linear velocity
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_get_linear_velocity - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        # Wait for the command to be processed with a short timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_get_linear_velocity - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0, 0
-
-        # Extract the linear velocity from the response
-        try:
-            seq_id, target_speed, acceleration = struct.unpack("<Bll", response[:9])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_get_linear_velocity - Error unpacking response: {e}")
-            return False, 0, 0
-        logging.info(f"CommandsTx::_get_linear_velocity - Target speed = {target_speed}, Acceleration = {acceleration}")
-        return True, target_speed, acceleration
-    
-    async def _get_rotational_velocity(self) -> tuple[bool, int, int]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_get_rotational_velocity - Not connected to a robot")
-            return False, 0, 0
-        
-        command_id = 23
-
-        # Command to get the rotational velocity
-        # Generate a sequence ID and queue the command
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_get_rotational_velocity - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        # Wait for the command to be processed with a short timeout
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_get_rotational_velocity - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0, 0
-
-        # Extract the rotational velocity from the response
-        try:
-            seq_id, target_speed, acceleration = struct.unpack("<Bll", response[:9])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_get_rotational_velocity - Error unpacking response: {e}")
-            return False, 0, 0
-        logging.info(f"CommandsTx::_get_rotational_velocity - Target speed = {target_speed}, Acceleration = {acceleration}")
-        return True, target_speed, acceleration
-
-    async def _set_wheel_diameter_calibration(self, wheel_diameter: int) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_set_wheel_diameter_calibration - Not connected to a robot")
-            return False
-        
-        command_id = 24
-
-        # Command to set the wheel diameter calibration
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBi", seq_id, command_id, wheel_diameter)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_set_wheel_diameter_calibration - Command ID = {command_id}, Sequence ID = {seq_id}, wheel_diameter = {wheel_diameter}")
-        
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_set_wheel_diameter_calibration - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        return True
-
-    async def _set_axel_distance_calibration(self, axel_distance: int) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_set_axel_distance_calibration - Not connected to a robot")
-            return False
-        
-        command_id = 25
-
-        # Command to set the axel distance calibration
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBi", seq_id, command_id, axel_distance)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_set_axel_distance_calibration - Command ID = {command_id}, Sequence ID = {seq_id}, axel_distance = {axel_distance}")
-        
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_set_axel_distance_calibration - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        return True
-
-    async def _get_wheel_diameter_calibration(self) -> tuple[bool, int]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_get_wheel_diameter_calibration - Not connected to a robot")
-            return False, 0
-        
-        command_id = 26
-
-        # Command to get the wheel diameter calibration
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_get_wheel_diameter_calibration - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_get_wheel_diameter_calibration - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0
-
-        try:
-            seq_id, cali_wheel = struct.unpack("<Bi", response[:5])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_get_wheel_diameter_calibration - Error unpacking response: {e}")
-            return False, 0
-        logging.info(f"CommandsTx::_get_wheel_diameter_calibration - Calibration wheel diameter = {cali_wheel}")
-        return True, cali_wheel
-
-    async def _get_axel_distance_calibration(self) -> tuple[bool, int]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_get_axel_distance_calibration - Not connected to a robot")
-            return False, 0
-        
-        command_id = 27
-
-        # Command to get the axel distance calibration
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_get_axel_distance_calibration - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_get_axel_distance_calibration - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0
-
-        try:
-            seq_id, cali_axel = struct.unpack("<Bi", response[:5])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_get_axel_distance_calibration - Error unpacking response: {e}")
-            return False, 0
-        logging.info(f"CommandsTx::_get_axel_distance_calibration - Calibration axel distance = {cali_axel}")
-        return True, cali_axel
-
-    async def _set_turtle_id(self, turtle_id: int) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_set_turtle_id - Not connected to a robot")
-            return False
-        
-        command_id = 28
-
-        # Command to set the turtle ID
-        seq_id = self.__next_seq()
-        data = struct.pack("<BBB", seq_id, command_id, turtle_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_set_turtle_id - Command ID = {command_id}, Sequence ID = {seq_id}, turtle_id = {turtle_id}")
-        
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_set_turtle_id - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        return True
-
-    async def _get_turtle_id(self) -> tuple[bool, int]:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_get_turtle_id - Not connected to a robot")
-            return False, 0
-        
-        command_id = 29
-
-        # Command to get the turtle ID
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_get_turtle_id - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        try:
-            response = await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_get_turtle_id - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False, 0
-
-        try:
-            seq_id, turtle_id = struct.unpack("<BB", response[:2])
-        except ValueError as e:
-            logging.error(f"CommandsTx::_get_turtle_id - Error unpacking response: {e}")
-            return False, 0
-        logging.info(f"CommandsTx::_get_turtle_id - Turtle ID = {turtle_id}")
-        return True, turtle_id
-
-    async def _load_config(self) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_load_config - Not connected to a robot")
-            return False
-        
-        command_id = 30
-
-        # Command to load the configuration
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_load_config - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_load_config - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        return True
-
-    async def _save_config(self) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_save_config - Not connected to a robot")
-            return False
-        
-        command_id = 31
-
-        # Command to save the configuration
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_save_config - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_save_config - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        return True
-
-    async def _reset_config(self) -> bool:
-        if not self._ble_central.connected:
-            logging.error("CommandsTx::_reset_config - Not connected to a robot")
-            return False
-        
-        command_id = 32
-
-        # Command to reset the configuration
-        seq_id = self.__next_seq()
-        data = struct.pack("<BB", seq_id, command_id)
-        self._ble_central.add_to_c2p_queue(data)
-        logging.info(f"CommandsTx::_reset_config - Command ID = {command_id}, Sequence ID = {seq_id}")
-        
-        try:
-            await asyncio.wait_for(self.__wait_for_command_response(seq_id), timeout=self._short_timeout)
-        except asyncio.TimeoutError:
-            logging.error(f"CommandsTx::_reset_config - Command ID = {command_id}, Sequence ID = {seq_id} timed out")
-            self._ble_central.disconnect()
-            return False
-
-        return True
\ No newline at end of file
+        return self.__run(self._commands.reset_config())
+
+    def motion_queue(self, enable: bool) -> bool:
+        if not self._commands.connected:
+            raise RuntimeError("CommandsTx::motion_queue - The connect method must be called before sending commands")
+        return self.__run(self._commands.motion_queue(enable))
+
+    def wait_for_completion(self, timeout: float = None) -> tuple[bool, float, float, float]:
+        # Moves accepted into the robot's motion queue return a pose of None, this waits for them to
+        # complete and returns the pose the robot reports
+        if not self._commands.connected:
+            raise RuntimeError("CommandsTx::wait_for_completion - The connect method must be called before sending commands")
+        return asyncio.run_coroutine_threadsafe(self._commands.wait_for_completion(timeout), self._loop).result()
+
+    def set_telemetry_interval(self, interval_ms: int) -> bool:
+        if not self._commands.connected:
+            raise RuntimeError("CommandsTx::set_telemetry_interval - The connect method must be called before sending commands")
+        if interval_ms < 0 or interval_ms > 65535:
+            raise ValueError("CommandsTx::set_telemetry_interval - Interval must be between 0 and 65535 ms")
+        return self.__run(self._commands.set_telemetry_interval(interval_ms))
+
+    def set_log_stream(self, enable: bool) -> bool:
+        if not self._commands.connected:
+            raise RuntimeError("CommandsTx::set_log_stream - The connect method must be called before sending commands")
+        return self.__run(self._commands.set_log_stream(enable))
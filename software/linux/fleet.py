@@ -0,0 +1,276 @@
+#************************************************************************ 
+#
+#   fleet.py
+#
+#   Fleet controller (several robots driven from one event loop)
+#   Valiant Turtle 2 - Communicator firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import asyncio
+import logging
+
+import protocol_central as protocol
+from async_commands_tx import AsyncCommandsTx
+from transport import Transport
+
+class FleetRobot:
+    """
+    A robot in a fleet. The AsyncCommandsTx commands are available as coroutines (for example
+    await robot.forward(100)) and run on the fleet's event loop.
+
+    Up to window_size commands can be outstanding. A command that doesn't return data
+    (such as forward) returns once it has a slot in the window (so the caller only waits when
+    the robot has fallen behind) and flush() waits for them to complete. Queries wait for
+    their response.
+    """
+
+    # Commands that return data (or change how the robot responds) so the caller waits for the response
+    __QUERIES = {"heading", "position", "power", "isdown", "get_linear_velocity", "get_rotational_velocity",
+        "get_wheel_diameter_calibration", "get_axel_distance_calibration", "get_turtle_id", "motion_queue"}
+
+    def __init__(self, turtle_id: int, transport: Transport, window_size: int):
+        self._turtle_id = turtle_id
+        self._commands_tx = AsyncCommandsTx(transport, max_in_flight=window_size)
+        self._window_size = window_size
+
+        # Created in run() (so they belong to the fleet's event loop)
+        self._window_slots = None
+
+        # Commands that have not completed yet and a flag set if any of them failed
+        self._outstanding = set()
+        self._failed = False
+
+    @property
+    def turtle_id(self) -> int:
+        return self._turtle_id
+
+    @property
+    def commands_tx(self) -> AsyncCommandsTx:
+        return self._commands_tx
+
+    @property
+    def connected(self) -> bool:
+        return self._commands_tx.connected
+
+    @property
+    def outstanding(self) -> int:
+        """The number of commands sent that have not completed"""
+        return len(self._outstanding)
+
+    async def run(self):
+        self._window_slots = asyncio.Semaphore(self._window_size)
+        await self._commands_tx.run()
+
+    async def send(self, command: str, *args):
+        """
+        Send a command (by its name in the protocol schema, for example "forward").
+        Returns:
+            The command's result for a query (or if the window size is 1), otherwise the asyncio.Task running the command.
+        """
+
+        if command is None or command not in protocol.NAMES:
+            raise ValueError(f"FleetRobot::send - Unknown command '{command}'")
+        if self._window_slots is None:
+            raise RuntimeError("FleetRobot::send - The fleet is not running")
+
+        # Wait for a slot in the window (this is what stops a fast caller getting ahead of a slow robot)
+        await self._window_slots.acquire()
+        task = asyncio.create_task(getattr(self._commands_tx, command)(*args))
+        self._outstanding.add(task)
+        task.add_done_callback(self.__command_done)
+
+        if command in FleetRobot.__QUERIES or self._window_size == 1:
+            return await task
+        return task
+
+    def __getattr__(self, name: str):
+        # Make the commands available as methods (robot.forward(100) is robot.send("forward", 100))
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def command(*args):
+            return await self.send(name, *args)
+        return command
+
+    def __command_done(self, task: asyncio.Task):
+        # Record the outcome and free the command's slot in the window
+        try:
+            result = task.result()
+            success = result[0] if isinstance(result, tuple) else result
+        except Exception as e:
+            logging.error(f"FleetRobot::__command_done - Turtle {self._turtle_id} command raised an exception: {e}")
+            success = False
+
+        self._outstanding.discard(task)
+        if not success:
+            self._failed = True
+        self._window_slots.release()
+
+    async def flush(self) -> bool:
+        """Wait for all outstanding commands to complete. Returns False if any of them failed"""
+        if self._outstanding:
+            await asyncio.wait(list(self._outstanding))
+        success = not self._failed
+        self._failed = False
+        return success
+
+class Fleet:
+    """
+    Several robots driven at once from a single event loop (without a thread per robot).
+    Each robot has its own link and command window, so a robot that falls behind (or loses
+    its connection) doesn't hold up the others.
+
+    Example:
+        async with Fleet() as fleet:
+            await fleet.discover()
+            await fleet.wait_connected()
+            await fleet.drive(draw_square)
+    """
+
+    # The range of turtle IDs (see the robot's Configuration)
+    __MAX_TURTLE_ID = 7
+
+    def __init__(self, window_size: int = 4):
+        self._window_size = window_size
+        self._robots = {}
+        self._tasks = {}
+        self._running = False
+
+    @property
+    def robots(self) -> list:
+        """The robots in the fleet (in turtle ID order)"""
+        return [self._robots[turtle_id] for turtle_id in sorted(self._robots)]
+
+    def __getitem__(self, turtle_id: int) -> FleetRobot:
+        return self._robots[turtle_id]
+
+    def __contains__(self, turtle_id: int) -> bool:
+        return turtle_id in self._robots
+
+    def __len__(self) -> int:
+        return len(self._robots)
+
+    async def __aenter__(self):
+        self._running = True
+        for robot in self._robots.values():
+            self.__start(robot)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    def add(self, turtle_id: int, transport: Transport = None) -> FleetRobot:
+        """
+        Add a robot to the fleet.
+        Args:
+            turtle_id (int): The robot's turtle ID (0-7).
+            transport (Transport): Optional link to the robot (by default BLE to the robot advertising the turtle ID).
+        """
+
+        if turtle_id < 0 or turtle_id > Fleet.__MAX_TURTLE_ID:
+            raise ValueError(f"Fleet::add - Turtle ID must be between 0 and {Fleet.__MAX_TURTLE_ID}")
+        if turtle_id in self._robots:
+            raise ValueError(f"Fleet::add - Turtle ID {turtle_id} is already in the fleet")
+
+        if transport is None:
+            from ble_central import BleCentral
+            transport = BleCentral(turtle_id=turtle_id)
+
+        robot = FleetRobot(turtle_id, transport, self._window_size)
+        self._robots[turtle_id] = robot
+        if self._running:
+            self.__start(robot)
+        logging.info(f"Fleet::add - Added turtle {turtle_id} using the {transport.name} transport")
+        return robot
+
+    async def discover(self, timeout: float = 5.0, turtle_ids: list = None) -> list:
+        """
+        Scan for robots (using BLE) and add the ones found to the fleet.
+        Args:
+            timeout (float): How long to scan for in seconds.
+            turtle_ids (list): Optional turtle IDs to look for (by default every robot found is added).
+        Returns:
+            list: The turtle IDs added.
+        """
+
+        from ble_central import BleCentral, discover_robots
+
+        added = []
+        for turtle_id, address in sorted((await discover_robots(timeout)).items()):
+            if turtle_id in self._robots or (turtle_ids is not None and turtle_id not in turtle_ids):
+                continue
+            self.add(turtle_id, BleCentral(address, turtle_id))
+            added.append(turtle_id)
+        return added
+
+    def __start(self, robot: FleetRobot):
+        self._tasks[robot.turtle_id] = asyncio.create_task(robot.run())
+
+    async def wait_connected(self, timeout: float = 30.0) -> bool:
+        """Wait for every robot to connect. Returns False if any of them didn't connect in time"""
+        loop = asyncio.get_running_loop()
+        end_time = loop.time() + timeout
+        while not all(robot.connected for robot in self._robots.values()):
+            if loop.time() >= end_time:
+                missing = [robot.turtle_id for robot in self.robots if not robot.connected]
+                logging.info(f"Fleet::wait_connected - Turtles {missing} did not connect")
+                return False
+            await asyncio.sleep(0.1)
+        return True
+
+    async def drive(self, program) -> dict:
+        """
+        Run a program on every robot at once.
+        Args:
+            program: An async function taking a FleetRobot (it should send the robot's commands).
+        Returns:
+            dict: The result of each robot's program (or the exception it raised), indexed by turtle ID.
+        """
+
+        robots = self.robots
+
+        async def run_program(robot: FleetRobot):
+            result = await program(robot)
+            await robot.flush()
+            return result
+
+        results = await asyncio.gather(*(run_program(robot) for robot in robots), return_exceptions=True)
+        return {robot.turtle_id: result for robot, result in zip(robots, results)}
+
+    async def flush(self) -> bool:
+        """Wait for every robot's outstanding commands. Returns False if any of them failed"""
+        results = await asyncio.gather(*(robot.flush() for robot in self._robots.values()))
+        return all(results)
+
+    async def stop(self):
+        """Wait for outstanding commands then disconnect every robot"""
+        if not self._running:
+            return
+
+        await self.flush()
+        for robot in self._robots.values():
+            robot.commands_tx.transport.disconnect()
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        self._running = False
@@ -31,6 +31,10 @@ import time
 import math
 
 class FloorTurtle(TurtleInterface):
+    # Note: Commands that don't return anything are submitted without waiting for the robot, so with a
+    # window size greater than 1 the robot can be sent the next commands whilst it's executing one.
+    # Queries wait for their result (and disconnect waits for the submitted commands to complete)
+
     def __init__(self, commands_tx: CommandsTx):
         self._commands_tx = commands_tx
 
@@ -49,33 +53,33 @@ class FloorTurtle(TurtleInterface):
     def motors(self, state: bool):
         """Control the state of the motors."""
         print(f"motors(state={state})")
-        self._commands_tx.motors(state)
+        self._commands_tx.submit("motors", state)
 
     def forward(self, distance: float):
         """Move the turtle forward by a specified distance."""
         print(f"forward(distance={distance})")
-        self._commands_tx.forward(distance)
+        self._commands_tx.submit("forward", distance)
 
     def backward(self, distance: float):
         """Move the turtle backward by a specified distance."""
         print(f"backward(distance={distance})")
-        self._commands_tx.backward(distance)
+        self._commands_tx.submit("backward", distance)
 
     def left(self, angle: float):
         """Turn the turtle left by a specified angle."""
         print(f"left(angle={angle})")
-        self._commands_tx.left(angle)
+        self._commands_tx.submit("left", angle)
 
     def right(self, angle: float):
         """Turn the turtle right by a specified angle."""
         print(f"right(angle={angle})")
-        self._commands_tx.right(angle)
+        self._commands_tx.submit("right", angle)
 
     def circle(self, radius: float, extent: float=360, steps: int=None):
         """Move the turtle in a circle with a specified radius and extent."""
         if steps is None or extent != 360:
             print(f"circle(radius={radius}, extent={extent})")
-            self._commands_tx.circle(radius, extent)
+            self._commands_tx.submit("circle", radius, extent)
         else:
             # This implementation attempts to match the behaviour of turtle.circle()
             # by using a series of straight lines to approximate the circle
@@ -93,30 +97,30 @@ class FloorTurtle(TurtleInterface):
             step_length = 2 * abs(radius) * math.sin(math.pi / steps)
             
             # Rotate to match turtle.circle() starting orientation
-            self._commands_tx.left(start_angle * turn_direction)
+            self._commands_tx.submit("left", start_angle * turn_direction)
 
             for _ in range(steps):
-                self._commands_tx.forward(step_length)
-                self._commands_tx.left(turn_direction * step_angle)
+                self._commands_tx.submit("forward", step_length)
+                self._commands_tx.submit("left", turn_direction * step_angle)
             
             # Reset the initial rotation to match turtle.circle() final state
-            self._commands_tx.right(start_angle * turn_direction)
+            self._commands_tx.submit("right", start_angle * turn_direction)
 
     def setheading(self, angle: float):
         """Set the turtle's heading to a specified angle."""
         print(f"setheading(angle={angle})")
         self._angle = angle % 360
-        self._commands_tx.setheading(self._angle)
+        self._commands_tx.submit("setheading", self._angle)
 
     def setx(self, x: float):
         """Set the turtle's x-coordinate."""
         print(f"setx(x={x})")
-        self._commands_tx.setx(x)
+        self._commands_tx.submit("setx", x)
 
     def sety(self, y: float):
         """Set the turtle's y-coordinate."""
         print(f"sety(y={y})")
-        self._commands_tx.sety(y)
+        self._commands_tx.submit("sety", y)
 
     def setposition(self, x: float = None, y: float = None):
         """Set the turtle's position to specified x and y coordinates."""
@@ -130,17 +134,17 @@ class FloorTurtle(TurtleInterface):
             raise ValueError("Provide either two floats or a single tuple containing two floats.")
 
         print(f"setposition(x={_x}, y={_y})")
-        self._commands_tx.setposition(_x, _y)
+        self._commands_tx.submit("setposition", _x, _y)
 
     def towards(self, x: float, y: float):
         """Calculate the angle towards a specified position."""
         print(f"towards(x={x}, y={y})")
-        self._commands_tx.towards(x, y)
+        self._commands_tx.submit("towards", x, y)
 
     def reset_origin(self):
         """Reset the turtle's origin."""
         print("reset_origin()")
-        self._commands_tx.reset_origin()
+        self._commands_tx.submit("reset_origin")
 
     def heading(self) -> float:
         """Get the turtle's current heading."""
@@ -157,12 +161,12 @@ class FloorTurtle(TurtleInterface):
     def penup(self):
         """Lift the pen up."""
         print("penup()")
-        self._commands_tx.penup()
+        self._commands_tx.submit("penup")
 
     def pendown(self):
         """Put the pen down."""
         print("pendown()")
-        self._commands_tx.pendown()
+        self._commands_tx.submit("pendown")
 
     def eyes(self, eye: int, red: int, green: int, blue: int):
         """Set the color of the turtle's eyes."""
@@ -172,7 +176,7 @@ class FloorTurtle(TurtleInterface):
         red = max(0, min(255, red))
         green = max(0, min(255, green))
         blue = max(0, min(255, blue))
-        self._commands_tx.eyes(eye, red, green, blue)
+        self._commands_tx.submit("eyes", eye, red, green, blue)
 
     def power(self) -> tuple[int, int, int]:
         """Returns the power state of the turtle."""
@@ -189,34 +193,34 @@ class FloorTurtle(TurtleInterface):
     def set_linear_velocity(self, target_speed: int, acceleration: int):
         """Set the turtle's linear velocity."""
         print(f"set_linear_velocity(target_speed={target_speed}, acceleration={acceleration})")
-        self._commands_tx.set_linear_velocity(target_speed, acceleration)
+        self._commands_tx.submit("set_linear_velocity", target_speed, acceleration)
 
     def set_rotational_velocity(self, target_speed: int, acceleration: int):
         """Set the turtle's rotational velocity."""
         print(f"set_rotational_velocity(target_speed={target_speed}, acceleration={acceleration})")
-        self._commands_tx.set_rotational_velocity(target_speed, acceleration)
+        self._commands_tx.submit("set_rotational_velocity", target_speed, acceleration)
 
     def get_linear_velocity(self) -> tuple[int, int]:
         """Get the turtle's current linear velocity."""
-        _, target_speed, acceleration = self._commands_tx.get_linear_velocity()
+        _, target_speed, acceleration, _ = self._commands_tx.get_linear_velocity()
         print(f"get_linear_velocity() = {target_speed}, {acceleration}")
         return target_speed, acceleration
 
     def get_rotational_velocity(self) -> tuple[int, int]:
         """Get the turtle's current rotational velocity."""
-        _, target_speed, acceleration = self._commands_tx.get_rotational_velocity()
+        _, target_speed, acceleration, _ = self._commands_tx.get_rotational_velocity()
         print(f"get_rotational_velocity() = {target_speed}, {acceleration}")
         return target_speed, acceleration
 
     def set_wheel_diameter_calibration(self, diameter: int):
         """Set the calibration for the wheel diameter."""
         print(f"set_wheel_diameter_calibration(diameter={diameter})")
-        self._commands_tx.set_wheel_diameter_calibration(diameter)
+        self._commands_tx.submit("set_wheel_diameter_calibration", diameter)
 
     def set_axel_distance_calibration(self, distance: int):
         """Set the calibration for the axel distance."""
         print(f"set_axel_distance_calibration(distance={distance})")
-        self._commands_tx.set_axel_distance_calibration(distance)
+        self._commands_tx.submit("set_axel_distance_calibration", distance)
 
     def get_wheel_diameter_calibration(self) -> int:
         """Get the current wheel diameter calibration."""
@@ -233,7 +237,7 @@ class FloorTurtle(TurtleInterface):
     def set_turtle_id(self, turtle_id: int):
         """Set the turtle's ID."""
         print(f"set_turtle_id(turtle_id={turtle_id})")
-        self._commands_tx.set_turtle_id(turtle_id)
+        self._commands_tx.submit("set_turtle_id", turtle_id)
 
     def get_turtle_id(self) -> int:
         """Get the turtle's ID."""
@@ -244,17 +248,17 @@ class FloorTurtle(TurtleInterface):
     def load_config(self):
         """Load the turtle's configuration."""
         print("load_config()")
-        self._commands_tx.load_config()
+        self._commands_tx.submit("load_config")
 
     def save_config(self):
         """Save the turtle's configuration."""
         print("save_config()")
-        self._commands_tx.save_config()
+        self._commands_tx.submit("save_config")
 
     def reset_config(self):
         """Reset the turtle's configuration to default."""
         print("reset_config()")
-        self._commands_tx.reset_config()
+        self._commands_tx.submit("reset_config")
 
     def speed(self, speed: int):
         """Set the turtle's speed."""
@@ -281,14 +285,14 @@ class FloorTurtle(TurtleInterface):
             speed = 10
 
         if speed <= 3:
-            self._commands_tx.set_linear_velocity(100, 2)
-            self._commands_tx.set_rotational_velocity(50, 2)
+            self._commands_tx.submit("set_linear_velocity", 100, 2)
+            self._commands_tx.submit("set_rotational_velocity", 50, 2)
         elif speed <= 6:
-            self._commands_tx.set_linear_velocity(200, 4)
-            self._commands_tx.set_rotational_velocity(100, 4)
+            self._commands_tx.submit("set_linear_velocity", 200, 4)
+            self._commands_tx.submit("set_rotational_velocity", 100, 4)
         elif speed <= 8:
-            self._commands_tx.set_linear_velocity(400, 8)
-            self._commands_tx.set_rotational_velocity(200, 4)
+            self._commands_tx.submit("set_linear_velocity", 400, 8)
+            self._commands_tx.submit("set_rotational_velocity", 200, 4)
         else:
-            self._commands_tx.set_linear_velocity(600, 12)
-            self._commands_tx.set_rotational_velocity(300, 6)
+            self._commands_tx.submit("set_linear_velocity", 600, 12)
+            self._commands_tx.submit("set_rotational_velocity", 300, 6)
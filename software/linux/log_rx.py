@@ -0,0 +1,88 @@
+#************************************************************************
+#
+#   log_rx.py
+#
+#   Log lines received from the robot
+#   Valiant Turtle 2 - Communicator Linux Firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Once enabled (CommandsTx.set_log_stream) the robot sends the records in its log ring buffer,
+# followed by each new record, as text on its own characteristic (see robot/log_stream.py).
+# The notifications are split at 20 bytes, so they are joined back into lines here.
+
+import collections
+import logging
+import threading
+
+class RobotLog:
+    """
+    A bounded buffer of the log lines received from the robot (once full, the oldest lines
+    are dropped).
+
+    Sinks are called with each line as it is completed. A sink is any callable taking a
+    str; it is called from the transport's thread, so it should be quick.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        if capacity < 1:
+            raise ValueError("RobotLog::__init__ - Capacity must be at least 1")
+        self._lines = collections.deque(maxlen=capacity)
+        self._partial = bytearray()
+        self._lock = threading.Lock()
+        self._sinks = []
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def lines(self) -> list:
+        """A copy of the lines in the buffer (oldest first)"""
+        with self._lock:
+            return list(self._lines)
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+
+    def add_sink(self, sink):
+        with self._lock:
+            self._sinks.append(sink)
+
+    def remove_sink(self, sink):
+        with self._lock:
+            self._sinks.remove(sink)
+
+    def receive(self, data: bytes):
+        """Add a chunk of log text received from the robot"""
+        with self._lock:
+            self._partial += data
+            *complete, partial = self._partial.split(b"\n")
+            self._partial = bytearray(partial)
+            lines = [line.decode("utf-8", errors="replace") for line in complete]
+            self._lines.extend(lines)
+            sinks = list(self._sinks)
+
+        for line in lines:
+            for sink in sinks:
+                try:
+                    sink(line)
+                except Exception as e:
+                    logging.error(f"RobotLog::receive - Sink {sink} raised an exception: {e}")
@@ -0,0 +1,452 @@
+#************************************************************************
+#
+#   protocol_central.py
+#
+#   Command protocol codec (central)
+#   Valiant Turtle 2 - Linux host
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Generated from software/protocol/schema.py by software/protocol/codegen.py - do not edit
+
+import struct
+
+# The length of every packet
+PACKET_LENGTH = 20
+
+# Response types (stored in the last byte of the response)
+RESPONSE_TYPE_OFFSET = 19
+RESPONSE_RESULT = 0x00
+RESPONSE_ACCEPTED = 0x01
+RESPONSE_COMPLETED = 0x02
+
+# Command IDs
+MOTORS = 1
+FORWARD = 2
+BACKWARD = 3
+LEFT = 4
+RIGHT = 5
+CIRCLE = 6
+SETHEADING = 7
+SETX = 8
+SETY = 9
+SETPOSITION = 10
+TOWARDS = 11
+RESET_ORIGIN = 12
+HEADING = 13
+POSITION = 14
+PENUP = 15
+PENDOWN = 16
+EYES = 17
+POWER = 18
+ISDOWN = 19
+SET_LINEAR_VELOCITY = 20
+SET_ROTATIONAL_VELOCITY = 21
+GET_LINEAR_VELOCITY = 22
+GET_ROTATIONAL_VELOCITY = 23
+SET_WHEEL_DIAMETER_CALIBRATION = 24
+SET_AXEL_DISTANCE_CALIBRATION = 25
+GET_WHEEL_DIAMETER_CALIBRATION = 26
+GET_AXEL_DISTANCE_CALIBRATION = 27
+SET_TURTLE_ID = 28
+GET_TURTLE_ID = 29
+LOAD_CONFIG = 30
+SAVE_CONFIG = 31
+RESET_CONFIG = 32
+MOTION_QUEUE = 33
+SET_TELEMETRY_INTERVAL = 34
+SET_LOG_STREAM = 35
+COMMAND_COUNT = 36 # The highest command ID + 1
+
+# Commands that are acknowledged as soon as they are queued (when the motion queue
+# is enabled) and then report completion once they have been executed
+DEFERRED_COMMANDS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 15, 16, 17, 20, 21, 24, 25)
+
+# Commands that are given to the motion planner (so the following moves can be planned
+# whilst they are executing)
+PLANNED_COMMANDS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11)
+
+# Commands that only read the robot's state (answered straight away, even with moves queued)
+QUERY_COMMANDS = (13, 14, 18, 19, 22, 23, 26, 27, 29)
+
+# The command names indexed by command ID
+NAMES = (
+    None,
+    'motors', # 1
+    'forward', # 2
+    'backward', # 3
+    'left', # 4
+    'right', # 5
+    'circle', # 6
+    'setheading', # 7
+    'setx', # 8
+    'sety', # 9
+    'setposition', # 10
+    'towards', # 11
+    'reset_origin', # 12
+    'heading', # 13
+    'position', # 14
+    'penup', # 15
+    'pendown', # 16
+    'eyes', # 17
+    'power', # 18
+    'isdown', # 19
+    'set_linear_velocity', # 20
+    'set_rotational_velocity', # 21
+    'get_linear_velocity', # 22
+    'get_rotational_velocity', # 23
+    'set_wheel_diameter_calibration', # 24
+    'set_axel_distance_calibration', # 25
+    'get_wheel_diameter_calibration', # 26
+    'get_axel_distance_calibration', # 27
+    'set_turtle_id', # 28
+    'get_turtle_id', # 29
+    'load_config', # 30
+    'save_config', # 31
+    'reset_config', # 32
+    'motion_queue', # 33
+    'set_telemetry_interval', # 34
+    'set_log_stream', # 35
+)
+
+# Motion queue responses
+
+# Command accepted into the motion queue - slot, depth
+decode_accepted = struct.Struct('<xBB').unpack_from
+
+# Queued command completed - x_mm, y_mm, heading_degrees
+decode_completed = struct.Struct('<xfff').unpack_from
+
+# Commands
+
+_MOTORS = struct.Struct('<BBB')
+def encode_motors(seq: int, enable: bool) -> bytes:
+    return _MOTORS.pack(seq, 1, enable)
+
+_FORWARD = struct.Struct('<BBf')
+def encode_forward(seq: int, distance_mm: float) -> bytes:
+    return _FORWARD.pack(seq, 2, distance_mm)
+
+# Result of forward - x_mm, y_mm, heading_degrees
+decode_forward = struct.Struct('<xfff').unpack_from
+
+_BACKWARD = struct.Struct('<BBf')
+def encode_backward(seq: int, distance_mm: float) -> bytes:
+    return _BACKWARD.pack(seq, 3, distance_mm)
+
+# Result of backward - x_mm, y_mm, heading_degrees
+decode_backward = struct.Struct('<xfff').unpack_from
+
+_LEFT = struct.Struct('<BBf')
+def encode_left(seq: int, angle_degrees: float) -> bytes:
+    return _LEFT.pack(seq, 4, angle_degrees)
+
+# Result of left - x_mm, y_mm, heading_degrees
+decode_left = struct.Struct('<xfff').unpack_from
+
+_RIGHT = struct.Struct('<BBf')
+def encode_right(seq: int, angle_degrees: float) -> bytes:
+    return _RIGHT.pack(seq, 5, angle_degrees)
+
+# Result of right - x_mm, y_mm, heading_degrees
+decode_right = struct.Struct('<xfff').unpack_from
+
+_CIRCLE = struct.Struct('<BBff')
+def encode_circle(seq: int, radius_mm: float, extent_degrees: float) -> bytes:
+    return _CIRCLE.pack(seq, 6, radius_mm, extent_degrees)
+
+# Result of circle - x_mm, y_mm, heading_degrees
+decode_circle = struct.Struct('<xfff').unpack_from
+
+_SETHEADING = struct.Struct('<BBf')
+def encode_setheading(seq: int, heading_degrees: float) -> bytes:
+    return _SETHEADING.pack(seq, 7, heading_degrees)
+
+_SETX = struct.Struct('<BBf')
+def encode_setx(seq: int, x_mm: float) -> bytes:
+    return _SETX.pack(seq, 8, x_mm)
+
+# Result of setx - x_mm, y_mm, heading_degrees
+decode_setx = struct.Struct('<xfff').unpack_from
+
+_SETY = struct.Struct('<BBf')
+def encode_sety(seq: int, y_mm: float) -> bytes:
+    return _SETY.pack(seq, 9, y_mm)
+
+# Result of sety - x_mm, y_mm, heading_degrees
+decode_sety = struct.Struct('<xfff').unpack_from
+
+_SETPOSITION = struct.Struct('<BBff')
+def encode_setposition(seq: int, x_mm: float, y_mm: float) -> bytes:
+    return _SETPOSITION.pack(seq, 10, x_mm, y_mm)
+
+# Result of setposition - x_mm, y_mm, heading_degrees
+decode_setposition = struct.Struct('<xfff').unpack_from
+
+_TOWARDS = struct.Struct('<BBff')
+def encode_towards(seq: int, x_mm: float, y_mm: float) -> bytes:
+    return _TOWARDS.pack(seq, 11, x_mm, y_mm)
+
+# Result of towards - x_mm, y_mm, heading_degrees
+decode_towards = struct.Struct('<xfff').unpack_from
+
+_RESET_ORIGIN = struct.Struct('<BB')
+def encode_reset_origin(seq: int) -> bytes:
+    return _RESET_ORIGIN.pack(seq, 12)
+
+_HEADING = struct.Struct('<BB')
+def encode_heading(seq: int) -> bytes:
+    return _HEADING.pack(seq, 13)
+
+# Result of heading - heading_degrees
+decode_heading = struct.Struct('<xf').unpack_from
+
+_POSITION = struct.Struct('<BB')
+def encode_position(seq: int) -> bytes:
+    return _POSITION.pack(seq, 14)
+
+# Result of position - x_mm, y_mm
+decode_position = struct.Struct('<xff').unpack_from
+
+_PENUP = struct.Struct('<BB')
+def encode_penup(seq: int) -> bytes:
+    return _PENUP.pack(seq, 15)
+
+_PENDOWN = struct.Struct('<BB')
+def encode_pendown(seq: int) -> bytes:
+    return _PENDOWN.pack(seq, 16)
+
+_EYES = struct.Struct('<BBBBBB')
+def encode_eyes(seq: int, eye_id: int, red: int, green: int, blue: int) -> bytes:
+    return _EYES.pack(seq, 17, eye_id, red, green, blue)
+
+_POWER = struct.Struct('<BB')
+def encode_power(seq: int) -> bytes:
+    return _POWER.pack(seq, 18)
+
+# Result of power - voltage_mv, current_ma, power_mw
+decode_power = struct.Struct('<xiii').unpack_from
+
+_ISDOWN = struct.Struct('<BB')
+def encode_isdown(seq: int) -> bytes:
+    return _ISDOWN.pack(seq, 19)
+
+# Result of isdown - pen_down
+decode_isdown = struct.Struct('<xB').unpack_from
+
+_SET_LINEAR_VELOCITY = struct.Struct('<BBiii')
+def encode_set_linear_velocity(seq: int, max_speed: int, acceleration: int, jerk: int = 0) -> bytes:
+    return _SET_LINEAR_VELOCITY.pack(seq, 20, max_speed, acceleration, jerk)
+
+_SET_ROTATIONAL_VELOCITY = struct.Struct('<BBiii')
+def encode_set_rotational_velocity(seq: int, max_speed: int, acceleration: int, jerk: int = 0) -> bytes:
+    return _SET_ROTATIONAL_VELOCITY.pack(seq, 21, max_speed, acceleration, jerk)
+
+_GET_LINEAR_VELOCITY = struct.Struct('<BB')
+def encode_get_linear_velocity(seq: int) -> bytes:
+    return _GET_LINEAR_VELOCITY.pack(seq, 22)
+
+# Result of get_linear_velocity - max_speed, acceleration, jerk
+decode_get_linear_velocity = struct.Struct('<xiii').unpack_from
+
+_GET_ROTATIONAL_VELOCITY = struct.Struct('<BB')
+def encode_get_rotational_velocity(seq: int) -> bytes:
+    return _GET_ROTATIONAL_VELOCITY.pack(seq, 23)
+
+# Result of get_rotational_velocity - max_speed, acceleration, jerk
+decode_get_rotational_velocity = struct.Struct('<xiii').unpack_from
+
+_SET_WHEEL_DIAMETER_CALIBRATION = struct.Struct('<BBi')
+def encode_set_wheel_diameter_calibration(seq: int, wheel_diameter: int) -> bytes:
+    return _SET_WHEEL_DIAMETER_CALIBRATION.pack(seq, 24, wheel_diameter)
+
+_SET_AXEL_DISTANCE_CALIBRATION = struct.Struct('<BBi')
+def encode_set_axel_distance_calibration(seq: int, axel_distance: int) -> bytes:
+    return _SET_AXEL_DISTANCE_CALIBRATION.pack(seq, 25, axel_distance)
+
+_GET_WHEEL_DIAMETER_CALIBRATION = struct.Struct('<BB')
+def encode_get_wheel_diameter_calibration(seq: int) -> bytes:
+    return _GET_WHEEL_DIAMETER_CALIBRATION.pack(seq, 26)
+
+# Result of get_wheel_diameter_calibration - wheel_diameter
+decode_get_wheel_diameter_calibration = struct.Struct('<xi').unpack_from
+
+_GET_AXEL_DISTANCE_CALIBRATION = struct.Struct('<BB')
+def encode_get_axel_distance_calibration(seq: int) -> bytes:
+    return _GET_AXEL_DISTANCE_CALIBRATION.pack(seq, 27)
+
+# Result of get_axel_distance_calibration - axel_distance
+decode_get_axel_distance_calibration = struct.Struct('<xi').unpack_from
+
+_SET_TURTLE_ID = struct.Struct('<BBB')
+def encode_set_turtle_id(seq: int, turtle_id: int) -> bytes:
+    return _SET_TURTLE_ID.pack(seq, 28, turtle_id)
+
+_GET_TURTLE_ID = struct.Struct('<BB')
+def encode_get_turtle_id(seq: int) -> bytes:
+    return _GET_TURTLE_ID.pack(seq, 29)
+
+# Result of get_turtle_id - turtle_id
+decode_get_turtle_id = struct.Struct('<xB').unpack_from
+
+_LOAD_CONFIG = struct.Struct('<BB')
+def encode_load_config(seq: int) -> bytes:
+    return _LOAD_CONFIG.pack(seq, 30)
+
+_SAVE_CONFIG = struct.Struct('<BB')
+def encode_save_config(seq: int) -> bytes:
+    return _SAVE_CONFIG.pack(seq, 31)
+
+_RESET_CONFIG = struct.Struct('<BB')
+def encode_reset_config(seq: int) -> bytes:
+    return _RESET_CONFIG.pack(seq, 32)
+
+_MOTION_QUEUE = struct.Struct('<BBB')
+def encode_motion_queue(seq: int, enable: bool) -> bytes:
+    return _MOTION_QUEUE.pack(seq, 33, enable)
+
+_SET_TELEMETRY_INTERVAL = struct.Struct('<BBH')
+def encode_set_telemetry_interval(seq: int, interval_ms: int) -> bytes:
+    return _SET_TELEMETRY_INTERVAL.pack(seq, 34, interval_ms)
+
+_SET_LOG_STREAM = struct.Struct('<BBB')
+def encode_set_log_stream(seq: int, enable: bool) -> bytes:
+    return _SET_LOG_STREAM.pack(seq, 35, enable)
+
+# The encode functions indexed by command ID
+ENCODERS = (
+    None,
+    encode_motors, # 1 = motors
+    encode_forward, # 2 = forward
+    encode_backward, # 3 = backward
+    encode_left, # 4 = left
+    encode_right, # 5 = right
+    encode_circle, # 6 = circle
+    encode_setheading, # 7 = setheading
+    encode_setx, # 8 = setx
+    encode_sety, # 9 = sety
+    encode_setposition, # 10 = setposition
+    encode_towards, # 11 = towards
+    encode_reset_origin, # 12 = reset_origin
+    encode_heading, # 13 = heading
+    encode_position, # 14 = position
+    encode_penup, # 15 = penup
+    encode_pendown, # 16 = pendown
+    encode_eyes, # 17 = eyes
+    encode_power, # 18 = power
+    encode_isdown, # 19 = isdown
+    encode_set_linear_velocity, # 20 = set_linear_velocity
+    encode_set_rotational_velocity, # 21 = set_rotational_velocity
+    encode_get_linear_velocity, # 22 = get_linear_velocity
+    encode_get_rotational_velocity, # 23 = get_rotational_velocity
+    encode_set_wheel_diameter_calibration, # 24 = set_wheel_diameter_calibration
+    encode_set_axel_distance_calibration, # 25 = set_axel_distance_calibration
+    encode_get_wheel_diameter_calibration, # 26 = get_wheel_diameter_calibration
+    encode_get_axel_distance_calibration, # 27 = get_axel_distance_calibration
+    encode_set_turtle_id, # 28 = set_turtle_id
+    encode_get_turtle_id, # 29 = get_turtle_id
+    encode_load_config, # 30 = load_config
+    encode_save_config, # 31 = save_config
+    encode_reset_config, # 32 = reset_config
+    encode_motion_queue, # 33 = motion_queue
+    encode_set_telemetry_interval, # 34 = set_telemetry_interval
+    encode_set_log_stream, # 35 = set_log_stream
+)
+
+# The decode functions indexed by command ID (None = no result)
+DECODERS = (
+    None,
+    None, # 1 = motors
+    decode_forward, # 2 = forward
+    decode_backward, # 3 = backward
+    decode_left, # 4 = left
+    decode_right, # 5 = right
+    decode_circle, # 6 = circle
+    None, # 7 = setheading
+    decode_setx, # 8 = setx
+    decode_sety, # 9 = sety
+    decode_setposition, # 10 = setposition
+    decode_towards, # 11 = towards
+    None, # 12 = reset_origin
+    decode_heading, # 13 = heading
+    decode_position, # 14 = position
+    None, # 15 = penup
+    None, # 16 = pendown
+    None, # 17 = eyes
+    decode_power, # 18 = power
+    decode_isdown, # 19 = isdown
+    None, # 20 = set_linear_velocity
+    None, # 21 = set_rotational_velocity
+    decode_get_linear_velocity, # 22 = get_linear_velocity
+    decode_get_rotational_velocity, # 23 = get_rotational_velocity
+    None, # 24 = set_wheel_diameter_calibration
+    None, # 25 = set_axel_distance_calibration
+    decode_get_wheel_diameter_calibration, # 26 = get_wheel_diameter_calibration
+    decode_get_axel_distance_calibration, # 27 = get_axel_distance_calibration
+    None, # 28 = set_turtle_id
+    decode_get_turtle_id, # 29 = get_turtle_id
+    None, # 30 = load_config
+    None, # 31 = save_config
+    None, # 32 = reset_config
+    None, # 33 = motion_queue
+    None, # 34 = set_telemetry_interval
+    None, # 35 = set_log_stream
+)
+
+# The zero value of each field of the result indexed by command ID (the types of the results)
+RESULT_DEFAULTS = (
+    None,
+    (), # 1 = motors
+    (0.0, 0.0, 0.0), # 2 = forward
+    (0.0, 0.0, 0.0), # 3 = backward
+    (0.0, 0.0, 0.0), # 4 = left
+    (0.0, 0.0, 0.0), # 5 = right
+    (0.0, 0.0, 0.0), # 6 = circle
+    (), # 7 = setheading
+    (0.0, 0.0, 0.0), # 8 = setx
+    (0.0, 0.0, 0.0), # 9 = sety
+    (0.0, 0.0, 0.0), # 10 = setposition
+    (0.0, 0.0, 0.0), # 11 = towards
+    (), # 12 = reset_origin
+    (0.0,), # 13 = heading
+    (0.0, 0.0), # 14 = position
+    (), # 15 = penup
+    (), # 16 = pendown
+    (), # 17 = eyes
+    (0, 0, 0), # 18 = power
+    (False,), # 19 = isdown
+    (), # 20 = set_linear_velocity
+    (), # 21 = set_rotational_velocity
+    (0, 0, 0), # 22 = get_linear_velocity
+    (0, 0, 0), # 23 = get_rotational_velocity
+    (), # 24 = set_wheel_diameter_calibration
+    (), # 25 = set_axel_distance_calibration
+    (0,), # 26 = get_wheel_diameter_calibration
+    (0,), # 27 = get_axel_distance_calibration
+    (), # 28 = set_turtle_id
+    (0,), # 29 = get_turtle_id
+    (), # 30 = load_config
+    (), # 31 = save_config
+    (), # 32 = reset_config
+    (), # 33 = motion_queue
+    (), # 34 = set_telemetry_interval
+    (), # 35 = set_log_stream
+)
@@ -0,0 +1,160 @@
+#************************************************************************
+#
+#   response_router.py
+#
+#   Matches the robot's responses to the commands waiting for them
+#   Valiant Turtle 2 - Linux host
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import asyncio
+import logging
+import time
+
+class ResponseRouter:
+    """
+    Routes each response from the robot straight to the future of the command waiting for it
+    (looked up by sequence ID), so any number of commands can wait at once and no response is
+    taken by the wrong waiter.
+
+    route() is called by the transport as each packet is received (in the transport's event loop).
+    A sequence ID whose command gave up waiting is kept in the late table until its response arrives
+    (or the entry expires), and isn't reused until then - otherwise a late response could complete a
+    newer command that was given the same sequence ID. Responses that no command is waiting for are
+    kept in a small orphan table for diagnostics.
+    """
+
+    # The maximum number of entries kept in the late and orphan tables (the oldest entries are dropped)
+    MAX_LATE = 64
+    MAX_ORPHANS = 16
+
+    # How long a late response is waited for (in seconds) before its sequence ID can be reused
+    LATE_EXPIRY = 120.0
+
+    def __init__(self):
+        # Futures of the commands waiting for a response (indexed by sequence ID)
+        self._pending = {}
+
+        # Time (time.monotonic) that each command waiting for a late response gave up (indexed by sequence ID)
+        self._late = {}
+
+        # Responses that no command was waiting for (indexed by sequence ID)
+        self._orphans = {}
+
+        # Counts of the responses received, the late responses and the orphaned responses
+        self._received = 0
+        self._late_count = 0
+        self._orphan_count = 0
+
+    @property
+    def pending(self) -> int:
+        # The number of commands waiting for a response
+        return len(self._pending)
+
+    @property
+    def received(self) -> int:
+        # The number of responses routed
+        return self._received
+
+    @property
+    def late_count(self) -> int:
+        return self._late_count
+
+    @property
+    def orphan_count(self) -> int:
+        return self._orphan_count
+
+    @property
+    def orphans(self) -> dict:
+        # The most recent responses that no command was waiting for (indexed by sequence ID)
+        return dict(self._orphans)
+
+    def in_use(self, seq_id: int) -> bool:
+        """True if the sequence ID can't be given to a new command (it's waiting for a response or a late response)"""
+        if seq_id in self._pending:
+            return True
+        gave_up = self._late.get(seq_id)
+        if gave_up is None:
+            return False
+        if time.monotonic() - gave_up > ResponseRouter.LATE_EXPIRY:
+            del self._late[seq_id]
+            return False
+        return True
+
+    def expect(self, seq_id: int) -> asyncio.Future:
+        """Register a command that is about to be sent and return the future its response will be delivered to"""
+        if self.in_use(seq_id):
+            raise ValueError(f"ResponseRouter::expect - Sequence ID {seq_id} is already in use")
+
+        # Anything left over from an earlier use of the sequence ID is stale
+        self._orphans.pop(seq_id, None)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[seq_id] = future
+        return future
+
+    def future(self, seq_id: int) -> asyncio.Future:
+        """The future of a command waiting for a response"""
+        return self._pending[seq_id]
+
+    def ahead(self, seq_id: int) -> list:
+        """The futures of the commands registered before a command that are still waiting for a response"""
+        ahead = []
+        for pending_seq_id, future in self._pending.items():
+            if pending_seq_id == seq_id:
+                break
+            if not future.done():
+                ahead.append(future)
+        return ahead
+
+    def finish(self, seq_id: int):
+        """Stop waiting for a response (if it hasn't arrived the sequence ID is moved to the late table)"""
+        future = self._pending.pop(seq_id, None)
+        if future is None or future.done():
+            return
+
+        future.cancel()
+        if len(self._late) >= ResponseRouter.MAX_LATE:
+            del self._late[next(iter(self._late))]
+        self._late[seq_id] = time.monotonic()
+
+    def route(self, data: bytes) -> bool:
+        """Deliver a response to the command waiting for it. Returns False if no command was waiting"""
+        self._received += 1
+        seq_id = data[0]
+
+        future = self._pending.get(seq_id)
+        if future is not None and not future.done():
+            future.set_result(data)
+            return True
+
+        if self._late.pop(seq_id, None) is not None:
+            self._late_count += 1
+            logging.info(f"ResponseRouter::route - Sequence ID = {seq_id} responded after its command stopped waiting - discarded")
+            return False
+
+        self._orphan_count += 1
+        if len(self._orphans) >= ResponseRouter.MAX_ORPHANS:
+            del self._orphans[next(iter(self._orphans))]
+        self._orphans[seq_id] = data
+        logging.info(f"ResponseRouter::route - Sequence ID = {seq_id} has no waiting command - discarded")
+        return False
+
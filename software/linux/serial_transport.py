@@ -0,0 +1,183 @@
+#************************************************************************ 
+#
+#   serial_transport.py
+#
+#   Serial transport (via the communicator's UART)
+#   Valiant Turtle 2 - Communicator firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import asyncio
+import logging
+import struct
+
+import serial
+
+from transport import Transport, PACKET_LENGTH
+
+class SerialTransport(Transport):
+    """
+    Carries the command packets over a serial port to the communicator, which passes them
+    on to the robot using its BLE central (see the communicator's serial_comms.py).
+
+    The port is opened once and reused (across robot reconnections) until disconnect()
+    is called. Every packet waiting in the C2P queue is sent in a single write.
+    """
+
+    # Communicator shell command IDs
+    __COMMAND_PACKET = 44
+    __COMMAND_PACKET_MODE_OFF = 45
+    __COMMAND_STATUS = 46
+
+    # Start byte of a packet frame from the communicator (other frames are 3-byte shell responses)
+    __PACKET_FRAME = 0xFE
+    __SHELL_RESPONSE_LENGTH = 3
+
+    name = "serial"
+
+    def __init__(self, port: str, baudrate: int = 4800, status_interval: float = 1.0):
+        super().__init__()
+        self._port = port
+        self._baudrate = baudrate
+        self._status_interval = status_interval
+
+        self._serial = None
+        self._rx_buffer = bytearray()
+
+        # Set when the communicator responds to a status request
+        self._status_response = None
+
+    def disconnect(self):
+        super().disconnect()
+
+        # Leave packet mode so the communicator's shell can be used again
+        if self._serial is not None:
+            try:
+                self._serial.write(self.__frame(SerialTransport.__COMMAND_PACKET_MODE_OFF))
+                self._serial.close()
+            except serial.SerialException as e:
+                logging.error(f"SerialTransport::disconnect - Failed to close {self._port}: {e}")
+            self._serial = None
+
+    def __frame(self, command_id: int, payload: bytes = b"") -> bytes:
+        return struct.pack("<h", command_id) + payload + b"\x0D"
+
+    async def __write(self, data: bytes):
+        # pyserial blocks, so the write is run on the executor
+        await asyncio.get_running_loop().run_in_executor(None, self._serial.write, data)
+
+    def __open(self) -> bool:
+        # Reuse the port if it's still open
+        if self._serial is not None and self._serial.is_open:
+            return True
+
+        try:
+            self._serial = serial.Serial(self._port, self._baudrate, timeout=0.1, rtscts=True)
+            self._rx_buffer.clear()
+            logging.info(f"SerialTransport::__open - Opened {self._port} at {self._baudrate} baud")
+            return True
+        except serial.SerialException as e:
+            logging.error(f"SerialTransport::__open - Failed to open {self._port}: {e}")
+            self._serial = None
+            return False
+
+    async def __robot_connected(self) -> bool:
+        # Ask the communicator if it is connected to the robot
+        self._status_response = asyncio.get_running_loop().create_future()
+        await self.__write(self.__frame(SerialTransport.__COMMAND_STATUS))
+        try:
+            result_code, response = await asyncio.wait_for(self._status_response, timeout=2.0)
+        except asyncio.TimeoutError:
+            logging.info("SerialTransport::__robot_connected - The communicator didn't respond")
+            return False
+        finally:
+            self._status_response = None
+        return result_code == 0 and response == 1
+
+    async def _maintain_connection(self):
+        logging.info("SerialTransport::_maintain_connection - Running maintain connection task")
+        reader = asyncio.create_task(self.__read_frames())
+        try:
+            while True:
+                try:
+                    if self.__open():
+                        connected = await self.__robot_connected()
+                        if connected != self._connected:
+                            logging.info(f"SerialTransport::_maintain_connection - Robot {'connected' if connected else 'disconnected'}")
+                            if connected:
+                                self._clear_queues()
+                        self._connected = connected
+                except serial.SerialException as e:
+                    # Reopen the port next time around
+                    logging.error(f"SerialTransport::_maintain_connection - Serial error: {e}")
+                    self._connected = False
+                    self._serial.close()
+
+                await asyncio.sleep(self._status_interval)
+        finally:
+            reader.cancel()
+
+    async def __read_frames(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._serial is None or not self._serial.is_open:
+                await asyncio.sleep(0.25)
+                continue
+
+            try:
+                data = await loop.run_in_executor(None, self._serial.read, max(self._serial.in_waiting, 1))
+            except (serial.SerialException, TypeError, AttributeError) as e:
+                # The port was closed whilst reading
+                logging.debug(f"SerialTransport::__read_frames - Read failed: {e}")
+                continue
+            self._rx_buffer.extend(data)
+
+            # Split the received bytes into packet frames and shell responses
+            while len(self._rx_buffer) > 0:
+                if self._rx_buffer[0] == SerialTransport.__PACKET_FRAME:
+                    if len(self._rx_buffer) < PACKET_LENGTH + 1:
+                        break
+                    self._receive_packet(bytes(self._rx_buffer[1:PACKET_LENGTH + 1]))
+                    del self._rx_buffer[:PACKET_LENGTH + 1]
+                else:
+                    if len(self._rx_buffer) < SerialTransport.__SHELL_RESPONSE_LENGTH:
+                        break
+                    response = struct.unpack("<Bh", self._rx_buffer[:SerialTransport.__SHELL_RESPONSE_LENGTH])
+                    del self._rx_buffer[:SerialTransport.__SHELL_RESPONSE_LENGTH]
+                    if self._status_response is not None and not self._status_response.done():
+                        self._status_response.set_result(response)
+
+    async def _handle_commands(self):
+        logging.info("SerialTransport::_handle_commands - Running handle commands task")
+        while True:
+            await self._wake_event.wait()
+            self._wake_event.clear()
+            if not self._connected:
+                continue
+
+            # Send all of the waiting packets in one write
+            batch = self._take_c2p_batch()
+            if batch:
+                try:
+                    await self.__write(b"".join(self.__frame(SerialTransport.__COMMAND_PACKET, self._pad_packet(packet)) for packet in batch))
+                except serial.SerialException as e:
+                    logging.error(f"SerialTransport::_handle_commands - Serial error: {e}")
+                    self._connected = False
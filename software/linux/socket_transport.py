@@ -0,0 +1,118 @@
+#************************************************************************ 
+#
+#   socket_transport.py
+#
+#   Socket transport (TCP or Unix socket to vt2_bridge or the simulator)
+#   Valiant Turtle 2 - Communicator firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import asyncio
+import logging
+
+from transport import Transport, PACKET_LENGTH
+
+class SocketTransport(Transport):
+    """
+    Carries the command packets over a TCP or Unix socket to vt2_bridge (which passes them
+    on to the robot) or to a simulated robot. Packets are sent in both directions as fixed
+    20-byte frames.
+
+    The connection is kept open between commands and is reopened (backing off up to
+    max_retry_interval seconds) if it's lost. Every packet waiting in the C2P queue is
+    sent in a single write.
+    """
+
+    name = "socket"
+
+    def __init__(self, host: str = None, port: int = None, path: str = None, max_retry_interval: float = 8.0):
+        super().__init__()
+        if (path is None) == (host is None or port is None):
+            raise ValueError("SocketTransport::__init__ - Either a host and port or a path is required")
+        self._host = host
+        self._port = port
+        self._path = path
+        self._max_retry_interval = max_retry_interval
+
+        self._loop = None
+        self._writer = None
+
+    def disconnect(self):
+        super().disconnect()
+
+        # Note: This can be called from outside of the transport's event loop
+        if self._writer is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._writer.close)
+
+    async def __open(self):
+        if self._path is not None:
+            return await asyncio.open_unix_connection(self._path)
+        return await asyncio.open_connection(self._host, self._port)
+
+    async def _maintain_connection(self):
+        logging.info("SocketTransport::_maintain_connection - Running maintain connection task")
+        self._loop = asyncio.get_running_loop()
+        address = self._path if self._path is not None else f"{self._host}:{self._port}"
+        retry_interval = 0.25
+
+        while True:
+            self._clear_queues()
+            try:
+                reader, self._writer = await self.__open()
+            except OSError as e:
+                logging.info(f"SocketTransport::_maintain_connection - Failed to connect to {address}: {e}")
+                await asyncio.sleep(retry_interval)
+                retry_interval = min(retry_interval * 2, self._max_retry_interval)
+                continue
+
+            logging.info(f"SocketTransport::_maintain_connection - Connected to {address}")
+            retry_interval = 0.25
+            self._connected = True
+
+            # Receive packets until the connection is closed (by either end)
+            try:
+                while True:
+                    self._receive_packet(await reader.readexactly(PACKET_LENGTH))
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                logging.info(f"SocketTransport::_maintain_connection - Connection to {address} closed")
+
+            self._connected = False
+            self._writer.close()
+            self._writer = None
+            await asyncio.sleep(retry_interval)
+
+    async def _handle_commands(self):
+        logging.info("SocketTransport::_handle_commands - Running handle commands task")
+        while True:
+            await self._wake_event.wait()
+            self._wake_event.clear()
+            if not self._connected:
+                continue
+
+            # Send all of the waiting packets in one write
+            batch = self._take_c2p_batch()
+            if batch:
+                try:
+                    self._writer.write(b"".join(self._pad_packet(packet) for packet in batch))
+                    await self._writer.drain()
+                except ConnectionError as e:
+                    logging.error(f"SocketTransport::_handle_commands - Failed to send packets: {e}")
+                    self._connected = False
@@ -0,0 +1,440 @@
+#************************************************************************ 
+#
+#   stroke_optimizer.py
+#
+#   Pen-up travel optimiser for drawings
+#   Valiant Turtle 2 - Communicator Linux Firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Drawings are written as a sequence of turtle commands, visiting each part of the drawing
+# in the order it was written. On the floor the pen-up moves between the strokes can take as
+# long as the drawing itself.
+#
+# The DrawingRecorder runs a drawing without a robot and records it as pen-down strokes
+# (made of lines and arcs) and the other commands (such as motors and eyes). The strokes are
+# then put in a new order (drawing a stroke backwards where that helps) to minimise the
+# pen-up travel and turning, and the optimised drawing is rendered on a real turtle.
+#
+# The strokes are ordered greedily (the cheapest stroke next) using a grid of stroke end points,
+# so the ordering stays close to O(n log n) - 10,000 strokes take around a second.
+
+import math
+from abstract_turtle import TurtleInterface
+from turtle_recorder import TurtleRecorder
+
+# Positions closer than this (in mm) are the same point
+_EPSILON = 1e-6
+
+def _normalise_angle(angle: float) -> float:
+    # The angle in the range -180 to 180 degrees
+    return (angle + 180.0) % 360.0 - 180.0
+
+def _bearing(x1: float, y1: float, x2: float, y2: float) -> float:
+    return math.degrees(math.atan2(y2 - y1, x2 - x1)) % 360.0
+
+class Segment:
+    """A line or an arc drawn with the pen down"""
+    __slots__ = ("start", "start_heading", "end", "end_heading", "radius", "extent")
+
+    def __init__(self, start: tuple, start_heading: float, end: tuple, end_heading: float, radius: float = None, extent: float = None):
+        self.start = start
+        self.start_heading = start_heading
+        self.end = end
+        self.end_heading = end_heading
+        self.radius = radius
+        self.extent = extent
+
+    @property
+    def is_arc(self) -> bool:
+        return self.radius is not None
+
+    def reversed(self):
+        """The same segment drawn from the other end"""
+        if self.is_arc:
+            # Starting from the end facing backwards, the centre is on the other side
+            return Segment(self.end, (self.end_heading + 180.0) % 360.0, self.start, (self.start_heading + 180.0) % 360.0,
+                -self.radius, self.extent)
+        heading = (self.start_heading + 180.0) % 360.0
+        return Segment(self.end, heading, self.start, heading)
+
+class Stroke:
+    """A sequence of segments drawn without lifting the pen"""
+    __slots__ = ("segments",)
+
+    def __init__(self, segments: list):
+        self.segments = segments
+
+    @property
+    def start(self) -> tuple:
+        return self.segments[0].start
+
+    @property
+    def start_heading(self) -> float:
+        return self.segments[0].start_heading
+
+    @property
+    def end(self) -> tuple:
+        return self.segments[-1].end
+
+    @property
+    def end_heading(self) -> float:
+        return self.segments[-1].end_heading
+
+    def reversed(self):
+        return Stroke([segment.reversed() for segment in reversed(self.segments)])
+
+class Command:
+    """A command that isn't part of a stroke (such as eyes) and the pose it was given at"""
+    __slots__ = ("name", "args", "position", "heading")
+
+    def __init__(self, name: str, args: tuple, position: tuple, heading: float):
+        self.name = name
+        self.args = args
+        self.position = position
+        self.heading = heading
+
+class Drawing:
+    """
+    A recorded drawing: strokes and commands (in the order they were drawn) and the pose the
+    turtle finished in. Commands are kept in place, so strokes are only reordered between them.
+    """
+
+    def __init__(self, items: list, final_position: tuple, final_heading: float):
+        self.items = items
+        self.final_position = final_position
+        self.final_heading = final_heading
+
+    @property
+    def strokes(self) -> list:
+        return [item for item in self.items if isinstance(item, Stroke)]
+
+    def travel(self) -> tuple[float, float]:
+        """The pen-up travel (in mm) and turning (in degrees) needed to render the drawing"""
+        position, heading = (0.0, 0.0), 0.0
+        distance = turning = 0.0
+        for item in self.items:
+            if isinstance(item, Stroke):
+                move_distance, move_turning = _move_cost(position, heading, item.start, item.start_heading)
+                position, heading = item.end, item.end_heading
+            else:
+                move_distance, move_turning = _move_cost(position, heading, item.position, item.heading)
+                position, heading = item.position, item.heading
+            distance += move_distance
+            turning += move_turning
+        move_distance, move_turning = _move_cost(position, heading, self.final_position, self.final_heading)
+        return distance + move_distance, turning + move_turning
+
+    def optimised(self, turn_cost: float = 0.5):
+        """
+        The drawing with its strokes reordered (and reversed where that helps) to reduce the pen-up travel.
+        Args:
+            turn_cost (float): The cost of turning in mm per degree (how far the turtle could
+                               travel in the time it takes to turn a degree).
+        Returns:
+            Drawing: The optimised drawing.
+        """
+
+        items = []
+        run = []
+        position, heading = (0.0, 0.0), 0.0
+        for item in self.items + [None]:
+            if isinstance(item, Stroke):
+                run.append(item)
+                continue
+
+            # Reorder the strokes since the last command (starting from where the turtle will be)
+            if run:
+                run = _order_strokes(run, position, heading, turn_cost)
+                items.extend(run)
+                position, heading = run[-1].end, run[-1].end_heading
+                run = []
+            if item is not None:
+                items.append(item)
+                position, heading = item.position, item.heading
+        return Drawing(items, self.final_position, self.final_heading)
+
+    def render(self, t: TurtleInterface):
+        """Draw the drawing with a turtle"""
+        position, heading = (0.0, 0.0), 0.0
+        pen_down = False
+
+        # Note: The heading is None when it isn't known (reset_origin resets the floor turtle's
+        # heading, but not the screen turtle's)
+        def set_heading(target_heading: float):
+            nonlocal heading
+            if heading is None or abs(_normalise_angle(target_heading - heading)) > _EPSILON:
+                t.setheading(target_heading)
+            heading = target_heading
+
+        def move_to(target: tuple, target_heading: float):
+            # Pen-up move to a pose (only turning if the heading matters)
+            nonlocal position, heading, pen_down
+            if pen_down:
+                t.penup()
+                pen_down = False
+            if math.dist(position, target) > _EPSILON:
+                t.goto(target[0], target[1])
+            position = target
+            if target_heading is not None:
+                set_heading(target_heading)
+
+        for item in self.items:
+            if isinstance(item, Command):
+                move_to(item.position, item.heading)
+                getattr(t, item.name)(*item.args)
+                if item.name == "reset_origin":
+                    position, heading = (0.0, 0.0), None
+                continue
+
+            # Lines are drawn with goto (which doesn't depend on or change the heading) so the
+            # heading only needs to be set before an arc
+            first = item.segments[0]
+            move_to(item.start, first.start_heading if first.is_arc else None)
+            t.pendown()
+            pen_down = True
+            for segment in item.segments:
+                if segment.is_arc:
+                    set_heading(segment.start_heading)
+                    t.circle(segment.radius, segment.extent)
+                    heading = segment.end_heading
+                else:
+                    t.goto(segment.end[0], segment.end[1])
+                position = segment.end
+
+        move_to(self.final_position, self.final_heading)
+
+def _move_cost(position: tuple, heading: float, target: tuple, target_heading: float) -> tuple[float, float]:
+    # The distance and turning to move (turn, drive, turn) from one pose to another
+    distance = math.dist(position, target)
+    if distance <= _EPSILON:
+        return 0.0, abs(_normalise_angle(target_heading - heading))
+    bearing = _bearing(position[0], position[1], target[0], target[1])
+    return distance, abs(_normalise_angle(bearing - heading)) + abs(_normalise_angle(target_heading - bearing))
+
+class _EndPointGrid:
+    # A grid of stroke end points (each stroke can be started from either end) for finding
+    # the stroke closest to the turtle. Strokes that have been drawn are removed lazily
+    def __init__(self, strokes: list, used: list):
+        self._strokes = strokes
+        self._used = used
+        remaining = [index for index in range(len(strokes)) if not used[index]]
+        self.size = len(remaining)
+
+        points = [strokes[index].start for index in remaining] + [strokes[index].end for index in remaining]
+        self._min_x = min(point[0] for point in points)
+        self._min_y = min(point[1] for point in points)
+        width = max(point[0] for point in points) - self._min_x
+        height = max(point[1] for point in points) - self._min_y
+
+        # Aim for about one stroke per cell
+        self._cell_size = max(math.sqrt(max(width * height, _EPSILON) / len(remaining)), max(width, height) / len(remaining), _EPSILON)
+        self._columns = int(width / self._cell_size) + 1
+        self._rows = int(height / self._cell_size) + 1
+        self._cells = {}
+        for index in remaining:
+            for reverse, point in ((False, strokes[index].start), (True, strokes[index].end)):
+                self._cells.setdefault(self.__cell(point), []).append((point[0], point[1], index, reverse))
+
+    def __cell(self, point: tuple) -> tuple:
+        column = min(max(int((point[0] - self._min_x) / self._cell_size), 0), self._columns - 1)
+        row = min(max(int((point[1] - self._min_y) / self._cell_size), 0), self._rows - 1)
+        return column, row
+
+    def nearest(self, position: tuple, heading: float, turn_cost: float, candidates: int) -> tuple:
+        # Find the closest end points (searching rings of cells around the turtle until no
+        # closer end point is possible) then pick the one that's cheapest including the turning
+        column, row = self.__cell(position)
+        x, y = position
+        used = self._used
+        found = []
+        max_ring = max(self._columns, self._rows)
+        ring = 0
+        while ring <= max_ring:
+            for cell in self.__ring(column, row, ring):
+                entries = self._cells.get(cell)
+                if not entries:
+                    continue
+                live = [entry for entry in entries if not used[entry[2]]]
+                self._cells[cell] = live
+                for point_x, point_y, index, reverse in live:
+                    found.append(((point_x - x) ** 2 + (point_y - y) ** 2, index, reverse))
+
+            # End points outside this ring are at least this far away
+            if len(found) >= candidates:
+                found.sort()
+                del found[candidates:]
+                if found[-1][0] <= (ring * self._cell_size) ** 2:
+                    break
+            ring += 1
+
+        best, best_cost = None, math.inf
+        for _, index, reverse in found:
+            stroke = self._strokes[index]
+            if reverse:
+                target, target_heading = stroke.end, (stroke.end_heading + 180.0) % 360.0
+            else:
+                target, target_heading = stroke.start, stroke.start_heading
+            distance, turning = _move_cost(position, heading, target, target_heading)
+            cost = distance + turn_cost * turning
+            if cost < best_cost:
+                best, best_cost = (index, reverse), cost
+        return best
+
+    def __ring(self, column: int, row: int, ring: int):
+        if ring == 0:
+            yield column, row
+            return
+        for x in range(column - ring, column + ring + 1):
+            yield x, row - ring
+            yield x, row + ring
+        for y in range(row - ring + 1, row + ring):
+            yield column - ring, y
+            yield column + ring, y
+
+def _order_strokes(strokes: list, position: tuple, heading: float, turn_cost: float, candidates: int = 8) -> list:
+    # Greedy ordering: repeatedly draw the stroke that's cheapest to get to next (of the
+    # strokes with an end point closest to the turtle)
+    used = [False] * len(strokes)
+    grid = _EndPointGrid(strokes, used)
+    ordered = []
+    while len(ordered) < len(strokes):
+        # Rebuild the grid as it empties (so the searches don't cross lots of empty cells)
+        remaining = len(strokes) - len(ordered)
+        if remaining < grid.size // 4:
+            grid = _EndPointGrid(strokes, used)
+
+        index, reverse = grid.nearest(position, heading, turn_cost, candidates)
+        used[index] = True
+        stroke = strokes[index].reversed() if reverse else strokes[index]
+        ordered.append(stroke)
+        position, heading = stroke.end, stroke.end_heading
+    return ordered
+
+class DrawingRecorder(TurtleRecorder):
+    """
+    A turtle that records a drawing (see Drawing) instead of drawing it.
+    Args:
+        floor (bool): True to follow the floor turtle, where towards turns the turtle to face the
+                      point and reset_origin also resets the heading (False for the screen turtle).
+    """
+
+    def __init__(self, floor: bool = True):
+        self._floor = floor
+        self._items = []
+        self._segments = []
+        self._x, self._y = 0.0, 0.0
+        self._heading = 0.0
+        self._pen_down = False
+
+    @property
+    def drawing(self) -> Drawing:
+        """The drawing recorded so far"""
+        self.__end_stroke()
+        return Drawing(list(self._items), (self._x, self._y), self._heading)
+
+    def _record(self, name: str, *args):
+        self.__end_stroke()
+        self._items.append(Command(name, args, (self._x, self._y), self._heading))
+
+    def __end_stroke(self):
+        if self._segments:
+            self._items.append(Stroke(self._segments))
+            self._segments = []
+
+    def __line_to(self, x: float, y: float):
+        # Move in a straight line (the heading is unchanged)
+        if math.dist((self._x, self._y), (x, y)) <= _EPSILON:
+            return
+        if self._pen_down:
+            bearing = _bearing(self._x, self._y, x, y)
+            self._segments.append(Segment((self._x, self._y), bearing, (x, y), bearing))
+        self._x, self._y = x, y
+
+    def forward(self, distance: float):
+        heading = math.radians(self._heading)
+        self.__line_to(self._x + distance * math.cos(heading), self._y + distance * math.sin(heading))
+
+    def backward(self, distance: float):
+        self.forward(-distance)
+
+    def left(self, angle: float):
+        self._heading = (self._heading + angle) % 360.0
+
+    def right(self, angle: float):
+        self.left(-angle)
+
+    def _arc(self, radius: float, extent: float):
+        # The centre is to the left of the turtle (to the right for a negative radius)
+        heading = math.radians(self._heading)
+        centre_x = self._x - radius * math.sin(heading)
+        centre_y = self._y + radius * math.cos(heading)
+        turn = extent if radius >= 0 else -extent
+        turn_radians = math.radians(turn)
+        dx, dy = self._x - centre_x, self._y - centre_y
+        end_x = centre_x + dx * math.cos(turn_radians) - dy * math.sin(turn_radians)
+        end_y = centre_y + dx * math.sin(turn_radians) + dy * math.cos(turn_radians)
+        end_heading = (self._heading + turn) % 360.0
+
+        if self._pen_down and radius != 0 and extent != 0:
+            self._segments.append(Segment((self._x, self._y), self._heading, (end_x, end_y), end_heading, radius, extent))
+        self._x, self._y, self._heading = end_x, end_y, end_heading
+
+    def setheading(self, angle: float):
+        self._heading = angle % 360.0
+
+    def setx(self, x: float):
+        self.setposition(x, self._y)
+
+    def sety(self, y: float):
+        self.setposition(self._x, y)
+
+    def setposition(self, x: float = None, y: float = None):
+        if isinstance(x, tuple) and len(x) == 2 and y is None:
+            x, y = x
+        # Note: The floor turtle turns back to its original heading once it has moved
+        self.__line_to(x, y)
+
+    def towards(self, x: float, y: float):
+        if self._floor and math.dist((self._x, self._y), (x, y)) > _EPSILON:
+            self._heading = _bearing(self._x, self._y, x, y)
+
+    def reset_origin(self):
+        self._record("reset_origin")
+        self._x, self._y = 0.0, 0.0
+        if self._floor:
+            self._heading = 0.0
+
+    def heading(self) -> float:
+        return self._heading
+
+    def position(self) -> tuple[float, float]:
+        return self._x, self._y
+
+    def penup(self):
+        self.__end_stroke()
+        self._pen_down = False
+
+    def pendown(self):
+        self._pen_down = True
+
+    def isdown(self) -> bool:
+        return self._pen_down
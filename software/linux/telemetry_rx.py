@@ -0,0 +1,195 @@
+#************************************************************************
+#
+#   telemetry_rx.py
+#
+#   Telemetry frames received from the robot
+#   Valiant Turtle 2 - Communicator Linux Firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Once enabled (CommandsTx.set_telemetry_interval) the robot notifies a telemetry frame at a
+# regular interval on its own characteristic, so samples don't need a command each (see
+# robot/telemetry.py for the frame layout). The frames are kept in a bounded ring buffer
+# and passed to any sinks (such as a CSV file) as they arrive.
+
+import collections
+import csv
+import logging
+import struct
+import threading
+import time
+
+# The layout of a telemetry frame (see robot/telemetry.py)
+_FRAME_FORMAT = "<IhhHHHHhH"
+_FRAME_LENGTH = struct.calcsize(_FRAME_FORMAT)
+
+# Status flags (stored in the top 4 bits of the heading)
+_FLAG_MOTORS_ENABLED = 0x1000
+_FLAG_MOVING = 0x2000
+_FLAG_PEN_DOWN = 0x4000
+
+class TelemetryFrame:
+    """
+    A telemetry frame from the robot.
+    Attributes:
+        received (float): The host time the frame was received (time.time()).
+        time_ms (int): The robot's time in milliseconds.
+        x_mm, y_mm (int): The position the robot has reached (dead reckoned from its steps whilst moving).
+        heading (float): The heading the robot has reached in degrees.
+        motors_enabled, moving, pen_down (bool): The robot's status.
+        left_steps, right_steps (int): The steps given to each motor (backwards steps are negative).
+        voltage_mV, current_mA, power_mW (int): The INA260 power readings (the current is negative
+                                                when the battery is charging).
+    """
+
+    __slots__ = ("received", "time_ms", "x_mm", "y_mm", "heading", "motors_enabled", "moving", "pen_down",
+                 "left_steps", "right_steps", "voltage_mV", "current_mA", "power_mW")
+
+    # The column names used by sinks such as CsvSink
+    FIELDS = __slots__
+
+    def __init__(self, data: bytes, previous = None, received: float = None):
+        """
+        Decode a frame.
+        Args:
+            data (bytes): The 20 byte frame.
+            previous (TelemetryFrame): The previous frame (the robot sends 16-bit step counters, so
+                                       the full counts are continued from the previous frame).
+            received (float): The time the frame was received (default is now).
+        """
+
+        if len(data) < _FRAME_LENGTH:
+            raise ValueError(f"TelemetryFrame::__init__ - Frame must be {_FRAME_LENGTH} bytes (got {len(data)})")
+
+        (self.time_ms, self.x_mm, self.y_mm, heading_flags, left_steps, right_steps,
+            self.voltage_mV, self.current_mA, self.power_mW) = struct.unpack(_FRAME_FORMAT, data[:_FRAME_LENGTH])
+        self.received = received if received is not None else time.time()
+        self.heading = (heading_flags & 0x0FFF) / 10
+        self.motors_enabled = bool(heading_flags & _FLAG_MOTORS_ENABLED)
+        self.moving = bool(heading_flags & _FLAG_MOVING)
+        self.pen_down = bool(heading_flags & _FLAG_PEN_DOWN)
+
+        if previous is None:
+            # Assume the counts haven't wrapped yet
+            self.left_steps = left_steps - 0x10000 if left_steps >= 0x8000 else left_steps
+            self.right_steps = right_steps - 0x10000 if right_steps >= 0x8000 else right_steps
+        else:
+            self.left_steps = previous.left_steps + self.__wrapped_difference(left_steps, previous.left_steps)
+            self.right_steps = previous.right_steps + self.__wrapped_difference(right_steps, previous.right_steps)
+
+    def __wrapped_difference(self, count: int, previous_count: int) -> int:
+        # The change in a 16-bit counter (assuming it has moved less than half way round)
+        return ((count - previous_count + 0x8000) & 0xFFFF) - 0x8000
+
+    def as_tuple(self) -> tuple:
+        return tuple(getattr(self, field) for field in TelemetryFrame.FIELDS)
+
+    def __repr__(self) -> str:
+        return (f"TelemetryFrame(time_ms={self.time_ms}, pose=({self.x_mm}, {self.y_mm}, {self.heading}), "
+            f"steps=({self.left_steps}, {self.right_steps}), power=({self.voltage_mV}mV, {self.current_mA}mA, {self.power_mW}mW))")
+
+class TelemetryBuffer:
+    """
+    A bounded ring buffer of telemetry frames (once full, the oldest frames are dropped).
+
+    Sinks are called with each frame as it arrives. A sink is any callable taking a
+    TelemetryFrame; it is called from the transport's thread, so it should be quick.
+    """
+
+    def __init__(self, capacity: int = 1000):
+        if capacity < 1:
+            raise ValueError("TelemetryBuffer::__init__ - Capacity must be at least 1")
+        self._frames = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._sinks = []
+        self._latest = None
+        self._dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    @property
+    def capacity(self) -> int:
+        return self._frames.maxlen
+
+    @property
+    def dropped(self) -> int:
+        """The number of frames dropped from the buffer because it was full"""
+        return self._dropped
+
+    @property
+    def latest(self) -> TelemetryFrame:
+        """The most recent frame (None if no frames have been received)"""
+        return self._latest
+
+    def frames(self) -> list:
+        """A copy of the frames in the buffer (oldest first)"""
+        with self._lock:
+            return list(self._frames)
+
+    def clear(self):
+        """Empty the buffer (the step counts still continue from the last frame)"""
+        with self._lock:
+            self._frames.clear()
+
+    def add_sink(self, sink):
+        with self._lock:
+            self._sinks.append(sink)
+
+    def remove_sink(self, sink):
+        with self._lock:
+            self._sinks.remove(sink)
+
+    def receive(self, data: bytes):
+        """Add a frame received from the robot"""
+        try:
+            frame = TelemetryFrame(data, self._latest)
+        except ValueError as e:
+            logging.error(f"TelemetryBuffer::receive - {e}")
+            return
+
+        with self._lock:
+            if len(self._frames) == self._frames.maxlen:
+                self._dropped += 1
+            self._frames.append(frame)
+            self._latest = frame
+            sinks = list(self._sinks)
+
+        for sink in sinks:
+            try:
+                sink(frame)
+            except Exception as e:
+                logging.error(f"TelemetryBuffer::receive - Sink {sink} raised an exception: {e}")
+
+class CsvSink:
+    """A telemetry sink that writes each frame to a CSV file (with a header row)"""
+
+    def __init__(self, path: str):
+        self._file = open(path, mode="w", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(TelemetryFrame.FIELDS)
+
+    def __call__(self, frame: TelemetryFrame):
+        self._writer.writerow(frame.as_tuple())
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,220 @@
+#************************************************************************ 
+#
+#   transport.py
+#
+#   Transport interface (the link between CommandsTx and the robot)
+#   Valiant Turtle 2 - Communicator firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import asyncio
+import logging
+
+# The length of a command or response packet
+PACKET_LENGTH = 20
+
+class Transport:
+    """
+    Base class for the links that carry 20-byte command packets to the robot (central to
+    peripheral, C2P) and response packets back from it (peripheral to central, P2C).
+
+    The transport keeps its connection open between commands (reconnecting if it's lost) and
+    sends everything waiting in the C2P queue together. Received packets (other than NOPs)
+    are passed to the response handler as they arrive or, if there isn't one, added to the
+    P2C queue and the P2C queue event is set.
+
+    Subclasses implement _maintain_connection() and _handle_commands(), which are run by run().
+    Links with a large enough MTU (only BLE at present) can carry a frame of several packets in
+    each write and notification (see _take_c2p_frames() and _receive_frame()).
+    Transports that can carry the robot's telemetry frames and log pass them to _receive_telemetry()
+    and _receive_log() (only BLE does at present).
+    """
+
+    # Human readable name of the transport (used in log messages)
+    name = "transport"
+
+    def __init__(self):
+        # Flag to show connected status
+        self._connected = False
+
+        # Maximum number of elements to store in the queues (note: maximum is 128 since command sequence is 8 bits)
+        # Note: Queue elements are 20 bytes long
+        self._max_queue_elements = 50
+
+        # Transmission queue for sending data to the robot
+        self._c2p_queue = []
+
+        # Reception queue for data received from the robot
+        self._p2c_queue = []
+        self._p2c_queue_event = None
+
+        # Event to wake the command handler (set when data is added to the c2p queue)
+        self._wake_event = None
+
+        # Function called with each response packet received from the robot (instead of queuing it)
+        self._response_handler = None
+
+        # Function called with each telemetry frame received from the robot
+        self._telemetry_handler = None
+
+        # Function called with each chunk of the robot's log received
+        self._log_handler = None
+
+    @property
+    def connected(self) -> bool:
+        return self._connected
+
+    @property
+    def p2c_queue(self) -> list:
+        return self._p2c_queue
+
+    @property
+    def p2c_queue_event(self) -> asyncio.Event:
+        """Set when data is added to the p2c queue (None until the transport is running)"""
+        return self._p2c_queue_event
+
+    def set_response_handler(self, handler):
+        """Set the function called (from the transport's thread) with each response packet received"""
+        self._response_handler = handler
+
+    def set_telemetry_handler(self, handler):
+        """Set the function called (from the transport's thread) with each telemetry frame received"""
+        self._telemetry_handler = handler
+
+    def set_log_handler(self, handler):
+        """Set the function called (from the transport's thread) with each chunk of the robot's log received"""
+        self._log_handler = handler
+
+    def add_to_c2p_queue(self, data):
+        if len(self._c2p_queue) < self._max_queue_elements:
+            self._c2p_queue.append(data)
+            if self._wake_event is not None:
+                self._wake_event.set()
+        else:
+            logging.info(f"Transport::add_to_c2p_queue - C2P queue is full - data not added ({self.name})")
+
+    def disconnect(self):
+        logging.info(f"Transport::disconnect - Disconnecting ({self.name})")
+        self._connected = False
+
+    async def run(self):
+        logging.info(f"Transport::run - Running {self.name} async tasks")
+
+        # Note: The events are created here so they belong to the loop running the transport
+        self._p2c_queue_event = asyncio.Event()
+        self._wake_event = asyncio.Event()
+
+        tasks = [
+            asyncio.create_task(self._maintain_connection()),
+            asyncio.create_task(self._handle_commands()),
+        ]
+        await asyncio.gather(*tasks)
+
+    async def _maintain_connection(self):
+        raise NotImplementedError("Transport::_maintain_connection - Must be implemented by the transport")
+
+    async def _handle_commands(self):
+        raise NotImplementedError("Transport::_handle_commands - Must be implemented by the transport")
+
+    def _take_c2p_batch(self) -> list:
+        # Take everything waiting in the c2p queue (so it can be sent together)
+        batch = self._c2p_queue[:]
+        self._c2p_queue.clear()
+        return batch
+
+    def _take_c2p_frames(self, frame_packets: int) -> list:
+        # Take everything waiting in the c2p queue with up to frame_packets packets in each write
+        # (a frame is the packets padded to full length one after another)
+        batch = self._take_c2p_batch()
+        if frame_packets <= 1:
+            return batch
+        return [b"".join(self._pad_packet(data) for data in batch[index:index + frame_packets])
+            for index in range(0, len(batch), frame_packets)]
+
+    def _pad_packet(self, data) -> bytes:
+        # Commands are only as long as their parameters, but links with fixed size framing
+        # send every packet padded to the full length (the robot ignores the padding)
+        if len(data) > PACKET_LENGTH:
+            raise ValueError(f"Transport::_pad_packet - Packet is longer than {PACKET_LENGTH} bytes")
+        return bytes(data) + bytes(PACKET_LENGTH - len(data))
+
+    def _receive_packet(self, data) -> bool:
+        # Queue a packet received from the robot. Returns False if the packet is invalid
+        if len(data) != PACKET_LENGTH:
+            logging.info(f"Transport::_receive_packet - Received data: {data} - invalid length ({self.name})")
+            return False
+
+        # If the first byte is 0x00, then it is a NOP response
+        if data[0] != 0x00:
+            if self._response_handler is not None:
+                self._response_handler(data)
+            elif len(self._p2c_queue) < self._max_queue_elements:
+                self._p2c_queue.append(data)
+                self._p2c_queue_event.set()
+            else:
+                logging.info(f"Transport::_receive_packet - P2C queue is full - data discarded ({self.name})")
+        return True
+
+    def _receive_frame(self, data) -> bool:
+        # Queue the packets from a frame (a single packet is a frame of one). Returns False if the frame is invalid
+        if len(data) <= PACKET_LENGTH or len(data) % PACKET_LENGTH != 0:
+            return self._receive_packet(data)
+        for offset in range(0, len(data), PACKET_LENGTH):
+            self._receive_packet(data[offset:offset + PACKET_LENGTH])
+        return True
+
+    def _receive_telemetry(self, data):
+        if self._telemetry_handler is not None:
+            self._telemetry_handler(bytes(data))
+
+    def _receive_log(self, data):
+        if self._log_handler is not None:
+            self._log_handler(bytes(data))
+
+    def _clear_queues(self):
+        self._c2p_queue.clear()
+        self._p2c_queue.clear()
+
+def create_transport(specification: str) -> Transport:
+    """
+    Create a transport from a specification string:
+        ble                         BLE (BLEak)
+        serial:<port>[@<baud>]      The communicator's UART (for example serial:/dev/ttyACM0@115200)
+        tcp:<host>:<port>           A TCP bridge or simulator (for example tcp:localhost:8910)
+        unix:<path>                 A Unix socket bridge or simulator
+    """
+
+    kind, _, address = specification.partition(":")
+    if kind == "ble":
+        from ble_central import BleCentral
+        return BleCentral()
+    if kind == "serial":
+        from serial_transport import SerialTransport
+        port, _, baud = address.partition("@")
+        return SerialTransport(port, int(baud)) if baud else SerialTransport(port)
+    if kind == "tcp":
+        from socket_transport import SocketTransport
+        host, _, port = address.rpartition(":")
+        return SocketTransport(host=host or "localhost", port=int(port))
+    if kind == "unix":
+        from socket_transport import SocketTransport
+        return SocketTransport(path=address)
+    raise ValueError(f"create_transport - Unknown transport '{specification}' (must be ble, serial:<port>, tcp:<host>:<port> or unix:<path>)")
@@ -0,0 +1,364 @@
+#************************************************************************
+#
+#   turtle_program.py
+#
+#   Recorded turtle programs and peephole optimisation
+#   Valiant Turtle 2 - Communicator Linux Firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Every command sent to the floor turtle is a BLE round trip and (for a move) a stop and
+# start of the motors, so drawings written for clarity (such as circles drawn as polygons)
+# are slow on the floor.
+#
+# The ProgramRecorder runs a drawing without a robot and records the turtle commands as a
+# program (a list of (name, args) tuples). Peephole passes then remove the commands that make
+# no difference to the drawing and the optimised program is replayed on a real turtle.
+#
+# Programs are recorded from the origin (heading 0), as the robot starts when it is powered
+# on. Where the pose isn't known (for example after towards, which turns the floor turtle
+# but not the screen turtle) the passes leave the commands that depend on it alone.
+
+import math
+from abstract_turtle import TurtleInterface
+from turtle_recorder import TurtleRecorder
+
+# Distances (in mm) and angles (in degrees) smaller than this are zero
+_EPSILON = 1e-6
+
+# Commands that move the turtle along its heading
+_MOVES = ("forward", "backward")
+
+# Commands that turn the turtle on the spot
+_TURNS = ("left", "right", "setheading")
+
+# Commands that lift or lower the pen
+_PEN = ("penup", "pendown")
+
+# Commands whose result depends on the heading they start from
+# Note: reset_origin and towards are included as they change the heading on the floor turtle
+# but not on the screen turtle
+_HEADING_USERS = ("forward", "backward", "circle", "towards", "reset_origin")
+
+def _normalise_angle(angle: float) -> float:
+    # The angle in the range -180 to 180 degrees
+    return (angle + 180.0) % 360.0 - 180.0
+
+def _signed(name: str, args: tuple) -> float:
+    # The distance of a move (or the angle of a turn) with backward and right negative
+    return -args[0] if name in ("backward", "right") else args[0]
+
+class _Pose:
+    # The turtle's pose and pen whilst stepping through a program (None where it isn't known)
+    __slots__ = ("x", "y", "heading", "pen_down")
+
+    def __init__(self):
+        self.x, self.y, self.heading = 0.0, 0.0, 0.0
+        self.pen_down = None
+
+    @property
+    def known(self) -> bool:
+        return self.x is not None and self.y is not None and self.heading is not None
+
+    def apply(self, name: str, args: tuple):
+        if name in _MOVES:
+            if self.known:
+                distance = _signed(name, args)
+                heading = math.radians(self.heading)
+                self.x += distance * math.cos(heading)
+                self.y += distance * math.sin(heading)
+            else:
+                self.x = self.y = None
+        elif name in ("left", "right"):
+            if self.heading is not None:
+                self.heading = (self.heading + _signed(name, args)) % 360.0
+        elif name == "setheading":
+            self.heading = args[0] % 360.0
+        elif name == "circle":
+            self.__arc(*args)
+        elif name == "setposition":
+            self.x, self.y = args
+        elif name == "setx":
+            self.x = args[0]
+        elif name == "sety":
+            self.y = args[0]
+        elif name == "towards":
+            self.heading = None
+        elif name == "reset_origin":
+            self.x, self.y, self.heading = 0.0, 0.0, None
+        elif name in _PEN:
+            self.pen_down = name == "pendown"
+
+    def __arc(self, radius: float, extent: float):
+        # The centre is to the left of the turtle (to the right for a negative radius)
+        turn = extent if radius >= 0 else -extent
+        if self.known:
+            heading = math.radians(self.heading)
+            centre_x = self.x - radius * math.sin(heading)
+            centre_y = self.y + radius * math.cos(heading)
+            turn_radians = math.radians(turn)
+            dx, dy = self.x - centre_x, self.y - centre_y
+            self.x = centre_x + dx * math.cos(turn_radians) - dy * math.sin(turn_radians)
+            self.y = centre_y + dx * math.sin(turn_radians) + dy * math.cos(turn_radians)
+        else:
+            self.x = self.y = None
+        if self.heading is not None:
+            self.heading = (self.heading + turn) % 360.0
+
+def _fold_moves(ops: list, pen_down: bool) -> list:
+    # Merge consecutive moves (a move back over a line that has just been drawn would
+    # change the drawing, so the direction can only change with the pen up)
+    distances = []
+    for name, args in ops:
+        distance = _signed(name, args)
+        if distances and (pen_down is False or distance * distances[-1] >= 0):
+            distances[-1] += distance
+        else:
+            distances.append(distance)
+    return [("forward", (distance,)) if distance > 0 else ("backward", (-distance,))
+            for distance in distances if abs(distance) > _EPSILON]
+
+def _fold_turns(ops: list, heading: float) -> list:
+    # Merge consecutive turns into a single turn (or setheading)
+    absolute = None
+    turn = 0.0
+    for name, args in ops:
+        if name == "setheading":
+            absolute, turn = args[0], 0.0
+        else:
+            turn += _signed(name, args)
+
+    if absolute is not None:
+        target = (absolute + turn) % 360.0
+        if heading is not None and abs(_normalise_angle(target - heading)) <= _EPSILON:
+            return []
+        return [("setheading", (target,))]
+
+    turn = _normalise_angle(turn)
+    if abs(turn) <= _EPSILON:
+        return []
+    return [("left", (turn,))] if turn > 0 else [("right", (-turn,))]
+
+def _does_nothing(name: str, args: tuple, pose: _Pose) -> bool:
+    # True if a command leaves the turtle where it is
+    if name == "circle":
+        return abs(args[1]) <= _EPSILON
+    if name == "setposition":
+        return pose.x is not None and pose.y is not None and math.dist((pose.x, pose.y), args) <= _EPSILON
+    if name == "setx":
+        return pose.x is not None and abs(pose.x - args[0]) <= _EPSILON
+    if name == "sety":
+        return pose.y is not None and abs(pose.y - args[0]) <= _EPSILON
+    return False
+
+def _fold(ops: list) -> list:
+    """Merge runs of moves, turns and pen changes, and drop the commands that do nothing"""
+    result = []
+    pose = _Pose()
+    index = 0
+    while index < len(ops):
+        name, args = ops[index]
+        end = index + 1
+        for group in (_MOVES, _TURNS, _PEN):
+            if name in group:
+                while end < len(ops) and ops[end][0] in group:
+                    end += 1
+                break
+
+        if name in _MOVES:
+            folded = _fold_moves(ops[index:end], pose.pen_down)
+        elif name in _TURNS:
+            folded = _fold_turns(ops[index:end], pose.heading)
+        elif name in _PEN:
+            # Only the last pen change counts
+            folded = [ops[end - 1]]
+            if pose.pen_down == (folded[0][0] == "pendown"):
+                folded = []
+        elif _does_nothing(name, args, pose):
+            folded = []
+        else:
+            folded = [ops[index]]
+
+        for op in folded:
+            pose.apply(*op)
+            result.append(op)
+        index = end
+    return result
+
+def _heading_live_after(ops: list) -> list:
+    # For each command, True if the heading it leaves is used later (the final heading is kept)
+    live_after = [False] * len(ops)
+    live = True
+    for index in range(len(ops) - 1, -1, -1):
+        live_after[index] = live
+        name = ops[index][0]
+        if name == "setheading":
+            live = False
+        elif name in _HEADING_USERS:
+            live = True
+    return live_after
+
+def _drop_dead_turns(ops: list) -> list:
+    """Drop the turns whose heading is set again before anything uses it"""
+    live_after = _heading_live_after(ops)
+    return [op for op, live in zip(ops, live_after) if live or op[0] not in _TURNS]
+
+def _moves_to_goto(ops: list) -> list:
+    """Replace a turn followed by a move with a goto (where the heading isn't used afterwards)"""
+    # Give the turns as headings where the heading is known, so a turn followed by a move and
+    # then another turn leaves a heading that isn't used
+    absolute = []
+    pose = _Pose()
+    for op in ops:
+        if op[0] in ("left", "right") and pose.heading is not None:
+            op = ("setheading", ((pose.heading + _signed(*op)) % 360.0,))
+        absolute.append(op)
+        pose.apply(*op)
+
+    # Note: goto leaves the heading as it was before the turn
+    live_after = _heading_live_after(absolute)
+    result = []
+    pose = _Pose()
+    index = 0
+    while index < len(absolute):
+        name, args = absolute[index]
+        if (name == "setheading" and index + 1 < len(absolute) and absolute[index + 1][0] in _MOVES
+                and not live_after[index + 1] and pose.x is not None and pose.y is not None):
+            distance = _signed(*absolute[index + 1])
+            heading = math.radians(args[0])
+            op = ("setposition", (pose.x + distance * math.cos(heading), pose.y + distance * math.sin(heading)))
+            index += 2
+        else:
+            op = absolute[index]
+            index += 1
+        result.append(op)
+        pose.apply(*op)
+    return result
+
+class TurtleProgram:
+    """
+    A recorded sequence of turtle commands, each a (name, args) tuple such as ("forward", (10,)).
+    """
+
+    def __init__(self, ops: list):
+        self.ops = ops
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def optimised(self, goto: bool = False, max_rounds: int = 8):
+        """
+        The program with the commands that make no difference to the drawing removed.
+        Args:
+            goto (bool): Also replace a turn followed by a move with a goto. This saves a command
+                         but the floor turtle turns back to its heading after a goto, so it is
+                         only worth it when the commands are sent one at a time.
+            max_rounds (int): The maximum number of times to run the passes.
+        Returns:
+            TurtleProgram: The optimised program.
+        """
+
+        passes = [_fold, _drop_dead_turns]
+        if goto:
+            passes += [_moves_to_goto, _fold]
+
+        # Run the passes until they make no more changes
+        ops = self.ops
+        for _ in range(max_rounds):
+            previous = ops
+            for optimisation_pass in passes:
+                ops = optimisation_pass(ops)
+            if ops == previous:
+                break
+        return TurtleProgram(ops)
+
+    def replay(self, t: TurtleInterface):
+        """Give the program's commands to a turtle"""
+        for name, args in self.ops:
+            getattr(t, name)(*args)
+
+class ProgramRecorder(TurtleRecorder):
+    """A turtle that records the commands it is given as a TurtleProgram"""
+
+    def __init__(self):
+        self._ops = []
+        self._pose = _Pose()
+
+    @property
+    def program(self) -> TurtleProgram:
+        """The program recorded so far"""
+        return TurtleProgram(list(self._ops))
+
+    def _record(self, name: str, *args):
+        self._ops.append((name, args))
+        self._pose.apply(name, args)
+
+    def forward(self, distance: float):
+        self._record("forward", distance)
+
+    def backward(self, distance: float):
+        self._record("backward", distance)
+
+    def left(self, angle: float):
+        self._record("left", angle)
+
+    def right(self, angle: float):
+        self._record("right", angle)
+
+    def _arc(self, radius: float, extent: float):
+        self._record("circle", radius, extent)
+
+    def setheading(self, angle: float):
+        self._record("setheading", angle)
+
+    def setx(self, x: float):
+        self._record("setx", x)
+
+    def sety(self, y: float):
+        self._record("sety", y)
+
+    def setposition(self, x: float = None, y: float = None):
+        if isinstance(x, tuple) and len(x) == 2 and y is None:
+            x, y = x
+        self._record("setposition", x, y)
+
+    def towards(self, x: float, y: float):
+        self._record("towards", x, y)
+
+    def reset_origin(self):
+        self._record("reset_origin")
+
+    def penup(self):
+        self._record("penup")
+
+    def pendown(self):
+        self._record("pendown")
+
+    # Queries are answered from the recorded pose (0 where it isn't known)
+
+    def heading(self) -> float:
+        return self._pose.heading or 0.0
+
+    def position(self) -> tuple[float, float]:
+        return self._pose.x or 0.0, self._pose.y or 0.0
+
+    def isdown(self) -> bool:
+        return bool(self._pose.pen_down)
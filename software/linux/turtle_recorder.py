@@ -0,0 +1,122 @@
+#************************************************************************
+#
+#   turtle_recorder.py
+#
+#   Turtle recorder (base class)
+#   Valiant Turtle 2 - Communicator Linux Firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+
+import math
+from abstract_turtle import TurtleInterface
+
+class TurtleRecorder(TurtleInterface):
+    """
+    A turtle that records what it is given instead of drawing it (the base of the DrawingRecorder
+    and the ProgramRecorder). Subclasses record the moves and turns, _arc and _record; circles drawn
+    with steps are given to them as the polygon's moves and turns.
+    """
+
+    def _record(self, name: str, *args):
+        # Record a command that doesn't move the turtle
+        raise NotImplementedError("TurtleRecorder::_record - Must be implemented by the recorder")
+
+    def _arc(self, radius: float, extent: float):
+        # Record a circle (or part of one) drawn without steps
+        raise NotImplementedError("TurtleRecorder::_arc - Must be implemented by the recorder")
+
+    def circle(self, radius: float, extent: float = 360, steps: int = None):
+        if steps is None:
+            self._arc(radius, extent)
+            return
+
+        # A polygon (drawn the same way as turtle.circle)
+        step_angle = extent / steps
+        step_length = 2 * radius * math.sin(math.radians(step_angle / 2))
+        if radius < 0:
+            step_length, step_angle = -step_length, -step_angle
+        self.left(step_angle / 2)
+        for _ in range(steps):
+            self.forward(step_length)
+            self.left(step_angle)
+        self.right(step_angle / 2)
+
+    # Queries that can't be answered without a robot
+
+    def power(self) -> tuple[int, int, int]:
+        return 0, 0, 0
+
+    def get_linear_velocity(self) -> tuple[int, int]:
+        return 0, 0
+
+    def get_rotational_velocity(self) -> tuple[int, int]:
+        return 0, 0
+
+    def get_wheel_diameter_calibration(self) -> int:
+        return 0
+
+    def get_axel_distance_calibration(self) -> int:
+        return 0
+
+    def get_turtle_id(self) -> int:
+        return 0
+
+    # Commands that don't move the turtle (recorded so they are given at the same point in the drawing)
+
+    def connect(self):
+        self._record("connect")
+
+    def disconnect(self):
+        self._record("disconnect")
+
+    def motors(self, state: bool):
+        self._record("motors", state)
+
+    def eyes(self, eye: int, red: int, green: int, blue: int):
+        self._record("eyes", eye, red, green, blue)
+
+    def speed(self, speed):
+        self._record("speed", speed)
+
+    def set_linear_velocity(self, target_speed: int, acceleration: int):
+        self._record("set_linear_velocity", target_speed, acceleration)
+
+    def set_rotational_velocity(self, target_speed: int, acceleration: int):
+        self._record("set_rotational_velocity", target_speed, acceleration)
+
+    def set_wheel_diameter_calibration(self, diameter: int):
+        self._record("set_wheel_diameter_calibration", diameter)
+
+    def set_axel_distance_calibration(self, distance: int):
+        self._record("set_axel_distance_calibration", distance)
+
+    def set_turtle_id(self, turtle_id: int):
+        self._record("set_turtle_id", turtle_id)
+
+    def load_config(self):
+        self._record("load_config")
+
+    def save_config(self):
+        self._record("save_config")
+
+    def reset_config(self):
+        self._record("reset_config")
@@ -27,35 +27,41 @@
 
 import logging
 import time
-import csv
 from commands_tx import CommandsTx
+from telemetry_rx import CsvSink, TelemetryFrame
 import sys
 
+# Interval between the robot's telemetry frames in milliseconds
+_TELEMETRY_INTERVAL_MS = 1000
+
 def battery_discharge_test(commands_tx: CommandsTx):
     """
     Runs a battery discharge test on the robot. The robot will move forward and backward in 50cm increments
-    until the battery is exhausted. The test will record the battery voltage, current and power every 100cm in
-    a CSV file."""
+    until the battery is exhausted. The robot's telemetry (including the battery voltage, current and power)
+    is recorded every second in a CSV file."""
     distance = 0
 
-    # Open CSV file to store the output
-    csv_file = open('vt2_batttest.csv', mode='w', newline='')
-    csv_writer = csv.writer(csv_file)
+    # Record the telemetry frames in a CSV file (and show the power readings as they arrive)
+    csv_sink = CsvSink('vt2_batttest.csv')
+    commands_tx.telemetry.add_sink(csv_sink)
+
+    def print_power(frame: TelemetryFrame):
+        print(f"{frame.time_ms}, {frame.voltage_mV}, {frame.current_mA}, {frame.power_mW}, {frame.left_steps}, {frame.right_steps}")
+    commands_tx.telemetry.add_sink(print_power)
 
     # Motors on
     commands_tx.motors(True)
+    commands_tx.set_telemetry_interval(_TELEMETRY_INTERVAL_MS)
 
-    while True:
-        _, mv, ma, mw = commands_tx.power()
-        current_time_str = time.strftime("%H%M%S", time.localtime()) + f"{int(time.time() * 1000) % 1000:03d}"
-        print(f"{current_time_str}, {mv}, {ma}, {mw}, {distance}")
-        csv_writer.writerow([current_time_str, mv, ma, mw, distance])
-        csv_file.flush()
-
-        commands_tx.forward(500)
-        distance += 5
-        commands_tx.backward(500)
-        distance += 5
+    try:
+        while True:
+            commands_tx.forward(500)
+            distance += 5
+            commands_tx.backward(500)
+            distance += 5
+            logging.info(f"Driven {distance} cm")
+    finally:
+        csv_sink.close()
 
 def main():
     # Configure the logging module
@@ -0,0 +1,138 @@
+#************************************************************************ 
+#
+#   vt2_bridge.py
+#
+#   Bridge from a TCP or Unix socket to the robot
+#   Valiant Turtle 2 - Communicator Linux Firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# The bridge keeps a single link to the robot (BLE by default) open and passes command
+# packets between it and a client connected to a TCP or Unix socket (see socket_transport.py).
+# Clients can come and go without the robot having to reconnect, and several programs (or a
+# program on another machine) can take turns driving the robot.
+
+import asyncio
+import logging
+import argparse
+from transport import Transport, PACKET_LENGTH, create_transport
+
+class Bridge:
+    def __init__(self, transport: Transport):
+        self._transport = transport
+        self._writer = None
+
+    async def serve(self, host: str = None, port: int = None, path: str = None):
+        """Run the robot link and serve clients until cancelled"""
+        if path is not None:
+            server = await asyncio.start_unix_server(self.__handle_client, path)
+        else:
+            server = await asyncio.start_server(self.__handle_client, host, port)
+        logging.info(f"Bridge::serve - Listening on {path if path is not None else f'{host}:{port}'}")
+
+        async with server:
+            await asyncio.gather(self._transport.run(), self.__relay_responses(), server.serve_forever())
+
+    async def __handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Only one client can drive the robot at a time, and only whilst the robot is connected
+        if self._writer is not None or not self._transport.connected:
+            logging.info("Bridge::__handle_client - Client refused (busy or the robot is not connected)")
+            writer.close()
+            return
+
+        logging.info("Bridge::__handle_client - Client connected")
+        self._writer = writer
+        self._transport.p2c_queue.clear()
+        monitor = asyncio.create_task(self.__monitor_robot(writer))
+        try:
+            while True:
+                self._transport.add_to_c2p_queue(await reader.readexactly(PACKET_LENGTH))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logging.info("Bridge::__handle_client - Client disconnected")
+        finally:
+            monitor.cancel()
+            self._writer = None
+            writer.close()
+
+    async def __monitor_robot(self, writer: asyncio.StreamWriter):
+        # Close the client's connection if the robot disconnects (the client will reconnect)
+        while self._transport.connected:
+            await asyncio.sleep(0.25)
+        logging.info("Bridge::__monitor_robot - Robot disconnected - closing the client connection")
+        writer.close()
+
+    async def __relay_responses(self):
+        # Wait for the transport to start
+        while self._transport.p2c_queue_event is None:
+            await asyncio.sleep(0.1)
+
+        while True:
+            await self._transport.p2c_queue_event.wait()
+            self._transport.p2c_queue_event.clear()
+
+            # Send everything waiting in one write (responses without a client are discarded)
+            packets = self._transport.p2c_queue[:]
+            self._transport.p2c_queue.clear()
+            if self._writer is not None and packets:
+                try:
+                    self._writer.write(b"".join(bytes(packet) for packet in packets))
+                    await self._writer.drain()
+                except ConnectionError as e:
+                    logging.info(f"Bridge::__relay_responses - Failed to send responses: {e}")
+
+def main():
+    # Configure the logging module
+    log_format = "[%(asctime)s %(filename)s::%(funcName)s():%(lineno)s]%(levelname)s: %(message)s"
+    logging.basicConfig(level=logging.INFO, format=log_format)
+
+    parser = argparse.ArgumentParser(description="Bridge a TCP or Unix socket to the robot.")
+    parser.add_argument(
+        "-l", "--listen",
+        default="tcp:localhost:8910",
+        help="Where to listen for a client: 'tcp:<host>:<port>' or 'unix:<path>'. Default is 'tcp:localhost:8910'."
+    )
+    parser.add_argument(
+        "-t", "--transport",
+        default="ble",
+        help="Link to the robot: 'ble' or 'serial:<port>[@<baud>]' (via the communicator). Default is 'ble'."
+    )
+    args = parser.parse_args()
+
+    try:
+        bridge = Bridge(create_transport(args.transport))
+    except ValueError as e:
+        print(e)
+        return
+
+    kind, _, address = args.listen.partition(":")
+    try:
+        if kind == "unix":
+            asyncio.run(bridge.serve(path=address))
+        elif kind == "tcp":
+            host, _, port = address.rpartition(":")
+            asyncio.run(bridge.serve(host=host or "localhost", port=int(port)))
+        else:
+            print("Unsupported listen address. Please use 'tcp:<host>:<port>' or 'unix:<path>'.")
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
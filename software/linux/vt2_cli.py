@@ -31,6 +31,13 @@ import sys
 import time
 import cmd
 
+def print_pose(x: float, y: float, heading: float):
+    # The pose is None when the move was accepted into the robot's motion queue (see motion_queue)
+    if x is None:
+        print("Queued.")
+    else:
+        print(f"X={x} mm, Y={y} mm, Heading={heading} degrees")
+
 class ValiantTurtleCLI(cmd.Cmd):
     intro = 'Welcome to the Valiant Turtle 2 CLI. Type help or ? to list commands.\n'
     prompt = 'VT2> '
@@ -96,7 +103,7 @@ class ValiantTurtleCLI(cmd.Cmd):
                 if distance != 0:
                     success, x, y, heading = self._commands_tx.forward(distance)
                     if success:
-                        print(f"X={x} mm, Y={y} mm, Heading={heading} degrees")
+                        print_pose(x, y, heading)
                     else:
                         print("Failed to move forward.")
                 else:
@@ -115,7 +122,7 @@ class ValiantTurtleCLI(cmd.Cmd):
                 if distance != 0:
                     success, x, y, heading = self._commands_tx.backward(distance)
                     if success:
-                        print(f"X={x} mm, Y={y} mm, Heading={heading} degrees")
+                        print_pose(x, y, heading)
                     else:
                         print("Failed to move backward.")
                 else:
@@ -134,7 +141,7 @@ class ValiantTurtleCLI(cmd.Cmd):
                 if degrees != 0:
                     success, x, y, heading = self._commands_tx.left(degrees)
                     if success:
-                        print(f"X={x} mm, Y={y} mm, Heading={heading} degrees")
+                        print_pose(x, y, heading)
                     else:
                         print("Failed to turn left.")
                 else:
@@ -153,7 +160,7 @@ class ValiantTurtleCLI(cmd.Cmd):
                 if degrees != 0:
                     success, x, y, heading = self._commands_tx.right(degrees)
                     if success:
-                        print(f"X={x} mm, Y={y} mm, Heading={heading} degrees")
+                        print_pose(x, y, heading)
                     else:
                         print("Failed to turn right.")
                 else:
@@ -172,7 +179,7 @@ class ValiantTurtleCLI(cmd.Cmd):
                 if radius != 0 and extent_degrees != 0:
                     success, x, y, heading = self._commands_tx.circle(radius, extent_degrees)
                     if success:
-                        print(f"X={x} mm, Y={y} mm, Heading={heading} degrees")
+                        print_pose(x, y, heading)
                     else:
                         print("Failed to move in a circle.")
                 else:
@@ -202,7 +209,7 @@ class ValiantTurtleCLI(cmd.Cmd):
                 x_mm = float(arg)
                 success, x, y, heading = self._commands_tx.setx(x_mm)
                 if success:
-                    print(f"X={x} mm, Y={y} mm, Heading={heading} degrees")
+                    print_pose(x, y, heading)
                 else:
                     print("Failed to set X position.")
             except ValueError:
@@ -218,7 +225,7 @@ class ValiantTurtleCLI(cmd.Cmd):
                 y_mm = float(arg)
                 success, x, y, heading = self._commands_tx.sety(y_mm)
                 if success:
-                    print(f"X={x} mm, Y={y} mm, Heading={heading} degrees")
+                    print_pose(x, y, heading)
                 else:
                     print("Failed to set Y position.")
             except ValueError:
@@ -234,7 +241,7 @@ class ValiantTurtleCLI(cmd.Cmd):
                 x_mm, y_mm = map(float, arg.split())
                 success, x, y, heading = self._commands_tx.setposition(x_mm, y_mm)
                 if success:
-                    print(f"X={x} mm, Y={y} mm, Heading={heading} degrees")
+                    print_pose(x, y, heading)
                 else:
                     print("Failed to set position.")
             except ValueError:
@@ -250,7 +257,7 @@ class ValiantTurtleCLI(cmd.Cmd):
                 x_mm, y_mm = map(float, arg.split())
                 success, x, y, heading = self._commands_tx.towards(x_mm, y_mm)
                 if success:
-                    print(f"X={x} mm, Y={y} mm, Heading={heading} degrees")
+                    print_pose(x, y, heading)
                 else:
                     print("Failed to move towards position.")
             except ValueError:
@@ -353,25 +360,29 @@ class ValiantTurtleCLI(cmd.Cmd):
             print("Not connected to BLE device.")
 
     def do_set_linear_velocity(self, arg):
-        'Set the linear velocity: set_linear_velocity [target_speed] [acceleration]'
+        'Set the linear velocity: set_linear_velocity [target_speed] [acceleration] [jerk (optional, 0 = trapezoidal profile)]'
         if self._connected:
             try:
-                target_speed, acceleration = map(int, arg.split())
-                self._commands_tx.set_linear_velocity(target_speed, acceleration)
+                values = list(map(int, arg.split()))
+                if len(values) not in (2, 3):
+                    raise ValueError
+                self._commands_tx.set_linear_velocity(*values)
             except ValueError:
-                print("Invalid arguments. Please enter two integer values.")
+                print("Invalid arguments. Please enter two or three integer values.")
             logging.info("CLI: Set Linear Velocity")
         else:
             print("Not connected to BLE device.")
 
     def do_set_rotational_velocity(self, arg):
-        'Set the rotational velocity: set_rotational_velocity [target_speed] [acceleration]'
+        'Set the rotational velocity: set_rotational_velocity [target_speed] [acceleration] [jerk (optional, 0 = trapezoidal profile)]'
         if self._connected:
             try:
-                target_speed, acceleration = map(int, arg.split())
-                self._commands_tx.set_rotational_velocity(target_speed, acceleration)
+                values = list(map(int, arg.split()))
+                if len(values) not in (2, 3):
+                    raise ValueError
+                self._commands_tx.set_rotational_velocity(*values)
             except ValueError:
-                print("Invalid arguments. Please enter two integer values.")
+                print("Invalid arguments. Please enter two or three integer values.")
             logging.info("CLI: Set Rotational Velocity")
         else:
             print("Not connected to BLE device.")
@@ -379,9 +390,9 @@ class ValiantTurtleCLI(cmd.Cmd):
     def do_get_linear_velocity(self, arg):
         'Get the linear velocity: get_linear_velocity'
         if self._connected:
-            success, speed, acceleration = self._commands_tx.get_linear_velocity()
+            success, speed, acceleration, jerk = self._commands_tx.get_linear_velocity()
             if success:
-                print(f"Linear velocity: Speed={speed}, Acceleration={acceleration}")
+                print(f"Linear velocity: Speed={speed}, Acceleration={acceleration}, Jerk={jerk}")
             else:
                 print("Failed to get linear velocity.")
             logging.info("CLI: Get Linear Velocity")
@@ -391,9 +402,9 @@ class ValiantTurtleCLI(cmd.Cmd):
     def do_get_rotational_velocity(self, arg):
         'Get the rotational velocity: get_rotational_velocity'
         if self._connected:
-            success, speed, acceleration = self._commands_tx.get_rotational_velocity()
+            success, speed, acceleration, jerk = self._commands_tx.get_rotational_velocity()
             if success:
-                print(f"Rotational velocity: Speed={speed}, Acceleration={acceleration}")
+                print(f"Rotational velocity: Speed={speed}, Acceleration={acceleration}, Jerk={jerk}")
             else:
                 print("Failed to get rotational velocity.")
             logging.info("CLI: Get Rotational Velocity")
@@ -499,6 +510,19 @@ class ValiantTurtleCLI(cmd.Cmd):
         else:
             print("Not connected to BLE device.")
 
+    def do_motion_queue(self, arg):
+        'Turn the robot motion queue on or off: motion_queue [on|off]'
+        if self._connected:
+            if arg == "on":
+                self._commands_tx.motion_queue(True)
+            elif arg == "off":
+                self._commands_tx.motion_queue(False)
+            else:
+                print("Invalid argument. Please enter 'on' or 'off'.")
+            logging.info("CLI: Motion Queue")
+        else:
+            print("Not connected to BLE device.")
+
 def main():
     # Configure the logging module
     log_format = "[%(asctime)s %(filename)s::%(funcName)s():%(lineno)s]%(levelname)s: %(message)s"
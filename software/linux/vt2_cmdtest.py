@@ -87,18 +87,18 @@ def command_test(commands_tx: CommandsTx):
     commands_tx.set_linear_velocity(400, 8)
     commands_tx.set_rotational_velocity(400, 8)
 
-    _, target_speed, acceleration = commands_tx.get_linear_velocity()
-    print(f"Linear velocity: {target_speed}, {acceleration}")
-    _, target_speed, acceleration = commands_tx.get_rotational_velocity()
-    print(f"Rotational velocity: {target_speed}, {acceleration}")
+    _, target_speed, acceleration, jerk = commands_tx.get_linear_velocity()
+    print(f"Linear velocity: {target_speed}, {acceleration}, {jerk}")
+    _, target_speed, acceleration, jerk = commands_tx.get_rotational_velocity()
+    print(f"Rotational velocity: {target_speed}, {acceleration}, {jerk}")
 
     commands_tx.set_linear_velocity(200, 4)
     commands_tx.set_rotational_velocity(200, 4)
 
-    _, target_speed, acceleration = commands_tx.get_linear_velocity()
-    print(f"Linear velocity: {target_speed}, {acceleration}")
-    _, target_speed, acceleration = commands_tx.get_rotational_velocity()
-    print(f"Rotational velocity: {target_speed}, {acceleration}")
+    _, target_speed, acceleration, jerk = commands_tx.get_linear_velocity()
+    print(f"Linear velocity: {target_speed}, {acceleration}, {jerk}")
+    _, target_speed, acceleration, jerk = commands_tx.get_rotational_velocity()
+    print(f"Rotational velocity: {target_speed}, {acceleration}, {jerk}")
 
     # Calibration test
     commands_tx.set_wheel_diameter_calibration(1234)
@@ -31,9 +31,12 @@ from abstract_turtle import TurtleInterface
 from floor_turtle import FloorTurtle
 from screen_turtle import ScreenTurtle
 from commands_tx import CommandsTx
+from transport import create_transport
 from cat import Cat
 from logotype import Logotype
 from calitest import Calitest1, Calitest2
+from stroke_optimizer import DrawingRecorder
+from turtle_program import ProgramRecorder
 
 def main():
      # Configure the logging module
@@ -61,10 +64,34 @@ def main():
         default=6,
         help="Choose the speed of the turtle (0-9). Default is 6."
     )
+    parser.add_argument(
+        "-w", "--window",
+        type=int,
+        choices=range(1, 33),
+        default=1,
+        metavar="{1-32}",
+        help="Number of commands that can be sent to the floor turtle before waiting for a response (1-32). Default is 1."
+    )
+    parser.add_argument(
+        "-t", "--transport",
+        default="ble",
+        help="Link to the floor turtle: 'ble', 'serial:<port>[@<baud>]' (via the communicator), 'tcp:<host>:<port>' or 'unix:<path>' (via vt2_bridge). Default is 'ble'."
+    )
+    parser.add_argument(
+        "-o", "--optimise",
+        action="store_true",
+        help="Reorder the drawing's strokes to reduce the pen-up travel before drawing it."
+    )
+    parser.add_argument(
+        "-c", "--compact",
+        action="store_true",
+        help="Remove the commands that make no difference to the drawing (such as turns that are undone) before drawing it. With a window of 1 turns followed by moves are also replaced by gotos."
+    )
     args = parser.parse_args()
     mode = args.mode
     drawing = args.drawing
     speed = args.speed
+    window = args.window
 
     # Range check for speed
     if speed < 0 or speed > 9:
@@ -74,32 +101,61 @@ def main():
     if mode == "screen":
         turtle_object = ScreenTurtle()
     elif mode == "floor":
-        commands_tx = CommandsTx()
+        try:
+            transport = create_transport(args.transport)
+        except ValueError as e:
+            print(e)
+            return
+        commands_tx = CommandsTx(window_size=window, transport=transport)
         turtle_object = FloorTurtle(commands_tx)
     else:
         print("Unsupported mode. Please choose 'screen' or 'floor'.")
         return
 
+    # When optimising or compacting, the drawing is recorded first and then given to the turtle
+    output = turtle_object
+    if args.compact:
+        program_recorder = ProgramRecorder()
+        output = program_recorder
+    target = output
+    if args.optimise:
+        recorder = DrawingRecorder(floor=(mode == "floor"))
+        target = recorder
+
     if drawing == "cat":
         # Draw the cat
-        cat = Cat(turtle_object, speed)
+        cat = Cat(target, speed)
         cat.render()
     elif drawing == "logotype":
         # Draw the Valiant Turtle 2 logo
-        logotype = Logotype(turtle_object, speed)
+        logotype = Logotype(target, speed)
         logotype.render()
     elif drawing == "calitest1":
         # Draw the calitest
-        calitest1 = Calitest1(turtle_object, speed)
+        calitest1 = Calitest1(target, speed)
         calitest1.render()
     elif drawing == "calitest2":
         # Draw the calitest
-        calitest2 = Calitest2(turtle_object, speed)
+        calitest2 = Calitest2(target, speed)
         calitest2.render()
     else:
         print("Unsupported drawing. Please choose 'cat' or 'logotype'.")
         return
 
+    if args.optimise:
+        original = recorder.drawing
+        optimised = original.optimised()
+        print("Pen-up travel %.0f mm and %.0f degrees of turning (was %.0f mm and %.0f degrees)" % (optimised.travel() + original.travel()))
+        optimised.render(output)
+
+    if args.compact:
+        program = program_recorder.program
+        # A goto saves a round trip for each turn and move it replaces, but the floor turtle turns
+        # back to its heading afterwards, so it's only worth it when the commands are sent one at a time
+        compacted = program.optimised(goto=(window == 1))
+        print(f"Drawing with {len(compacted)} commands (was {len(program)})")
+        compacted.replay(turtle_object)
+
     # If we are in screen mode, run the main loop to keep the window open
     if mode == "screen":
         turtle_object.screen.mainloop()
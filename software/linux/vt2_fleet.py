@@ -0,0 +1,106 @@
+#************************************************************************ 
+#
+#   vt2_fleet.py
+#
+#   Fleet demonstration (several robots drawing at once)
+#   Valiant Turtle 2 - Communicator Linux Firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import asyncio
+import logging
+import argparse
+from fleet import Fleet, FleetRobot
+from transport import create_transport
+
+async def draw_polygon(robot: FleetRobot):
+    # Each robot draws a polygon with a side for each turtle ID (plus 3)
+    sides = robot.turtle_id + 3
+    await robot.motors(True)
+    await robot.pendown()
+    for _ in range(sides):
+        await robot.forward(100)
+        await robot.left(360 / sides)
+    await robot.penup()
+    await robot.flush()
+    return await robot.position()
+
+async def run(robots: list, window: int, timeout: float):
+    async with Fleet(window_size=window) as fleet:
+        if robots:
+            for turtle_id, transport in robots:
+                fleet.add(turtle_id, transport)
+        else:
+            found = await fleet.discover()
+            print(f"Found turtles {found}")
+            if not found:
+                return
+
+        if not await fleet.wait_connected(timeout):
+            print("Not every robot connected")
+            return
+
+        results = await fleet.drive(draw_polygon)
+        for turtle_id, result in sorted(results.items()):
+            print(f"Turtle {turtle_id}: {result}")
+
+def main():
+    # Configure the logging module
+    log_format = "[%(asctime)s %(filename)s::%(funcName)s():%(lineno)s]%(levelname)s: %(message)s"
+    logging.basicConfig(level=logging.INFO, format=log_format, filename="vt2_fleet.log")
+
+    parser = argparse.ArgumentParser(description="Draw with several robots at once.")
+    parser.add_argument(
+        "-r", "--robot",
+        action="append",
+        default=[],
+        metavar="ID=TRANSPORT",
+        help="A robot to drive and its link, for example '2=tcp:localhost:8910' (can be repeated). Default is to scan for robots using BLE."
+    )
+    parser.add_argument(
+        "-w", "--window",
+        type=int,
+        choices=range(1, 33),
+        default=4,
+        metavar="{1-32}",
+        help="Number of commands that can be sent to each robot before waiting for a response (1-32). Default is 4."
+    )
+    parser.add_argument(
+        "-c", "--connect-timeout",
+        type=float,
+        default=30.0,
+        help="How long to wait for the robots to connect in seconds. Default is 30."
+    )
+    args = parser.parse_args()
+
+    robots = []
+    try:
+        for robot in args.robot:
+            turtle_id, _, transport = robot.partition("=")
+            robots.append((int(turtle_id), create_transport(transport) if transport else None))
+    except ValueError as e:
+        print(e)
+        return
+
+    asyncio.run(run(robots, args.window, args.connect_timeout))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+#************************************************************************
+#
+#   codegen.py
+#
+#   Generates the command protocol codecs from the schema
+#   Valiant Turtle 2 - Protocol
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import argparse
+import os
+import struct
+import sys
+import schema
+
+_SOFTWARE_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_HEADER = """#************************************************************************
+#
+#   {file_name}
+#
+#   {description}
+#   Valiant Turtle 2 - {project}
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Generated from software/protocol/schema.py by software/protocol/codegen.py - do not edit
+"""
+
+def format_of(fields: tuple) -> str:
+    """The struct format (without the byte order) of a list of fields"""
+    return "".join(schema.TYPES[field[1]] for field in fields)
+
+def validate():
+    """Check the schema for mistakes that would break the protocol"""
+    command_ids = set()
+    names = set()
+    for command in schema.COMMANDS:
+        if not 0 < command.command_id < 256:
+            raise ValueError(f"codegen::validate - Command ID {command.command_id} of '{command.name}' must be 1 to 255")
+        if command.command_id in command_ids:
+            raise ValueError(f"codegen::validate - Command ID {command.command_id} of '{command.name}' is used more than once")
+        if command.name in names:
+            raise ValueError(f"codegen::validate - Command name '{command.name}' is used more than once")
+        command_ids.add(command.command_id)
+        names.add(command.name)
+
+        for field in command.parameters + command.response:
+            if field[1] not in schema.TYPES:
+                raise ValueError(f"codegen::validate - Field '{field[0]}' of '{command.name}' has an unknown type '{field[1]}'")
+
+        # Parameters with a default value must come last
+        defaults = [len(parameter) > 2 for parameter in command.parameters]
+        if defaults != sorted(defaults):
+            raise ValueError(f"codegen::validate - Parameters of '{command.name}' without a default follow one with a default")
+
+        # The command has the sequence number and command ID in front, the response has the sequence
+        # number in front and the response type in the last byte
+        if struct.calcsize("<BB" + format_of(command.parameters)) > schema.PACKET_LENGTH:
+            raise ValueError(f"codegen::validate - Parameters of '{command.name}' don't fit in a packet")
+        if struct.calcsize("<B" + format_of(command.response)) > schema.RESPONSE_TYPE_OFFSET:
+            raise ValueError(f"codegen::validate - Response of '{command.name}' doesn't fit in a packet")
+
+        if command.planned and not command.deferred:
+            raise ValueError(f"codegen::validate - Planned command '{command.name}' must also be deferred")
+        if command.query and (command.deferred or not command.response):
+            raise ValueError(f"codegen::validate - Query '{command.name}' must have a response and can't be deferred")
+
+def _constants(micropython: bool) -> list:
+    # Constants shared by all of the codecs
+    def constant(name: str, value: int, comment: str = None) -> str:
+        line = f"{name} = const({value})" if micropython else f"{name} = {value}"
+        return line + (f" # {comment}" if comment else "")
+
+    lines = [
+        "# The length of every packet",
+        constant("PACKET_LENGTH", schema.PACKET_LENGTH),
+        "",
+        "# Response types (stored in the last byte of the response)",
+        constant("RESPONSE_TYPE_OFFSET", schema.RESPONSE_TYPE_OFFSET),
+    ]
+    for name, value in schema.RESPONSE_TYPES:
+        lines.append(constant(f"RESPONSE_{name}", f"0x{value:02X}"))
+
+    lines += ["", "# Command IDs"]
+    for command in schema.COMMANDS:
+        lines.append(constant(command.name.upper(), command.command_id))
+    lines.append(constant("COMMAND_COUNT", max(command.command_id for command in schema.COMMANDS) + 1,
+        "The highest command ID + 1"))
+
+    deferred = ", ".join(str(command.command_id) for command in schema.COMMANDS if command.deferred)
+    planned = ", ".join(str(command.command_id) for command in schema.COMMANDS if command.planned)
+    queries = ", ".join(str(command.command_id) for command in schema.COMMANDS if command.query)
+    lines += [
+        "",
+        "# Commands that are acknowledged as soon as they are queued (when the motion queue",
+        "# is enabled) and then report completion once they have been executed",
+        f"DEFERRED_COMMANDS = ({deferred})",
+        "",
+        "# Commands that are given to the motion planner (so the following moves can be planned",
+        "# whilst they are executing)",
+        f"PLANNED_COMMANDS = ({planned})",
+        "",
+        "# Commands that only read the robot's state (answered straight away, even with moves queued)",
+        f"QUERY_COMMANDS = ({queries})",
+        "",
+    ]
+    return lines
+
+def _by_command_id(value, named: bool = True) -> list:
+    # The entries of a tuple indexed by command ID (entries without a command are None)
+    commands = {command.command_id: command for command in schema.COMMANDS}
+    lines = []
+    for command_id in range(max(commands) + 1):
+        command = commands.get(command_id)
+        if command is None:
+            lines.append(f"    None,")
+        else:
+            comment = f"{command_id} = {command.name}" if named else f"{command_id}"
+            lines.append(f"    {value(command)}, # {comment}")
+    return lines
+
+def generate_peripheral() -> str:
+    """The robot's codec (MicroPython) - the parameter and response formats indexed by command ID"""
+    lines = ["", "from micropython import const", ""]
+    lines += _constants(micropython=True)
+
+    def parameter_format(command):
+        return repr("<" + format_of(command.parameters)) if command.parameters else "None"
+
+    def response_format(command):
+        return repr("<" + format_of(command.response)) if command.response else "None"
+
+    lines += [
+        "# Formats of the parameters (which follow the command ID) indexed by command ID (None = no parameters)",
+        "PARAMETER_FORMATS = (",
+    ] + _by_command_id(parameter_format) + [
+        ")",
+        "",
+        "# Formats of the results (which follow the sequence number) indexed by command ID (None = no result)",
+        "RESPONSE_FORMATS = (",
+    ] + _by_command_id(response_format) + [
+        ")",
+        "",
+        "# Formats of the motion queue's responses (which follow the sequence number)",
+        f"ACCEPTED_FORMAT = {'<' + format_of(schema.ACCEPTED)!r} # {', '.join(field[0] for field in schema.ACCEPTED)}",
+        f"COMPLETED_FORMAT = {'<' + format_of(schema.COMPLETED)!r} # {', '.join(field[0] for field in schema.COMPLETED)}",
+        "",
+    ]
+    return "\n".join(lines)
+
+def generate_central(micropython: bool) -> str:
+    """
+    Central's codec - an encode function for each command and a decode function for each result.
+    On CPython the formats are compiled to struct.Struct objects once and the decoders are the Structs'
+    own unpack_from methods. MicroPython doesn't have Struct objects so the formats are kept as strings.
+    """
+    lines = [""]
+    lines += ["import struct", "from micropython import const", ""] if micropython else ["import struct", ""]
+    lines += _constants(micropython)
+
+    lines += [
+        "# The command names indexed by command ID",
+        "NAMES = (",
+    ] + _by_command_id(lambda command: repr(command.name), named=False) + [
+        ")",
+        "",
+    ]
+
+    def decoder(name: str, fields: tuple, comment: str) -> list:
+        # The decoders return the fields that follow the sequence number
+        names = ", ".join(field[0] for field in fields)
+        if micropython:
+            return [
+                f"def decode_{name}(response: bytes) -> tuple:",
+                f"    # {comment} - {names}",
+                f"    return struct.unpack_from({'<' + format_of(fields)!r}, response, 1)",
+                "",
+            ]
+        return [
+            f"# {comment} - {names}",
+            f"decode_{name} = struct.Struct({'<x' + format_of(fields)!r}).unpack_from",
+            "",
+        ]
+
+    lines += ["# Motion queue responses", ""]
+    lines += decoder("accepted", schema.ACCEPTED, "Command accepted into the motion queue")
+    lines += decoder("completed", schema.COMPLETED, "Queued command completed")
+
+    lines += ["# Commands", ""]
+    for command in schema.COMMANDS:
+        arguments = ["seq: int"]
+        for parameter in command.parameters:
+            python_type = "float" if parameter[1] == "float" else "bool" if parameter[1] == "bool" else "int"
+            argument = f"{parameter[0]}: {python_type}"
+            if len(parameter) > 2:
+                argument += f" = {parameter[2]!r}"
+            arguments.append(argument)
+        values = ", ".join(["seq", str(command.command_id)] + [parameter[0] for parameter in command.parameters])
+        command_format = "<BB" + format_of(command.parameters)
+
+        if micropython:
+            lines += [
+                f"def encode_{command.name}({', '.join(arguments)}) -> bytes:",
+                f"    return struct.pack({command_format!r}, {values})",
+                "",
+            ]
+        else:
+            lines += [
+                f"_{command.name.upper()} = struct.Struct({command_format!r})",
+                f"def encode_{command.name}({', '.join(arguments)}) -> bytes:",
+                f"    return _{command.name.upper()}.pack({values})",
+                "",
+            ]
+        if command.response:
+            lines += decoder(command.name, command.response, f"Result of {command.name}")
+
+    # The Linux host sends every command through one function, so it also gets the codecs (and the
+    # types of the results) indexed by command ID
+    if not micropython:
+        def encoder_name(command):
+            return f"encode_{command.name}"
+
+        def decoder_name(command):
+            return f"decode_{command.name}" if command.response else "None"
+
+        def result_defaults(command):
+            defaults = ", ".join({"float": "0.0", "bool": "False"}.get(field[1], "0") for field in command.response)
+            return f"({defaults},)" if len(command.response) == 1 else f"({defaults})"
+
+        lines += [
+            "# The encode functions indexed by command ID",
+            "ENCODERS = (",
+        ] + _by_command_id(encoder_name) + [
+            ")",
+            "",
+            "# The decode functions indexed by command ID (None = no result)",
+            "DECODERS = (",
+        ] + _by_command_id(decoder_name) + [
+            ")",
+            "",
+            "# The zero value of each field of the result indexed by command ID (the types of the results)",
+            "RESULT_DEFAULTS = (",
+        ] + _by_command_id(result_defaults) + [
+            ")",
+            "",
+        ]
+
+    return "\n".join(lines)
+
+# The generated codecs (path relative to the software directory, description, project and generator)
+OUTPUTS = (
+    ("robot/protocol_peripheral.py", "Command protocol codec (peripheral)", "Robot firmware", generate_peripheral),
+    ("linux/protocol_central.py", "Command protocol codec (central)", "Linux host", lambda: generate_central(False)),
+    ("communicator/protocol_central.py", "Command protocol codec (central)", "Communicator firmware", lambda: generate_central(True)),
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the command protocol codecs from the schema.")
+    parser.add_argument("-c", "--check", action="store_true",
+        help="Check that the generated codecs are up to date (without writing them).")
+    args = parser.parse_args()
+
+    validate()
+
+    out_of_date = []
+    for path, description, project, generate in OUTPUTS:
+        file_name = os.path.basename(path)
+        source = _HEADER.format(file_name=file_name, description=description, project=project) + generate()
+        full_path = os.path.join(_SOFTWARE_PATH, path)
+
+        current = None
+        if os.path.exists(full_path):
+            with open(full_path, "r") as file:
+                current = file.read()
+        if current == source:
+            continue
+
+        out_of_date.append(path)
+        if not args.check:
+            with open(full_path, "w") as file:
+                file.write(source)
+            print(f"Generated {path}")
+
+    if args.check and out_of_date:
+        print(f"Out of date: {', '.join(out_of_date)} (run codegen.py)")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#************************************************************************
+#
+#   schema.py
+#
+#   Command protocol definition
+#   Valiant Turtle 2 - Protocol
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# This is the only place the command protocol between central (the linux host or the
+# communicator) and the robot is defined. The codecs used by the robot, the linux host and
+# the communicator are generated from it by codegen.py - after changing anything here run:
+#
+#   python codegen.py
+#
+# Every packet is 20 bytes (the robot pads shorter packets from central with zeros, so a parameter
+# added to the end of a command is 0 when an older central sends it). A command is
+# the sequence number (uint8), the command ID (uint8) and then the parameters. A response is the
+# sequence number (uint8), the result and then (in the last byte) the response type.
+#
+# All values are little-endian.
+
+# Field types and their struct format characters
+TYPES = {
+    "bool": "B",
+    "uint8": "B",
+    "uint16": "H",
+    "int32": "i",
+    "float": "f",
+}
+
+PACKET_LENGTH = 20
+
+# Response types (stored in the last byte of the response)
+RESPONSE_TYPE_OFFSET = 19
+RESPONSE_TYPES = (
+    ("RESULT", 0x00),       # The command has been executed (the response holds the result)
+    ("ACCEPTED", 0x01),     # The command has been added to the motion queue
+    ("COMPLETED", 0x02),    # A queued command has been executed (the response holds the pose)
+)
+
+# Response layouts (the fields following the sequence number)
+POSE = (("x_mm", "float"), ("y_mm", "float"), ("heading_degrees", "float"))
+VELOCITY = (("max_speed", "int32"), ("acceleration", "int32"), ("jerk", "int32"))
+
+# The layouts of the motion queue's responses
+ACCEPTED = (("slot", "uint8"), ("depth", "uint8"))
+COMPLETED = POSE
+
+class Command:
+    """
+    A command sent from central to the robot.
+
+    Attributes
+    ----------
+    command_id : int
+        The command ID (the second byte of the command).
+    name : str
+        The name of the command (used for the generated constants and functions).
+    parameters : tuple
+        (name, type) or (name, type, default) for each parameter.
+    response : tuple
+        (name, type) for each field of the response.
+    deferred : bool
+        The command is acknowledged as soon as it's added to the robot's motion queue and then reports
+        completion once it has been executed.
+    planned : bool
+        The command is given to the motion planner (so the following moves can be planned whilst it executes).
+    query : bool
+        The command only reads the robot's state, so the robot answers it straight away (rather than
+        after the commands waiting in its motion queue).
+    """
+
+    def __init__(self, command_id: int, name: str, parameters: tuple = (), response: tuple = (),
+                 deferred: bool = False, planned: bool = False, query: bool = False):
+        self.command_id = command_id
+        self.name = name
+        self.parameters = parameters
+        self.response = response
+        self.deferred = deferred
+        self.planned = planned
+        self.query = query
+
+COMMANDS = (
+    Command(1, "motors", (("enable", "bool"),)),
+    Command(2, "forward", (("distance_mm", "float"),), POSE, deferred=True, planned=True),
+    Command(3, "backward", (("distance_mm", "float"),), POSE, deferred=True, planned=True),
+    Command(4, "left", (("angle_degrees", "float"),), POSE, deferred=True, planned=True),
+    Command(5, "right", (("angle_degrees", "float"),), POSE, deferred=True, planned=True),
+    Command(6, "circle", (("radius_mm", "float"), ("extent_degrees", "float")), POSE, deferred=True, planned=True),
+    Command(7, "setheading", (("heading_degrees", "float"),), deferred=True, planned=True),
+    Command(8, "setx", (("x_mm", "float"),), POSE, deferred=True, planned=True),
+    Command(9, "sety", (("y_mm", "float"),), POSE, deferred=True, planned=True),
+    Command(10, "setposition", (("x_mm", "float"), ("y_mm", "float")), POSE, deferred=True, planned=True),
+    Command(11, "towards", (("x_mm", "float"), ("y_mm", "float")), POSE, deferred=True, planned=True),
+    Command(12, "reset_origin", deferred=True),
+    Command(13, "heading", response=(("heading_degrees", "float"),), query=True),
+    Command(14, "position", response=(("x_mm", "float"), ("y_mm", "float")), query=True),
+    Command(15, "penup", deferred=True),
+    Command(16, "pendown", deferred=True),
+    Command(17, "eyes", (("eye_id", "uint8"), ("red", "uint8"), ("green", "uint8"), ("blue", "uint8")), deferred=True),
+    Command(18, "power", response=(("voltage_mv", "int32"), ("current_ma", "int32"), ("power_mw", "int32")), query=True),
+    Command(19, "isdown", response=(("pen_down", "bool"),), query=True),
+    # A jerk of 0 gives a trapezoidal velocity profile
+    Command(20, "set_linear_velocity", VELOCITY[:2] + (("jerk", "int32", 0),), deferred=True),
+    Command(21, "set_rotational_velocity", VELOCITY[:2] + (("jerk", "int32", 0),), deferred=True),
+    Command(22, "get_linear_velocity", response=VELOCITY, query=True),
+    Command(23, "get_rotational_velocity", response=VELOCITY, query=True),
+    # Calibration adjustments are in micrometers
+    Command(24, "set_wheel_diameter_calibration", (("wheel_diameter", "int32"),), deferred=True),
+    Command(25, "set_axel_distance_calibration", (("axel_distance", "int32"),), deferred=True),
+    Command(26, "get_wheel_diameter_calibration", response=(("wheel_diameter", "int32"),), query=True),
+    Command(27, "get_axel_distance_calibration", response=(("axel_distance", "int32"),), query=True),
+    Command(28, "set_turtle_id", (("turtle_id", "uint8"),)),
+    Command(29, "get_turtle_id", response=(("turtle_id", "uint8"),), query=True),
+    Command(30, "load_config"),
+    Command(31, "save_config"),
+    Command(32, "reset_config"),
+    Command(33, "motion_queue", (("enable", "bool"),)),
+    # An interval of 0 turns telemetry off
+    Command(34, "set_telemetry_interval", (("interval_ms", "uint16"),)),
+    Command(35, "set_log_stream", (("enable", "bool"),)),
+)
@@ -30,16 +30,42 @@ import picolog
 import aioble
 import bluetooth
 import asyncio
-import struct
 
 from machine import unique_id
 from micropython import const
 
+# Interval between exchanges with central when there is nothing to send (keepalive)
+_KEEPALIVE_INTERVAL_MS = const(500)
+
+# Timeout waiting for central to respond to an exchange
+_EXCHANGE_TIMEOUT_MS = const(2000)
+
+# Response packets are taken from a pool and returned to it once they have been sent to
+# central (so building a response doesn't allocate)
+_PACKET_LENGTH = const(20)
+_P2C_POOL_SIZE = const(8)
+_EMPTY_PACKET = bytes(_PACKET_LENGTH)
+
+# Preferred ATT MTU (central starts the MTU exchange). Each notification or write carries
+# up to MTU - 3 bytes, so a larger MTU lets several packets share one
+_PREFERRED_MTU = const(247)
+_ATT_HEADER_LENGTH = const(3)
+
+# The most packets carried by one write or notification (a frame). A frame is simply the
+# packets one after another, so a 20 byte frame is the same as a single packet
+_MAX_FRAME_PACKETS = const(8)
+_MAX_FRAME_LENGTH = const(160) # _PACKET_LENGTH * _MAX_FRAME_PACKETS
+
 class BlePeripheral:
-    __MANUFACTURER_DATA = (0xFFE1, b"www.waitingforfriday.com")
+    __MANUFACTURER_ID = 0xFFE1
+    __MANUFACTURER_DATA = b"www.waitingforfriday.com"
     __ADVERTISING_NAME = "vt2-robot"
 
-    def __init__(self):
+    def __init__(self, configuration = None):
+        # The configuration (if given) supplies the turtle ID which is added to the end of
+        # the advertised manufacturer data (so a host can tell several robots apart)
+        self._configuration = configuration
+
         # Get the local device's Unique ID (used as the serial number)
         self._uid = "{:02x}{:02x}{:02x}{:02x}{:02x}{:02x}{:02x}{:02x}".format(*unique_id())
 
@@ -60,6 +86,7 @@ class BlePeripheral:
 
         # Register services with aioBLE library
         aioble.register_services(self.command_service)
+        aioble.config(mtu=_PREFERRED_MTU)
 
         # Maximum number of elements to store in the queues (note: maximum is 128 since command sequence is 8 bits)
         # Note: Queue elements are 20 bytes long
@@ -71,6 +98,21 @@ class BlePeripheral:
 
         # Transmission queue for sending service data to central
         self._p2c_queue = []
+        self._p2c_pool = [bytearray(_PACKET_LENGTH) for _ in range(_P2C_POOL_SIZE)]
+
+        # The number of packets central accepts in each notification (set by central through the
+        # framing characteristic, centrals that don't know about framing get one packet at a time)
+        # and the buffer the packets are gathered in
+        self._frame_packets = 1
+        self._p2c_frame = bytearray(_MAX_FRAME_LENGTH)
+
+        # Event to wake the exchange with central (set when there is data to send to
+        # central or a command has been received from central)
+        self._exchange_event = asyncio.Event()
+
+        # Count of data packets written by central (used to detect the response to an exchange)
+        self._c2p_write_count = 0
+        self._c2p_write_event = asyncio.Event()
 
     @property
     def is_connected(self):
@@ -79,12 +121,40 @@ class BlePeripheral:
     @property
     def c2p_queue(self):
         return self._c2p_queue
+
+    @property
+    def c2p_queue_event(self) -> asyncio.Event:
+        """Set when a command is added to the c2p queue (and when central disconnects)"""
+        return self._c2p_queue_event
+
+    @property
+    def frame_packets(self) -> int:
+        return self._frame_packets
     
+    def p2c_buffer(self) -> bytearray:
+        """
+        Get an empty (zeroed) packet to build a response in. Once the packet has been added to the
+        p2c queue and sent to central it's returned to the pool. If the pool is empty a new packet is used.
+        """
+        if len(self._p2c_pool) == 0:
+            return bytearray(_PACKET_LENGTH)
+        buffer = self._p2c_pool.pop()
+        buffer[:] = _EMPTY_PACKET
+        return buffer
+
+    def release_p2c_buffer(self, buffer):
+        """Return a packet that has been sent (or won't be sent) to the pool"""
+        # Packets that didn't come from p2c_buffer are dropped once the pool is full
+        if len(self._p2c_pool) < _P2C_POOL_SIZE and isinstance(buffer, bytearray) and len(buffer) == _PACKET_LENGTH:
+            self._p2c_pool.append(buffer)
+
     def add_to_p2c_queue(self, data):
         if len(self._p2c_queue) < self._max_queue_elements:
             self._p2c_queue.append(data)
+            self._exchange_event.set()
         else:
             picolog.debug("BlePeripheral::add_to_p2c_queue - P2C queue is full - data not added")
+            self.release_p2c_buffer(data)
 
     def __ble_advertising_definitions(self):
         # Definitions used for advertising via BLE
@@ -94,7 +164,6 @@ class BlePeripheral:
 
         # Set our appearance to "Remote Control"
         self.peripheral_appearance_generic_remote_control = const(0x0180)
-        self.peripheral_manufacturer = BlePeripheral.__MANUFACTURER_DATA
         self.peripheral_advertising_name = BlePeripheral.__ADVERTISING_NAME
 
     def __ble_service_definitions(self):
@@ -102,13 +171,24 @@ class BlePeripheral:
         service_uuid = bluetooth.UUID(0xFA20) # Custom
         tx_p2c_characteristic_uuid = bluetooth.UUID(0xFBA0) # Custom
         rx_c2p_characteristic_uuid = bluetooth.UUID(0xFBA1) # Custom
+        telemetry_characteristic_uuid = bluetooth.UUID(0xFBA2) # Custom
+        log_characteristic_uuid = bluetooth.UUID(0xFBA3) # Custom
 
         self.command_service = aioble.Service(service_uuid)
 
-        # TX: Peripheral -> Central (maximum supported length by BLE is 20 bytes)
-        self.tx_p2c_characteristic = aioble.BufferedCharacteristic(self.command_service, tx_p2c_characteristic_uuid, notify=True, max_len=20)
-        # RX: Central -> Peripheral
-        self.rx_c2p_characteristic = aioble.Characteristic(self.command_service, rx_c2p_characteristic_uuid, write=True, write_no_response=True, capture=True)
+        framing_characteristic_uuid = bluetooth.UUID(0xFBA4) # Custom
+
+        # TX: Peripheral -> Central (one packet, or a frame of packets once central has set up framing)
+        self.tx_p2c_characteristic = aioble.BufferedCharacteristic(self.command_service, tx_p2c_characteristic_uuid, notify=True, max_len=_MAX_FRAME_LENGTH)
+        # RX: Central -> Peripheral (one packet or a frame of packets)
+        self.rx_c2p_characteristic = aioble.BufferedCharacteristic(self.command_service, rx_c2p_characteristic_uuid, write=True, write_no_response=True, capture=True, max_len=_MAX_FRAME_LENGTH)
+        # Telemetry: Peripheral -> Central (notified without waiting for central to respond)
+        self.telemetry_characteristic = aioble.BufferedCharacteristic(self.command_service, telemetry_characteristic_uuid, read=True, notify=True, max_len=20)
+        # Log: Peripheral -> Central (the log records as text, 20 bytes per notification)
+        self.log_characteristic = aioble.BufferedCharacteristic(self.command_service, log_characteristic_uuid, read=True, notify=True, max_len=20)
+        # Framing: Central reads the most packets the robot can put in a frame, then writes the number
+        # of packets it accepts in each notification (older centrals don't, so they get one at a time)
+        self.framing_characteristic = aioble.Characteristic(self.command_service, framing_characteristic_uuid, read=True, write=True, capture=True, initial=bytes([_MAX_FRAME_PACKETS]))
 
     async def run(self):
         picolog.debug("BlePeripheral::run - Running")
@@ -116,6 +196,8 @@ class BlePeripheral:
         tasks = [
             asyncio.create_task(self.__maintain_connection()),
             asyncio.create_task(self.__handle_commands()),
+            asyncio.create_task(self.__receive_c2p()),
+            asyncio.create_task(self.__receive_framing()),
         ]
         await asyncio.gather(*tasks)
 
@@ -124,9 +206,10 @@ class BlePeripheral:
         while True:
             # If we are not connected, clear the queues then advertise and wait for connection
             if self._is_advertising:
-                # Clear the queues
+                # Clear the queues (and go back to one packet at a time for the next central)
                 self._c2p_queue.clear()
                 self._p2c_queue.clear()
+                self._frame_packets = 1
 
                 # BLE Advertising frequency
                 ble_advertising_frequency_us = const(250000)
@@ -138,15 +221,20 @@ class BlePeripheral:
                     name=self.peripheral_advertising_name,
                     services=[self.peripheral_advertising_uuid],
                     appearance=self.peripheral_appearance_generic_remote_control,
-                    manufacturer=self.peripheral_manufacturer,
+                    manufacturer=self.__manufacturer_data(),
                 )
-                picolog.info(f"BlePeripheral::__maintain_connection - Central with address {self._ble_connection.device.addr_hex()} has connected - advertising stopped")
+                picolog.info("BlePeripheral::__maintain_connection - Central with address {} has connected - advertising stopped", self._ble_connection.device.addr_hex())
                 self._is_advertising = False
                 self._connected = True
             else:
                 # If we are connected, wait for disconnection
                 await asyncio.sleep(0.25)
 
+    def __manufacturer_data(self) -> tuple:
+        # Note: This is built each time the robot advertises so a new turtle ID is picked up on the next connection
+        turtle_id = self._configuration.turtle_id if self._configuration is not None else 0
+        return (BlePeripheral.__MANUFACTURER_ID, BlePeripheral.__MANUFACTURER_DATA + bytes([turtle_id]))
+
     async def send_data_p2c(self, p2c_data_packet: bytearray):
         try:
             if p2c_data_packet is not None:
@@ -154,64 +242,142 @@ class BlePeripheral:
             else:
                 TypeError("BlePeripheral::send_data_p2c - p2c_data_packet is None")
         except Exception as e:
-            picolog.error(f"BlePeripheral::send_data_p2c - Exception {e}")
+            picolog.error("BlePeripheral::send_data_p2c - Exception {}", e)
             RuntimeError(f"BlePeripheral::send_data_p2c - Exception {e}")
 
-    async def get_data_c2p(self, characteristic, timeout_ms=2000):
+    def send_telemetry(self, frame: bytes):
+        # Note: Telemetry isn't part of the exchange with central, so a lost frame is not sent again
+        if not self._connected or self._ble_connection is None:
+            return
         try:
-            _, c2p_data_packet = await characteristic.written(timeout_ms=timeout_ms)
-            return c2p_data_packet
+            self.telemetry_characteristic.notify(self._ble_connection, frame)
+        except Exception as e:
+            picolog.debug("BlePeripheral::send_telemetry - Exception {}", e)
+
+    def send_log(self, data: bytes) -> bool:
+        # Returns False if the data couldn't be sent
+        # Note: Failures aren't logged (that would add another record to send)
+        if not self._connected or self._ble_connection is None:
+            return False
+        try:
+            self.log_characteristic.notify(self._ble_connection, data)
+        except Exception:
+            return False
+        return True
+
+    # Task to receive data written by central
+    # Note: Central writes in response to each exchange, but can also write a command at any time
+    # (so there is no need to wait for the next exchange before a command can be sent)
+    async def __receive_c2p(self):
+        picolog.debug("BlePeripheral::__receive_c2p - running")
+        while True:
+            if not self._connected:
+                await asyncio.sleep(0.5)
+                continue
+
+            try:
+                _, c2p_data_packet = await self.rx_c2p_characteristic.written(timeout_ms=_EXCHANGE_TIMEOUT_MS)
+            except asyncio.TimeoutError:
+                continue
+
+            if c2p_data_packet is None:
+                continue
+
+            # A write longer than a packet is a frame of (padded) packets, otherwise it's a single
+            # packet (which is only as long as its parameters)
+            if len(c2p_data_packet) <= _PACKET_LENGTH:
+                self.__receive_c2p_packet(c2p_data_packet)
+            elif len(c2p_data_packet) % _PACKET_LENGTH != 0:
+                # The packets of a malformed frame can't be trusted, so none of them are used
+                picolog.warning("BlePeripheral::__receive_c2p - Rejected a {} byte frame from central (not a multiple of {} bytes)",
+                    len(c2p_data_packet), _PACKET_LENGTH)
+            else:
+                for offset in range(0, len(c2p_data_packet) - _PACKET_LENGTH + 1, _PACKET_LENGTH):
+                    self.__receive_c2p_packet(c2p_data_packet[offset:offset + _PACKET_LENGTH])
+
+            self._c2p_write_count += 1
+            self._c2p_write_event.set()
+
+    def __receive_c2p_packet(self, c2p_data_packet):
+        # Only add data to the queue if the first byte is not 0 (NOP)
+        if c2p_data_packet[0] != 0:
+            # Commands are only as long as their parameters (and older centrals don't send the newer
+            # parameters) so the packet is padded with zeros (the missing parameters default to 0)
+            if len(c2p_data_packet) < _PACKET_LENGTH:
+                c2p_data_packet = bytes(c2p_data_packet) + _EMPTY_PACKET[len(c2p_data_packet):]
+
+            if len(self._c2p_queue) < self._max_queue_elements:
+                self._c2p_queue.append(c2p_data_packet)
+                self._c2p_queue_event.set()
+            else:
+                picolog.debug("BlePeripheral::__receive_c2p - c2p queue is full - data not added")
+
+            # Exchange with central straight away (central may have more to send)
+            self._exchange_event.set()
+
+    # Task to receive the number of packets central accepts in each notification
+    async def __receive_framing(self):
+        picolog.debug("BlePeripheral::__receive_framing - running")
+        while True:
+            _, data = await self.framing_characteristic.written()
+            if not self._connected or self._ble_connection is None or not data:
+                continue
+
+            # The frame has to fit in the MTU agreed with central (the default MTU is 23)
+            mtu = self._ble_connection.mtu or 23
+            self._frame_packets = max(1, min(data[0], _MAX_FRAME_PACKETS, (mtu - _ATT_HEADER_LENGTH) // _PACKET_LENGTH))
+            picolog.info("BlePeripheral::__receive_framing - MTU is {}, sending up to {} packets in each notification", mtu, self._frame_packets)
+
+    async def get_data_c2p(self, write_count: int, timeout_ms=_EXCHANGE_TIMEOUT_MS) -> bool:
+        # Wait for central to write data (after the specified write count)
+        try:
+            while self._c2p_write_count == write_count:
+                self._c2p_write_event.clear()
+                await asyncio.wait_for_ms(self._c2p_write_event.wait(), timeout_ms)
+            return True
         except asyncio.TimeoutError:
-            picolog.debug(f"BlePeripheral::get_data_c2p - Timed-out")
-            return None
+            picolog.debug("BlePeripheral::get_data_c2p - Timed-out")
+            return False
 
     # Note: We use an atomic exchange of data with the central to ensure that the data is received and processed
     # as, after the initial connection, the central can sometimes miss data packets
-    async def exchange_data(self, p2c_data_packet) -> tuple[bytearray, bool]:
+    async def exchange_data(self, p2c_data_packet) -> bool:
         for attempt in range(1, 4):
+            write_count = self._c2p_write_count
             await self.send_data_p2c(p2c_data_packet)
-            c2p_data_packet = await self.get_data_c2p(self.rx_c2p_characteristic)
-            if c2p_data_packet is not None:
-                return c2p_data_packet, True
-            picolog.debug(f"BlePeripheral::exchange_data - No response from central after attempt {attempt}")
+            if await self.get_data_c2p(write_count):
+                return True
+            picolog.debug("BlePeripheral::exchange_data - No response from central after attempt {}", attempt)
 
         picolog.error("BlePeripheral::exchange_data - All 3 attempts failed")
-        return bytearray(20), False
+        return False
 
     async def __poll_central(self):
         # If a response is available, send it to central, otherwise send a NOP
-        p2c_data_packet = bytearray(20)
-        if len(self._p2c_queue) > 0:
+        p2c_data_packet = _EMPTY_PACKET
+        packets = min(len(self._p2c_queue), self._frame_packets)
+        if packets == 1:
             p2c_data_packet = self._p2c_queue.pop(0)
-
-            # Just temporarily log the sequence number for testing
-            p2c_sequence = struct.unpack("<B", p2c_data_packet[0:1])[0]
-            picolog.debug(f"BlePeripheral::__poll_central - Sending data to central with sequence = {p2c_sequence}")
-
-        # Exchange data with central
-        success = False
-        c2p_data_packet, success = await self.exchange_data(p2c_data_packet)
-
-        if success:
-            # If we have received data from central, add it to the queue
-            if c2p_data_packet is not None:
-                # Only add data to the queue if the first byte is not 0 (NOP)
-                if c2p_data_packet[0] != 0:
-                    if len(self._c2p_queue) < self._max_queue_elements:
-                        self._c2p_queue.append(c2p_data_packet)
-                        self._c2p_queue_event.set()
-                    else:
-                        picolog.debug("BlePeripheral::__poll_central - c2p queue is full - data not added")
-            else:
-                self._connected = False
-                self._is_advertising = True
-                if self._ble_connection:
-                    await self._ble_connection.disconnect()
-                self._ble_connection = None
-                picolog.info("BlePeripheral::__poll_central - Empty response from central... Flagged as disconnected")
-        else:
+            picolog.debug("BlePeripheral::__poll_central - Sending data to central with sequence = {}", p2c_data_packet[0])
+        elif packets > 1:
+            # Gather the responses into one frame (the packets go back to the pool straight away)
+            for index in range(packets):
+                packet = self._p2c_queue.pop(0)
+                self._p2c_frame[index * _PACKET_LENGTH:(index + 1) * _PACKET_LENGTH] = packet
+                self.release_p2c_buffer(packet)
+            p2c_data_packet = memoryview(self._p2c_frame)[:packets * _PACKET_LENGTH]
+            picolog.debug("BlePeripheral::__poll_central - Sending {} packets to central", packets)
+
+        # Exchange data with central (the data written by central is queued by __receive_c2p)
+        # Note: The characteristic holds a copy of the packet, so it can be reused once it has been sent
+        exchanged = await self.exchange_data(p2c_data_packet)
+        if packets == 1:
+            self.release_p2c_buffer(p2c_data_packet)
+
+        if not exchanged:
             self._connected = False
             self._is_advertising = True
+            self._c2p_queue_event.set()
             if self._ble_connection:
                 await self._ble_connection.disconnect()
             self._ble_connection = None
@@ -222,10 +388,16 @@ class BlePeripheral:
         while True:
             # If we are connected, poll central for data
             if self._connected:
+                self._exchange_event.clear()
                 await self.__poll_central()
 
-                # Limit polling to a maximum of 5 times per second
-                await asyncio.sleep(0.2)
+                # If there is nothing more to send, wait until there is (or central sends a
+                # command) and keep the connection alive by polling central when idle
+                if self._connected and len(self._p2c_queue) == 0:
+                    try:
+                        await asyncio.wait_for_ms(self._exchange_event.wait(), _KEEPALIVE_INTERVAL_MS)
+                    except asyncio.TimeoutError:
+                        pass
             else:
                 # Disconnected - Wait before checking again
                 await asyncio.sleep(0.5)
@@ -30,7 +30,7 @@ import asyncio
 
 from pen import Pen
 from ina260 import Ina260
-from eeprom import Eeprom
+from config_journal import ConfigJournal
 from configuration import Configuration
 from led_fx import LedFx
 from diffdrive import DiffDrive
@@ -43,10 +43,10 @@ _LED_right_eye = const(3)
 _LED_left_eye = const(4)
 
 class CommandsRx:
-    def __init__(self, pen :Pen, ina260 :Ina260, eeprom :Eeprom, led_fx :LedFx, diff_drive :DiffDrive, configuration :Configuration):
+    def __init__(self, pen :Pen, ina260 :Ina260, config_journal :ConfigJournal, led_fx :LedFx, diff_drive :DiffDrive, configuration :Configuration):
         self._pen = pen
         self._ina260 = ina260
-        self._eeprom = eeprom
+        self._config_journal = config_journal
         self._led_fx = led_fx
         self._diff_drive = diff_drive
         self._configuration = configuration
@@ -63,8 +63,30 @@ class CommandsRx:
     def __um_to_mm(self, um: float) -> float:
         return um / 1000
 
+    @property
+    def moves_queued(self) -> int:
+        return self._diff_drive.moves_queued
+
+    @property
+    def moves_completed(self) -> int:
+        return self._diff_drive.moves_completed
+
+    # Register a function to be called whenever a planned move completes
+    def completion_subscribe(self, callback):
+        self._diff_drive.completion_subscribe(callback)
+
+    # Wait for space in the motion planner
+    async def __wait_for_planner(self):
+        await self._diff_drive.wait_for_planner()
+
+    # Wait for the planned motion to complete
+    # Note: The motion commands only wait if their wait parameter is True, otherwise
+    # the motion continues in the background (allowing further moves to be planned)
+    async def wait_for_motion(self):
+        await self._diff_drive.wait_for_motion()
+
     async def motors(self, enable: bool):
-        picolog.info(f"CommandsRx::motors - {'Enabling' if enable else 'Disabling'} motors")
+        picolog.info("CommandsRx::motors - {} motors", 'Enabling' if enable else 'Disabling')
         if enable:
             # Enable the motors and reset the origin to the current position
             self._diff_drive.set_enable(True)
@@ -72,105 +94,105 @@ class CommandsRx:
         else:
             self._diff_drive.set_enable(False)
 
-    async def forward(self, distance_mm: float) -> tuple[float, float, float]:
-        picolog.info(f"CommandsRx::forward - Moving forward {distance_mm} mm")
+    async def forward(self, distance_mm: float, wait: bool = True) -> tuple[float, float, float]:
+        picolog.info("CommandsRx::forward - Moving forward {} mm", distance_mm)
+        await self.__wait_for_planner()
         self._diff_drive.drive_forward(self.__mm_to_um(distance_mm))
-        while self._diff_drive.is_moving:
-            await asyncio.sleep(0.25)
+        if wait: await self.wait_for_motion()
 
         # Return the new position and heading
         x_pos_um, y_pos_um = self._diff_drive.get_cartesian_position()
         heading = self._diff_drive.get_heading()
         return round(self.__um_to_mm(x_pos_um), 2), round(self.__um_to_mm(y_pos_um), 2), round(heading, 2)
 
-    async def backward(self, distance_mm: float) -> tuple[float, float, float]:
-        picolog.info(f"CommandsRx::backward - Moving backward {distance_mm} mm")
+    async def backward(self, distance_mm: float, wait: bool = True) -> tuple[float, float, float]:
+        picolog.info("CommandsRx::backward - Moving backward {} mm", distance_mm)
+        await self.__wait_for_planner()
         self._diff_drive.drive_backward(self.__mm_to_um(distance_mm))
-        while self._diff_drive.is_moving:
-            await asyncio.sleep(0.25)
+        if wait: await self.wait_for_motion()
         
         # Return the new position and heading
         x_pos_um, y_pos_um = self._diff_drive.get_cartesian_position()
         heading = self._diff_drive.get_heading()
         return round(self.__um_to_mm(x_pos_um), 2), round(self.__um_to_mm(y_pos_um), 2), round(heading, 2)
 
-    async def left(self, angle_degrees: float) -> tuple[float, float, float]:
-        picolog.info(f"CommandsRx::left - Turning left {angle_degrees} degrees")
+    async def left(self, angle_degrees: float, wait: bool = True) -> tuple[float, float, float]:
+        picolog.info("CommandsRx::left - Turning left {} degrees", angle_degrees)
+        await self.__wait_for_planner()
         self._diff_drive.turn_left(angle_degrees)
-        while self._diff_drive.is_moving:
-            await asyncio.sleep(0.25)
+        if wait: await self.wait_for_motion()
 
         # Return the new position and heading
         x_pos_um, y_pos_um = self._diff_drive.get_cartesian_position()
         heading = self._diff_drive.get_heading()
         return round(self.__um_to_mm(x_pos_um), 2), round(self.__um_to_mm(y_pos_um), 2), round(heading, 2)
 
-    async def right(self, angle_degrees: float) -> tuple[float, float, float]:
-        picolog.info(f"CommandsRx::right - Turning right {angle_degrees} degrees")
+    async def right(self, angle_degrees: float, wait: bool = True) -> tuple[float, float, float]:
+        picolog.info("CommandsRx::right - Turning right {} degrees", angle_degrees)
+        await self.__wait_for_planner()
         self._diff_drive.turn_right(angle_degrees)
-        while self._diff_drive.is_moving:
-            await asyncio.sleep(0.25)
+        if wait: await self.wait_for_motion()
 
         # Return the new position and heading
         x_pos_um, y_pos_um = self._diff_drive.get_cartesian_position()
         heading = self._diff_drive.get_heading()
         return round(self.__um_to_mm(x_pos_um), 2), round(self.__um_to_mm(y_pos_um), 2), round(heading, 2)
 
-    async def circle(self, radius_mm: float, extent_degrees: float) -> tuple[float, float, float]:
-        picolog.info(f"CommandsRx::circle - Circle with radius {radius_mm} mm and extent of {extent_degrees} degrees")
+    async def circle(self, radius_mm: float, extent_degrees: float, wait: bool = True) -> tuple[float, float, float]:
+        picolog.info("CommandsRx::circle - Circle with radius {} mm and extent of {} degrees", radius_mm, extent_degrees)
+        await self.__wait_for_planner()
         self._diff_drive.circle(self.__mm_to_um(radius_mm), extent_degrees)
-        while self._diff_drive.is_moving:
-            await asyncio.sleep(0.25)
+        if wait: await self.wait_for_motion()
 
         # Return the new position and heading
         x_pos_um, y_pos_um = self._diff_drive.get_cartesian_position()
         heading = self._diff_drive.get_heading()
         return round(self.__um_to_mm(x_pos_um), 2), round(self.__um_to_mm(y_pos_um), 2), round(heading, 2)
 
-    async def setheading(self, heading_degrees: float):
-        picolog.info(f"CommandsRx::setheading - Setting heading to {heading_degrees} degrees")
+    async def setheading(self, heading_degrees: float, wait: bool = True):
+        picolog.info("CommandsRx::setheading - Setting heading to {} degrees", heading_degrees)
+        await self.__wait_for_planner()
         self._diff_drive.set_heading(heading_degrees)
-        while self._diff_drive.is_moving:
-            await asyncio.sleep(0.25)
+        if wait: await self.wait_for_motion()
 
-    async def setx(self, x_mm: float) -> tuple[float, float, float]:
-        picolog.info(f"CommandsRx::setx - Setting X position to {x_mm} mm")
+    async def setx(self, x_mm: float, wait: bool = True) -> tuple[float, float, float]:
+        picolog.info("CommandsRx::setx - Setting X position to {} mm", x_mm)
+        await self.__wait_for_planner()
         self._diff_drive.set_cartesian_x_position(self.__mm_to_um(x_mm))
-        while self._diff_drive.is_moving:
-            await asyncio.sleep(0.25)
+        if wait: await self.wait_for_motion()
 
         # Return the new position and heading
         x_pos_um, y_pos_um = self._diff_drive.get_cartesian_position()
         heading = self._diff_drive.get_heading()
         return round(self.__um_to_mm(x_pos_um), 2), round(self.__um_to_mm(y_pos_um), 2), round(heading, 2)
 
-    async def sety(self, y_mm: float) -> tuple[float, float, float]:
-        picolog.info(f"CommandsRx::sety - Setting Y position to {y_mm} mm")
+    async def sety(self, y_mm: float, wait: bool = True) -> tuple[float, float, float]:
+        picolog.info("CommandsRx::sety - Setting Y position to {} mm", y_mm)
+        await self.__wait_for_planner()
         self._diff_drive.set_cartesian_y_position(self.__mm_to_um(y_mm))
-        while self._diff_drive.is_moving:
-            await asyncio.sleep(0.25)
+        if wait: await self.wait_for_motion()
 
         # Return the new position and heading
         x_pos_um, y_pos_um = self._diff_drive.get_cartesian_position()
         heading = self._diff_drive.get_heading()
         return round(self.__um_to_mm(x_pos_um), 2), round(self.__um_to_mm(y_pos_um), 2), round(heading, 2)
 
-    async def setposition(self, x_mm: float, y_mm: float) -> tuple[float, float, float]:
-        picolog.info(f"CommandsRx::setposition - Setting position to ({x_mm}, {y_mm}) mm")
+    async def setposition(self, x_mm: float, y_mm: float, wait: bool = True) -> tuple[float, float, float]:
+        picolog.info("CommandsRx::setposition - Setting position to ({}, {}) mm", x_mm, y_mm)
+        await self.__wait_for_planner()
         self._diff_drive.set_cartesian_position(self.__mm_to_um(x_mm), self.__mm_to_um(y_mm))
-        while self._diff_drive.is_moving:
-            await asyncio.sleep(0.25)
+        if wait: await self.wait_for_motion()
 
         # Return the new position and heading
         x_pos_um, y_pos_um = self._diff_drive.get_cartesian_position()
         heading = self._diff_drive.get_heading()
         return round(self.__um_to_mm(x_pos_um), 2), round(self.__um_to_mm(y_pos_um), 2), round(heading, 2)
 
-    async def towards(self, x_mm: float, y_mm: float) -> tuple[float, float, float]:
-        picolog.info(f"CommandsRx::towards - Turning towards ({x_mm}, {y_mm}) mm")
+    async def towards(self, x_mm: float, y_mm: float, wait: bool = True) -> tuple[float, float, float]:
+        picolog.info("CommandsRx::towards - Turning towards ({}, {}) mm", x_mm, y_mm)
+        await self.__wait_for_planner()
         self._diff_drive.turn_towards_cartesian_point(self.__mm_to_um(x_mm), self.__mm_to_um(y_mm))
-        while self._diff_drive.is_moving:
-            await asyncio.sleep(0.25)
+        if wait: await self.wait_for_motion()
 
         # Return the new position and heading
         x_pos_um, y_pos_um = self._diff_drive.get_cartesian_position()
@@ -192,12 +214,12 @@ class CommandsRx:
         return round(self.__um_to_mm(x_pos_um), 2), round(self.__um_to_mm(y_pos_um), 2)
 
     async def penup(self):
-        picolog.info(f"CommandsRx::penup - Raising pen")
+        picolog.info("CommandsRx::penup - Raising pen")
         self._pen.up()
         return
     
     async def pendown(self):
-        picolog.info(f"CommandsRx::pendown - Lowering pen")
+        picolog.info("CommandsRx::pendown - Lowering pen")
         self._pen.down()
         return
 
@@ -207,53 +229,55 @@ class CommandsRx:
 
     async def eyes(self, eye: int, red: int, green: int, blue: int):
         if eye == 0:
-            picolog.info(f"CommandsRx::eyes - Setting both eyes to colour ({red}, {green}, {blue})")
+            picolog.info("CommandsRx::eyes - Setting both eyes to colour ({}, {}, {})", red, green, blue)
             self._led_fx.set_led_colour(_LED_left_eye, red, green, blue)
             self._led_fx.set_led_colour(_LED_right_eye, red, green, blue)
         elif eye == 1:
-            picolog.info(f"CommandsRx::eyes - Setting left eye colour to ({red}, {green}, {blue})")
+            picolog.info("CommandsRx::eyes - Setting left eye colour to ({}, {}, {})", red, green, blue)
             self._led_fx.set_led_colour(_LED_left_eye, red, green, blue)
         else:
-            picolog.info(f"CommandsRx::eyes - Setting right eye colour to ({red}, {green}, {blue})")
+            picolog.info("CommandsRx::eyes - Setting right eye colour to ({}, {}, {})", red, green, blue)
             self._led_fx.set_led_colour(_LED_right_eye, red, green, blue)
 
     async def power(self) -> tuple[int, int, int]:
-        mv = int(self._ina260.voltage_mV)
-        ma = int(self._ina260.current_mA)
-        mw = int(self._ina260.power_mW)
+        # The power monitor task keeps the snapshot up to date, so this doesn't normally use the I2C bus
+        voltage, current, power = self._ina260.cached()
+        mv, ma, mw = int(voltage), int(current), int(power)
 
-        picolog.info(f"CommandsRx::power - Power readings: {mv} mV, {ma} mA, {mw} mW")
+        picolog.info("CommandsRx::power - Power readings: {} mV, {} mA, {} mW", mv, ma, mw)
         return mv, ma, mw
     
-    async def set_linear_velocity(self, target_speed_mms: int, acceleration_mmpss: int):
-        picolog.info(f"CommandsRx::set_linear_velocity - Setting linear target speed to {target_speed_mms} mm/s and acceleration to {acceleration_mmpss} mm/s^2")
-        self._diff_drive.set_linear_velocity(self.__mm_to_um(target_speed_mms), self.__mm_to_um(acceleration_mmpss))
+    async def set_linear_velocity(self, target_speed_mms: int, acceleration_mmpss: int, jerk_mmpsss: int = 0):
+        picolog.info("CommandsRx::set_linear_velocity - Setting linear target speed to {} mm/s, acceleration to {} mm/s^2 and jerk to {} mm/s^3", target_speed_mms, acceleration_mmpss, jerk_mmpsss)
+        self._diff_drive.set_linear_velocity(self.__mm_to_um(target_speed_mms), self.__mm_to_um(acceleration_mmpss), self.__mm_to_um(jerk_mmpsss))
         self._configuration.linear_target_speed_umps = self.__mm_to_um(target_speed_mms)
         self._configuration.linear_acceleration_umpss = self.__mm_to_um(acceleration_mmpss)
+        self._configuration.linear_jerk_umpsss = self.__mm_to_um(jerk_mmpsss)
 
-    async def set_rotational_velocity(self, target_speed_mms: int, acceleration_mmps: int):
-        picolog.info(f"CommandsRx::set_rotational_velocity - Setting rotational target speed to {target_speed_mms} mm/s and acceleration to {acceleration_mmps} mm/s^2")
-        self._diff_drive.set_rotational_velocity(self.__mm_to_um(target_speed_mms), self.__mm_to_um(acceleration_mmps))
+    async def set_rotational_velocity(self, target_speed_mms: int, acceleration_mmps: int, jerk_mmpsss: int = 0):
+        picolog.info("CommandsRx::set_rotational_velocity - Setting rotational target speed to {} mm/s, acceleration to {} mm/s^2 and jerk to {} mm/s^3", target_speed_mms, acceleration_mmps, jerk_mmpsss)
+        self._diff_drive.set_rotational_velocity(self.__mm_to_um(target_speed_mms), self.__mm_to_um(acceleration_mmps), self.__mm_to_um(jerk_mmpsss))
         self._configuration.rotational_target_speed_umps = self.__mm_to_um(target_speed_mms)
         self._configuration.rotational_acceleration_umpss = self.__mm_to_um(acceleration_mmps)
+        self._configuration.rotational_jerk_umpsss = self.__mm_to_um(jerk_mmpsss)
 
-    async def get_linear_velocity(self) -> tuple[float, float]:
+    async def get_linear_velocity(self) -> tuple[float, float, float]:
         picolog.info("CommandsRx::get_linear_velocity - Getting linear velocity")
-        target_speed_ums, acceleration_umpss = self._diff_drive.get_linear_velocity()
-        return (self.__um_to_mm(target_speed_ums), self.__um_to_mm(acceleration_umpss))
+        target_speed_ums, acceleration_umpss, jerk_umpsss = self._diff_drive.get_linear_velocity()
+        return (self.__um_to_mm(target_speed_ums), self.__um_to_mm(acceleration_umpss), self.__um_to_mm(jerk_umpsss))
     
-    async def get_rotational_velocity(self) -> tuple[float, float]:
+    async def get_rotational_velocity(self) -> tuple[float, float, float]:
         picolog.info("CommandsRx::get_rotational_velocity - Getting rotational velocity")
-        target_speed_ums, acceleration_umpss = self._diff_drive.get_rotational_velocity()
-        return (self.__um_to_mm(target_speed_ums), self.__um_to_mm(acceleration_umpss))
+        target_speed_ums, acceleration_umpss, jerk_umpsss = self._diff_drive.get_rotational_velocity()
+        return (self.__um_to_mm(target_speed_ums), self.__um_to_mm(acceleration_umpss), self.__um_to_mm(jerk_umpsss))
         
     async def set_wheel_diameter_calibration(self, calibration_um: int):
-        picolog.info(f"CommandsRx::set_wheel_diameter_calibration - Setting wheel diameter calibration to {calibration_um} um")
+        picolog.info("CommandsRx::set_wheel_diameter_calibration - Setting wheel diameter calibration to {} um", calibration_um)
         self._diff_drive.set_wheel_calibration(calibration_um)
         self._configuration.wheel_calibration_um = calibration_um
 
     async def set_axel_distance_calibration(self, calibration_um: int):
-        picolog.info(f"CommandsRx::set_axel_distance_calibration - Setting axel distance calibration to {calibration_um} um")
+        picolog.info("CommandsRx::set_axel_distance_calibration - Setting axel distance calibration to {} um", calibration_um)
         self._diff_drive.set_axel_calibration(calibration_um)
         self._configuration.axel_calibration_um = calibration_um
 
@@ -266,7 +290,7 @@ class CommandsRx:
         return self._diff_drive.get_axel_calibration()
     
     async def set_turtle_id(self, turtle_id: int):
-        picolog.info(f"CommandsRx::set_turtle_id - Setting turtle ID to {turtle_id}")
+        picolog.info("CommandsRx::set_turtle_id - Setting turtle ID to {}", turtle_id)
         self._configuration.turtle_id = turtle_id
 
     async def get_turtle_id(self) -> int:
@@ -275,21 +299,21 @@ class CommandsRx:
 
     async def load_config(self):
         picolog.info("CommandsRx::load_config - Loading configuration")
-        self._configuration.unpack(self._eeprom.read(0, self._configuration.pack_size))
-        self._diff_drive.set_linear_velocity(self._configuration.linear_target_speed_umps, self._configuration.linear_acceleration_umpss)
-        self._diff_drive.set_rotational_velocity(self._configuration.rotational_target_speed_umps, self._configuration.rotational_acceleration_umpss)
+        self._config_journal.load(self._configuration)
+        self._diff_drive.set_linear_velocity(self._configuration.linear_target_speed_umps, self._configuration.linear_acceleration_umpss, self._configuration.linear_jerk_umpsss)
+        self._diff_drive.set_rotational_velocity(self._configuration.rotational_target_speed_umps, self._configuration.rotational_acceleration_umpss, self._configuration.rotational_jerk_umpsss)
         self._diff_drive.set_wheel_calibration(self._configuration.wheel_calibration_um)
         self._diff_drive.set_axel_calibration(self._configuration.axel_calibration_um)
 
     async def save_config(self):
         picolog.info("CommandsRx::save_config - Saving configuration")
-        self._eeprom.write(0, self._configuration.pack())
+        self._config_journal.save(self._configuration)
 
     async def reset_config(self):
         picolog.info("CommandsRx::reset_config - Resetting configuration to default")
         self._configuration.default()
-        self._diff_drive.set_linear_velocity(self._configuration.linear_target_speed_umps, self._configuration.linear_acceleration_umpss)
-        self._diff_drive.set_rotational_velocity(self._configuration.rotational_target_speed_umps, self._configuration.rotational_acceleration_umpss)
+        self._diff_drive.set_linear_velocity(self._configuration.linear_target_speed_umps, self._configuration.linear_acceleration_umpss, self._configuration.linear_jerk_umpsss)
+        self._diff_drive.set_rotational_velocity(self._configuration.rotational_target_speed_umps, self._configuration.rotational_acceleration_umpss, self._configuration.rotational_jerk_umpsss)
         self._diff_drive.set_wheel_calibration(self._configuration.wheel_calibration_um)
         self._diff_drive.set_axel_calibration(self._configuration.axel_calibration_um)
 
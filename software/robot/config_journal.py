@@ -0,0 +1,177 @@
+#************************************************************************ 
+#
+#   config_journal.py
+#
+#   Configuration journal (wear-levelled, CRC protected)
+#   Valiant Turtle 2 - Robot firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import picolog
+import ustruct
+from micropython import const
+
+from eeprom import Eeprom
+from configuration import Configuration
+
+# Each save appends a record to the next slot in the EEPROM (wrapping at the end), so the
+# writes are spread over the whole device and a save that is cut short (by a brown-out or
+# the power switch) leaves the previous record intact. At boot the EEPROM is read once and
+# the newest record with a valid CRC is used.
+#
+# Record layout (little-endian):
+#   uint16  magic        0x5456 ("VT")
+#   uint16  sequence     Incremented for every save (wraps)
+#   bytes   payload      The packed configuration (see Configuration.pack)
+#   uint16  crc          CRC-16/CCITT of the sequence and payload
+_MAGIC = const(0x5456)
+_HEADER_FORMAT = '<HH'
+_CRC_FORMAT = '<H'
+_RECORD_SIZE = const(40)
+_EEPROM_SIZE = const(2048)
+_SLOTS = const(_EEPROM_SIZE // _RECORD_SIZE)
+
+def _make_crc_table() -> list:
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+_CRC_TABLE = _make_crc_table()
+
+def crc16(data: bytes, crc: int = 0xFFFF) -> int:
+    """CRC-16/CCITT-FALSE (polynomial 0x1021, initial value 0xFFFF)"""
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+class ConfigJournal:
+    """
+    Stores the configuration as a journal of CRC protected records in the 24LC16 EEPROM.
+    Only the EEPROM pages that change are written, and saving an unchanged configuration
+    doesn't write anything.
+    """
+
+    def __init__(self, eeprom: Eeprom):
+        self._eeprom = eeprom
+        self._image = None # The contents of the journal area (read by load)
+        self._slot = -1 # The slot holding the newest record (-1 = no valid record)
+        self._sequence = 0
+        self._payload = None # The newest record's payload
+        self._first_slot = 0 # The slot for the first record (after any configuration in the original format)
+
+        # The payload has to fit in a record
+        if ustruct.calcsize(_HEADER_FORMAT) + ustruct.calcsize(Configuration().format) + ustruct.calcsize(_CRC_FORMAT) > _RECORD_SIZE:
+            raise RuntimeError("ConfigJournal::__init__ - Configuration is too large for a journal record")
+
+    @property
+    def slot(self) -> int:
+        """The slot holding the newest record (-1 if there isn't one)"""
+        return self._slot
+
+    @property
+    def sequence(self) -> int:
+        """The sequence number of the newest record"""
+        return self._sequence
+
+    def load(self, configuration: Configuration) -> bool:
+        """
+        Find the newest valid record and unpack it into the configuration. If there isn't one, the
+        original (unjournalled) format is tried, otherwise the configuration is set to the default.
+        Returns:
+            bool: True if a valid configuration was loaded.
+        """
+        self._image = bytearray(self._eeprom.read(0, _SLOTS * _RECORD_SIZE))
+        self._slot = -1
+        self._payload = None
+        self._first_slot = 0
+
+        payload_size = ustruct.calcsize(configuration.format)
+        header_size = ustruct.calcsize(_HEADER_FORMAT)
+        for slot in range(_SLOTS):
+            offset = slot * _RECORD_SIZE
+
+            # Check the magic number first, so only the likely records have their CRC calculated
+            magic, sequence = ustruct.unpack_from(_HEADER_FORMAT, self._image, offset)
+            if magic != _MAGIC: continue
+            crc_offset = offset + header_size + payload_size
+            crc = ustruct.unpack_from(_CRC_FORMAT, self._image, crc_offset)[0]
+            if crc != crc16(self._image[offset + 2:crc_offset]): continue
+
+            # Newer if the sequence is ahead (allowing for it wrapping)
+            if self._slot < 0 or 0 < ((sequence - self._sequence) & 0xFFFF) < 0x8000:
+                self._slot = slot
+                self._sequence = sequence
+
+        if self._slot >= 0:
+            offset = self._slot * _RECORD_SIZE + header_size
+            self._payload = bytes(self._image[offset:offset + payload_size])
+            if configuration.unpack(self._payload):
+                picolog.info("ConfigJournal::load - Loaded record {} from slot {}", self._sequence, self._slot)
+                return True
+            self._payload = None
+            return False
+
+        if configuration.unpack_legacy(self._image):
+            # The first record is written after the original configuration, so it's kept until there's a good record
+            self._first_slot = (configuration.legacy_pack_size + _RECORD_SIZE - 1) // _RECORD_SIZE
+            picolog.info("ConfigJournal::load - Loaded configuration saved in the original format")
+            return True
+
+        picolog.info("ConfigJournal::load - No valid configuration record... Using default")
+        configuration.default()
+        return False
+
+    def save(self, configuration: Configuration) -> bool:
+        """
+        Append the configuration to the journal (unless it's the same as the newest record).
+        Returns:
+            bool: True if a record was written.
+        """
+        if self._image is None:
+            self._image = bytearray(self._eeprom.read(0, _SLOTS * _RECORD_SIZE))
+
+        payload = configuration.pack()
+        if payload == self._payload:
+            picolog.debug("ConfigJournal::save - Configuration is unchanged")
+            return False
+
+        sequence = (self._sequence + 1) & 0xFFFF if self._slot >= 0 else 0
+        slot = (self._slot + 1) % _SLOTS if self._slot >= 0 else self._first_slot
+        body = ustruct.pack('<H', sequence) + payload
+        record = ustruct.pack('<H', _MAGIC) + body + ustruct.pack(_CRC_FORMAT, crc16(body))
+        record += b'\xff' * (_RECORD_SIZE - len(record))
+
+        offset = slot * _RECORD_SIZE
+        pages = self._eeprom.update(offset, record, self._image[offset:offset + _RECORD_SIZE])
+        self._image[offset:offset + _RECORD_SIZE] = record
+        self._slot = slot
+        self._sequence = sequence
+        self._payload = payload
+        picolog.info("ConfigJournal::save - Saved record {} to slot {} ({} page writes)", sequence, slot, pages)
+        return True
+
+if __name__ == "__main__":
+    from main import main
+    main()
@@ -29,8 +29,12 @@ import picolog
 import ustruct
 from micropython import const
 
+# The version of the original configuration format (10 x int64 at EEPROM address 0)
+_LEGACY_VERSION = const(0x04)
+_LEGACY_FORMAT = 'qqqqqqqqqq'
+
 class Configuration:
-    CONFIGURATION_VERSION = const(0x03)
+    CONFIGURATION_VERSION = const(0x05)
 
     def __init__(self):
         self._configuration_version = 0
@@ -41,14 +45,16 @@ class Configuration:
         self._wheel_calibration_um = 0
         self._axel_calibration_um = 0
         self._turtle_id = 0
+        self._linear_jerk_umpsss = 0
+        self._rotational_jerk_umpsss = 0
 
         # Set default configuration
         self.default()
 
-        # ustruct format
+        # ustruct format (every value is range checked to fit)
         # See: https://docs.micropython.org/en/latest/library/struct.html
-        # 8 x int32_t (4 bytes) = 32 bytes
-        self.format = 'qqqqqqqq'
+        # uint8_t version, 6 x int32_t, uint8_t turtle ID, 2 x int32_t = 34 bytes
+        self.format = '<BiiiiiiBii'
 
     def pack(self) -> bytes:
         buffer = ustruct.pack(self.format,
@@ -60,6 +66,8 @@ class Configuration:
             int(self._wheel_calibration_um),
             int(self._axel_calibration_um),
             int(self._turtle_id),
+            int(self._linear_jerk_umpsss),
+            int(self._rotational_jerk_umpsss),
             )
         return buffer
     
@@ -67,8 +75,17 @@ class Configuration:
     # True = EEPROM was valid
     # False = EEPROM was invalid (uses default configuration instead)
     def unpack(self, buffer: bytes) -> bool:
-        result = ustruct.unpack(self.format, buffer)
+        return self.__set_fields(ustruct.unpack(self.format, buffer))
+
+    # Unpack configuration data saved in the original (version 4) format
+    # so the calibration survives a firmware update. Returns True if it was valid.
+    def unpack_legacy(self, buffer: bytes) -> bool:
+        if len(buffer) < ustruct.calcsize(_LEGACY_FORMAT): return False
+        result = ustruct.unpack(_LEGACY_FORMAT, buffer[:ustruct.calcsize(_LEGACY_FORMAT)])
+        if result[0] != _LEGACY_VERSION: return False
+        return self.__set_fields((Configuration.CONFIGURATION_VERSION,) + result[1:])
 
+    def __set_fields(self, result) -> bool:
         # Place the resulting tuple into the configuration parameters
         self._configuration_version = result[0]
         self._linear_target_speed_umps = result[1]
@@ -78,6 +95,8 @@ class Configuration:
         self._wheel_calibration_um = result[5]
         self._axel_calibration_um = result[6]
         self._turtle_id = result[7]
+        self._linear_jerk_umpsss = result[8]
+        self._rotational_jerk_umpsss = result[9]
 
         # Check configuration is valid
         if self._configuration_version != Configuration.CONFIGURATION_VERSION:
@@ -106,11 +125,20 @@ class Configuration:
         # Turtle ID
         self._turtle_id = 0
 
+        # Jerk (0 = trapezoidal velocity profile, otherwise an S-curve profile is used)
+        self._linear_jerk_umpsss = 0 # um per second per second per second
+        self._rotational_jerk_umpsss = 0 # um per second per second per second
+
     # Return the size (in bytes) of the packed configuration
     @property
     def pack_size(self) -> int:
         return ustruct.calcsize(self.format)
 
+    # Return the size (in bytes) of the configuration saved in the original format
+    @property
+    def legacy_pack_size(self) -> int:
+        return ustruct.calcsize(_LEGACY_FORMAT)
+
     # Getters and setters for configuration parameters
 
     # Note: configuration version is read only
@@ -140,6 +168,17 @@ class Configuration:
         else:
             raise ValueError("linear_acceleration_umpss must be an integer between 0 and 2,147,483,647")
 
+    @property
+    def linear_jerk_umpsss(self) -> int:
+        return self._linear_jerk_umpsss
+
+    @linear_jerk_umpsss.setter
+    def linear_jerk_umpsss(self, value: int):
+        if 0 <= value <= 2147483647:
+            self._linear_jerk_umpsss = value
+        else:
+            raise ValueError("linear_jerk_umpsss must be an integer between 0 and 2,147,483,647")
+
     @property
     def rotational_target_speed_umps(self) -> int:
         return self._rotational_target_speed_umps
@@ -162,6 +201,17 @@ class Configuration:
         else:
             raise ValueError("rotational_acceleration_umpss must be an integer between 1 and 2,147,483,647")
 
+    @property
+    def rotational_jerk_umpsss(self) -> int:
+        return self._rotational_jerk_umpsss
+
+    @rotational_jerk_umpsss.setter
+    def rotational_jerk_umpsss(self, value: int):
+        if 0 <= value <= 2147483647:
+            self._rotational_jerk_umpsss = value
+        else:
+            raise ValueError("rotational_jerk_umpsss must be an integer between 0 and 2,147,483,647")
+
     @property
     def wheel_calibration_um(self) -> int:
         return self._wheel_calibration_um
@@ -30,18 +30,105 @@ import asyncio
 
 from ble_peripheral import BlePeripheral
 from commands_rx import CommandsRx
+from telemetry import Telemetry
+from log_stream import LogStream
 import struct
+from micropython import const
+from protocol_peripheral import COMMAND_COUNT, PARAMETER_FORMATS, RESPONSE_FORMATS, ACCEPTED_FORMAT, COMPLETED_FORMAT
+from protocol_peripheral import DEFERRED_COMMANDS, PLANNED_COMMANDS, QUERY_COMMANDS, RESPONSE_TYPE_OFFSET, RESPONSE_ACCEPTED, RESPONSE_COMPLETED
+import protocol_peripheral as protocol
+
+# The maximum number of commands that can be waiting in the motion queue
+_MOTION_QUEUE_DEPTH = const(16)
+
+# Longest wait for a command before checking the connection and power (commands are handled as soon as they arrive)
+_IDLE_CHECK_MS = const(250)
 
 class Control:
     """
     This class is responsible for processing commands received from the central device and 
     calling the appropriate command functions in the Commands class. The commands are then
     responded to with data that is sent back to the central device.
+
+    If the motion queue is enabled (command 33) commands are executed in order from a queue.
+    Motion commands are acknowledged as soon as they are queued and a completion event is sent
+    once they have been executed; this allows the central to keep the queue full so the robot
+    does not have to wait for the BLE link between moves. Queries (such as power and heading) are
+    answered straight away with the robot's current state rather than waiting for the queue.
     """
-    def __init__(self, ble_peripheral :BlePeripheral, commands_rx :CommandsRx, power_low_event: asyncio.Event):
+    def __init__(self, ble_peripheral :BlePeripheral, commands_rx :CommandsRx, power_low_event: asyncio.Event, telemetry: Telemetry = None, log_stream: LogStream = None,
+                 power_restored_event: asyncio.Event = None):
         self._ble_peripheral = ble_peripheral
         self._commands_rx = commands_rx
         self._power_low_event = power_low_event
+        # Set by the power monitor when the power low event is cleared
+        self._power_restored_event = power_restored_event if power_restored_event is not None else asyncio.Event()
+        self._telemetry = telemetry
+        self._log_stream = log_stream
+
+        self._motion_queue_enabled = False
+        self._motion_queue = []
+
+        # Set when a command is added to the motion queue and when one is removed (both are also
+        # set when the queue is cleared, so anything waiting on the queue checks it again)
+        self._motion_queue_added_event = asyncio.Event()
+        self._motion_queue_removed_event = asyncio.Event()
+
+        # Completion events waiting for planned motion to complete (sequence ID, move count, pose)
+        self._pending_completions = []
+
+        # Set when there are no completion events waiting
+        self._completions_sent_event = asyncio.Event()
+        self._completions_sent_event.set()
+
+        # Flag set (by the motion planner) when a planned move completes and when a completion event is added
+        self._move_completed_flag = asyncio.ThreadSafeFlag()
+        self._commands_rx.completion_subscribe(self._move_completed_flag.set)
+
+        # Command table (indexed by command ID) of the handler and the struct formats of the command's
+        # parameters (which follow the command ID) and result (which follows the sequence number). The
+        # formats come from the protocol schema (see software/protocol). Each handler is called with the
+        # wait flag and the parameters and returns the result (or None if there is no result).
+        # Note: MicroPython's struct module doesn't have Struct objects, so the formats are kept as strings
+        self._command_table = [None] * COMMAND_COUNT
+        for command_id, handler in (
+            (protocol.MOTORS, self.__motors),
+            (protocol.FORWARD, self.__forward),
+            (protocol.BACKWARD, self.__backward),
+            (protocol.LEFT, self.__left),
+            (protocol.RIGHT, self.__right),
+            (protocol.CIRCLE, self.__circle),
+            (protocol.SETHEADING, self.__setheading),
+            (protocol.SETX, self.__setx),
+            (protocol.SETY, self.__sety),
+            (protocol.SETPOSITION, self.__setposition),
+            (protocol.TOWARDS, self.__towards),
+            (protocol.RESET_ORIGIN, self.__reset_origin),
+            (protocol.HEADING, self.__heading),
+            (protocol.POSITION, self.__position),
+            (protocol.PENUP, self.__penup),
+            (protocol.PENDOWN, self.__pendown),
+            (protocol.EYES, self.__eyes),
+            (protocol.POWER, self.__power),
+            (protocol.ISDOWN, self.__isdown),
+            (protocol.SET_LINEAR_VELOCITY, self.__set_linear_velocity),
+            (protocol.SET_ROTATIONAL_VELOCITY, self.__set_rotational_velocity),
+            (protocol.GET_LINEAR_VELOCITY, self.__get_linear_velocity),
+            (protocol.GET_ROTATIONAL_VELOCITY, self.__get_rotational_velocity),
+            (protocol.SET_WHEEL_DIAMETER_CALIBRATION, self.__set_cali_wheel),
+            (protocol.SET_AXEL_DISTANCE_CALIBRATION, self.__set_cali_axel),
+            (protocol.GET_WHEEL_DIAMETER_CALIBRATION, self.__get_cali_wheel),
+            (protocol.GET_AXEL_DISTANCE_CALIBRATION, self.__get_cali_axel),
+            (protocol.SET_TURTLE_ID, self.__set_turtle_id),
+            (protocol.GET_TURTLE_ID, self.__get_turtle_id),
+            (protocol.LOAD_CONFIG, self.__load_config),
+            (protocol.SAVE_CONFIG, self.__save_config),
+            (protocol.RESET_CONFIG, self.__reset_config),
+            (protocol.MOTION_QUEUE, self.__motion_queue),
+            (protocol.SET_TELEMETRY_INTERVAL, self.__telemetry),
+            (protocol.SET_LOG_STREAM, self.__log_stream),
+        ):
+            self._command_table[command_id] = (handler, PARAMETER_FORMATS[command_id], RESPONSE_FORMATS[command_id])
 
     # Run a task where we wait for BLE c2p queue to have data
     # then process the data as commands which then respond
@@ -52,302 +139,315 @@ class Control:
         # Ensure the stored configuration is loaded from EEPROM
         await self._commands_rx.load_config()
 
+        await asyncio.gather(self.__process_commands(), self.__process_motion_queue(), self.__process_completions())
+
+    async def __process_commands(self):
         while True:
             # Wait for data to arrive in the c2p queue
+            c2p_queue_event = self._ble_peripheral.c2p_queue_event
             while len(self._ble_peripheral.c2p_queue) == 0 and self._power_low_event.is_set() == False:
-                await asyncio.sleep(0.25)
+                c2p_queue_event.clear()
+                try:
+                    await asyncio.wait_for_ms(c2p_queue_event.wait(), _IDLE_CHECK_MS)
+                except asyncio.TimeoutError:
+                    pass
                 if not self._ble_peripheral.is_connected and self._commands_rx.motors_enabled:
-                    # If we are not connected, ensure the motors are off
+                    # If we are not connected, ensure the motors are off (and discard any queued commands)
+                    self.__clear_motion_queue()
                     await self._commands_rx.motors(False)
 
             if self._power_low_event.is_set():
-                picolog.debug("Control::run - Power low event set - waiting for power to return")
+                picolog.debug("Control::__process_commands - Power low event set - waiting for power to return")
+                self.__clear_motion_queue()
                 await self._commands_rx.motors(False)
                 while self._power_low_event.is_set():
-                    await asyncio.sleep(0.25)
-                picolog.debug("Control::run - Power restored - resuming")
+                    self._power_restored_event.clear()
+                    await self._power_restored_event.wait()
+                picolog.debug("Control::__process_commands - Power restored - resuming")
             else:
                 # C2P queue has data - process it
                 data = self._ble_peripheral.c2p_queue.pop(0)
-
-                # The first byte is the command ID and the second
-                # byte is the sequence number. Unpack the data using struct
-                command_seq, command_id = struct.unpack('<BB', data[:2])
+                command_seq = data[0]
+                command_id = data[1]
 
                 if command_id == 0:
                     # NOP command
                     pass
-                elif command_id == 1:
-                    # Command ID 1 = motors
-                    # Expect a single byte parameter (1 = enable, 0 = disable)
-                    command_seq, command_id, enable = struct.unpack('<BBB', data[:3])
-                    await self._commands_rx.motors(enable)
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 2:
-                    # Command ID 2 = forward
-                    # Expect a single float parameter (distance in mm)
-                    command_seq, command_id, distance_mm = struct.unpack('<BBf', data[:6])
-                    if distance_mm > 0:
-                        x_position, y_position, heading = await self._commands_rx.forward(distance_mm)
-                    elif distance_mm < 0:
-                        x_position, y_position, heading = await self._commands_rx.backward(-distance_mm)
-
-                    response = struct.pack('<Bfff', command_seq, x_position, y_position, heading) + bytes(7)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 3:
-                    # Command ID 3 = backward
-                    # Expect a single float parameter (distance in mm)
-                    command_seq, command_id, distance_mm = struct.unpack('<BBf', data[:6])
-                    if distance_mm > 0:
-                        x_position, y_position, heading = await self._commands_rx.backward(distance_mm)
-                    elif distance_mm < 0:
-                        x_position, y_position, heading = await self._commands_rx.forward(-distance_mm)
-
-                    response = struct.pack('<Bfff', command_seq, x_position, y_position, heading) + bytes(7)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 4:
-                    # Command ID 4 = left
-                    # Expect a single float parameter (angle in degrees)
-                    command_seq, command_id, angle_degrees = struct.unpack('<BBf', data[:6])
-                    if angle_degrees > 0:
-                        x_position, y_position, heading = await self._commands_rx.left(angle_degrees)
-                    elif angle_degrees < 0:
-                        x_position, y_position, heading = await self._commands_rx.right(-angle_degrees)
-
-                    response = struct.pack('<Bfff', command_seq, x_position, y_position, heading) + bytes(7)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 5:
-                    # Command ID 5 = right
-                    # Expect a single float parameter (angle in degrees)
-                    command_seq, command_id, angle_degrees = struct.unpack('<BBf', data[:6])
-                    if angle_degrees > 0:
-                        x_position, y_position, heading = await self._commands_rx.right(angle_degrees)
-                    elif angle_degrees < 0:
-                        x_position, y_position, heading = await self._commands_rx.left(-angle_degrees)
-
-                    response = struct.pack('<Bfff', command_seq, x_position, y_position, heading) + bytes(7)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 6:
-                    # Command ID 6 = circle
-                    # Expect two float parameters (radius in mm and extent in degrees)
-                    command_seq, command_id, radius_mm, extent_degrees = struct.unpack('<BBff', data[:10])
-                    x_position, y_position, heading = await self._commands_rx.circle(radius_mm, extent_degrees)
-
-                    response = struct.pack('<Bfff', command_seq, x_position, y_position, heading) + bytes(7)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 7:
-                    # Command ID 7 = setheading
-                    # Expect a single float parameter (heading in degrees)
-                    command_seq, command_id, heading_degrees = struct.unpack('<BBf', data[:6])
-                    await self._commands_rx.setheading(heading_degrees)
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 8:
-                    # Command ID 8 = setx
-                    # Expect a single float parameter (x position in mm)
-                    command_seq, command_id, x_mm = struct.unpack('<BBf', data[:6])
-                    x_position, y_position, heading = await self._commands_rx.setx(x_mm)
-
-                    response = struct.pack('<Bfff', command_seq, x_position, y_position, heading) + bytes(7)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 9:
-                    # Command ID 9 = sety
-                    # Expect a single float parameter (y position in mm)
-                    command_seq, command_id, y_mm = struct.unpack('<BBf', data[:6])
-                    x_position, y_position, heading = await self._commands_rx.sety(y_mm)
-
-                    response = struct.pack('<Bfff', command_seq, x_position, y_position, heading) + bytes(7)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 10:
-                    # Command ID 10 = setposition
-                    # Expect two float parameters (x and y position in mm)
-                    command_seq, command_id, x_mm, y_mm = struct.unpack('<BBff', data[:10])
-                    x_position, y_position, heading = await self._commands_rx.setposition(x_mm, y_mm)
-
-                    response = struct.pack('<Bfff', command_seq, x_position, y_position, heading) + bytes(7)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 11:
-                    # Command ID 11 = towards
-                    # Expect two float parameters (x and y position in mm)
-                    command_seq, command_id, x_mm, y_mm = struct.unpack('<BBff', data[:10])
-                    x_position, y_position, heading = await self._commands_rx.towards(x_mm, y_mm)
-
-                    response = struct.pack('<Bfff', command_seq, x_position, y_position, heading) + bytes(7)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 12:
-                    # Command ID 12 = reset_origin
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    await self._commands_rx.reset_origin()
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 13:
-                    # Command ID 13 = heading
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    heading = await self._commands_rx.heading()
-
-                    response = struct.pack('<Bf', command_seq, heading) + bytes(15)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 14:
-                    # Command ID 14 = position
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    x_position, y_position = await self._commands_rx.position()
-
-                    response = struct.pack('<Bff', command_seq, x_position, y_position) + bytes(11)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 15:
-                    # Command ID 15 = penup
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    await self._commands_rx.penup()
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 16:
-                    # Command ID 16 = pendown
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    await self._commands_rx.pendown()
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 17:
-                    # Command ID 17 = eyes
-                    # Expect four byte parameters (eye ID, red, green, blue)
-                    command_seq, command_id, eye_id, red, green, blue = struct.unpack('<BBBBBB', data[:6])
-                    await self._commands_rx.eyes(eye_id, red, green, blue)
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 18:
-                    # Command ID 18 = power
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    mv, ma, mw = await self._commands_rx.power()
-
-                    response = struct.pack('<Blll', command_seq, mv, ma, mw) + bytes(7)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 19:
-                    # Command ID 19 = isdown (pen)
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    pen_position = await self._commands_rx.isdown()
-
-                    response = struct.pack('<BB', command_seq, pen_position) + bytes(18)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 20:
-                    # Command ID 20 = set_linear_velocity
-                    # Expect two float parameters (max speed and acceleration in mm/s^2)
-                    command_seq, command_id, max_speed, acceleration = struct.unpack('<BBll', data[:10])
-                    await self._commands_rx.set_linear_velocity(max_speed, acceleration)
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 21:
-                    # Command ID 21 = set_rotation_velocity
-                    # Expect two float parameters (max speed and acceleration in mm/s^2)
-                    command_seq, command_id, max_speed, acceleration = struct.unpack('<BBll', data[:10])
-                    await self._commands_rx.set_rotational_velocity(max_speed, acceleration)
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 22:
-                    # Command ID 22 = get_linear_velocity
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    linear_max_speed, linear_acceleration = await self._commands_rx.get_linear_velocity()
-
-                    response = struct.pack('<Bll', command_seq, linear_max_speed, linear_acceleration) + bytes(11)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 23:
-                    # Command ID 23 = get_rotational_velocity
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    rotation_max_speed, rotation_acceleration = await self._commands_rx.get_rotational_velocity()
-
-                    response = struct.pack('<Bll', command_seq, rotation_max_speed, rotation_acceleration) + bytes(11)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 24:
-                    # Command ID 24 = set_cali_wheel
-                    # Expect a single int32 parameter (wheel diameter adjustment in micrometers)
-                    command_seq, command_id, wheel_diameter = struct.unpack('<BBi', data[:6])
-                    await self._commands_rx.set_wheel_diameter_calibration(wheel_diameter)
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 25:
-                    # Command ID 25 = set_cali_axel
-                    # Expect a single int32 parameter (axel distance adjustment in micrometers)
-                    command_seq, command_id, axel_distance = struct.unpack('<BBi', data[:6])
-                    await self._commands_rx.set_axel_distance_calibration(axel_distance)
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 26:
-                    # Command ID 26 = get_wheel_diameter_calibration
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    cali_wheel = await self._commands_rx.get_wheel_diameter_calibration()
-
-                    response = struct.pack('<Bi', command_seq, cali_wheel) + bytes(15)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 27:
-                    # Command ID 27 = get_axel_distance_calibration
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    cali_axel = await self._commands_rx.get_axel_distance_calibration()
-
-                    response = struct.pack('<Bi', command_seq, cali_axel) + bytes(15)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 28:
-                    # Command ID 28 = set_turtle_id
-                    # Expect a single byte parameter (ID)
-                    command_seq, command_id, turtle_id = struct.unpack('<BBB', data[:3])
-                    await self._commands_rx.set_turtle_id(turtle_id)
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 29:
-                    # Command ID 29 = get_turtle_id
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    turtle_id = await self._commands_rx.get_turtle_id()
-
-                    response = struct.pack('<BB', command_seq, turtle_id) + bytes(18)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 30:
-                    # Command ID 30 = load_config
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    await self._commands_rx.load_config()
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 31:
-                    # Command ID 31 = save_config
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    await self._commands_rx.save_config()
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
-                elif command_id == 32:
-                    # Command ID 32 = reset_config
-                    # Expect no parameters
-                    command_seq, command_id = struct.unpack('<BB', data[:2])
-                    await self._commands_rx.reset_config()
-
-                    response = struct.pack('<B', command_seq) + bytes(19)
-                    self._ble_peripheral.add_to_p2c_queue(response)
+                elif command_id in QUERY_COMMANDS or (not self._motion_queue_enabled and len(self._motion_queue) == 0):
+                    # Motion queue is not in use (or the command only reads the robot's current state,
+                    # so it doesn't wait behind the queued motion) - execute the command immediately
+                    response = await self.__execute(data)
+                    if response is not None:
+                        self._ble_peripheral.add_to_p2c_queue(response)
+                else:
+                    # Wait for space in the motion queue (this stops the central sending
+                    # more commands until the robot has caught up)
+                    while len(self._motion_queue) >= _MOTION_QUEUE_DEPTH and not self._power_low_event.is_set():
+                        self._motion_queue_removed_event.clear()
+                        try:
+                            await asyncio.wait_for_ms(self._motion_queue_removed_event.wait(), _IDLE_CHECK_MS)
+                        except asyncio.TimeoutError:
+                            pass
+                    if self._power_low_event.is_set():
+                        continue
+
+                    deferred = self._motion_queue_enabled and command_id in DEFERRED_COMMANDS
+                    self._motion_queue.append((data, deferred))
+                    self._motion_queue_added_event.set()
+
+                    if deferred:
+                        # Acknowledge the command with its position in the queue
+                        slot = len(self._motion_queue) - 1
+                        response = self._ble_peripheral.p2c_buffer()
+                        response[0] = command_seq
+                        struct.pack_into(ACCEPTED_FORMAT, response, 1, slot, _MOTION_QUEUE_DEPTH)
+                        response[RESPONSE_TYPE_OFFSET] = RESPONSE_ACCEPTED
+                        self._ble_peripheral.add_to_p2c_queue(response)
+
+    # Task to execute the commands in the motion queue in order
+    async def __process_motion_queue(self):
+        while True:
+            while len(self._motion_queue) == 0:
+                self._motion_queue_added_event.clear()
+                await self._motion_queue_added_event.wait()
+
+            # Note: The command is only removed from the queue once it has been executed
+            # so the queue length includes the command that is currently executing
+            data, deferred = self._motion_queue[0]
+            command_id = data[1]
+            planned = deferred and command_id in PLANNED_COMMANDS
+
+            if not planned:
+                # Other commands (such as the pen) must wait for the planned motion to complete
+                await self._commands_rx.wait_for_motion()
+                while len(self._pending_completions) > 0:
+                    self._completions_sent_event.clear()
+                    await self._completions_sent_event.wait()
+
+            response = await self.__execute(data, not planned)
+            if len(self._motion_queue) == 0 or self._motion_queue[0][0] is not data:
+                # The queue was cleared whilst the command was executing
+                if response is not None:
+                    self._ble_peripheral.release_p2c_buffer(response)
+                continue
+            self._motion_queue.pop(0)
+            self._motion_queue_removed_event.set()
+
+            if deferred:
+                # The command's own response isn't sent (central gets the completion event instead)
+                if response is not None:
+                    self._ble_peripheral.release_p2c_buffer(response)
+
+                # Get the pose after the command (the planned pose if the motion is still in progress)
+                x_position, y_position = await self._commands_rx.position()
+                heading = await self._commands_rx.heading()
+
+                if planned:
+                    # Send the completion event once the planned motion has completed
+                    self._pending_completions.append((data[0], self._commands_rx.moves_queued, x_position, y_position, heading))
+                    self._completions_sent_event.clear()
+                    self._move_completed_flag.set()
                 else:
-                    picolog.debug(f"Control::run - Unknown command ID = {command_id} received from central")
+                    self.__send_completion(data[0], x_position, y_position, heading)
+            elif response is not None:
+                self._ble_peripheral.add_to_p2c_queue(response)
+
+    # Task to send the completion events for planned motion
+    async def __process_completions(self):
+        while True:
+            while len(self._pending_completions) > 0 and self._commands_rx.moves_completed >= self._pending_completions[0][1]:
+                command_seq, moves, x_position, y_position, heading = self._pending_completions.pop(0)
+                self.__send_completion(command_seq, x_position, y_position, heading)
+            if len(self._pending_completions) == 0:
+                self._completions_sent_event.set()
+            await self._move_completed_flag.wait()
+
+    def __send_completion(self, command_seq: int, x_position: float, y_position: float, heading: float):
+        response = self._ble_peripheral.p2c_buffer()
+        response[0] = command_seq
+        struct.pack_into(COMPLETED_FORMAT, response, 1, x_position, y_position, heading)
+        response[RESPONSE_TYPE_OFFSET] = RESPONSE_COMPLETED
+        self._ble_peripheral.add_to_p2c_queue(response)
+
+    def __set_motion_queue(self, enable: bool):
+        # Note: When the queue is enabled, this command is executed from the queue so any
+        # commands queued before it have completed by the time the queue is disabled
+        self._motion_queue_enabled = bool(enable)
+        picolog.info("Control::__set_motion_queue - Motion queue enabled = {}", self._motion_queue_enabled)
+
+    def __clear_motion_queue(self):
+        if len(self._motion_queue) > 0:
+            picolog.info("Control::__clear_motion_queue - Discarding {} queued commands", len(self._motion_queue))
+            self._motion_queue.clear()
+        self._pending_completions.clear()
+        self._motion_queue_enabled = False
+        self._motion_queue_added_event.set()
+        self._motion_queue_removed_event.set()
+        self._completions_sent_event.set()
+
+    # Execute a command and return the response to send to the central (or None if there is no response)
+    # Note: If wait is False, motion commands return once the move has been planned
+    async def __execute(self, data: bytes, wait: bool = True):
+        # The first byte is the sequence number and the second byte is the command ID
+        command_id = data[1]
+        entry = self._command_table[command_id] if command_id < COMMAND_COUNT else None
+        if entry is None:
+            # Command ID 0 is a NOP
+            if command_id != 0:
+                picolog.debug("Control::__execute - Unknown command ID = {} received from central", command_id)
+            return None
+
+        handler, parameter_format, response_format = entry
+        if parameter_format is None:
+            result = await handler(wait)
+        else:
+            result = await handler(wait, *struct.unpack_from(parameter_format, data, 2))
+
+        response = self._ble_peripheral.p2c_buffer()
+        response[0] = data[0]
+        if response_format is not None:
+            struct.pack_into(response_format, response, 1, *result)
+        return response
+
+    # The current pose (x, y and heading) without moving
+    async def __pose(self) -> tuple[float, float, float]:
+        x_position, y_position = await self._commands_rx.position()
+        return x_position, y_position, await self._commands_rx.heading()
+
+    # Command handlers (see the command table)
+
+    async def __motors(self, wait: bool, enable: int):
+        await self._commands_rx.motors(enable)
+
+    async def __forward(self, wait: bool, distance_mm: float) -> tuple[float, float, float]:
+        # A negative distance moves the other way (and zero doesn't move at all)
+        if distance_mm > 0:
+            return await self._commands_rx.forward(distance_mm, wait)
+        elif distance_mm < 0:
+            return await self._commands_rx.backward(-distance_mm, wait)
+        return await self.__pose()
+
+    async def __backward(self, wait: bool, distance_mm: float) -> tuple[float, float, float]:
+        if distance_mm > 0:
+            return await self._commands_rx.backward(distance_mm, wait)
+        elif distance_mm < 0:
+            return await self._commands_rx.forward(-distance_mm, wait)
+        return await self.__pose()
+
+    async def __left(self, wait: bool, angle_degrees: float) -> tuple[float, float, float]:
+        if angle_degrees > 0:
+            return await self._commands_rx.left(angle_degrees, wait)
+        elif angle_degrees < 0:
+            return await self._commands_rx.right(-angle_degrees, wait)
+        return await self.__pose()
+
+    async def __right(self, wait: bool, angle_degrees: float) -> tuple[float, float, float]:
+        if angle_degrees > 0:
+            return await self._commands_rx.right(angle_degrees, wait)
+        elif angle_degrees < 0:
+            return await self._commands_rx.left(-angle_degrees, wait)
+        return await self.__pose()
+
+    async def __circle(self, wait: bool, radius_mm: float, extent_degrees: float) -> tuple[float, float, float]:
+        return await self._commands_rx.circle(radius_mm, extent_degrees, wait)
+
+    async def __setheading(self, wait: bool, heading_degrees: float):
+        await self._commands_rx.setheading(heading_degrees, wait)
+
+    async def __setx(self, wait: bool, x_mm: float) -> tuple[float, float, float]:
+        return await self._commands_rx.setx(x_mm, wait)
+
+    async def __sety(self, wait: bool, y_mm: float) -> tuple[float, float, float]:
+        return await self._commands_rx.sety(y_mm, wait)
+
+    async def __setposition(self, wait: bool, x_mm: float, y_mm: float) -> tuple[float, float, float]:
+        return await self._commands_rx.setposition(x_mm, y_mm, wait)
+
+    async def __towards(self, wait: bool, x_mm: float, y_mm: float) -> tuple[float, float, float]:
+        return await self._commands_rx.towards(x_mm, y_mm, wait)
+
+    async def __reset_origin(self, wait: bool):
+        await self._commands_rx.reset_origin()
+
+    async def __heading(self, wait: bool) -> tuple[float]:
+        return (await self._commands_rx.heading(),)
+
+    async def __position(self, wait: bool) -> tuple[float, float]:
+        return await self._commands_rx.position()
+
+    async def __penup(self, wait: bool):
+        await self._commands_rx.penup()
+
+    async def __pendown(self, wait: bool):
+        await self._commands_rx.pendown()
+
+    async def __eyes(self, wait: bool, eye_id: int, red: int, green: int, blue: int):
+        await self._commands_rx.eyes(eye_id, red, green, blue)
+
+    async def __power(self, wait: bool) -> tuple[int, int, int]:
+        mv, ma, mw = await self._commands_rx.power()
+        return int(mv), int(ma), int(mw)
+
+    async def __isdown(self, wait: bool) -> tuple[int]:
+        return (1 if await self._commands_rx.isdown() else 0,)
+
+    async def __set_linear_velocity(self, wait: bool, max_speed: int, acceleration: int, jerk: int):
+        # Note: Centrals that don't send a jerk leave it as 0 (a trapezoidal velocity profile)
+        await self._commands_rx.set_linear_velocity(max_speed, acceleration, jerk)
+
+    async def __set_rotational_velocity(self, wait: bool, max_speed: int, acceleration: int, jerk: int):
+        await self._commands_rx.set_rotational_velocity(max_speed, acceleration, jerk)
+
+    async def __get_linear_velocity(self, wait: bool) -> tuple[int, int, int]:
+        max_speed, acceleration, jerk = await self._commands_rx.get_linear_velocity()
+        return int(max_speed), int(acceleration), int(jerk)
+
+    async def __get_rotational_velocity(self, wait: bool) -> tuple[int, int, int]:
+        max_speed, acceleration, jerk = await self._commands_rx.get_rotational_velocity()
+        return int(max_speed), int(acceleration), int(jerk)
+
+    async def __set_cali_wheel(self, wait: bool, wheel_diameter: int):
+        await self._commands_rx.set_wheel_diameter_calibration(wheel_diameter)
+
+    async def __set_cali_axel(self, wait: bool, axel_distance: int):
+        await self._commands_rx.set_axel_distance_calibration(axel_distance)
+
+    async def __get_cali_wheel(self, wait: bool) -> tuple[int]:
+        return (await self._commands_rx.get_wheel_diameter_calibration(),)
+
+    async def __get_cali_axel(self, wait: bool) -> tuple[int]:
+        return (await self._commands_rx.get_axel_distance_calibration(),)
+
+    async def __set_turtle_id(self, wait: bool, turtle_id: int):
+        await self._commands_rx.set_turtle_id(turtle_id)
+
+    async def __get_turtle_id(self, wait: bool) -> tuple[int]:
+        return (await self._commands_rx.get_turtle_id(),)
+
+    async def __load_config(self, wait: bool):
+        await self._commands_rx.load_config()
+
+    async def __save_config(self, wait: bool):
+        await self._commands_rx.save_config()
+
+    async def __reset_config(self, wait: bool):
+        await self._commands_rx.reset_config()
+
+    async def __motion_queue(self, wait: bool, enable: int):
+        self.__set_motion_queue(enable)
+
+    async def __telemetry(self, wait: bool, interval_ms: int):
+        if self._telemetry is not None:
+            self._telemetry.set_interval(interval_ms)
+        else:
+            picolog.debug("Control::__telemetry - Telemetry is not available")
+
+    async def __log_stream(self, wait: bool, enable: int):
+        if self._log_stream is not None:
+            self._log_stream.set_enabled(enable)
+        else:
+            picolog.debug("Control::__log_stream - Log stream is not available")
 
 if __name__ == "__main__":
     from main import main
-    main()
\ No newline at end of file
+    main()
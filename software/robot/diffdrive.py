@@ -29,12 +29,62 @@ import picolog
 from drv8825 import Drv8825
 from stepper import Stepper
 
-from machine import Pin
+from machine import Pin, disable_irq, enable_irq
+from micropython import const
 import math
-import time
+import asyncio
+
+# The maximum number of moves that can be waiting in the motion planner
+_PLANNER_DEPTH = const(8)
+
+class PlannedMove:
+    """A move held by the motion planner. The entry and exit speeds of the move are a fraction
+    of the target speed, so that consecutive moves can flow into each other without stopping.
+    The jerk applies to the wheel that moves the furthest (0 = a trapezoidal velocity profile)"""
+    def __init__(self, left_steps: float, right_steps: float, left_forward: bool, right_forward: bool, left_speed_sps: float, left_acceleration_spsps: float, right_speed_sps: float, right_acceleration_spsps: float, jerk_spspsps: float = 0):
+        self.left_steps = left_steps
+        self.right_steps = right_steps
+        self.left_forward = left_forward
+        self.right_forward = right_forward
+        self.left_speed_sps = left_speed_sps
+        self.left_acceleration_spsps = left_acceleration_spsps
+        self.right_speed_sps = right_speed_sps
+        self.right_acceleration_spsps = right_acceleration_spsps
+        self.jerk_spspsps = jerk_spspsps
+
+        self.entry = 0.0
+        self.exit = 0.0
+        self.move_number = 0 # The stepper move number used for the move
+
+        # The wheel that moves the furthest generates the speed profile and the other wheel follows it
+        self.master_is_left = left_steps >= right_steps
+
+    def can_blend(self, next_move) -> bool:
+        """Returns True if the next move can follow this move without stopping (both
+        wheels keep turning in the same direction at the same speed)"""
+        return (self.master_is_left == next_move.master_is_left and
+            self.left_forward == next_move.left_forward and self.right_forward == next_move.right_forward and
+            math.isclose(self.left_speed_sps, next_move.left_speed_sps, rel_tol=1e-3) and
+            math.isclose(self.right_speed_sps, next_move.right_speed_sps, rel_tol=1e-3) and
+            math.isclose(self.left_acceleration_spsps, next_move.left_acceleration_spsps, rel_tol=1e-3) and
+            math.isclose(self.right_acceleration_spsps, next_move.right_acceleration_spsps, rel_tol=1e-3) and
+            math.isclose(self.jerk_spspsps, next_move.jerk_spspsps, rel_tol=1e-3))
+
+    def reachable_speed(self, start_speed: float) -> float:
+        """The highest speed (as a fraction of the target speed) that can be reached from
+        the start speed by accelerating over the whole move (v^2 = u^2 + 2as)"""
+        # Use the wheel that moves the furthest
+        if self.master_is_left:
+            steps, speed, acceleration = self.left_steps, self.left_speed_sps, self.left_acceleration_spsps
+        else:
+            steps, speed, acceleration = self.right_steps, self.right_speed_sps, self.right_acceleration_spsps
+        if speed <= 0:
+            return 0.0
+        acceleration = Stepper.calibrated_acceleration_spsps(acceleration)
+        return min(1.0, math.sqrt(start_speed * start_speed + (2 * acceleration * steps) / (speed * speed)))
 
 class DiffDrive:
-    def __init__(self, drv8825_enable_gpio: int, drv8825_m0_gpio :int, drv8825_m1_gpio :int, drv8825_m2_gpio :int, left_step_gpio :int, left_direction_gpio :int, right_step_gpio :int, right_direction_gpio :int):
+    def __init__(self, drv8825_enable_gpio: int, drv8825_m0_gpio :int, drv8825_m1_gpio :int, drv8825_m2_gpio :int, left_step_gpio :int, left_direction_gpio :int, right_step_gpio :int, right_direction_gpio :int, use_dma: bool = False, intervals_per_second: int = 0):
         # Configure the DRV8825 control GPIOs
         self._drv8825_enable_pin = Pin(drv8825_enable_gpio, Pin.OUT)
         self._drv8825_m0_pin = Pin(drv8825_m0_gpio, Pin.OUT)
@@ -55,18 +105,22 @@ class DiffDrive:
         self._right_direction_pin = Pin(right_direction_gpio, Pin.OUT)
 
         # Create the stepper motor instances
-        self._left_stepper = Stepper(self._drv8825, self._left_step_pin, self._left_direction_pin, True)
+        # Note: With DMA the stepper profiles are streamed to the PIO (rather than set on every PIO interrupt). The
+        # profiles are updated at the specified number of intervals per second (0 = the steppers' default)
+        self._left_stepper = Stepper(self._drv8825, self._left_step_pin, self._left_direction_pin, True, use_dma, intervals_per_second)
         self._left_stepper.set_direction_forwards()
-        self._right_stepper = Stepper(self._drv8825, self._right_step_pin, self._right_direction_pin, False)
+        self._right_stepper = Stepper(self._drv8825, self._right_step_pin, self._right_direction_pin, False, use_dma, intervals_per_second)
         self._right_stepper.set_direction_forwards()
 
         # Default linear velocity
         self._linear_target_speed_umps = 200000 # um per second
         self._linear_acceleration_umpss = 4000 # um per second per second
+        self._linear_jerk_umpsss = 0 # um per second per second per second (0 = trapezoidal profile)
 
         # Default rotational velocity
         self._rotational_target_speed_umps = 100000 # um per second
         self._rotational_acceleration_umpss = 4000 # um per second per second
+        self._rotational_jerk_umpsss = 0 # um per second per second per second (0 = trapezoidal profile)
 
         # Default wheel diameter and axel distance
         self._wheel_diameter_um = 55530
@@ -86,10 +140,42 @@ class DiffDrive:
         # Current heading in radians (common to both polar and Cartesian coordinates)
         self._heading_radians = 0
 
+        # The pose the motors have reached (x, y, heading in radians) and the step counts it was
+        # dead reckoned from (see get_actual_pose)
+        self._actual_pose = (0, 0, 0)
+        self._actual_step_counts = (0, 0)
+
+        # Motion planner. Moves that can blend with the move currently being executed are given
+        # to the steppers straight away (active moves) and the junction speeds between them are
+        # re-planned as moves are added. Other moves wait (pending) until the steppers stop
+        self._active_moves = []
+        self._pending_moves = []
+        self._moves_queued = 0
+        self._moves_discarded = 0
+        self._starting_moves = False
+
+        # Flag set (by the stepper callbacks) whenever a stepper completes a move
+        # Note: Only one task can wait on the flag at a time
+        self._move_completed_flag = asyncio.ThreadSafeFlag()
+        self._completion_callbacks = []
+        self._left_stepper.completion_subscribe(self.__stepper_completed)
+        self._right_stepper.completion_subscribe(self.__stepper_completed)
+
     def set_enable(self, enable: bool):
         """Enable or disable the motor driver"""
         self._drv8825.set_enable(enable)
 
+        # Discard any moves that haven't been started
+        if not enable and len(self._pending_moves) > 0:
+            picolog.debug("DiffDrive::set_enable - Discarding {} planned moves", len(self._pending_moves))
+            irq_state = disable_irq()
+            self._moves_discarded += len(self._pending_moves)
+            self._pending_moves.clear()
+            enable_irq(irq_state)
+            self._move_completed_flag.set()
+            for fn in self._completion_callbacks:
+                fn()
+
     @property
     def is_enabled(self):
         """Returns True if the motor driver is enabled"""
@@ -97,8 +183,44 @@ class DiffDrive:
     
     @property
     def is_moving(self):
-        """Returns True if the motors are moving"""
-        return self._left_stepper.is_busy
+        """Returns True if the motors are moving (or there are planned moves waiting)"""
+        return self.moves_completed < self._moves_queued
+
+    @property
+    def step_counts(self) -> tuple:
+        """The steps given to the left and right motors since power on (backwards steps are negative)"""
+        return self._left_stepper.step_count, self._right_stepper.step_count
+
+    @property
+    def moves_queued(self) -> int:
+        """The number of moves given to the motion planner"""
+        return self._moves_queued
+
+    @property
+    def moves_completed(self) -> int:
+        """The number of moves completed by the motion planner"""
+        # Note: Every move uses one stepper move on each wheel
+        return min(self._left_stepper.moves_completed, self._right_stepper.moves_completed) + self._moves_discarded
+
+    @property
+    def planner_full(self) -> bool:
+        """Returns True if the motion planner cannot accept more moves"""
+        return (self._moves_queued - self.moves_completed) >= _PLANNER_DEPTH
+
+    def completion_subscribe(self, callback):
+        """Register a function to be called whenever a move completes (or planned moves are discarded)
+        Note: The function may be called from an interrupt, so it should only set a ThreadSafeFlag"""
+        self._completion_callbacks.append(callback)
+
+    async def wait_for_motion(self):
+        """Wait until both wheels have completed all of the planned moves"""
+        while self.is_moving:
+            await self._move_completed_flag.wait()
+
+    async def wait_for_planner(self):
+        """Wait until the motion planner can accept another move"""
+        while self.planner_full:
+            await self._move_completed_flag.wait()
     
     def set_wheel_calibration(self, value: int):
         """Set the wheel calibration in micrometers"""
@@ -172,72 +294,56 @@ class DiffDrive:
     def __forward(self, distance_um: float):
         """Linear motion forwards"""
         if distance_um <= 0:
-            picolog.debug(f"DiffDrive::__forward - Distance in um must be greater than zero")
+            picolog.debug("DiffDrive::__forward - Distance in um must be greater than zero")
             return
-        self.__configure_linear_velocity()
-        self._left_stepper.set_direction_forwards()
-        self._right_stepper.set_direction_forwards()
-        picolog.debug(f"DiffDrive::__forward - Moving {distance_um} um using {self.__um_to_steps(distance_um)} steps")
-        self._left_stepper.move(self.__um_to_steps(distance_um))
-        self._right_stepper.move(self.__um_to_steps(distance_um))
+        picolog.debug("DiffDrive::__forward - Moving {} um using {} steps", distance_um, self.__um_to_steps(distance_um))
+        self.__queue_linear_move(self.__um_to_steps(distance_um), True)
 
     def __backward(self, distance_um: float):
         """Linear motion backwards"""
         if distance_um <= 0:
-            picolog.debug(f"DiffDrive::__backward - Distance in um must be greater than zero")
+            picolog.debug("DiffDrive::__backward - Distance in um must be greater than zero")
             return
-        self.__configure_linear_velocity()
-        self._left_stepper.set_direction_backwards()
-        self._right_stepper.set_direction_backwards()
-        picolog.debug(f"DiffDrive::__backward - Moving {distance_um} um using {self.__um_to_steps(distance_um)} steps")
-        self._left_stepper.move(self.__um_to_steps(distance_um))
-        self._right_stepper.move(self.__um_to_steps(distance_um))
+        picolog.debug("DiffDrive::__backward - Moving {} um using {} steps", distance_um, self.__um_to_steps(distance_um))
+        self.__queue_linear_move(self.__um_to_steps(distance_um), False)
 
     def __left(self, radians: float):
         """Rotational motion to the left"""
         if radians <= 0:
-            picolog.debug(f"DiffDrive::__left - Radians must be greater than zero")
+            picolog.debug("DiffDrive::__left - Radians must be greater than zero")
             return
         
         if self.__radians_to_steps(radians) == 0:
-            picolog.debug(f"DiffDrive::__left - Results in zero steps - not moving")
+            picolog.debug("DiffDrive::__left - Results in zero steps - not moving")
             return
 
-        self.__configure_rotational_velocity()
-        self._left_stepper.set_direction_left()
-        self._right_stepper.set_direction_left()
-        picolog.debug(f"DiffDrive::__left - Turning left {radians} radians using {self.__radians_to_steps(radians)} steps")
-        self._left_stepper.move(self.__radians_to_steps(radians))
-        self._right_stepper.move(self.__radians_to_steps(radians))
+        picolog.debug("DiffDrive::__left - Turning left {} radians using {} steps", radians, self.__radians_to_steps(radians))
+        self.__queue_rotational_move(self.__radians_to_steps(radians), True, False)
 
     def __right(self, radians: float):
         """Rotational motion to the right"""
         if radians <= 0:
-            picolog.debug(f"DiffDrive::__right - Radians must be greater than zero")
+            picolog.debug("DiffDrive::__right - Radians must be greater than zero")
             return
         
         if self.__radians_to_steps(radians) == 0:
-            picolog.debug(f"DiffDrive::__right - Results in zero steps - not moving")
+            picolog.debug("DiffDrive::__right - Results in zero steps - not moving")
             return
 
-        self.__configure_rotational_velocity()
-        self._left_stepper.set_direction_right()
-        self._right_stepper.set_direction_right()
-        picolog.debug(f"DiffDrive::__right - Turning right {radians} radians using {self.__radians_to_steps(radians)} steps")
-        self._left_stepper.move(self.__radians_to_steps(radians))
-        self._right_stepper.move(self.__radians_to_steps(radians))
+        picolog.debug("DiffDrive::__right - Turning right {} radians using {} steps", radians, self.__radians_to_steps(radians))
+        self.__queue_rotational_move(self.__radians_to_steps(radians), False, True)
 
     def __circle(self, radius_um: float, extent_radians: float):
         """Move in a circle of the specified radius and extent."""
 
         # Ensure the radius is not zero
         if radius_um == 0:
-            picolog.debug(f"DiffDrive::__circle - Radius must be non-zero")
+            picolog.debug("DiffDrive::__circle - Radius must be non-zero")
             return
         
         # Ensure the extent is not zero
         if extent_radians == 0:
-            picolog.debug(f"DiffDrive::__circle - Extent must be non-zero")
+            picolog.debug("DiffDrive::__circle - Extent must be non-zero")
             return
 
         # Ensure that the absolute radius is greater than the half the axel distance
@@ -250,52 +356,31 @@ class DiffDrive:
     def __circle_big(self, radius_um: float, extent_radians: float):
         """Move the fulcrum of the wheel axle in a circle of the specified radius and extent (when the radius is equal or greater to the half the wheel axle distance)."""
         if abs(radius_um) < ((self._axel_distance_um + self._axel_calibration_um) / 2):
-            picolog.debug(f"DiffDrive::__circle_big - Radius must be greater than or equal to the axel distance")
+            picolog.debug("DiffDrive::__circle_big - Radius must be greater than or equal to the axel distance")
             return
         
-        picolog.debug(f"DiffDrive::__circle_big - Moving in a circle with radius {radius_um} um and extent {math.degrees(extent_radians)} degrees")
+        picolog.debug("DiffDrive::__circle_big - Moving in a circle with radius {} um and extent {} degrees", radius_um, math.degrees(extent_radians))
         # If the radius is positive the outer wheel is the left wheel
-        if radius_um > 0:
-            outer_stepper = self._left_stepper
-            inner_stepper = self._right_stepper
-            picolog.debug(f"DiffDrive::__circle_big - Moving in a circle to the left, left motor is outer and right motor is inner")
+        outer_is_left = radius_um > 0
+        if outer_is_left:
+            picolog.debug("DiffDrive::__circle_big - Moving in a circle to the left, left motor is outer and right motor is inner")
         else:
-            outer_stepper = self._right_stepper
-            inner_stepper = self._left_stepper
-            picolog.debug(f"DiffDrive::__circle_big - Moving in a circle to the right, right motor is outer and left motor is inner")
+            picolog.debug("DiffDrive::__circle_big - Moving in a circle to the right, right motor is outer and left motor is inner")
 
         # Calculate the outer and inner wheel distances
         outer_distance = abs(radius_um) * (extent_radians * 2)
         inner_distance = (abs(radius_um) - (self._axel_distance_um / 2)) * (extent_radians * 2)
 
-        # Set the target speed and acceleration of the outer wheel to the maximum allowed
-        self.__configure_rotational_velocity()
-        outer_stepper.set_target_speed_sps(self.__um_to_steps(self._rotational_target_speed_umps))
-        outer_stepper.set_acceleration_spsps(self.__um_to_steps(self._rotational_acceleration_umpss))
-
         # Calculate the inner wheel speed and acceleration to match the movement time of the outer wheel
         inner_speed = (inner_distance / outer_distance) * self._rotational_target_speed_umps
         inner_acceleration = (inner_distance / outer_distance) * self._rotational_acceleration_umpss
 
-        # Set the target speed and acceleration of the inner wheel
-        inner_stepper.set_target_speed_sps(self.__um_to_steps(inner_speed))
-        inner_stepper.set_acceleration_spsps(self.__um_to_steps(inner_acceleration))
-
         # If extent is positive, both wheels move forwards
-        if extent_radians > 0:
-            outer_stepper.set_direction_forwards()
-            inner_stepper.set_direction_forwards()
-        else:
-            outer_stepper.set_direction_backwards()
-            inner_stepper.set_direction_backwards()
+        forwards = extent_radians > 0
 
-        # Ensure steps are positive
-        outer_distance = abs(outer_distance)
-        inner_distance = abs(inner_distance)
-
-        # Move the outer and inner wheels
-        outer_stepper.move(self.__um_to_steps(outer_distance))
-        inner_stepper.move(self.__um_to_steps(inner_distance))
+        # Move the outer and inner wheels (ensuring steps are positive)
+        self.__queue_arc_move(outer_is_left, self.__um_to_steps(abs(outer_distance)), self.__um_to_steps(abs(inner_distance)), forwards, forwards,
+            self.__um_to_steps(inner_speed), self.__um_to_steps(inner_acceleration))
 
     def __circle_small(self, radius_um: float, extent_radians: float):
         """Move the fulcrum of the wheel axle in a circle of the specified radius and extent
@@ -303,20 +388,17 @@ class DiffDrive:
         than half the axle distance, requiring opposite rotation for the inner wheel)."""
 
         if abs(radius_um) >= ((self._axel_distance_um  + self._axel_calibration_um) / 2):
-            picolog.debug(f"DiffDrive::__circle_small - Radius must be smaller than half the axle distance")
+            picolog.debug("DiffDrive::__circle_small - Radius must be smaller than half the axle distance")
             return
 
-        picolog.debug(f"DiffDrive::__circle_small - Moving in a circle with radius {radius_um} um and extent {math.degrees(extent_radians)} degrees")
+        picolog.debug("DiffDrive::__circle_small - Moving in a circle with radius {} um and extent {} degrees", radius_um, math.degrees(extent_radians))
 
         # Determine which wheel is inner and which is outer
-        if radius_um > 0:
-            outer_stepper = self._left_stepper
-            inner_stepper = self._right_stepper
-            picolog.debug(f"DiffDrive::__circle_small - Moving in a tight circle to the left, left motor is outer and right motor is inner")
+        outer_is_left = radius_um > 0
+        if outer_is_left:
+            picolog.debug("DiffDrive::__circle_small - Moving in a tight circle to the left, left motor is outer and right motor is inner")
         else:
-            outer_stepper = self._right_stepper
-            inner_stepper = self._left_stepper
-            picolog.debug(f"DiffDrive::__circle_small - Moving in a tight circle to the right, right motor is outer and left motor is inner")
+            picolog.debug("DiffDrive::__circle_small - Moving in a tight circle to the right, right motor is outer and left motor is inner")
 
         # Calculate the actual radii for the inner and outer wheels
         outer_radius = abs(radius_um) + ((self._axel_distance_um + self._axel_calibration_um) / 2)
@@ -326,34 +408,151 @@ class DiffDrive:
         outer_distance = outer_radius * abs(extent_radians)
         inner_distance = inner_radius * abs(extent_radians)
 
-        # Set the target speed and acceleration for the outer wheel
-        self.__configure_rotational_velocity()
-        picolog.debug(f"DiffDrive::__circle_small - Setting outer stepper target speed to {self._rotational_target_speed_umps} um/s and acceleration to {self._rotational_acceleration_umpss} um/s^2")
-        outer_stepper.set_target_speed_sps(self.__um_to_steps(self._rotational_target_speed_umps))
-        outer_stepper.set_acceleration_spsps(self.__um_to_steps(self._rotational_acceleration_umpss))
-
         # Calculate the inner wheel speed and acceleration to match the movement time of the outer wheel
         inner_speed = abs((inner_distance / outer_distance) * self._rotational_target_speed_umps)
         inner_acceleration = abs((inner_distance / outer_distance) * self._rotational_acceleration_umpss)
-
-        # Set the target speed and acceleration for the inner wheel
-        picolog.debug(f"DiffDrive::__circle_small - Setting inner stepper target speed to {inner_speed} um/s and acceleration to {inner_acceleration} um/s^2")
-        inner_stepper.set_target_speed_sps(self.__um_to_steps(inner_speed))
-        inner_stepper.set_acceleration_spsps(self.__um_to_steps(inner_acceleration))
+        picolog.debug("DiffDrive::__circle_small - Outer wheel target speed is {} um/s and acceleration is {} um/s^2", self._rotational_target_speed_umps, self._rotational_acceleration_umpss)
+        picolog.debug("DiffDrive::__circle_small - Inner wheel target speed is {} um/s and acceleration is {} um/s^2", inner_speed, inner_acceleration)
 
         # Handle wheel direction: inner wheel rotates in the opposite direction
         if extent_radians > 0:
-            outer_stepper.set_direction_forwards()
-            inner_stepper.set_direction_backwards()
-            picolog.debug(f"DiffDrive::__circle_small - Outer wheel moves forward, inner wheel moves backward")
+            picolog.debug("DiffDrive::__circle_small - Outer wheel moves forward, inner wheel moves backward")
         else:
-            outer_stepper.set_direction_backwards()
-            inner_stepper.set_direction_forwards()
-            picolog.debug(f"DiffDrive::__circle_small - Outer wheel moves backward, inner wheel moves forward")
+            picolog.debug("DiffDrive::__circle_small - Outer wheel moves backward, inner wheel moves forward")
 
         # Move the outer and inner wheels
-        outer_stepper.move(self.__um_to_steps(abs(outer_distance)))
-        inner_stepper.move(self.__um_to_steps(abs(inner_distance)))
+        self.__queue_arc_move(outer_is_left, self.__um_to_steps(abs(outer_distance)), self.__um_to_steps(abs(inner_distance)), extent_radians > 0, extent_radians <= 0,
+            self.__um_to_steps(inner_speed), self.__um_to_steps(inner_acceleration))
+
+    def __queue_linear_move(self, steps: float, forwards: bool):
+        """Queue a move with both wheels turning in the same direction at the linear velocity"""
+        speed = self.__um_to_steps(self._linear_target_speed_umps)
+        acceleration = self.__um_to_steps(self._linear_acceleration_umpss)
+        jerk = self.__um_to_steps(self._linear_jerk_umpsss)
+        self.__queue_move(PlannedMove(steps, steps, forwards, forwards, speed, acceleration, speed, acceleration, jerk))
+
+    def __queue_rotational_move(self, steps: float, left_forward: bool, right_forward: bool):
+        """Queue a move with both wheels turning at the rotational velocity"""
+        speed = self.__um_to_steps(self._rotational_target_speed_umps)
+        acceleration = self.__um_to_steps(self._rotational_acceleration_umpss)
+        jerk = self.__um_to_steps(self._rotational_jerk_umpsss)
+        self.__queue_move(PlannedMove(steps, steps, left_forward, right_forward, speed, acceleration, speed, acceleration, jerk))
+
+    def __queue_arc_move(self, outer_is_left: bool, outer_steps: float, inner_steps: float, outer_forward: bool, inner_forward: bool, inner_speed_sps: float, inner_acceleration_spsps: float):
+        """Queue a move with the outer wheel at the rotational velocity and the inner wheel at the specified velocity"""
+        outer_speed = self.__um_to_steps(self._rotational_target_speed_umps)
+        outer_acceleration = self.__um_to_steps(self._rotational_acceleration_umpss)
+        outer_jerk = self.__um_to_steps(self._rotational_jerk_umpsss)
+        if outer_is_left:
+            move = PlannedMove(outer_steps, inner_steps, outer_forward, inner_forward, outer_speed, outer_acceleration, inner_speed_sps, inner_acceleration_spsps, outer_jerk)
+        else:
+            move = PlannedMove(inner_steps, outer_steps, inner_forward, outer_forward, inner_speed_sps, inner_acceleration_spsps, outer_speed, outer_acceleration, outer_jerk)
+        self.__queue_move(move)
+
+    def __queue_move(self, move: PlannedMove):
+        """Add a move to the motion planner"""
+        # Note: The stepper callbacks also update the planner, so interrupts are disabled whilst it's changed
+        irq_state = disable_irq()
+        self._moves_queued += 1
+
+        if (len(self._pending_moves) == 0 and len(self._active_moves) > 0 and self._active_moves[-1].can_blend(move)
+            and self.__master_and_follower(move)[0].can_chain):
+            # The move can follow the moves being executed without stopping
+            self.__chain_move(move)
+            self.__plan_active_moves()
+        else:
+            self._pending_moves.append(move)
+            self.__start_pending_moves()
+        enable_irq(irq_state)
+
+    def __master_and_follower(self, move: PlannedMove) -> tuple:
+        """Returns the master stepper, follower stepper, master steps, follower steps and master speed and acceleration of a move"""
+        if move.master_is_left:
+            return self._left_stepper, self._right_stepper, move.left_steps, move.right_steps, move.left_speed_sps, move.left_acceleration_spsps
+        return self._right_stepper, self._left_stepper, move.right_steps, move.left_steps, move.right_speed_sps, move.right_acceleration_spsps
+
+    def __chain_move(self, move: PlannedMove):
+        """Give a move to the steppers to follow the current active move"""
+        master, follower, master_steps, follower_steps, speed, acceleration = self.__master_and_follower(move)
+        move.move_number = master.moves_queued
+        master.set_target_speed_sps(max(speed, 1))
+        master.set_acceleration_spsps(max(acceleration, 1))
+        master.set_jerk_spspsps(move.jerk_spspsps)
+        master.chain_move(master_steps, follower_steps=follower_steps)
+        self._active_moves.append(move)
+
+    def __start_pending_moves(self):
+        """Start the next pending move if the steppers are stopped"""
+        # Note: A move of zero steps completes immediately, so prevent recursion from the stepper callback
+        if self._starting_moves:
+            return
+        self._starting_moves = True
+
+        while len(self._pending_moves) > 0 and not self._left_stepper.is_busy and not self._right_stepper.is_busy:
+            move = self._pending_moves.pop(0)
+            master, follower, master_steps, follower_steps, speed, acceleration = self.__master_and_follower(move)
+            move.move_number = master.moves_queued
+            move.entry = 0.0
+            self._active_moves = [move]
+
+            if move.left_forward:
+                self._left_stepper.set_direction_forwards()
+            else:
+                self._left_stepper.set_direction_backwards()
+            if move.right_forward:
+                self._right_stepper.set_direction_forwards()
+            else:
+                self._right_stepper.set_direction_backwards()
+
+            # Both wheels are driven by the master stepper's profile, so they start together and
+            # stay in proportion throughout the move
+            master.set_target_speed_sps(max(speed, 1))
+            master.set_acceleration_spsps(max(acceleration, 1))
+            master.set_jerk_spspsps(move.jerk_spspsps)
+            master.move(master_steps, follower=follower, follower_steps=follower_steps)
+
+            # Chain any following moves that can blend with the move
+            while len(self._pending_moves) > 0 and self._active_moves[-1].can_blend(self._pending_moves[0]) and master.can_chain:
+                self.__chain_move(self._pending_moves.pop(0))
+            self.__plan_active_moves()
+
+        self._starting_moves = False
+
+    def __plan_active_moves(self):
+        """Calculate the junction speeds between the active moves"""
+        # Remove any moves that have been completed
+        completed = min(self._left_stepper.moves_completed, self._right_stepper.moves_completed)
+        while len(self._active_moves) > 0 and self._active_moves[0].move_number < completed:
+            self._active_moves.pop(0)
+        if len(self._active_moves) == 0:
+            return
+
+        # Backward pass - the last move must stop, so work back from there finding the highest
+        # speed each move can be entered at and still slow down in time
+        next_entry = 0.0
+        for move in reversed(self._active_moves):
+            move.exit = next_entry
+            next_entry = move.reachable_speed(move.exit)
+
+        # Forward pass - limit the junction speeds to what can be reached by accelerating from
+        # the entry speed of the first move (which is already being executed)
+        entry = self._active_moves[0].entry
+        for move in self._active_moves:
+            move.entry = entry
+            move.exit = min(move.exit, move.reachable_speed(entry))
+            entry = move.exit
+
+        # Set the exit speeds of the moves (the follower wheel is driven by the master wheel's profile)
+        for move in self._active_moves:
+            master, follower, master_steps, follower_steps, speed, acceleration = self.__master_and_follower(move)
+            master.set_exit_speed_sps(move.move_number - master.moves_completed, move.exit * speed)
+
+    def __stepper_completed(self):
+        # Callback from the steppers when a move has completed
+        self.__start_pending_moves()
+        self._move_completed_flag.set()
+        for fn in self._completion_callbacks:
+            fn()
 
     def set_heading(self, degrees: float):
         """Set the heading in degrees"""
@@ -361,7 +560,7 @@ class DiffDrive:
 
         current_heading_degrees = math.degrees(self._heading_radians)
         if math.isclose(current_heading_degrees, degrees, abs_tol=1e-2):
-            picolog.debug(f"DiffDrive::set_heading - Already at required heading ({degrees}°)")
+            picolog.debug("DiffDrive::set_heading - Already at required heading ({}°)", degrees)
             return
 
         # Convert degrees to radians
@@ -379,10 +578,10 @@ class DiffDrive:
 
         # Determine turning direction
         if angle_difference > 0:
-            picolog.debug(f"DiffDrive::__set_heading - Turning left by {math.degrees(angle_difference):.2f} degrees")
+            picolog.debug("DiffDrive::__set_heading - Turning left by {:.2f} degrees", math.degrees(angle_difference))
             self.turn_left(math.degrees(angle_difference))
         elif angle_difference < 0:
-            picolog.debug(f"DiffDrive::__set_heading - Turning right by {math.degrees(-angle_difference):.2f} degrees")
+            picolog.debug("DiffDrive::__set_heading - Turning right by {:.2f} degrees", math.degrees(-angle_difference))
             self.turn_right(math.degrees(-angle_difference))
 
         # Update the heading to the target value
@@ -437,17 +636,9 @@ class DiffDrive:
 
             self._heading_radians = (self._heading_radians + turn_angle) % (2 * math.pi)
 
-            picolog.debug("DiffDrive::set_cartesian_position - Waiting for turn to complete (backward).")
-            while self._left_stepper.is_busy or self._right_stepper.is_busy:
-                time.sleep(0.2)
-
             if not turn_only:
                 self.drive_backward(distance)
 
-                picolog.debug("DiffDrive::set_cartesian_position - Waiting for movement to complete (backward).")
-                while self._left_stepper.is_busy or self._right_stepper.is_busy:
-                    time.sleep(0.2)
-
                 # Restore the original heading
                 self.__set_heading(current_heading)                
         else:
@@ -459,17 +650,9 @@ class DiffDrive:
 
             self._heading_radians = (self._heading_radians + angle_diff) % (2 * math.pi)
 
-            picolog.debug("DiffDrive::set_cartesian_position - Waiting for turn to complete (forward).")
-            while self._left_stepper.is_busy or self._right_stepper.is_busy:
-                time.sleep(0.2)
-
             if not turn_only:
                 self.drive_forward(distance)
 
-                picolog.debug("DiffDrive::set_cartesian_position - Waiting for movement to complete (forward).")
-                while self._left_stepper.is_busy or self._right_stepper.is_busy:
-                    time.sleep(0.2)
-
                 # Restore the original heading
                 self.__set_heading(current_heading) 
 
@@ -477,9 +660,32 @@ class DiffDrive:
         """Get the Cartesian x and y position"""
         return round(self._x_pos, 2), round(self._y_pos, 2)
 
+    def get_actual_pose(self) -> tuple:
+        """Get the pose the motors have reached (x and y in um, heading in degrees). Whilst moving it's
+        dead reckoned from the steps given since the last call (taken as one arc), so it should be called
+        regularly; when the motors are stopped it's the planned pose"""
+        left_count, right_count = self.step_counts
+        if not self.is_moving:
+            x, y, heading = self._x_pos, self._y_pos, self._heading_radians
+        else:
+            x, y, heading = self._actual_pose
+            left_steps = left_count - self._actual_step_counts[0]
+            right_steps = right_count - self._actual_step_counts[1]
+
+            # Note: Turning left counts the left motor's steps up and the right motor's steps down
+            distance_um = (left_steps + right_steps) / (2 * self.__um_to_steps(1))
+            turn_radians = (left_steps - right_steps) / (2 * self.__radians_to_steps(1))
+            x += distance_um * math.cos(heading + turn_radians / 2)
+            y += distance_um * math.sin(heading + turn_radians / 2)
+            heading += turn_radians
+
+        self._actual_pose = (x, y, heading)
+        self._actual_step_counts = (left_count, right_count)
+        return round(x, 2), round(y, 2), round(math.degrees(heading), 2) % 360
+
     def reset_origin(self):
         """Reset the Cartesian origin and heading to the current position"""
-        picolog.debug(f"DiffDrive::reset_origin - Resetting origin and heading")
+        picolog.debug("DiffDrive::reset_origin - Resetting origin and heading")
         self._x_pos = 0
         self._y_pos = 0
         self._heading_radians = 0
@@ -498,23 +704,25 @@ class DiffDrive:
         self._right_stepper.set_target_speed_sps(self.__um_to_steps(self._rotational_target_speed_umps))
         self._right_stepper.set_acceleration_spsps(self.__um_to_steps(self._rotational_acceleration_umpss))
 
-    def set_linear_velocity(self, velocity_um_s: float, acceleration_um_s2: float):
-        """Set the linear velocity"""
+    def set_linear_velocity(self, velocity_um_s: float, acceleration_um_s2: float, jerk_um_s3: float = 0):
+        """Set the linear velocity (a jerk of 0 uses a trapezoidal velocity profile, otherwise an S-curve is used)"""
         self._linear_target_speed_umps = velocity_um_s
         self._linear_acceleration_umpss = acceleration_um_s2
+        self._linear_jerk_umpsss = jerk_um_s3
 
     def get_linear_velocity(self) -> tuple:
-        """Get the linear target velocity and acceleration"""
-        return self._linear_target_speed_umps, self._linear_acceleration_umpss
+        """Get the linear target velocity, acceleration and jerk"""
+        return self._linear_target_speed_umps, self._linear_acceleration_umpss, self._linear_jerk_umpsss
 
-    def set_rotational_velocity(self, velocity_um_s: float, acceleration_um_s2: float):
-        """Set the rotational velocity"""
+    def set_rotational_velocity(self, velocity_um_s: float, acceleration_um_s2: float, jerk_um_s3: float = 0):
+        """Set the rotational velocity (a jerk of 0 uses a trapezoidal velocity profile, otherwise an S-curve is used)"""
         self._rotational_target_speed_umps = velocity_um_s
         self._rotational_acceleration_umpss = acceleration_um_s2
+        self._rotational_jerk_umpsss = jerk_um_s3
 
     def get_rotational_velocity(self) -> tuple:
-        """Get the rotational target velocity and acceleration"""
-        return self._rotational_target_speed_umps, self._rotational_acceleration_umpss
+        """Get the rotational target velocity, acceleration and jerk"""
+        return self._rotational_target_speed_umps, self._rotational_acceleration_umpss, self._rotational_jerk_umpsss
 
     def get_motor_status(self) -> tuple:
         """Returns a tuple containing the status of the stepper motors with
@@ -72,7 +72,7 @@ class Eeprom:
             if devices[idx] == self.i2c_address: self._is_present = True
 
         if self._is_present:
-            picolog.info(f"Eeprom::__init__ - 24LC16 EEPROM detected at I2C address {hex(self.i2c_address)}")
+            picolog.info("Eeprom::__init__ - 24LC16 EEPROM detected at I2C address {}", hex(self.i2c_address))
         else:
             picolog.info("Eeprom::__init__ - 24LC16 EEPROM is not present... Cannot initialise!")
 
@@ -98,7 +98,7 @@ class Eeprom:
         self._blockaddr[0] = (address & 0xFF); # Block address
 
         # Read from the EEPROM and return the collected data
-        picolog.debug(f"Eeprom::read - Address = {address} - number of bytes = {number_of_bytes}")
+        picolog.debug("Eeprom::read - Address = {} - number of bytes = {}", address, number_of_bytes)
 
         sleep(0.01)
         self.i2c.writeto(self._devaddr[0], self._blockaddr, False)
@@ -113,7 +113,7 @@ class Eeprom:
         
         remaining_data = len(data) # Keep track of what's left to write
         data_pointer = 0
-        picolog.debug(f"Eeprom::write - Writing address = {address} - write length = {remaining_data}")
+        picolog.debug("Eeprom::write - Writing address = {} - write length = {}", address, remaining_data)
 
         while remaining_data > 0:
             # Determine the device address (including the block) and intra-block address
@@ -138,7 +138,7 @@ class Eeprom:
                 page_buffer[i+1] = data[data_pointer]
                 data_pointer += 1
 
-            picolog.debug(f"Eeprom::write - Page write @ address = {address} - write length = {write_length}")
+            picolog.debug("Eeprom::write - Page write @ address = {} - write length = {}", address, write_length)
 
             # Perform a write
             sleep(0.01)
@@ -148,6 +148,25 @@ class Eeprom:
             remaining_data -= write_length
             address += write_length
 
+    def update(self, address, data: bytes, current: bytes = None) -> int:
+        # Write only the pages whose bytes differ from the current contents (which are read
+        # if they are not given). Saves page write cycles (and EEPROM wear). Returns the
+        # number of pages written.
+        if current is None:
+            current = self.read(address, len(data))
+        if len(current) != len(data):
+            raise ValueError("Eeprom::update - Current contents must be the same length as the data")
+
+        pages_written = 0
+        offset = 0
+        while offset < len(data):
+            page_length = min(self._page_size - (address + offset) % self._page_size, len(data) - offset)
+            if data[offset:offset + page_length] != current[offset:offset + page_length]:
+                self.write(address + offset, data[offset:offset + page_length])
+                pages_written += 1
+            offset += page_length
+        return pages_written
+
 if __name__ == "__main__":
     from main import main
     main()
\ No newline at end of file
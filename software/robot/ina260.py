@@ -27,6 +27,7 @@
 
 from machine import I2C
 import picolog
+import time
 
 # INA260 Registers
 _INA260_REG_CONFIG = const(0x00)
@@ -38,6 +39,15 @@ _INA260_REG_ALERT = const(0x07)
 _INA260_REG_MANU = const(0xFE)
 _INA260_REG_DIE = const(0xFF)
 
+# Config register - supported averaging and conversion times (the index is the register value)
+_AVERAGES = (1, 4, 16, 64, 128, 256, 512, 1024)
+_CONVERSION_TIMES_US = (140, 204, 332, 588, 1100, 2116, 4156, 8244)
+_INA260_MODE_CONTINUOUS = const(0x07)
+
+# Mask/Enable register - bus under-voltage alert and the alert function flag
+_INA260_MASK_BUL = const(0x1000)
+_INA260_MASK_AFF = const(0x0010)
+
 # Expected manufacturer ID and die ID values
 _TEXAS_INSTRUMENTS_ID = const(0x5449)
 _INA260_ID = const(0x2270)
@@ -61,6 +71,11 @@ class Ina260:
         """
         self.i2c = i2c
         self.address = address
+        self._buffer = bytearray(2)
+
+        # The last reading (voltage_mV, current_mA, power_mW) and when it was taken
+        self._snapshot = (0.0, 0.0, 0.0)
+        self._snapshot_ticks_ms = None
 
         # Check that the EEPROM is present
         self._is_present = False
@@ -70,7 +85,7 @@ class Ina260:
             if devices[idx] == self.address: self._is_present = True
 
         if self._is_present:
-            picolog.info(f"Ina260::__init__ - INA260 detected at I2C address {hex(self.address)}")
+            picolog.info("Ina260::__init__ - INA260 detected at I2C address {}", hex(self.address))
         else:
             picolog.info("Ina260::__init__ - INA260 is not present... Cannot initialise!")
 
@@ -85,32 +100,118 @@ class Ina260:
             if (self.die_id != _INA260_ID):
                 raise RuntimeError("INA260::__init__ - Die ID is incorrect - check IC")
 
+    def configure(self, averages: int = 1, voltage_conversion_us: int = 1100, current_conversion_us: int = 1100):
+        """
+        Configure the INA260's hardware averaging and conversion times.
+        The INA260 measures continuously; each reading is the average of the given number of
+        current and voltage conversions (so a reading is updated every
+        averages * (voltage_conversion_us + current_conversion_us) microseconds).
+
+        Args:
+            averages (int): The number of conversions averaged (1, 4, 16, 64, 128, 256, 512 or 1024).
+            voltage_conversion_us (int): The bus voltage conversion time (140, 204, 332, 588, 1100, 2116, 4156 or 8244).
+            current_conversion_us (int): The shunt current conversion time (as above).
+        """
+        if averages not in _AVERAGES:
+            raise ValueError(f"Ina260::configure - Averages must be one of {_AVERAGES}")
+        if voltage_conversion_us not in _CONVERSION_TIMES_US or current_conversion_us not in _CONVERSION_TIMES_US:
+            raise ValueError(f"Ina260::configure - Conversion times must be one of {_CONVERSION_TIMES_US}")
+        if not self._is_present: return
+
+        config = (_AVERAGES.index(averages) << 9) | (_CONVERSION_TIMES_US.index(voltage_conversion_us) << 6) \
+            | (_CONVERSION_TIMES_US.index(current_conversion_us) << 3) | _INA260_MODE_CONTINUOUS
+        self.__write_register(_INA260_REG_CONFIG, config)
+        picolog.info("Ina260::configure - Averaging {} conversions of {} us (voltage) and {} us (current)", averages, voltage_conversion_us, current_conversion_us)
+
+    def set_undervoltage_alert(self, voltage_mV: float):
+        """
+        Set the bus under-voltage alert. The INA260 compares every (averaged) voltage reading with
+        the limit and sets the alert flag itself, so the check costs a single register read (see alert).
+        Note: The ALERT pin is not connected on the Valiant Turtle 2 mainboard, so the flag is polled.
+        Args:
+            voltage_mV (float): The alert limit in mV (0 turns the alert off).
+        """
+        if not self._is_present: return
+        if voltage_mV <= 0:
+            self.__write_register(_INA260_REG_MASK, 0)
+            return
+
+        # The limit has the same LSB as the voltage register (1.25 mV)
+        self.__write_register(_INA260_REG_ALERT, min(int(voltage_mV / 1.25), 0xFFFF))
+
+        # Transparent mode (not latched), so the flag follows the most recent reading
+        self.__write_register(_INA260_REG_MASK, _INA260_MASK_BUL)
+        picolog.info("Ina260::set_undervoltage_alert - Under-voltage alert set at {} mV", voltage_mV)
+
+    @property
+    def alert(self) -> bool:
+        """True if the under-voltage alert is active (a single register read)"""
+        if not self._is_present: return False
+        return bool(self.__read_register(_INA260_REG_MASK) & _INA260_MASK_AFF)
+
+    def read(self) -> tuple:
+        """
+        Read the voltage (mV), current (mA) and power (mW) together and keep them as the snapshot.
+        Returns:
+            tuple: (voltage_mV, current_mA, power_mW)
+        """
+        if not self._is_present: return self._snapshot
+
+        voltage = self.__read_register(_INA260_REG_VOLTAGE)
+        current = self.__read_register(_INA260_REG_CURRENT)
+        power = self.__read_register(_INA260_REG_POWER)
+
+        # Current is two's complement (negative when the battery is charging)
+        if current & 0x8000: current -= 0x10000
+
+        self._snapshot = (float(voltage) * 1.25, float(current) * 1.25, float(power) * 10.0)
+        self._snapshot_ticks_ms = time.ticks_ms()
+        return self._snapshot
+
+    def cached(self, max_age_ms: int = 1000) -> tuple:
+        """
+        Get the snapshot (voltage_mV, current_mA, power_mW) without using the I2C bus, unless it is
+        older than max_age_ms (in which case the INA260 is read).
+        """
+        if self._snapshot_ticks_ms is None or time.ticks_diff(time.ticks_ms(), self._snapshot_ticks_ms) > max_age_ms:
+            return self.read()
+        return self._snapshot
+
+    @property
+    def snapshot_age_ms(self) -> int:
+        """The age of the snapshot in milliseconds (None if the INA260 hasn't been read)"""
+        if self._snapshot_ticks_ms is None: return None
+        return time.ticks_diff(time.ticks_ms(), self._snapshot_ticks_ms)
+
     # Read the current (between V+ and V-) in mA
     @property
     def current_mA(self) -> float:
         """Read the current (between V+ and V-) in mA"""
-        buffer = bytearray([_INA260_REG_CURRENT])
-        self.i2c.writeto(self.address, buffer, False)
-        response = int.from_bytes(self.i2c.readfrom(self.address, 2, True), "big")
-        return float(response) * 1.25
+        current = self.__read_register(_INA260_REG_CURRENT)
+        if current & 0x8000: current -= 0x10000
+        return float(current) * 1.25
 
     # Read the voltage in mV
     @property
     def voltage_mV(self) -> float:
         """Read the voltage in mV"""
-        buffer = bytearray([_INA260_REG_VOLTAGE])
-        self.i2c.writeto(self.address, buffer, False)
-        response = int.from_bytes(self.i2c.readfrom(self.address, 2, True), "big")
-        return float(response) * 1.25
+        return float(self.__read_register(_INA260_REG_VOLTAGE)) * 1.25
 
     # Read the power being delivered to the load in mW
     @property
     def power_mW(self) -> float:
         """Read the power being delivered to the load in mW"""
-        buffer = bytearray([_INA260_REG_POWER])
-        self.i2c.writeto(self.address, buffer, False)
-        response = int.from_bytes(self.i2c.readfrom(self.address, 2, True), "big")
-        return float(response) * 10.0
+        return float(self.__read_register(_INA260_REG_POWER)) * 10.0
+
+    def __read_register(self, register: int) -> int:
+        # Pointer write and read in a single transaction (repeated start) into the preallocated buffer
+        self.i2c.readfrom_mem_into(self.address, register, self._buffer)
+        return (self._buffer[0] << 8) | self._buffer[1]
+
+    def __write_register(self, register: int, value: int):
+        self._buffer[0] = (value >> 8) & 0xFF
+        self._buffer[1] = value & 0xFF
+        self.i2c.writeto_mem(self.address, register, self._buffer)
 
     # Read the manufacturer's ID
     @property
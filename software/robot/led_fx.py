@@ -24,96 +24,116 @@
 #   Email: simon.inns@gmail.com
 #
 #************************************************************************
-
 import picolog
 import machine, neopixel
 import asyncio
+import rp2
+from array import array
+from micropython import const
+
+# DMA request signal for the PIO 0 TX FIFOs (state-machine 0, the others follow on)
+_DREQ_PIO0_TX0 = const(0)
+
+# Interval between fade steps
+_FADE_INTERVAL_MS = const(10)
+
+# WS2812b bit timing (in PIO cycles at 8MHz, so each bit takes 1.25uS)
+_WS2812_FREQ = const(8000000)
+
+@rp2.asm_pio(sideset_init=rp2.PIO.OUT_LOW, out_shiftdir=rp2.PIO.SHIFT_LEFT, autopull=True, pull_thresh=24)
+def ws2812():
+    wrap_target()
+    label("bitloop")
+    out(x, 1)               .side(0)    [2]     # T3 - Low for the end of the previous bit
+    jmp(not_x, "do_zero")   .side(1)    [1]     # T1 - High for the start of the bit
+    jmp("bitloop")          .side(1)    [4]     # T2 - High for a 1 bit
+    label("do_zero")
+    nop()                   .side(0)    [4]     # T2 - Low for a 0 bit
+    wrap()
+
+class _Ws2812Pio:
+    """
+    WS2812b output using a PIO state-machine fed by DMA. The neopixel module bit-bangs the
+    data with interrupts disabled; here the CPU only starts the DMA transfer.
+    Note: Only PIO 0 state-machines are supported (the DMA request signal is for PIO 0).
+    """
+
+    def __init__(self, pin: machine.Pin, number_of_leds: int, state_machine: int):
+        self._words = array('I', [0] * number_of_leds)
+        self._sm = rp2.StateMachine(state_machine, ws2812, freq=_WS2812_FREQ, sideset_base=pin)
+        self._sm.active(1)
+
+        self._dma = rp2.DMA()
+        self._dma_ctrl = self._dma.pack_ctrl(size = 2, inc_write = False, treq_sel = _DREQ_PIO0_TX0 + state_machine)
+
+    def __setitem__(self, index: int, value):
+        # The state-machine shifts out the top 24 bits of each word in GRB order
+        red, green, blue = value
+        self._words[index] = (green << 24) | (red << 16) | (blue << 8)
+
+    @property
+    def busy(self) -> bool:
+        """True if the last frame is still being transferred"""
+        return self._dma.active()
+
+    def write(self):
+        self._dma.config(read = self._words, write = self._sm, count = len(self._words), ctrl = self._dma_ctrl, trigger = True)
 
 class LedFx:
     """
-    A class to control and manage LED effects using a NeoPixel strip.
-    Attributes:
-    -----------
-    number_of_leds : int
-        The number of LEDs in the NeoPixel strip.
-    neopixel : neopixel.NeoPixel
-        The NeoPixel driver instance.
-    current_red : list
-        The current red color values for each LED.
-    current_green : list
-        The current green color values for each LED.
-    current_blue : list
-        The current blue color values for each LED.
-    target_red : list
-        The target red color values for each LED.
-    target_green : list
-        The target green color values for each LED.
-    target_blue : list
-        The target blue color values for each LED.
-    fade_speed : list
-        The fade speed for each LED.
+    A class to control and manage LED effects using a string of WS2812b LEDs.
+
+    The current colours, target colours and fade speeds are held in preallocated buffers. The
+    LEDs are only written when a pixel has changed, and the task sleeps whilst every fade is
+    complete (until a new colour is set).
+
     Methods:
     --------
-    __init__(number_of_leds, data_gpio_pin):
+    __init__(number_of_leds, data_gpio_pin, state_machine):
         Initializes the LED effects controller with the specified number of LEDs and GPIO pin.
     set_led_colour(led_number, red, green, blue):
         Sets the target color for a specific LED.
     set_led_fade_speed(pixel_num, fade_speed):
         Sets the fade speed for a specific LED.
-    process_leds_task():
-        Asynchronous task to process and update the LED colors based on the target values and fade speeds.
+    run():
+        Asynchronous task to fade the LED colors towards the target values.
     """
 
-    def __init__(self, number_of_leds, data_gpio_pin):
+    def __init__(self, number_of_leds, data_gpio_pin, state_machine: int = -1):
         """
         Initialize the LED effects controller.
         Args:
             number_of_leds (int): The number of LEDs in the strip.
             data_gpio_pin (int): The GPIO pin connected to the data line of the LED strip.
-        Attributes:
-            number_of_leds (int): The number of LEDs in the strip.
-            neopixel (neopixel.NeoPixel): The NeoPixel driver instance.
-            current_red (list): The current red color values for each LED.
-            current_green (list): The current green color values for each LED.
-            current_blue (list): The current blue color values for each LED.
-            target_red (list): The target red color values for each LED.
-            target_green (list): The target green color values for each LED.
-            target_blue (list): The target blue color values for each LED.
-            fade_speed (list): The fade speed for each LED.
+            state_machine (int): Drive the LEDs from this PIO 0 state-machine using DMA (-1 = use the neopixel module).
         """
 
         self.number_of_leds = number_of_leds
 
-        # Initialise the neopixel driver
-        self.neopixel = neopixel.NeoPixel(machine.Pin(data_gpio_pin), self.number_of_leds)
+        # Initialise the output driver
+        self._use_pio = state_machine >= 0
+        if not self._use_pio:
+            self.neopixel = neopixel.NeoPixel(machine.Pin(data_gpio_pin), self.number_of_leds)
+        else:
+            picolog.debug("LedFx::__init__ - Using PIO 0 state-machine {} and DMA", state_machine)
+            self.neopixel = _Ws2812Pio(machine.Pin(data_gpio_pin), self.number_of_leds, state_machine)
+
+        # Pixel values (3 bytes per LED in RGB order) and the fade speed for each LED
+        self._current = bytearray(self.number_of_leds * 3)
+        self._target = bytearray(self.number_of_leds * 3)
+        self._fade_speed = bytearray([5] * self.number_of_leds)
 
-        # Set up pixel values
-        self.current_red = []
-        self.current_green = []
-        self.current_blue = []
-        self.target_red = []
-        self.target_green = []
-        self.target_blue = []
-        self.fade_speed = []
+        # Set when a target colour changes (wakes the run task)
+        self._changed = asyncio.Event()
+        self._frame_pending = False
 
         for idx in range(self.number_of_leds):
-            self.current_red.append(0)
-            self.current_green.append(0)
-            self.current_blue.append(0)
-            self.target_red.append(0)
-            self.target_green.append(0)
-            self.target_blue.append(0)
-            self.fade_speed.append(5)
-
-        self.neopixel.fill((0,0,0))
+            self.neopixel[idx] = (0, 0, 0)
         self.neopixel.write()
 
     def is_led_on(self, led_number) -> bool:
-        active = False
-        if self.target_red[led_number] != 0: active = True
-        if self.target_green[led_number] != 0: active = True
-        if self.target_blue[led_number] != 0: active = True
-        return active
+        offset = led_number * 3
+        return self._target[offset] != 0 or self._target[offset + 1] != 0 or self._target[offset + 2] != 0
 
     def set_led_colour(self, led_number, red, green, blue):
         """
@@ -129,58 +149,83 @@ class LedFx:
 
         if led_number < 0 or led_number >= self.number_of_leds:
             raise ValueError("LedFx::set_led_colour - Led number exceeds the number of available LEDs")
-        self.target_red[led_number] = red
-        self.target_green[led_number] = green
-        self.target_blue[led_number] = blue
+        offset = led_number * 3
+        target = self._target
+        if target[offset] != red or target[offset + 1] != green or target[offset + 2] != blue:
+            target[offset] = red
+            target[offset + 1] = green
+            target[offset + 2] = blue
+            self._changed.set()
 
     def set_led_fade_speed(self, pixel_num, fade_speed):
         """
         Sets the fade speed for a specific LED.
         Parameters:
         pixel_num (int): The index of the LED to set the fade speed for.
-        fade_speed (int): The speed at which the LED should fade.
+        fade_speed (int): The amount each colour component moves towards its target every 10 ms (1-255).
         Raises:
-        ValueError: If the pixel_num exceeds the number of available LEDs.
+        ValueError: If the pixel_num exceeds the number of available LEDs or the fade speed is out of range.
         """
 
         if pixel_num < 0 or pixel_num >= self.number_of_leds:
             raise ValueError("LedFx::set_led_fade_speed - Led number exceeds the number of available LEDs")
-        self.fade_speed[pixel_num] = fade_speed
+        if fade_speed < 1 or fade_speed > 255:
+            raise ValueError("LedFx::set_led_fade_speed - Fade speed must be between 1 and 255")
+        self._fade_speed[pixel_num] = fade_speed
+
+    @property
+    def is_fading(self) -> bool:
+        """True if any LED hasn't reached its target colour"""
+        return self._current != self._target
+
+    def __step(self) -> bool:
+        # Move every colour component one step towards its target (stopping at the target) and
+        # write the LEDs if a pixel changed. Returns True if any LED is still fading.
+        current = self._current
+        target = self._target
+        changed = False
+        for idx in range(self.number_of_leds):
+            speed = self._fade_speed[idx]
+            pixel_changed = False
+            for offset in range(idx * 3, idx * 3 + 3):
+                value = current[offset]
+                goal = target[offset]
+                if value == goal: continue
+                if goal > value: value = min(value + speed, goal)
+                else: value = max(value - speed, goal)
+                current[offset] = value
+                pixel_changed = True
+
+            if pixel_changed:
+                self.neopixel[idx] = (current[idx * 3], current[idx * 3 + 1], current[idx * 3 + 2])
+                changed = True
+
+        if changed or self._frame_pending:
+            # If the previous frame is still being sent, try again on the next step
+            if self._use_pio and self.neopixel.busy:
+                self._frame_pending = True
+            else:
+                self.neopixel.write()
+                self._frame_pending = False
+
+        return self._frame_pending or current != target
 
     # Process the LED effects
     async def run(self):
         """
         Asynchronous task to process and update the LED colors.
-        This task continuously adjusts the current color values of the LEDs towards their target values
-        using a specified fade speed. It ensures that the color values remain within the valid range (0-255)
-        and updates the LED strip accordingly.
-        The task runs indefinitely, updating the LED colors and writing the changes to the LED strip
-        at regular intervals.
+        Whilst any LED is fading, the current colour values are moved towards their targets (by
+        the LED's fade speed) every 10 ms and the changed pixels are written to the LED strip.
+        Once every fade is complete the task waits until a target colour is changed.
         """
 
         picolog.debug("LedFx::run - Running")
         while True:
-            for idx in range(self.number_of_leds):
-                if (self.target_red[idx] > self.current_red[idx]): self.current_red[idx] += self.fade_speed[idx]
-                elif (self.target_red[idx] < self.current_red[idx]): self.current_red[idx] -= self.fade_speed[idx]
-                if (self.target_green[idx] > self.current_green[idx]): self.current_green[idx] += self.fade_speed[idx]
-                elif (self.target_green[idx] < self.current_green[idx]): self.current_green[idx] -= self.fade_speed[idx]
-                if (self.target_blue[idx] > self.current_blue[idx]): self.current_blue[idx] += self.fade_speed[idx]
-                elif (self.target_blue[idx] < self.current_blue[idx]): self.current_blue[idx] -= self.fade_speed[idx]
-
-                if (self.current_red[idx] < 0): self.current_red[idx] = 0
-                if (self.current_red[idx] > 255): self.current_red[idx] = 255
-                if (self.current_green[idx] < 0): self.current_green[idx] = 0
-                if (self.current_green[idx] > 255): self.current_green[idx] = 255
-                if (self.current_blue[idx] < 0): self.current_blue[idx] = 0
-                if (self.current_blue[idx] > 255): self.current_blue[idx] = 255
-
-                self.neopixel[idx] = (self.current_red[idx], self.current_green[idx], self.current_blue[idx])
-
-            # Perform the actual update
-            self.neopixel.write()
-            await asyncio.sleep_ms(10)
+            await self._changed.wait()
+            self._changed.clear()
+            while self.__step():
+                await asyncio.sleep_ms(_FADE_INTERVAL_MS)
 
 if __name__ == "__main__":
     from main import main
-    main()
\ No newline at end of file
+    main()
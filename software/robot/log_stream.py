@@ -0,0 +1,96 @@
+#************************************************************************
+#
+#   log_stream.py
+#
+#   Send the picolog ring buffer to central
+#   Valiant Turtle 2 - Robot firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import picolog
+import asyncio
+
+from ble_peripheral import BlePeripheral
+from micropython import const
+
+# The largest notification (the log is split into chunks of this size)
+_CHUNK_LENGTH = const(20)
+
+# Interval between notifications (so the log doesn't crowd out the command exchange)
+_CHUNK_INTERVAL_MS = const(10)
+
+class LogStream:
+    """
+    Sends the log records held in picolog's ring buffer to central as text (each record is
+    followed by a newline) on the log characteristic. Once enabled (by central with command 35)
+    the records already in the buffer are sent, followed by each new record as it is logged.
+    Note: This requires picolog to be configured with a ring buffer.
+    """
+
+    def __init__(self, ble_peripheral: BlePeripheral):
+        self._ble_peripheral = ble_peripheral
+        self._enabled = False
+        self._enabled_event = asyncio.Event()
+        self._index = 0 # The index of the next record to send
+
+    @property
+    def is_enabled(self) -> bool:
+        return self._enabled
+
+    def set_enabled(self, enable: bool):
+        """Start (from the oldest record in the buffer) or stop sending the log"""
+        self._enabled = bool(enable)
+        self._index = picolog.first_index()
+        self._enabled_event.set()
+        picolog.info("LogStream::set_enabled - Log stream enabled = {}", self._enabled)
+
+    async def run(self):
+        picolog.debug("LogStream::run - Running")
+        while True:
+            # The stream stops when central disconnects (the next central starts it if it wants it)
+            if self._enabled and not self._ble_peripheral.is_connected:
+                self.set_enabled(False)
+
+            if not self._enabled:
+                self._enabled_event.clear()
+                try:
+                    await asyncio.wait_for_ms(self._enabled_event.wait(), 500)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Skip any records that were overwritten before they could be sent
+            self._index = max(self._index, picolog.first_index())
+            if self._index >= picolog.next_index():
+                await asyncio.sleep_ms(100)
+                continue
+
+            record = picolog.record(self._index)
+            self._index += 1
+            data = (record + "\n").encode()
+            for offset in range(0, len(data), _CHUNK_LENGTH):
+                if not self._ble_peripheral.send_log(data[offset:offset + _CHUNK_LENGTH]):
+                    break
+                await asyncio.sleep_ms(_CHUNK_INTERVAL_MS)
+
+if __name__ == "__main__":
+    from main import main
+    main()
@@ -30,12 +30,15 @@ from pen import Pen
 from ina260 import Ina260
 from eeprom import Eeprom
 from configuration import Configuration
+from config_journal import ConfigJournal
 from ble_peripheral import BlePeripheral
 from led_fx import LedFx
 from diffdrive import DiffDrive
 from machine import I2C, Pin
 from commands_rx import CommandsRx
 from control import Control
+from telemetry import Telemetry
+from log_stream import LogStream
 import asyncio
 
 # GPIO hardware mapping
@@ -56,6 +59,24 @@ _GPIO_M0 = const(12)
 _GPIO_M1 = const(13)
 _GPIO_M2 = const(14)
 
+# Stream the stepper profiles to the PIO using DMA (0 = set each segment from the PIO interrupt)
+_STEPPER_DMA = const(1)
+
+# Drive the LEDs from this PIO 0 state-machine using DMA (-1 = bit-bang them with the neopixel module)
+# Note: The steppers use state-machines 0 and 1
+_LED_STATE_MACHINE = const(2)
+
+# The number of log records kept in RAM (0 = write each record straight away)
+_LOG_BUFFER_RECORDS = const(64)
+
+# Power monitoring - the minimum allowed battery voltage (3.0V per cell), the INA260 averaging
+# (64 x 2.2 ms conversions gives a reading every 141 ms, which filters out the motor current spikes)
+# and how often the alert is polled (and how many polls between snapshot reads)
+_POWER_LOW_MV = const(12000)
+_POWER_MONITOR_AVERAGES = const(64)
+_POWER_MONITOR_POLL_MS = const(100)
+_POWER_MONITOR_READ_POLLS = const(10)
+
 # WS2812b led number mapping
 _LED_status = const(0)
 _LED_left_motor = const(1)
@@ -123,26 +144,30 @@ def main():
 
     # Power monitoring task
     async def power_monitor_task():
-        while True:
-            # Read the power from the INA260
-            current = ina260.current_mA
-            voltage = ina260.voltage_mV
-            power = ina260.power_mW
-
-            #picolog.debug(f"Power monitor: {voltage}mV, {current}mA, {power}mW")
+        # The INA260 checks every reading against the minimum allowed cell voltage (3.0V per cell) itself,
+        # so the alert flag is polled quickly (one register read) and the full snapshot is only read
+        # once a second (for the power command and telemetry)
+        ina260.configure(_POWER_MONITOR_AVERAGES, 1100, 1100)
+        ina260.set_undervoltage_alert(_POWER_LOW_MV)
 
-            # Check if the power level is below the minimum allowed
-            # cell voltage (3.0V) and set the event flag
-            if (voltage < 12000):
+        poll = 0
+        while True:
+            if ina260.alert:
                 if not power_low_event.is_set():
                     picolog.warning("Power monitor: Power low event set")
                     power_low_event.set()
-            else:
-                if power_low_event.is_set():
+
+            if poll == 0:
+                voltage, current, power = ina260.read()
+                #picolog.debug(f"Power monitor: {voltage}mV, {current}mA, {power}mW")
+
+                if power_low_event.is_set() and voltage >= _POWER_LOW_MV:
                     picolog.warning("Power monitor: Power low event cleared")
                     power_low_event.clear()
+                    power_restored_event.set()
 
-            await asyncio.sleep(5)
+            poll = (poll + 1) % _POWER_MONITOR_READ_POLLS
+            await asyncio.sleep_ms(_POWER_MONITOR_POLL_MS)
 
     # Async task generation and launch
     async def aio_main():
@@ -152,11 +177,16 @@ def main():
             asyncio.create_task(led_fx.run()), # LED effects task
             asyncio.create_task(robot_status_task()), # Robot status monitoring task
             asyncio.create_task(power_monitor_task()), # Robot power monitoring task
+            asyncio.create_task(telemetry.run()), # Telemetry notification task
+            asyncio.create_task(log_stream.run()), # Log stream notification task
+            asyncio.create_task(picolog.run()), # Log writing task
         ]
         await asyncio.gather(*tasks)
 
     # Configure the picolog module
-    picolog.basicConfig(level=picolog.DEBUG)
+    # Note: Records are kept in a ring buffer and written by the log task (so logging doesn't hold up
+    # the motion and BLE tasks), and central can retrieve them with the log stream command
+    picolog.basicConfig(level=picolog.DEBUG, buffer_records=_LOG_BUFFER_RECORDS)
 
     # Initialise the pen control
     pen = Pen(Pin(_GPIO_PEN))
@@ -169,33 +199,38 @@ def main():
     # Initialise the INA260 power monitoring chip
     ina260 = Ina260(i2c_internal, 0x40)
     power_low_event = asyncio.Event()
+    power_restored_event = asyncio.Event()
 
     # Initialise the EEPROM
     eeprom = Eeprom(i2c_internal, 0x50)
 
-    # Initialise BLE peripheral
-    ble_peripheral = BlePeripheral()
-
     # Configure the LEDs
-    led_fx = LedFx(5, _GPIO_LEDS)
+    led_fx = LedFx(5, _GPIO_LEDS, _LED_STATE_MACHINE)
 
     # Initialise the differential drive motor control
-    diff_drive = DiffDrive(_GPIO_ENABLE, _GPIO_M0, _GPIO_M1, _GPIO_M2, _GPIO_LM_STEP, _GPIO_LM_DIR, _GPIO_RM_STEP, _GPIO_RM_DIR)
+    diff_drive = DiffDrive(_GPIO_ENABLE, _GPIO_M0, _GPIO_M1, _GPIO_M2, _GPIO_LM_STEP, _GPIO_LM_DIR, _GPIO_RM_STEP, _GPIO_RM_DIR, _STEPPER_DMA == 1)
 
     # Read the configuration from EEPROM
     configuration = Configuration()
-    if not configuration.unpack(eeprom.read(0, configuration.pack_size)):
-        # Current EEPROM image is invalid, write the default
-        eeprom.write(0, configuration.pack())
+    config_journal = ConfigJournal(eeprom)
+    if not config_journal.load(configuration):
+        # There's no valid configuration in the EEPROM, write the default
+        config_journal.save(configuration)
 
-    # Initialise the BLE peripheral
-    ble_peripheral = BlePeripheral()
+    # Initialise the BLE peripheral (which advertises the configured turtle ID)
+    ble_peripheral = BlePeripheral(configuration)
 
     # Initialise the commands handler
-    commands = CommandsRx(pen, ina260, eeprom, led_fx, diff_drive, configuration)
+    commands = CommandsRx(pen, ina260, config_journal, led_fx, diff_drive, configuration)
+
+    # Initialise the telemetry (sent to central once central sets the interval)
+    telemetry = Telemetry(ble_peripheral, diff_drive, ina260, pen)
+
+    # Initialise the log stream (sent to central once central asks for it)
+    log_stream = LogStream(ble_peripheral)
 
     # Initialise the control handler
-    control = Control(ble_peripheral, commands, power_low_event)
+    control = Control(ble_peripheral, commands, power_low_event, telemetry, log_stream, power_restored_event)
 
     # Run
     asyncio.run(aio_main())
@@ -26,6 +26,7 @@
 #************************************************************************
 
 import sys
+import asyncio
 
 DEBUG = 10
 INFO = 20
@@ -33,45 +34,114 @@ WARNING = 30
 ERROR = 40
 CRITICAL = 50
 
+_LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR", CRITICAL: "CRITICAL"}
+
 _level = INFO
 _uart = None
 
-def basicConfig(level=INFO, uart=None):
-    global _level, _uart
+# Messages are formatted with str.format and the arguments given after the message, so nothing
+# is formatted if the level is disabled (callers should pass the values rather than an f-string):
+#
+#   picolog.debug("Stepper::move - Moving {} steps", steps)
+#
+# By default each record is written straight away. With a ring buffer (see basicConfig) the
+# record is stored unformatted and the run() task formats and writes it later, so logging
+# doesn't hold up the caller. The buffer keeps the most recent records (even once written)
+# so they can be retrieved (for example, over BLE).
+# Note: The arguments are formatted when the record is written, so they shouldn't be changed
+# by the caller afterwards (pass a copy of a list rather than the list).
+_buffer = None
+_added = 0 # The number of records added to the buffer
+_written = 0 # The number of records written by run()
+_wake = None
+
+def basicConfig(level=INFO, uart=None, buffer_records=0):
+    """
+    Configure logging.
+    Args:
+        level (int): The lowest level logged.
+        uart (machine.UART): Write to a UART rather than stdout.
+        buffer_records (int): The size of the ring buffer in records (0 = write each record straight away).
+                              With a ring buffer the run() task must be running.
+    """
+    global _level, _uart, _buffer, _added, _written, _wake
     _level = level
     _uart = uart
+    _buffer = [None] * buffer_records if buffer_records > 0 else None
+    _added = 0
+    _written = 0
+    _wake = asyncio.ThreadSafeFlag() if _buffer is not None else None
+
+def isEnabledFor(level) -> bool:
+    """True if records of the level are logged (to guard logging that needs expensive arguments)"""
+    return _level <= level
 
 def debug(msg, *args):
-    if _level <= DEBUG:
-        if not _uart:
-            sys.stdout.write("[DEBUG] " + msg.format(*args) + "\n")
-        else:
-            _uart.write("[DEBUG] " + msg.format(*args) + "\r\n")
+    if _level <= DEBUG: _log(DEBUG, msg, args)
 
 def info(msg, *args):
-    if _level <= INFO:
-        if not _uart:
-            sys.stdout.write("[INFO] " + msg.format(*args) + "\n")
-        else:
-            _uart.write("[INFO] " + msg.format(*args) + "\r\n")
+    if _level <= INFO: _log(INFO, msg, args)
 
 def warning(msg, *args):
-    if _level <= WARNING:
-        if not _uart:
-            sys.stdout.write("[WARNING] " + msg.format(*args) + "\n")
-        else:
-            _uart.write("[WARNING] " + msg.format(*args) + "\r\n")
+    if _level <= WARNING: _log(WARNING, msg, args)
 
 def error(msg, *args):
-    if _level <= ERROR:
-        if not _uart:
-            sys.stdout.write("[ERROR] " + msg.format(*args) + "\n")
-        else:
-            _uart.write("[ERROR] " + msg.format(*args) + "\r\n")
+    if _level <= ERROR: _log(ERROR, msg, args)
 
 def critical(msg, *args):
-    if _level <= CRITICAL:
-        if not _uart:
-            sys.stdout.write("[CRITICAL] " + msg.format(*args) + "\n")
-        else:
-            _uart.write("[CRITICAL] " + msg.format(*args) + "\r\n")
+    if _level <= CRITICAL: _log(CRITICAL, msg, args)
+
+def _log(level, msg, args):
+    global _added
+    if _buffer is None:
+        _write(_format((level, msg, args)))
+        return
+
+    # The oldest record is overwritten once the buffer is full
+    _buffer[_added % len(_buffer)] = (level, msg, args)
+    _added += 1
+    _wake.set()
+
+def _format(record) -> str:
+    level, msg, args = record
+    return "[" + _LEVEL_NAMES.get(level, str(level)) + "] " + (msg.format(*args) if args else msg)
+
+def _write(line: str):
+    if not _uart:
+        sys.stdout.write(line + "\n")
+    else:
+        _uart.write(line + "\r\n")
+
+def first_index() -> int:
+    """The index of the oldest record held in the ring buffer"""
+    if _buffer is None: return 0
+    return max(0, _added - len(_buffer))
+
+def next_index() -> int:
+    """The index the next record added to the ring buffer will have"""
+    return _added
+
+def record(index: int) -> str:
+    """Get a formatted record from the ring buffer (None if it is no longer held)"""
+    if _buffer is None or index < first_index() or index >= _added: return None
+    return _format(_buffer[index % len(_buffer)])
+
+async def run():
+    """Task to write the records added to the ring buffer (one at a time, so other tasks can run in between)"""
+    global _written
+    while True:
+        while _buffer is not None and _written < _added:
+            if _written < first_index():
+                # The buffer wrapped before the records could be written
+                lost = first_index() - _written
+                _written = first_index()
+                _write("[WARNING] picolog - " + str(lost) + " records were lost (the ring buffer is full)")
+
+            _write(_format(_buffer[_written % len(_buffer)]))
+            _written += 1
+            await asyncio.sleep_ms(0)
+
+        if _wake is None:
+            # Records are written straight away, so there's nothing to do
+            return
+        await _wake.wait()
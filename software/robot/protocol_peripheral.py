@@ -0,0 +1,172 @@
+#************************************************************************
+#
+#   protocol_peripheral.py
+#
+#   Command protocol codec (peripheral)
+#   Valiant Turtle 2 - Robot firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Generated from software/protocol/schema.py by software/protocol/codegen.py - do not edit
+
+from micropython import const
+
+# The length of every packet
+PACKET_LENGTH = const(20)
+
+# Response types (stored in the last byte of the response)
+RESPONSE_TYPE_OFFSET = const(19)
+RESPONSE_RESULT = const(0x00)
+RESPONSE_ACCEPTED = const(0x01)
+RESPONSE_COMPLETED = const(0x02)
+
+# Command IDs
+MOTORS = const(1)
+FORWARD = const(2)
+BACKWARD = const(3)
+LEFT = const(4)
+RIGHT = const(5)
+CIRCLE = const(6)
+SETHEADING = const(7)
+SETX = const(8)
+SETY = const(9)
+SETPOSITION = const(10)
+TOWARDS = const(11)
+RESET_ORIGIN = const(12)
+HEADING = const(13)
+POSITION = const(14)
+PENUP = const(15)
+PENDOWN = const(16)
+EYES = const(17)
+POWER = const(18)
+ISDOWN = const(19)
+SET_LINEAR_VELOCITY = const(20)
+SET_ROTATIONAL_VELOCITY = const(21)
+GET_LINEAR_VELOCITY = const(22)
+GET_ROTATIONAL_VELOCITY = const(23)
+SET_WHEEL_DIAMETER_CALIBRATION = const(24)
+SET_AXEL_DISTANCE_CALIBRATION = const(25)
+GET_WHEEL_DIAMETER_CALIBRATION = const(26)
+GET_AXEL_DISTANCE_CALIBRATION = const(27)
+SET_TURTLE_ID = const(28)
+GET_TURTLE_ID = const(29)
+LOAD_CONFIG = const(30)
+SAVE_CONFIG = const(31)
+RESET_CONFIG = const(32)
+MOTION_QUEUE = const(33)
+SET_TELEMETRY_INTERVAL = const(34)
+SET_LOG_STREAM = const(35)
+COMMAND_COUNT = const(36) # The highest command ID + 1
+
+# Commands that are acknowledged as soon as they are queued (when the motion queue
+# is enabled) and then report completion once they have been executed
+DEFERRED_COMMANDS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 15, 16, 17, 20, 21, 24, 25)
+
+# Commands that are given to the motion planner (so the following moves can be planned
+# whilst they are executing)
+PLANNED_COMMANDS = (2, 3, 4, 5, 6, 7, 8, 9, 10, 11)
+
+# Commands that only read the robot's state (answered straight away, even with moves queued)
+QUERY_COMMANDS = (13, 14, 18, 19, 22, 23, 26, 27, 29)
+
+# Formats of the parameters (which follow the command ID) indexed by command ID (None = no parameters)
+PARAMETER_FORMATS = (
+    None,
+    '<B', # 1 = motors
+    '<f', # 2 = forward
+    '<f', # 3 = backward
+    '<f', # 4 = left
+    '<f', # 5 = right
+    '<ff', # 6 = circle
+    '<f', # 7 = setheading
+    '<f', # 8 = setx
+    '<f', # 9 = sety
+    '<ff', # 10 = setposition
+    '<ff', # 11 = towards
+    None, # 12 = reset_origin
+    None, # 13 = heading
+    None, # 14 = position
+    None, # 15 = penup
+    None, # 16 = pendown
+    '<BBBB', # 17 = eyes
+    None, # 18 = power
+    None, # 19 = isdown
+    '<iii', # 20 = set_linear_velocity
+    '<iii', # 21 = set_rotational_velocity
+    None, # 22 = get_linear_velocity
+    None, # 23 = get_rotational_velocity
+    '<i', # 24 = set_wheel_diameter_calibration
+    '<i', # 25 = set_axel_distance_calibration
+    None, # 26 = get_wheel_diameter_calibration
+    None, # 27 = get_axel_distance_calibration
+    '<B', # 28 = set_turtle_id
+    None, # 29 = get_turtle_id
+    None, # 30 = load_config
+    None, # 31 = save_config
+    None, # 32 = reset_config
+    '<B', # 33 = motion_queue
+    '<H', # 34 = set_telemetry_interval
+    '<B', # 35 = set_log_stream
+)
+
+# Formats of the results (which follow the sequence number) indexed by command ID (None = no result)
+RESPONSE_FORMATS = (
+    None,
+    None, # 1 = motors
+    '<fff', # 2 = forward
+    '<fff', # 3 = backward
+    '<fff', # 4 = left
+    '<fff', # 5 = right
+    '<fff', # 6 = circle
+    None, # 7 = setheading
+    '<fff', # 8 = setx
+    '<fff', # 9 = sety
+    '<fff', # 10 = setposition
+    '<fff', # 11 = towards
+    None, # 12 = reset_origin
+    '<f', # 13 = heading
+    '<ff', # 14 = position
+    None, # 15 = penup
+    None, # 16 = pendown
+    None, # 17 = eyes
+    '<iii', # 18 = power
+    '<B', # 19 = isdown
+    None, # 20 = set_linear_velocity
+    None, # 21 = set_rotational_velocity
+    '<iii', # 22 = get_linear_velocity
+    '<iii', # 23 = get_rotational_velocity
+    None, # 24 = set_wheel_diameter_calibration
+    None, # 25 = set_axel_distance_calibration
+    '<i', # 26 = get_wheel_diameter_calibration
+    '<i', # 27 = get_axel_distance_calibration
+    None, # 28 = set_turtle_id
+    '<B', # 29 = get_turtle_id
+    None, # 30 = load_config
+    None, # 31 = save_config
+    None, # 32 = reset_config
+    None, # 33 = motion_queue
+    None, # 34 = set_telemetry_interval
+    None, # 35 = set_log_stream
+)
+
+# Formats of the motion queue's responses (which follow the sequence number)
+ACCEPTED_FORMAT = '<BB' # slot, depth
+COMPLETED_FORMAT = '<fff' # x_mm, y_mm, heading_degrees
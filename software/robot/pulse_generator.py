@@ -26,12 +26,34 @@
 #************************************************************************
 
 import picolog
-from machine import Pin
+from machine import Pin, mem32, disable_irq, enable_irq
+from micropython import const
+from array import array
 import rp2
 
+# PIO register addresses (used to start state-machines together)
+_PIO0_BASE = const(0x50200000)
+_PIO1_BASE = const(0x50300000)
+_PIO_CTRL = const(0x000)
+_ATOMIC_SET = const(0x2000)
+
+# DMA request signals for the PIO TX FIFOs (state-machine 0, the others follow on)
+_DREQ_PIO0_TX0 = const(0)
+_DREQ_PIO1_TX0 = const(8)
+
+# The number of segments held by each DMA buffer (two buffers are used, so one can be
+# filled whilst the other is being transferred)
+_DMA_BUFFER_SEGMENTS = const(16)
+
+# The number of PIO cycles used by each segment (excluding the pulses) and by each pulse (excluding the delays)
+# Note: This is dependent on the PIO code and will change if the ASM code changes
+_SEGMENT_OVERHEAD = const(7)
+_PULSE_OVERHEAD = const(7)
+
 @rp2.asm_pio(set_init=(rp2.PIO.OUT_LOW))
 def pulse_generator():
     wrap_target()
+    label("start")
     pull(block)             # Pull (with blocking) FIFO into OSR (first, number of steps)
     mov(x, osr)             # Store the OSR in X
 
@@ -40,8 +62,13 @@ def pulse_generator():
 
     irq(rel(0))             # Signal parameters read to CPU (IRQ relative to SM number)
 
+    jmp(x_dec, "step")      # If X != 0 then X-- and jump to "step"
+
+    label("idle")           # Zero steps - idle for the number of delay cycles
+    jmp(y_dec, "idle")
+    wrap()
+
     label("step")
-    jmp(not_x, "finished")  # If X == 0 then jump to "finished"
     set(pins, 1)            # Turn pin on
 
     label("ondelay")
@@ -54,11 +81,8 @@ def pulse_generator():
     jmp(y_dec,"offdelay")
     mov(y, osr)             # Restore the Y register (number of delay cycles)
 
-    jmp(x_dec,"step")       # X-- then jump to "step"
-
-    label("finished")
-    set(pins, 0)            # Ensure output pin is 0 (not really needed)
-    wrap()
+    jmp(x_dec,"step")       # If X != 0 then X-- and jump to "step"
+    jmp("start")
 
 class PulseGenerator:
     """
@@ -67,10 +91,24 @@ class PulseGenerator:
         _sm (rp2.StateMachine): The state machine instance used for pulse generation.
         callbacks (list): A list of callback functions to be called on interrupts.
     Methods:
-        __init__(_pio: int, _state_machine: int, pin: Pin):
+        __init__(_pio: int, _state_machine: int, pin: Pin, use_dma: bool):
             Initializes the PulseGenerator with the specified PIO and state machine.
-        set(pps: int, pulses: int):
+        set(pps: int, pulses: int) -> int:
             Sets the pulse generator with the specified pulses per second (PPS) and number of pulses.
+        set_duration(pulses: int, cycles: int) -> int:
+            Sets the pulse generator to spread the number of pulses over the specified number of PIO cycles.
+        set_end_marker():
+            Sets an end of move marker (a segment of zero pulses).
+        buffer_full -> bool:
+            True if the DMA buffer being filled cannot take another segment.
+        buffer_free -> bool:
+            True if the next DMA buffer can be filled (it isn't waiting for or being transferred by the DMA).
+        flush():
+            Hands the filled DMA buffer to the DMA controller.
+        active(enable: bool):
+            Starts or stops the state machine.
+        start_together(generators: list):
+            Starts the state machines of several pulse generators on the same PIO clock edge.
         callback_subscribe(callback: callable):
             Subscribes a callback function to be called on interrupts.
         __pps_to_pio_delay(pps: int) -> int:
@@ -79,13 +117,16 @@ class PulseGenerator:
             Handles interrupts generated by the PIO code and calls subscribed callback functions.
     """
 
-    def __init__(self, _pio: int, _state_machine: int, step_pin: Pin):
+    def __init__(self, _pio: int, _state_machine: int, step_pin: Pin, use_dma: bool = False):
         """
         Initializes the PulseGenerator instance.
         Args:
             _pio (int): The PIO (Programmable Input/Output) ID, must be 0 or 1.
             _state_machine (int): The state-machine ID, must be between 0 and 3.
             pin (Pin): The pin object to be used by the state machine.
+            use_dma (bool): If True, segments are buffered and streamed into the TX FIFO
+                            by DMA (the callbacks are called once per buffer rather than
+                            once per segment).
         Raises:
             ValueError: If _pio is not 0 or 1.
             ValueError: If _state_machine is not between 0 and 3.
@@ -99,14 +140,34 @@ class PulseGenerator:
         if _state_machine > 3 or _state_machine < 0:
             raise ValueError("PulseGenerator::__init__ - State-machine ID must be 0-3")
 
-        picolog.info(f"PulseGenerator::__init__ - Pulse generator initialising on PIO {_pio} state-machine {_state_machine}")
+        picolog.info("PulseGenerator::__init__ - Pulse generator initialising on PIO {} state-machine {}", _pio, _state_machine)
+        self._pio = _pio
+        self._sm_index = _state_machine
         if _pio == 1: _state_machine += 4 # PIO 0 is SM 0-3 and PIO 1 is SM 4-7
 
-        picolog.debug(f"PulseGenerator::__init__ - Micropython state-machine ID is {_state_machine}")
+        picolog.debug("PulseGenerator::__init__ - Micropython state-machine ID is {}", _state_machine)
         self._sm = rp2.StateMachine(_state_machine, pulse_generator, freq=2500000, set_base=step_pin)
-        
-        # Set interrupt for SM on IRQ 0
-        self._sm.irq(handler = self.__interrupt_handler)
+
+        self._use_dma = use_dma
+        if use_dma:
+            # Segments are written to a pair of buffers which are streamed into the TX FIFO by DMA (one
+            # buffer is transferred whilst the other is filled). The CPU is interrupted once per buffer
+            # and the state machine's IRQ is only used to detect the end of move marker
+            picolog.debug("PulseGenerator::__init__ - Using DMA with {} segments per buffer", _DMA_BUFFER_SEGMENTS)
+            self._dma = rp2.DMA()
+            dreq = (_DREQ_PIO1_TX0 if _pio == 1 else _DREQ_PIO0_TX0) + self._sm_index
+            self._dma_ctrl = self._dma.pack_ctrl(size = 2, inc_write = False, treq_sel = dreq, irq_quiet = False)
+            self._dma.irq(handler = self.__dma_handler)
+
+            self._buffers = [array('I', [0] * (2 * _DMA_BUFFER_SEGMENTS)) for _ in range(2)]
+            self._buffer_words = [0, 0]
+            self._fill_buffer = 0 # The buffer being filled with segments
+            self._dma_buffer = -1 # The buffer being transferred (-1 = DMA idle)
+            self._ready_buffer = -1 # A filled buffer waiting for the DMA (-1 = none)
+            self._marker_buffer = -1 # The buffer containing the end of move marker (-1 = none)
+        else:
+            # Set interrupt for SM on IRQ 0
+            self._sm.irq(handler = self.__interrupt_handler)
 
         # Activate the state machine
         self._sm.active(1)
@@ -116,7 +177,7 @@ class PulseGenerator:
 
     # Set the pulse generator (and start it running)
     # PPS = Pulses Per Second, pulses = number of pulses to generate
-    def set(self, pps: int, pulses: int):
+    def set(self, pps: int, pulses: int) -> int:
         """
         Set the pulse generator parameters.
         This method configures the pulse generator by setting the pulses per second (pps)
@@ -125,6 +186,8 @@ class PulseGenerator:
         Args:
             pps (int): Pulses per second.
             pulses (int): Number of pulses to generate.
+        Returns:
+            int: The duration of the pulses in PIO clock ticks.
         """
 
         pio_delay = self.__pps_to_pio_delay(pps)
@@ -132,8 +195,128 @@ class PulseGenerator:
         # Place the values into the TX FIFO towards the required state machine
         # Note: The FIFO is 4x32-bit
         #picolog.debug("Pulse_generator::set: Pulses =", pulses, ", PIO delay =", pio_delay)
-        self._sm.put(pulses)
-        self._sm.put(pio_delay)
+        self.__put(pulses, pio_delay)
+
+        return self.__duration(pulses, pio_delay)
+
+    def set_duration(self, pulses: int, cycles: int) -> int:
+        """
+        Set the pulse generator to spread a number of pulses evenly over a period.
+        This is used to keep the pulses of one state machine in step with another
+        (a period with zero pulses keeps the state machine idle for the period).
+        Args:
+            pulses (int): Number of pulses to generate.
+            cycles (int): The period in PIO clock ticks.
+        Returns:
+            int: The actual duration of the pulses in PIO clock ticks (which can be
+                 slightly shorter than the requested period due to rounding).
+        """
+
+        if pulses == 0:
+            pio_delay = max(cycles - _SEGMENT_OVERHEAD, 0)
+        else:
+            pio_delay = max(((cycles - _SEGMENT_OVERHEAD) // pulses - _PULSE_OVERHEAD) // 2, 0)
+
+        self.__put(pulses, pio_delay)
+
+        return self.__duration(pulses, pio_delay)
+
+    def set_end_marker(self):
+        """
+        Set an end of move marker (a segment of zero pulses). The subscribed callbacks are
+        called once the state machine has taken the marker from the TX FIFO (i.e. once all
+        of the pulses before the marker have been generated).
+        """
+
+        if self._use_dma:
+            self._marker_buffer = self._fill_buffer
+        self.__put(0, 0)
+
+    def __put(self, pulses: int, pio_delay: int):
+        # Write a segment to the TX FIFO (or to the buffer being filled when using DMA)
+        if self._use_dma:
+            words = self._buffer_words[self._fill_buffer]
+            buffer = self._buffers[self._fill_buffer]
+            buffer[words] = pulses
+            buffer[words + 1] = pio_delay
+            self._buffer_words[self._fill_buffer] = words + 2
+        else:
+            self._sm.put(pulses)
+            self._sm.put(pio_delay)
+
+    @property
+    def buffer_full(self) -> bool:
+        """True if the DMA buffer being filled cannot take another segment (always False without DMA)"""
+        if not self._use_dma:
+            return False
+        return self._buffer_words[self._fill_buffer] >= 2 * _DMA_BUFFER_SEGMENTS
+
+    @property
+    def buffer_free(self) -> bool:
+        """True if the next DMA buffer can be filled (always True without DMA)"""
+        if not self._use_dma:
+            return True
+        return self._fill_buffer != self._dma_buffer and self._fill_buffer != self._ready_buffer
+
+    def flush(self):
+        """
+        Hand the filled DMA buffer to the DMA controller (it's transferred straight away if the
+        DMA is idle, otherwise once the current buffer has been transferred). Without DMA the
+        segments are written directly to the TX FIFO, so this does nothing.
+        Note: Only two buffers are used, so the next buffer must not be filled until it's
+        free (see buffer_free).
+        """
+
+        if not self._use_dma or self._buffer_words[self._fill_buffer] == 0:
+            return
+
+        irq_state = disable_irq()
+        buffer = self._fill_buffer
+        self._fill_buffer ^= 1
+        if self._dma_buffer < 0:
+            self.__start_dma(buffer)
+        else:
+            self._ready_buffer = buffer
+        enable_irq(irq_state)
+
+    def __start_dma(self, buffer: int):
+        # Stream a buffer into the TX FIFO (paced by the FIFO's DMA request signal)
+        self._dma_buffer = buffer
+        self._dma.config(read = self._buffers[buffer], write = self._sm, count = self._buffer_words[buffer], ctrl = self._dma_ctrl, trigger = True)
+
+    def __duration(self, pulses: int, pio_delay: int) -> int:
+        # The duration of a segment in PIO clock ticks (the delay is used for both
+        # the high and low part of each pulse)
+        if pulses == 0:
+            return pio_delay + _SEGMENT_OVERHEAD
+        return _SEGMENT_OVERHEAD + pulses * ((2 * pio_delay) + _PULSE_OVERHEAD)
+
+    def active(self, enable: bool):
+        """
+        Start or stop the state machine (the TX FIFO is preserved whilst stopped).
+        Args:
+            enable (bool): True to start the state machine.
+        """
+
+        self._sm.active(1 if enable else 0)
+
+    @staticmethod
+    def start_together(generators: list):
+        """
+        Start the state machines of several pulse generators on the same PIO clock edge.
+        The state machines are enabled (and their clock dividers restarted) with a single
+        write to the PIO CTRL register, so the pulse generators stay in step.
+        Args:
+            generators (list): The pulse generators to start (all must use the same PIO).
+        """
+
+        mask = 0
+        for generator in generators:
+            mask |= 1 << generator._sm_index
+
+        # CTRL bits 0-3 are SM_ENABLE and bits 8-11 are CLKDIV_RESTART
+        base = _PIO1_BASE if generators[0]._pio == 1 else _PIO0_BASE
+        mem32[base + _ATOMIC_SET + _PIO_CTRL] = mask | (mask << 8)
 
     # Convert pulses per second to the required PIO delay
     def __pps_to_pio_delay(self, pps: int) -> int:
@@ -154,8 +337,7 @@ class PulseGenerator:
             pps = 250000
         
         # The loop overhead in PIO clock ticks
-        # Note: This is dependent on the PIO code and will change if the ASM code changes
-        delay_loop_overhead = 8.0
+        delay_loop_overhead = float(_PULSE_OVERHEAD)
 
         # PIO clock speed in hertz
         pio_clock_pps = 2500000
@@ -192,6 +374,50 @@ class PulseGenerator:
         for fn in self.callbacks:
             fn()
 
+    # Handle the end of a DMA transfer
+    def __dma_handler(self, dma):
+        """
+        Internal method to handle DMA interrupts.
+        This method is called when a buffer has been transferred to the TX FIFO. It starts
+        the transfer of the next buffer (if one is ready) and calls the subscribed callback
+        functions (so the transferred buffer can be filled). If the buffer contained the end
+        of move marker, the callbacks are called once the state machine has taken the marker.
+        Args:
+            dma: The DMA channel that triggered the interrupt.
+        """
+
+        buffer = self._dma_buffer
+        self._buffer_words[buffer] = 0
+        self._dma_buffer = -1
+        if self._ready_buffer >= 0:
+            self.__start_dma(self._ready_buffer)
+            self._ready_buffer = -1
+
+        if buffer == self._marker_buffer:
+            # Note: The PIO sets its IRQ flag every time a segment is taken, so the handler
+            # is called straight away if the marker has already been taken
+            self._marker_buffer = -1
+            self._sm.irq(handler = self.__drain_handler)
+            return
+
+        for fn in self.callbacks:
+            fn()
+
+    # Handle interrupts generated by the PIO code whilst waiting for the end of move marker (DMA only)
+    def __drain_handler(self, sm):
+        """
+        Internal method to detect when the end of move marker has been taken.
+        The marker is the final segment, so it has been taken once the DMA is idle
+        and the TX FIFO is empty.
+        Args:
+            sm: The state machine or context that triggered the interrupt.
+        """
+
+        if self._dma_buffer < 0 and self._sm.tx_fifo() == 0:
+            self._sm.irq(handler = None)
+            for fn in self.callbacks:
+                fn()
+
 if __name__ == "__main__":
     from main import main
     main()
\ No newline at end of file
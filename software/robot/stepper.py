@@ -30,12 +30,23 @@ from pulse_generator import PulseGenerator
 from drv8825 import Drv8825
 
 from machine import Pin
+from micropython import const
+import math
+
+# Positions and speeds are planned in fixed point (1/65536 of a step)
+_FIXED_POINT_SHIFT = const(16)
+_FIXED_POINT_ONE = const(65536)
+
+# The acceleration and jerk are calibrated for 16 intervals per second. The speed changes every interval,
+# so they are scaled by the square (and the cube for the jerk) of the interval rate to give the same
+# profile timing at any rate
+_CALIBRATION_INTERVALS_PER_SECOND = const(16)
 
 class Stepper:
     _sm_counter = 0 # Keep track of the next free state-machine
     test_only = False # Set to True to test the acceleration sequence without moving the stepper
 
-    def __init__(self, drv8825: Drv8825, step_pin: Pin, direction_pin: Pin, is_left: bool):
+    def __init__(self, drv8825: Drv8825, step_pin: Pin, direction_pin: Pin, is_left: bool, use_dma: bool = False, intervals_per_second: int = 0):
         self.pio = 0
 
         # Configure the stepper motor direction
@@ -50,28 +61,72 @@ class Stepper:
         # Stepper motion parameters (in steps per interval)
         self._target_speed_spi = 1
         self._acceleration_spi = 1
+        self._jerk_spi = 0 # 0 = trapezoidal profile, otherwise a jerk limited (S-curve) profile is used
         self._steps_remaining = 0
         self._current_speed_spi = 1
+        self._current_acceleration_spi = 0 # Only used by S-curve profiles
 
         # Tracking parameters
-        self._acceleration_steps = 0
-        self._running_steps = 0
+        self._total_steps = 0
         self._track_actual_steps = 0
 
-        # The number of speed re-calculations per second
-        self._intervals_per_second = 16
+        # The steps given to the pulse generator since power on (forwards positive, used for telemetry)
+        self._step_count = 0
+
+        # The position within the current move and the move's total position (in fixed point steps)
+        self._position = 0
+        self._total_position = 0
+
+        # The planned trapezoidal profile of the current move (re-planned if the exit speed changes)
+        self._profile = None
+        self._profile_interval = 0
+
+        # Moves chained to the current move ([steps, target speed, acceleration, exit speed, follower steps, jerk]
+        # with speeds in steps per interval)
+        self._chained_moves = []
+        self._exit_speed_spi = 0
+        self._moves_queued = 0
+        self._moves_completed = 0
+        self._completion_callbacks = []
+        self._finishing = False # True once the end of move marker has been sent to the pulse generator
+        self._decelerating = False # True once the current move has started to decelerate
+        self._deceleration_plan = None # The planned S-curve deceleration of the current move
+        self._deceleration_interval = 0
+
+        # DMA operation - the profile is calculated a buffer of segments at a time and chained moves
+        # are only marked as completed once the buffer containing their final segment has been
+        # transferred to the pulse generator
+        self._use_dma = use_dma
+        self._buffer_completions = [] # The number of moves completed in each buffer being transferred
+        self._fill_completions = 0 # The number of moves completed in the buffer being filled
+
+        # Coupled operation - a follower stepper's pulses are generated alongside this stepper's pulses
+        # (the follower's steps are distributed over the segments of this stepper's profile)
+        self._follower = None
+        self._is_follower = False
+        self._master = None
+        self._follower_total_steps = 0
+        self._follower_actual_steps = 0
+        self._follower_carry_cycles = 0
+
+        # The number of speed re-calculations per second (0 = the default). With DMA the CPU isn't
+        # interrupted for every segment, so a finer acceleration granularity is used by default
+        if intervals_per_second <= 0:
+            intervals_per_second = 128 if use_dma else 16
+        self._intervals_per_second = intervals_per_second
 
         # Temporary acceleration and target speed values in case
         # we need to adjust them for a single move
         self._actual_acceleration_spi = self._acceleration_spi
         self._actual_target_speed_spi = self._target_speed_spi
+        self._actual_jerk_spi = self._jerk_spi
 
         # Ensure we have a free state-machine
         if Stepper._sm_counter < 4:
             if self._is_left:
-                picolog.debug(f"Stepper::__init__ - Left stepper pulse generator using PIO {self.pio} SM {Stepper._sm_counter}")
+                picolog.debug("Stepper::__init__ - Left stepper pulse generator using PIO {} SM {}", self.pio, Stepper._sm_counter)
             else:
-                picolog.debug(f"Stepper::__init__ - Right stepper pulse generator using PIO {self.pio} SM {Stepper._sm_counter}")
+                picolog.debug("Stepper::__init__ - Right stepper pulse generator using PIO {} SM {}", self.pio, Stepper._sm_counter)
         else:
             raise RuntimeError("Stepper::__init__ - No more state machines available!")
 
@@ -79,7 +134,7 @@ class Stepper:
         # Note: This controls the step GPIO
         self._state_machine = Stepper._sm_counter
         Stepper._sm_counter += 1
-        self.pulse_generator = PulseGenerator(self.pio, self._state_machine, step_pin)
+        self.pulse_generator = PulseGenerator(self.pio, self._state_machine, step_pin, use_dma)
         
         # Set up the pulse generator callback
         self.pulse_generator.callback_subscribe(self.callback)
@@ -91,6 +146,16 @@ class Stepper:
     @property
     def direction(self):
         return self._direction
+
+    @property
+    def step_count(self) -> int:
+        """The number of steps given to the pulse generator since power on (backwards steps are negative)"""
+        return self._step_count
+
+    @property
+    def can_chain(self) -> bool:
+        """True if a move can be chained to the current move (the stepper is busy and hasn't finished its profile)"""
+        return self._is_busy and not self._finishing
     
     def set_direction_forwards(self):
         if self._is_left:
@@ -126,162 +191,503 @@ class Stepper:
         else:
             self._direction = True
 
+    @staticmethod
+    def calibrated_acceleration_spsps(acceleration: float) -> float:
+        """The acceleration (in steps per second per second) the stepper actually moves at for
+        the given (calibrated) acceleration"""
+        return acceleration * _CALIBRATION_INTERVALS_PER_SECOND
+
     def set_acceleration_spsps(self, acceleration: float):
         """Set the acceleration in steps per second per second"""
         if acceleration < 1:
             raise ValueError("Stepper::set_acceleration - Acceleration must be greater than 0")
-        self._acceleration_spi = acceleration / self._intervals_per_second
-        picolog.debug(f"Stepper::set_acceleration - Acceleration set to {acceleration} steps per second per second ({self._acceleration_spi} steps per interval per interval)")
+        self._acceleration_spi = acceleration * _CALIBRATION_INTERVALS_PER_SECOND / (self._intervals_per_second * self._intervals_per_second)
+        picolog.debug("Stepper::set_acceleration - Acceleration set to {} steps per second per second ({} steps per interval per interval)", acceleration, self._acceleration_spi)
 
     def set_target_speed_sps(self, target_speed: float):
         """Set the target speed in steps per second"""
         if target_speed < 1:
             raise ValueError("Stepper::set_target_speed - Speed must be greater than 0")
         self._target_speed_spi = target_speed / self._intervals_per_second
-        picolog.debug(f"Stepper::set_target_speed - Target speed set to {target_speed} steps per second ({self._target_speed_spi} steps per interval)")
+        picolog.debug("Stepper::set_target_speed - Target speed set to {} steps per second ({} steps per interval)", target_speed, self._target_speed_spi)
 
-    def move(self, steps: float):
+    def set_jerk_spspsps(self, jerk: float):
+        """Set the jerk in steps per second per second per second (0 = trapezoidal profile)
+        Note: The jerk is in the same calibrated units as the acceleration, so the acceleration divided by
+        the jerk is the time (in seconds) taken to reach full acceleration"""
+        if jerk < 0:
+            raise ValueError("Stepper::set_jerk - Jerk must not be negative")
+        self._jerk_spi = jerk * _CALIBRATION_INTERVALS_PER_SECOND / (self._intervals_per_second ** 3)
+        picolog.debug("Stepper::set_jerk - Jerk set to {} steps per second per second per second ({} steps per interval per interval per interval)", jerk, self._jerk_spi)
+
+    @property
+    def moves_queued(self) -> int:
+        """The number of moves given to the stepper (including chained moves)"""
+        return self._moves_queued
+
+    @property
+    def moves_completed(self) -> int:
+        """The number of moves the stepper has completed"""
+        return self._moves_completed
+
+    def completion_subscribe(self, callback):
+        """Register a function to be called whenever the stepper completes a move"""
+        self._completion_callbacks.append(callback)
+
+    def move(self, steps: float, exit_speed_sps: float = 0, follower = None, follower_steps: float = 0):
+        """Move the specified number of steps from standstill, finishing at the exit speed (in steps per second).
+        If a follower stepper is specified, it moves the follower steps in step with this stepper (the follower
+        must be on the same PIO and both steppers must be stopped)"""
         # Check if the stepper is currently busy
         if self._is_busy:
             raise RuntimeError("Stepper::move - Stepper is currently busy")
-        
+
+        self._moves_queued += 1
+        self._follower = follower
+        if follower is not None:
+            if follower.is_busy:
+                raise RuntimeError("Stepper::move - Follower stepper is currently busy")
+            follower._moves_queued += 1
+
         if (steps == 0):
             picolog.debug("Stepper::move - Steps must be greater than 0 - not moving")
+            self.__move_completed()
+            self._follower = None
             return
 
         # Set the stepper as busy
         self._is_busy = True
+        if follower is not None:
+            follower._is_busy = True
+            follower._is_follower = True
+            follower._master = self
 
-        picolog.debug(f"Stepper::move - Moving {steps} steps using {self._intervals_per_second} calculation intervals per second")
-        picolog.debug(f"Stepper::move - Maximum acceleration is {self._acceleration_spi} steps per interval and target speed is {self._target_speed_spi} steps per interval")
+        picolog.debug("Stepper::move - Moving {} steps using {} calculation intervals per second", steps, self._intervals_per_second)
+        picolog.debug("Stepper::move - Maximum acceleration is {} steps per interval and target speed is {} steps per interval", self._acceleration_spi, self._target_speed_spi)
 
-        self._total_steps = steps
-        self._steps_remaining = self._total_steps
         self._current_speed_spi = 0
-        self._maximum_available_acceleration_steps = self._total_steps / 2
-        one_shot = False
-        self._partial_steps = 0
-        self._track_actual_steps = 0
-
-        # Save the initial acceleration and target speed in case we need to adjust them
-        self._actual_acceleration_spi = self._acceleration_spi
-        self._actual_target_speed_spi = self._target_speed_spi
-
-        # Ensure that we have enough steps to accelerate
-        if self._total_steps < (2 * self._actual_acceleration_spi):
-            if (self._total_steps / 2) >= 1:
-                self._actual_acceleration_spi = int(self._total_steps / 2)
-                picolog.debug(f"Stepper::move - Adjusting acceleration to {self._actual_acceleration_spi} steps per interval")
+        self._current_acceleration_spi = 0
+        self._finishing = False
+        self._follower_carry_cycles = 0
+        self.__begin_move(steps, self._target_speed_spi, self._acceleration_spi, exit_speed_sps / self._intervals_per_second, follower_steps, self._jerk_spi)
+
+        if not Stepper.test_only:
+            if follower is None:
+                self.__fill()
+                if self._use_dma and not self._finishing:
+                    self.__fill()
             else:
-                picolog.debug("Stepper::move - Cannot accelerate: Steps must be greater than or equal to 2")
-                one_shot = True
-        
-        # Range check and adjust the target speed if necessary
-        if (self._actual_target_speed_spi <= self._actual_acceleration_spi):
-            self._actual_target_speed_spi = self._actual_acceleration_spi
-            picolog.debug(f"Stepper::move - Adjusting target speed to {self._actual_target_speed_spi} steps per interval")
-        
-        if (self._total_steps < self._actual_target_speed_spi):
-            self._actual_target_speed_spi = self._total_steps
-            picolog.debug(f"Stepper::move - Adjusting target speed to {self._actual_target_speed_spi} steps per interval")
-
-        if one_shot:
-            # One-shot move
-            picolog.debug(f"Stepper::move - Performing one-shot move of {self._total_steps} steps at {self._intervals_per_second} steps per second)")
-            if not Stepper.test_only:
-                # Move at a low speed during a one-shot move
-                self.pulse_generator.set(self._intervals_per_second, int(round(self._total_steps, 0)))
-                self._steps_remaining = 0
-                self._track_actual_steps = self._total_steps
+                # Load the first segment(s) of both steppers with the state-machines stopped, then
+                # start both state-machines on the same clock edge
+                self.pulse_generator.active(False)
+                follower.pulse_generator.active(False)
+                self.__fill()
+                if self._use_dma and not self._finishing:
+                    self.__fill()
+                PulseGenerator.start_together([self.pulse_generator, follower.pulse_generator])
         else:
-            # Acceleration and deceleration move
-            picolog.debug(f"Stepper::move - Beginning initial acceleration on SM {self._state_machine}")
-            if not Stepper.test_only:
+            # Just test the acceleration sequence
+            while self._steps_remaining > 0:
                 self.calculate_next_command()
+            
+            if int(round(self._total_steps)) == self._track_actual_steps and self._follower_total_steps == self._follower_actual_steps:
+                picolog.debug("Stepper::move - Acceleration/deceleration sequence completed successfully on SM {}", self._state_machine)
             else:
-                # Just test the acceleration sequence
-                self._is_busy = True
-                while self._steps_remaining > 0:
-                    self.calculate_next_command()
-                
-                if self._total_steps == self._track_actual_steps:
-                    picolog.debug(f"Stepper::move - Acceleration/deceleration sequence completed successfully on SM {self._state_machine}")
-                else:
-                    picolog.error(f"Stepper::move - Acceleration/deceleration sequence failed on SM {self._state_machine} expected {self._total_steps} steps, performed {self._track_actual_steps} steps")
-                self._is_busy = False
+                picolog.error("Stepper::move - Acceleration/deceleration sequence failed on SM {} expected {} steps, performed {} steps", self._state_machine, self._total_steps, self._track_actual_steps)
+            self._chained_moves.clear()
+            self.__move_finished()
+
+    def chain_move(self, steps: float, exit_speed_sps: float = 0, follower_steps: float = 0):
+        """Queue a move to follow the current move without stopping (the stepper must be busy). The move
+        starts at the speed the current move finishes at and uses the current target speed and acceleration.
+        The follower steps are used if the current move has a follower"""
+        if not self.can_chain:
+            raise RuntimeError("Stepper::chain_move - Stepper is not busy")
+
+        self._moves_queued += 1
+        if self._follower is not None:
+            self._follower._moves_queued += 1
+        self._chained_moves.append([steps, self._target_speed_spi, self._acceleration_spi, exit_speed_sps / self._intervals_per_second, follower_steps, self._jerk_spi])
+
+    def set_exit_speed_sps(self, move_index: int, exit_speed_sps: float):
+        """Set the exit speed of a queued move (0 = the current move, 1 = the first chained move, etc.)"""
+        # Moves whose profiles have been fully calculated (but not yet completed) can't be changed
+        move_index -= sum(self._buffer_completions) + self._fill_completions
+        if move_index == 0:
+            exit_speed_spi = min(exit_speed_sps / self._intervals_per_second, self._actual_target_speed_spi)
+            if self._decelerating:
+                # The move is already slowing down, so the exit speed can't be raised above the current speed
+                exit_speed_spi = min(exit_speed_spi, self._current_speed_spi)
+                self._deceleration_plan = None
+            self._exit_speed_spi = exit_speed_spi
+            self._profile = None
+        elif 0 < move_index <= len(self._chained_moves):
+            self._chained_moves[move_index - 1][3] = exit_speed_sps / self._intervals_per_second
+
+    def __begin_move(self, steps: float, target_speed_spi: float, acceleration_spi: float, exit_speed_spi: float, follower_steps: float, jerk_spi: float):
+        # Initialise the motion parameters for a move (the move starts at the current speed)
+        self._total_steps = steps
+        self._steps_remaining = steps
+        self._track_actual_steps = 0
+        self._position = 0
+        self._total_position = int(round(steps)) << _FIXED_POINT_SHIFT
+        self._profile = None
+        self._follower_total_steps = int(round(follower_steps))
+        self._follower_actual_steps = 0
+
+        self._actual_target_speed_spi = target_speed_spi
+        self._actual_acceleration_spi = acceleration_spi
+        self._actual_jerk_spi = jerk_spi
+        self._exit_speed_spi = min(exit_speed_spi, target_speed_spi)
+        self._decelerating = False
+        self._deceleration_plan = None
+
+    def __minimum_speed_spi(self) -> float:
+        # The slowest speed used (a move starts and finishes at this speed). It's the speed reached after one
+        # interval at the calibration rate, so it doesn't depend on the interval rate
+        return self._actual_acceleration_spi * self._intervals_per_second / _CALIBRATION_INTERVALS_PER_SECOND
+
+    def __acceleration_position(self, start_speed: int, target_speed: int, acceleration: int, intervals: int) -> int:
+        # The position covered (in fixed point steps) by accelerating from the start speed for a number of intervals
+        # (the speed increases by the acceleration every interval and only the final interval can be limited to the
+        # target speed)
+        if intervals <= 0:
+            return 0
+        if start_speed + acceleration * intervals <= target_speed:
+            return intervals * start_speed + (acceleration * intervals * (intervals + 1)) // 2
+        return (intervals - 1) * start_speed + (acceleration * (intervals - 1) * intervals) // 2 + target_speed
+
+    def __deceleration_position(self, speed: int, final_speed: int, acceleration: int) -> int:
+        # The position covered (in fixed point steps) by decelerating from the speed to the final speed (the speed
+        # is reduced by the acceleration every interval and the final interval is at the final speed)
+        if speed <= final_speed:
+            return 0
+        intervals = -((final_speed - speed) // acceleration)
+        return (intervals - 1) * speed - (acceleration * (intervals - 1) * intervals) // 2 + final_speed
+
+    def __plan_trapezoid(self, accelerate: bool):
+        # Plan the rest of the move (from the current speed) using fixed point integer arithmetic. The profile
+        # accelerates to the peak speed, runs at the peak speed (in a single command) and then decelerates to the
+        # final speed. The position covered by each part is calculated in closed form, so the profile covers the
+        # remaining position exactly. The acceleration is per interval per interval (see set_acceleration_spsps),
+        # so the profile has the same shape in time at any interval rate
+        acceleration = max(int(self._actual_acceleration_spi * _FIXED_POINT_ONE), 1)
+        target_speed = max(int(self._actual_target_speed_spi * _FIXED_POINT_ONE), 1)
+        minimum_speed = min(max(int(self.__minimum_speed_spi() * _FIXED_POINT_ONE), acceleration), target_speed)
+        # A move from standstill starts at the minimum speed
+        start_speed = max(int(self._current_speed_spi * _FIXED_POINT_ONE), minimum_speed - acceleration)
+        final_speed = max(int(self._exit_speed_spi * _FIXED_POINT_ONE), minimum_speed)
+        remaining = self._total_position - self._position
+
+        # The number of intervals needed to reach the target speed
+        maximum_intervals = 0
+        if accelerate and start_speed < target_speed:
+            maximum_intervals = -((start_speed - target_speed) // acceleration)
+
+        # Estimate the number of acceleration intervals from the continuous profile (v^2 = u^2 + 2as for both
+        # the acceleration and the deceleration) and then correct the estimate using the exact positions
+        peak_estimate = math.sqrt((2 * acceleration * remaining + start_speed * start_speed + final_speed * final_speed) / 2)
+        intervals = min(max(int((peak_estimate - start_speed) / acceleration), 0), maximum_intervals)
+        while intervals < maximum_intervals and self.__trapezoid_position(start_speed, target_speed, final_speed, acceleration, intervals + 1) <= remaining:
+            intervals += 1
+        while intervals > 0 and self.__trapezoid_position(start_speed, target_speed, final_speed, acceleration, intervals) > remaining:
+            intervals -= 1
+
+        # A move from standstill must accelerate for at least one interval
+        if start_speed < minimum_speed and maximum_intervals > 0:
+            intervals = max(intervals, 1)
+
+        peak_speed = min(start_speed + acceleration * intervals, target_speed)
+        cruise = max(remaining - self.__trapezoid_position(start_speed, target_speed, final_speed, acceleration, intervals), 0)
+        deceleration_intervals = 0
+        if peak_speed > final_speed:
+            deceleration_intervals = -((final_speed - peak_speed) // acceleration)
+
+        self._profile = (start_speed, peak_speed, final_speed, acceleration, intervals, cruise, deceleration_intervals)
+        self._profile_interval = 0
+        if Stepper.test_only: picolog.debug("Stepper::__plan_trapezoid - Accelerating for {} intervals to {}, running for {} and decelerating for {} intervals to {} (fixed point)", intervals, peak_speed, cruise, deceleration_intervals, final_speed)
+
+    def __trapezoid_position(self, start_speed: int, target_speed: int, final_speed: int, acceleration: int, intervals: int) -> int:
+        # The position covered by accelerating for a number of intervals and then decelerating to the final speed
+        peak_speed = min(start_speed + acceleration * intervals, target_speed) if intervals > 0 else start_speed
+        return (self.__acceleration_position(start_speed, target_speed, acceleration, intervals) +
+            self.__deceleration_position(peak_speed, final_speed, acceleration))
+
+    def __next_trapezoid_command(self) -> tuple:
+        # Returns the speed and the position to advance (both fixed point) of the next command of a trapezoidal profile
+        if self._profile is None:
+            self.__plan_trapezoid(not self._decelerating)
+        start_speed, peak_speed, final_speed, acceleration, intervals, cruise, deceleration_intervals = self._profile
+        self._profile_interval += 1
+        interval = self._profile_interval
+
+        if interval <= intervals:
+            # Accelerating
+            speed = min(start_speed + acceleration * interval, peak_speed)
+            if Stepper.test_only: picolog.debug("Stepper::calculate_next_command - Accelerating - Speed = {}", speed)
+            return speed, speed
+        interval -= intervals
+
+        if cruise > 0:
+            if interval == 1:
+                # Running - run at the peak speed until it's time to decelerate (in a single command)
+                if Stepper.test_only: picolog.debug("Stepper::calculate_next_command - Running - Speed = {}, position = {}", peak_speed, cruise)
+                return peak_speed, cruise
+            interval -= 1
+
+        # Decelerating (towards the final speed)
+        self._decelerating = True
+        speed = max(peak_speed - acceleration * interval, final_speed) if interval < deceleration_intervals else final_speed
+        if Stepper.test_only: picolog.debug("Stepper::calculate_next_command - Decelerating - Speed = {}", speed)
+        return speed, speed
+
+    def __s_curve_plan(self, speed_spi: float, final_speed_spi: float) -> tuple:
+        # Plan a jerk limited deceleration from the speed to the final speed. The deceleration rises to its peak
+        # over the ramp intervals, holds and then falls back over the ramp intervals (so the profile is symmetric).
+        # Returns the number of ramp intervals, the total number of intervals and the peak deceleration
+        delta_spi = speed_spi - final_speed_spi
+        if delta_spi <= 0:
+            return 1, 0, 0
+        peak_spi = min(self._actual_acceleration_spi, math.sqrt(delta_spi * self._actual_jerk_spi))
+        ramp = max(math.ceil(peak_spi / self._actual_jerk_spi), 1)
+        hold = max(math.ceil(delta_spi / peak_spi) - ramp, 0)
+
+        # Adjust the peak so the decelerations add up to the change in speed exactly
+        return ramp, 2 * ramp - 1 + hold, delta_spi / (ramp + hold)
+
+    def __s_curve_deceleration(self, interval: int, ramp: int, total: int, peak_spi: float) -> float:
+        # The deceleration used for an interval (1 to total) of a planned deceleration
+        return peak_spi * min(interval, total + 1 - interval, ramp) / ramp
+
+    def __s_curve_deceleration_steps(self, speed_spi: float, final_speed_spi: float) -> float:
+        # The number of steps used by a planned deceleration (the final interval is at the final speed). The
+        # decelerations are symmetric, so the speed lost by the end of each interval sums to half the change
+        # in speed for every interval plus one
+        if speed_spi <= final_speed_spi:
+            return 0
+        ramp, total, peak_spi = self.__s_curve_plan(speed_spi, final_speed_spi)
+        return total * speed_spi - (total + 1) * (speed_spi - final_speed_spi) / 2
+
+    def __s_curve_ramp_down(self, speed_spi: float, acceleration_spi: float) -> tuple:
+        # The steps used (and the speed reached) whilst the acceleration is reduced to zero by the jerk
+        intervals = math.ceil(acceleration_spi / self._actual_jerk_spi)
+        steps = intervals * speed_spi + (acceleration_spi * (intervals - 1) * (intervals + 1)) / 3
+        return steps, speed_spi + (acceleration_spi * (intervals - 1)) / 2
+
+    def __next_s_curve_command(self) -> tuple:
+        # Returns the speed and steps of the next command of a jerk limited (S-curve) profile. The acceleration
+        # changes by no more than the jerk every interval and the deceleration is planned when it starts
+        jerk_spi = self._actual_jerk_spi
+        target_speed_spi = self._actual_target_speed_spi
+        # The slowest speed used (as for the trapezoidal profile, a move starts and finishes at this speed)
+        minimum_speed_spi = min(max(self.__minimum_speed_spi(), self._actual_acceleration_spi), target_speed_spi)
+        final_speed_spi = max(self._exit_speed_spi, minimum_speed_spi)
+        current_speed_spi = self._current_speed_spi
+        acceleration_spi = self._current_acceleration_spi
+
+        if not self._decelerating and current_speed_spi < target_speed_spi:
+            # Accelerating - increase the acceleration (up to the maximum) unless the speed would overshoot the target
+            # speed whilst the acceleration is reduced again. Either way there must be enough steps left to reduce the
+            # acceleration and then slow down to the exit speed
+            increased_spi = min(acceleration_spi + jerk_spi, self._actual_acceleration_spi)
+            candidates = (increased_spi, max(acceleration_spi - jerk_spi, 0)) if acceleration_spi > 0 else (increased_spi,)
+            for next_acceleration_spi in candidates:
+                speed = max(min(current_speed_spi + next_acceleration_spi, target_speed_spi), minimum_speed_spi)
+                ramp_down_steps, ramp_down_speed_spi = self.__s_curve_ramp_down(speed, next_acceleration_spi)
+                if len(candidates) > 1 and next_acceleration_spi == increased_spi and ramp_down_speed_spi > target_speed_spi:
+                    # Approaching the target speed - reduce the acceleration so the speed reaches it smoothly
+                    continue
+                if (self._steps_remaining - speed) >= ramp_down_steps + self.__s_curve_deceleration_steps(min(ramp_down_speed_spi, target_speed_spi), final_speed_spi):
+                    self._current_acceleration_spi = next_acceleration_spi if speed < target_speed_spi else 0
+                    if Stepper.test_only: picolog.debug("Stepper::calculate_next_command - S-curve accelerating - Current SPI = {}, acceleration = {}", speed, self._current_acceleration_spi)
+                    return speed, speed
+
+        deceleration_steps = self.__s_curve_deceleration_steps(current_speed_spi, final_speed_spi)
+        if not self._decelerating and current_speed_spi > 0 and (self._steps_remaining - deceleration_steps) > 0:
+            # Running - run at the current speed until it's time to decelerate (in a single command)
+            self._current_acceleration_spi = 0
+            if Stepper.test_only: picolog.debug("Stepper::calculate_next_command - S-curve running - Current speed = {}, running steps = {}", current_speed_spi, self._steps_remaining - deceleration_steps)
+            return current_speed_spi, self._steps_remaining - deceleration_steps
+
+        # Decelerating - follow the planned deceleration (it's re-planned if the exit speed changes)
+        if self._deceleration_plan is None:
+            self._decelerating = True
+            self._current_acceleration_spi = 0
+            self._deceleration_plan = self.__s_curve_plan(current_speed_spi, final_speed_spi)
+            self._deceleration_interval = 0
+        ramp, total, peak_spi = self._deceleration_plan
+        self._deceleration_interval += 1
+        if self._deceleration_interval >= total:
+            speed = final_speed_spi
+        else:
+            speed = max(current_speed_spi - self.__s_curve_deceleration(self._deceleration_interval, ramp, total, peak_spi), final_speed_spi)
+        if Stepper.test_only: picolog.debug("Stepper::calculate_next_command - S-curve decelerating - Current speed = {}, steps remaining = {}", speed, self._steps_remaining - min(speed, self._steps_remaining))
+        return speed, min(speed, self._steps_remaining)
 
     def calculate_next_command(self):
-        steps = 0
-        speed = 0
-
-        # Accelerating?
-        if (self._steps_remaining - self._current_speed_spi) > self._maximum_available_acceleration_steps and (self._current_speed_spi + self._actual_acceleration_spi) < self._actual_target_speed_spi:
-            self._current_speed_spi += self._actual_acceleration_spi
-            if (self._current_speed_spi > self._actual_target_speed_spi):
-                self._current_speed_spi = self._actual_target_speed_spi
-            self._steps_remaining -= self._current_speed_spi
-            if Stepper.test_only: picolog.debug(f"Stepper::calculate_next_command - Accelerating - Current SPI = {self._current_speed_spi}, steps remaining = {self._steps_remaining}")
-            steps = self._current_speed_spi
-            speed = self._current_speed_spi
-
-            self._acceleration_steps = self._total_steps - self._steps_remaining
-            self._running_steps = self._total_steps - (2 * self._acceleration_steps)
-            self._final_acceleration_speed = self._current_speed_spi
-        elif (self._steps_remaining > self._acceleration_steps):
-            if Stepper.test_only: picolog.debug(f"Stepper::calculate_next_command - Acceleration steps = {self._acceleration_steps}")
-
-            # If acceleration didn't reach target speed, accelerate one more time
-            self._current_speed_spi += self._actual_acceleration_spi
-            if (self._current_speed_spi > self._actual_target_speed_spi):
-                self._current_speed_spi = self._actual_target_speed_spi
-
-            self._steps_remaining -= self._running_steps
-            if Stepper.test_only: picolog.debug(f"Stepper::calculate_next_command - Running - Current speed = {self._current_speed_spi}, running steps = {self._running_steps}")
-            steps = self._running_steps
-            speed = self._current_speed_spi
-
-            # Adjust back to the final acceleration speed to ensure we decelerate correctly
-            self._current_speed_spi = self._final_acceleration_speed
+        if self._actual_jerk_spi > 0:
+            speed_spi, advance = self.__next_s_curve_command()
+            advance = int(advance * _FIXED_POINT_ONE)
         else:
-            self._steps_remaining -= self._current_speed_spi
-            if Stepper.test_only: picolog.debug(f"Stepper::calculate_next_command - Decelerating - Current speed = {self._current_speed_spi}, steps remaining = {self._steps_remaining}")
-            steps = self._current_speed_spi
-            speed = self._current_speed_spi
+            speed, advance = self.__next_trapezoid_command()
+            speed_spi = speed / _FIXED_POINT_ONE
+
+        self._current_speed_spi = speed_spi
+
+        # Advance the position of the move (in fixed point steps). The command's whole steps are the change in the
+        # whole part of the position, so fractional steps are carried forward to the following commands (Bresenham style)
+        remaining = self._total_position - self._position
+        advance = max(advance, 1)
+        if advance >= remaining:
+            # Final command of the move - ensure the total number of steps is exact
+            advance = remaining
+        self._position += advance
+        steps = (self._position >> _FIXED_POINT_SHIFT) - self._track_actual_steps
+        self._steps_remaining = (self._total_position - self._position) / _FIXED_POINT_ONE
 
-            self._current_speed_spi -= self._actual_acceleration_spi
-            if (self._current_speed_spi < 1):
-                self._current_speed_spi = 1
+        # Set the pulse generator
+        self._track_actual_steps += steps
+        self._step_count += steps if self._direction else -steps
+        if Stepper.test_only: picolog.debug("Stepper::calculate_next_command - Command result: Steps per second = {} ({} SPI), Steps = {}, Position = {}", speed_spi * self._intervals_per_second, speed_spi, steps, self._track_actual_steps)
+        cycles = 0
+        if not Stepper.test_only: cycles = self.pulse_generator.set(max(int(speed_spi * self._intervals_per_second), 1), steps)
+
+        if self._follower is not None:
+            self.__set_follower(cycles)
+
+    def __set_follower(self, cycles: int):
+        # Distribute the follower's steps over the move using the ratio of the follower's steps to this stepper's
+        # steps (Bresenham style - integer arithmetic with the rounding error carried forward to the next segment)
+        total_steps = int(round(self._total_steps))
+        if self._steps_remaining == 0 or total_steps == 0:
+            follower_position = self._follower_total_steps
+        else:
+            follower_position = ((self._track_actual_steps * self._follower_total_steps) + (total_steps // 2)) // total_steps
+        steps = follower_position - self._follower_actual_steps
+        self._follower_actual_steps = follower_position
+        self._follower._step_count += steps if self._follower._direction else -steps
+
+        # Spread the follower's steps over the same period as this stepper's segment (carrying any cycles lost to rounding)
+        if not Stepper.test_only:
+            cycles += self._follower_carry_cycles
+            self._follower_carry_cycles = cycles - self._follower.pulse_generator.set_duration(steps, cycles)
+
+    def __move_completed(self):
+        self._moves_completed += 1
+        if self._follower is not None:
+            self._follower.__move_completed()
+        for fn in self._completion_callbacks:
+            fn()
+
+    def __move_finished(self):
+        # The last move has completed and the stepper has stopped
+        follower = self._follower
+        self._is_busy = False
+        self._current_speed_spi = 0
+        self._follower = None
+        self._buffer_completions.clear()
+        self._fill_completions = 0
+        if follower is not None:
+            follower._is_busy = False
+            follower._is_follower = False
+            follower._master = None
+
+        # Note: The completion callbacks are called after the steppers are marked as stopped
+        self._moves_completed += 1
+        if follower is not None:
+            follower.__move_completed()
+        for fn in self._completion_callbacks:
+            fn()
+
+    def __fill(self):
+        # Give the next segment of the profile to the pulse generator (or, when using DMA, fill
+        # the next buffer of segments and hand it to the DMA)
+        if not self._use_dma:
+            self.__next_segment()
+            return
 
-        # Deal with a fractional number of steps
-        whole_steps = int(steps)
-        self._partial_steps += steps - whole_steps
-        steps = whole_steps
+        self._fill_completions = 0
+        while not self._finishing and not self.pulse_generator.buffer_full:
+            self.__next_segment()
+        self._buffer_completions.append(self._fill_completions)
+        self._fill_completions = 0
 
-        # If we have a fractional number of steps greater than 1, add them to the next command
-        if self._partial_steps >= 1:
-            additional_steps = int(self._partial_steps)
-            self._partial_steps -= additional_steps
-            steps += additional_steps
+        self.pulse_generator.flush()
+        if self._follower is not None:
+            self._follower.pulse_generator.flush()
 
-        if Stepper.test_only: picolog.debug(f"Stepper::calculate_next_command - Steps = {steps}, Partial steps = {self._partial_steps}")
+    def __fill_when_free(self):
+        # Fill the next buffer once both this stepper's and the follower's pulse generators have a free buffer
+        if self._finishing or not self._is_busy:
+            return
+        if not self.pulse_generator.buffer_free:
+            return
+        if self._follower is not None and not self._follower.pulse_generator.buffer_free:
+            return
+        self.__fill()
 
-        # Set the pulse generator
-        self._track_actual_steps += steps
-        if Stepper.test_only: picolog.debug(f"Stepper::calculate_next_command - Command result: Steps per second = {speed * self._intervals_per_second} ({speed} SPI), Steps = {steps}, Position = {self._track_actual_steps}")
-        if not Stepper.test_only: self.pulse_generator.set(int(speed * self._intervals_per_second), steps)
+    def __next_segment(self):
+        # Calculate the next segment of the profile
+        if self._steps_remaining > 0:
+            self.calculate_next_command()
+            return
 
-    # Callback when pulse generator needs more sequence information
-    def callback(self):
-        # Only process the callback if the stepper is currently busy
-        if self._steps_remaining > 0:       
+        error_margin = int(round(self._total_steps)) - self._track_actual_steps
+        if error_margin == 0:
+            picolog.debug("Stepper::callback - Acc/dec completed successfully on SM {} error margin was {} steps", self._state_machine, error_margin)
+        else:
+            picolog.error("Stepper::callback - Acc/dec completed failed on SM {} error margin was >1 step ({} steps)", self._state_machine, error_margin)
+
+        if len(self._chained_moves) > 0:
+            # Start the next move from the current speed (without stopping)
+            steps, target_speed_spi, acceleration_spi, exit_speed_spi, follower_steps, jerk_spi = self._chained_moves.pop(0)
+            self.__begin_move(steps, target_speed_spi, acceleration_spi, exit_speed_spi, follower_steps, jerk_spi)
+            if self._use_dma:
+                # The move is completed once the buffer has been transferred
+                self._fill_completions += 1
+            else:
+                self.__move_completed()
             self.calculate_next_command()
         else:
-            self._is_busy = False
-            error_margin = self._total_steps - self._track_actual_steps
-            if int(error_margin) == 0:
-                picolog.debug(f"Stepper::callback - Acc/dec completed successfully on SM {self._state_machine} error margin was {error_margin} steps")
+            # Send an end of move marker (zero steps) to the pulse generator. It is taken once the final
+            # pulses have been generated, so the stepper is only marked as stopped once it has stopped
+            self._finishing = True
+            self.pulse_generator.set_end_marker()
+            if self._follower is not None:
+                self._follower.pulse_generator.set_end_marker()
+
+    # Callback when pulse generator needs more sequence information
+    def callback(self):
+        # A follower's pulse generator is set by the stepper it is following
+        if self._is_follower:
+            if self._use_dma and self._master is not None:
+                # The stepper being followed might be waiting for the follower's buffer to be transferred
+                self._master.__fill_when_free()
+            return
+
+        if self._use_dma:
+            # A buffer of segments has been transferred (or the end of move marker has been taken)
+            if len(self._buffer_completions) == 0:
+                return
+            for _ in range(self._buffer_completions.pop(0)):
+                self.__move_completed()
+
+            if self._finishing:
+                if len(self._buffer_completions) == 0:
+                    # The pulse generator has taken the end of move marker, so the move is complete
+                    self._finishing = False
+                    self.__move_finished()
             else:
-                picolog.error(f"Stepper::callback - Acc/dec completed failed on SM {self._state_machine} error margin was >1 step ({error_margin} steps)")
+                self.__fill_when_free()
+            return
+
+        # Only process the callback if the stepper is currently busy
+        if self._finishing:
+            # The pulse generator has taken the end of move marker, so the move is complete
+            self._finishing = False
+            self.__move_finished()
+        elif self._is_busy:
+            self.__fill()
 
 if __name__ == "__main__":
     from main import main
@@ -0,0 +1,143 @@
+#************************************************************************
+#
+#   telemetry.py
+#
+#   Periodic telemetry notifications
+#   Valiant Turtle 2 - Robot firmware
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import picolog
+import asyncio
+import struct
+import time
+
+from ble_peripheral import BlePeripheral
+from diffdrive import DiffDrive
+from ina260 import Ina260
+from pen import Pen
+from micropython import const
+
+# Shortest interval between telemetry frames (BLE can't deliver them any faster)
+_MINIMUM_INTERVAL_MS = const(50)
+
+# Status flags (stored in the top 4 bits of the heading)
+_FLAG_MOTORS_ENABLED = const(0x1000)
+_FLAG_MOVING = const(0x2000)
+_FLAG_PEN_DOWN = const(0x4000)
+
+class Telemetry:
+    """
+    Sends a telemetry frame to central at a regular interval (set by central with command 34).
+    Each 20 byte frame is notified on the telemetry characteristic, so no request is needed
+    for each sample and the command exchange isn't slowed down.
+
+    Frame layout (little-endian):
+        uint32 time_ms           Time since the firmware started in milliseconds
+        int16  x_mm, y_mm        The position the robot has reached (dead reckoned from the steps whilst
+                                 moving, see DiffDrive.get_actual_pose)
+        uint16 heading_flags     The heading reached in 0.1 degrees (bits 0-11) and the status flags
+                                 (bit 12 = motors enabled, bit 13 = moving, bit 14 = pen down)
+        uint16 left_steps        The steps given to each motor (wrapping 16-bit counters, backwards
+        uint16 right_steps       steps count down)
+        uint16 voltage_mV
+        int16  current_mA        Negative when the battery is charging
+        uint16 power_mW
+    """
+
+    def __init__(self, ble_peripheral: BlePeripheral, diff_drive: DiffDrive, ina260: Ina260, pen: Pen):
+        self._ble_peripheral = ble_peripheral
+        self._diff_drive = diff_drive
+        self._ina260 = ina260
+        self._pen = pen
+
+        # Interval between frames (0 = telemetry is off)
+        self._interval_ms = 0
+        self._interval_event = asyncio.Event()
+
+        # Time since the telemetry task started (the ticks counter wraps, so the elapsed ticks are accumulated)
+        self._time_ms = 0
+        self._last_ticks_ms = None
+
+    @property
+    def interval_ms(self) -> int:
+        return self._interval_ms
+
+    def set_interval(self, interval_ms: int):
+        """Set the interval between telemetry frames in milliseconds (0 turns telemetry off)"""
+        if interval_ms > 0:
+            interval_ms = max(interval_ms, _MINIMUM_INTERVAL_MS)
+        self._interval_ms = interval_ms
+        self._interval_event.set()
+        picolog.info("Telemetry::set_interval - Telemetry interval set to {} ms", interval_ms)
+
+    def frame(self) -> bytes:
+        """Build a telemetry frame from the current state of the robot"""
+        self.__update_time()
+        x_um, y_um, heading = self._diff_drive.get_actual_pose()
+        heading = int(round(heading * 10)) % 3600
+        if self._diff_drive.is_enabled: heading |= _FLAG_MOTORS_ENABLED
+        if self._diff_drive.is_moving: heading |= _FLAG_MOVING
+        if not self._pen.is_servo_up: heading |= _FLAG_PEN_DOWN
+        left_steps, right_steps = self._diff_drive.step_counts
+        voltage, current, power = self._ina260.cached(self._interval_ms)
+
+        return struct.pack("<IhhHHHHhH", self._time_ms & 0xFFFFFFFF,
+            self.__clamp(round(x_um / 1000), -32768, 32767), self.__clamp(round(y_um / 1000), -32768, 32767),
+            heading, left_steps & 0xFFFF, right_steps & 0xFFFF,
+            self.__clamp(int(voltage), 0, 65535),
+            self.__clamp(int(current), -32768, 32767),
+            self.__clamp(int(power), 0, 65535))
+
+    def __update_time(self):
+        ticks_ms = time.ticks_ms()
+        if self._last_ticks_ms is not None:
+            self._time_ms += time.ticks_diff(ticks_ms, self._last_ticks_ms)
+        self._last_ticks_ms = ticks_ms
+
+    def __clamp(self, value: int, minimum: int, maximum: int) -> int:
+        return max(minimum, min(maximum, value))
+
+    async def run(self):
+        picolog.debug("Telemetry::run - Running")
+        while True:
+            self.__update_time()
+
+            # Telemetry is turned off when central disconnects (the next central turns it on if it wants it)
+            if self._interval_ms > 0 and not self._ble_peripheral.is_connected:
+                self.set_interval(0)
+
+            if self._interval_ms == 0:
+                # Keep the dead reckoned pose up to date (it's reported as soon as telemetry is turned on)
+                self._diff_drive.get_actual_pose()
+                self._interval_event.clear()
+                try:
+                    await asyncio.wait_for_ms(self._interval_event.wait(), 500)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._ble_peripheral.send_telemetry(self.frame())
+            await asyncio.sleep_ms(self._interval_ms)
+
+if __name__ == "__main__":
+    from main import main
+    main()
@@ -0,0 +1,189 @@
+#************************************************************************
+#
+#   aioble/__init__.py
+#
+#   Emulation of the aioble library (peripheral role)
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# The peripheral side follows aioble's API. The simulated central uses central_connect(),
+# Characteristic.central_write() and the connection's notify_handler to talk to it.
+
+import asyncio
+from .device import Device, DeviceConnection, DeviceDisconnectedError
+
+# Registered services
+_services = []
+
+# Set whilst the peripheral is advertising (and the connection made by the central)
+_advertising = None
+_advertised_name = None
+_advertised_manufacturer = None
+_connection = None
+
+# The address of the simulated central
+_CENTRAL_ADDRESS = b"\x02\x56\x54\x32\x00\x01"
+
+# The largest ATT MTU the peripheral accepts (set with config)
+_DEFAULT_MTU = 23
+_mtu = _DEFAULT_MTU
+
+def reset():
+    """Forget the registered services and any connection (used when the simulation is restarted)"""
+    global _advertising, _advertised_name, _advertised_manufacturer, _connection, _mtu
+    _services.clear()
+    _advertising = None
+    _advertised_name = None
+    _advertised_manufacturer = None
+    _connection = None
+    _mtu = _DEFAULT_MTU
+
+def config(*args, **kwargs):
+    """Set or get the BLE stack's configuration (only the MTU is simulated)"""
+    global _mtu
+    if "mtu" in kwargs:
+        _mtu = kwargs["mtu"]
+    if args == ("mtu",):
+        return _mtu
+
+def register_services(*services):
+    _services.clear()
+    _services.extend(services)
+
+def services() -> list:
+    """The registered services"""
+    return list(_services)
+
+class Service:
+    def __init__(self, uuid):
+        self.uuid = uuid
+        self.characteristics = []
+
+class Characteristic:
+    """A characteristic of a service (written by the central and notified by the peripheral)"""
+
+    def __init__(self, service: Service, uuid, read: bool = False, write: bool = False, write_no_response: bool = False,
+                 notify: bool = False, indicate: bool = False, initial = None, capture: bool = False):
+        self.service = service
+        self.uuid = uuid
+        self._capture = capture
+        # Writes from the central are truncated to the size of the characteristic's buffer
+        self._max_len = 20
+        self._value = bytes(initial) if initial is not None else b""
+        self._writes = []
+        self._written_event = None
+        service.characteristics.append(self)
+
+    def read(self) -> bytes:
+        return self._value
+
+    def write(self, data, send_update: bool = False):
+        self._value = bytes(data)
+        if send_update and _connection is not None and _connection.is_connected():
+            _connection._notify(self, self._value)
+
+    def notify(self, connection: DeviceConnection, data = None):
+        if data is not None:
+            self._value = bytes(data)
+        connection._notify(self, self._value)
+
+    def indicate(self, connection: DeviceConnection, data = None, timeout_ms: int = 1000):
+        self.notify(connection, data)
+
+    async def written(self, timeout_ms: int = None):
+        if self._written_event is None:
+            self._written_event = asyncio.Event()
+        while len(self._writes) == 0:
+            self._written_event.clear()
+            await asyncio.wait_for(self._written_event.wait(), timeout_ms / 1000 if timeout_ms else None)
+
+        connection, data = self._writes.pop(0)
+        if self._capture:
+            return connection, data
+        return connection
+
+    def central_write(self, connection: DeviceConnection, data):
+        """Simulate a write from the central"""
+        if not connection.is_connected():
+            raise DeviceDisconnectedError()
+        self._value = bytes(data)[:self._max_len]
+        self._writes.append((connection, self._value))
+        if self._written_event is not None:
+            self._written_event.set()
+
+class BufferedCharacteristic(Characteristic):
+    def __init__(self, service: Service, uuid, max_len: int = 20, append: bool = False, **kwargs):
+        super().__init__(service, uuid, **kwargs)
+        self._max_len = max_len
+        self._append = append
+
+    def write(self, data, send_update: bool = False):
+        data = bytes(data)
+        if self._append:
+            data = self._value + data
+        super().write(data[-self._max_len:] if self._append else data[:self._max_len], send_update)
+
+    def notify(self, connection: DeviceConnection, data = None):
+        if data is not None:
+            data = bytes(data)[:self._max_len]
+        super().notify(connection, data)
+
+async def advertise(interval_us: int, adv_data = None, resp_data = None, connectable: bool = True, limited_disc: bool = False,
+                    include_tx_power: bool = False, name: str = None, services: list = None, appearance: int = 0,
+                    manufacturer = None, timeout_ms: int = None) -> DeviceConnection:
+    """Advertise until the simulated central connects"""
+    global _advertising, _advertised_name, _advertised_manufacturer, _connection
+    _advertising = asyncio.get_running_loop().create_future()
+    _advertised_name = name
+    _advertised_manufacturer = manufacturer
+    try:
+        _connection = await asyncio.wait_for(_advertising, timeout_ms / 1000 if timeout_ms else None)
+    finally:
+        _advertising = None
+    return _connection
+
+def is_advertising() -> bool:
+    """True if the peripheral is waiting for the central to connect"""
+    return _advertising is not None
+
+def advertised_name() -> str:
+    """The name the peripheral is advertising (None if it isn't advertising)"""
+    return _advertised_name if _advertising is not None else None
+
+def advertised_manufacturer():
+    """The (company ID, data) manufacturer data the peripheral is advertising (None if it isn't advertising)"""
+    return _advertised_manufacturer if _advertising is not None else None
+
+async def central_connect(poll_ms: int = 10, mtu: int = 23) -> DeviceConnection:
+    """
+    Connect the simulated central to the peripheral (waiting until the peripheral advertises).
+    The MTU is the central's MTU, the connection uses the smaller of it and the peripheral's.
+    """
+    while _advertising is None or _advertising.done():
+        await asyncio.sleep(poll_ms / 1000)
+    connection = DeviceConnection(Device(0, _CENTRAL_ADDRESS), min(mtu, _mtu))
+    _advertising.set_result(connection)
+    return connection
+
+def central_disconnect(connection: DeviceConnection):
+    """Disconnect the simulated central"""
+    connection._disconnect()
@@ -0,0 +1,91 @@
+#************************************************************************
+#
+#   aioble/device.py
+#
+#   Emulation of aioble's device and connection classes
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import asyncio
+
+class DeviceDisconnectedError(Exception):
+    pass
+
+class Device:
+    """A remote BLE device"""
+
+    def __init__(self, addr_type: int = 0, addr: bytes = b"\x00\x00\x00\x00\x00\x00"):
+        self.addr_type = addr_type
+        self.addr = bytes(addr)
+
+    def addr_hex(self) -> str:
+        return ":".join("{:02x}".format(byte) for byte in self.addr)
+
+    def __repr__(self) -> str:
+        return f"Device({self.addr_type}, {self.addr_hex()})"
+
+class DeviceConnection:
+    """
+    A connection between the peripheral and a simulated central.
+    Notifications sent by the peripheral are passed to notify_handler (called with the
+    characteristic and the data) or, if there is no handler, kept in the notifications list.
+    """
+
+    def __init__(self, device: Device, mtu: int = 23):
+        self.device = device
+        self.mtu = mtu
+        self.notify_handler = None
+        self.notifications = []
+        self._connected = True
+        self._disconnected_event = asyncio.Event()
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def disconnect(self, timeout_ms: int = 2000):
+        self._disconnect()
+
+    async def disconnected(self, timeout_ms: int = 60000):
+        if self._connected:
+            await asyncio.wait_for(self._disconnected_event.wait(), timeout_ms / 1000 if timeout_ms else None)
+
+    async def exchange_mtu(self, mtu: int = None, timeout_ms: int = 1000):
+        if mtu is not None:
+            self.mtu = min(mtu, 517)
+        return self.mtu
+
+    def _notify(self, characteristic, data: bytes):
+        if not self._connected:
+            raise DeviceDisconnectedError()
+        # A notification carries at most the MTU less the 3 byte ATT header
+        data = bytes(data)[:self.mtu - 3]
+        if self.notify_handler is not None:
+            self.notify_handler(characteristic, bytes(data))
+        else:
+            self.notifications.append((characteristic, bytes(data)))
+
+    def _disconnect(self):
+        self._connected = False
+        self._disconnected_event.set()
+
+    def __repr__(self) -> str:
+        return f"DeviceConnection({self.device.addr_hex()})"
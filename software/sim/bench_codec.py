@@ -0,0 +1,143 @@
+#************************************************************************
+#
+#   bench_codec.py
+#
+#   Command protocol codec benchmark (the generated central and peripheral codecs)
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import argparse
+import importlib.util
+import os
+import struct
+import sys
+import time
+import harness
+
+# Example values for each struct format character (chosen so that they survive the round trip exactly)
+_VALUES = {"B": 7, "H": 500, "i": -12345, "f": 12.5}
+
+def load_communicator_codec():
+    # The communicator's codec (the MicroPython flavour of protocol_central) has the same module
+    # name as the linux host's, so it's loaded from its file under another name
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "communicator", "protocol_central.py")
+    spec = importlib.util.spec_from_file_location("communicator_protocol_central", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def example(format: str) -> tuple:
+    return tuple(_VALUES[character] for character in format[1:]) if format is not None else ()
+
+def round_trip(central, peripheral, command_id: int) -> bool:
+    """Send a command and its result through both codecs and check that nothing is lost on the way"""
+    name = central.NAMES[command_id]
+    parameters = example(peripheral.PARAMETER_FORMATS[command_id])
+    result = example(peripheral.RESPONSE_FORMATS[command_id])
+
+    # Central encodes the command (the transport pads it to a full packet) and the robot decodes it
+    packet = getattr(central, f"encode_{name}")(1, *parameters)
+    packet += bytes(central.PACKET_LENGTH - len(packet))
+    if packet[1] != command_id:
+        return False
+    if parameters and struct.unpack_from(peripheral.PARAMETER_FORMATS[command_id], packet, 2) != parameters:
+        return False
+
+    # The robot encodes the result and central decodes it
+    if result:
+        response = bytearray(peripheral.PACKET_LENGTH)
+        struct.pack_into(peripheral.RESPONSE_FORMATS[command_id], response, 1, *result)
+        if tuple(getattr(central, f"decode_{name}")(response)) != result:
+            return False
+    return True
+
+def benchmark(central, peripheral, count: int) -> dict:
+    """Time each stage of the round trip in nanoseconds (averaged over the commands that have the stage)"""
+    stages = {"encode command": [], "decode command": [], "encode result": [], "decode result": []}
+    packet = bytearray(peripheral.PACKET_LENGTH)
+    response = bytearray(peripheral.PACKET_LENGTH)
+    commands = [command_id for command_id in range(1, peripheral.COMMAND_COUNT) if central.NAMES[command_id] is not None]
+
+    for command_id in commands:
+        name = central.NAMES[command_id]
+        encode = getattr(central, f"encode_{name}")
+        decode = getattr(central, f"decode_{name}", None)
+        parameter_format = peripheral.PARAMETER_FORMATS[command_id]
+        response_format = peripheral.RESPONSE_FORMATS[command_id]
+        parameters = example(parameter_format)
+        result = example(response_format)
+        command = encode(1, *parameters)
+        packet[:] = command + bytes(peripheral.PACKET_LENGTH - len(command))
+
+        start = time.perf_counter_ns()
+        for _ in range(count):
+            encode(1, *parameters)
+        stages["encode command"].append((time.perf_counter_ns() - start) / count)
+
+        if parameter_format is not None:
+            start = time.perf_counter_ns()
+            for _ in range(count):
+                struct.unpack_from(parameter_format, packet, 2)
+            stages["decode command"].append((time.perf_counter_ns() - start) / count)
+
+        if response_format is not None:
+            start = time.perf_counter_ns()
+            for _ in range(count):
+                struct.pack_into(response_format, response, 1, *result)
+            stages["encode result"].append((time.perf_counter_ns() - start) / count)
+
+            start = time.perf_counter_ns()
+            for _ in range(count):
+                decode(response)
+            stages["decode result"].append((time.perf_counter_ns() - start) / count)
+
+    return {stage: sum(times) / len(times) for stage, times in stages.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and benchmark the generated command protocol codecs.")
+    parser.add_argument("-n", "--count", type=int, default=20000,
+        help="The number of times to run each stage for each command. Default is 20000.")
+    args = parser.parse_args()
+
+    harness.setup()
+    import protocol_central
+    import protocol_peripheral
+    codecs = (("linux (struct.Struct)", protocol_central), ("communicator (format strings)", load_communicator_codec()))
+
+    # Every command must survive the round trip with both central codecs
+    failed = []
+    for label, central in codecs:
+        for command_id in range(1, protocol_peripheral.COMMAND_COUNT):
+            if central.NAMES[command_id] is not None and not round_trip(central, protocol_peripheral, command_id):
+                failed.append(f"{central.NAMES[command_id]} ({label})")
+    if failed:
+        print(f"Round trip failed: {', '.join(failed)}")
+        sys.exit(1)
+    print(f"Round trip passed for {protocol_peripheral.COMMAND_COUNT - 1} commands")
+
+    # Time each stage (the robot's side is the same for both, it's the central codecs that differ)
+    for label, central in codecs:
+        result = benchmark(central, protocol_peripheral, args.count)
+        print(f"  {label}: " + ", ".join(f"{stage} = {ns:.0f}ns" for stage, ns in result.items()))
+
+if __name__ == "__main__":
+    main()
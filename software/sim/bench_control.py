@@ -0,0 +1,116 @@
+#************************************************************************
+#
+#   bench_control.py
+#
+#   Command decode/encode benchmark (Control's command table on the simulated robot)
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import argparse
+import logging
+import time
+import tracemalloc
+import harness
+
+# Commands that can be benchmarked (protocol_central encoder name and parameters)
+# Note: Only commands that don't move the robot are included, so the time is spent in Control
+_COMMANDS = {
+    "nop": (None,),
+    "heading": ("heading",),
+    "position": ("position",),
+    "eyes": ("eyes", 1, 0, 64, 0),
+    "power": ("power",),
+    "isdown": ("isdown",),
+    "get_linear_velocity": ("get_linear_velocity",),
+    "get_turtle_id": ("get_turtle_id",),
+}
+
+def command_packet(command: str) -> bytes:
+    import protocol_central
+    name, *parameters = _COMMANDS[command]
+    packet = bytes([1, 0]) if name is None else getattr(protocol_central, f"encode_{name}")(1, *parameters)
+    return packet + bytes(protocol_central.PACKET_LENGTH - len(packet))
+
+async def benchmark(robot: harness.SimRobot, command: str, count: int) -> dict:
+    execute = robot.control._Control__execute
+    release = robot.ble_peripheral.release_p2c_buffer
+    packet = command_packet(command)
+
+    # Warm up (so the response buffer pool and any caches are filled)
+    for _ in range(10):
+        response = await execute(packet)
+        if response is not None: release(response)
+
+    # Time the commands
+    start = time.perf_counter()
+    for _ in range(count):
+        response = await execute(packet)
+        if response is not None: release(response)
+    duration = time.perf_counter() - start
+
+    # Measure the memory allocated whilst each command runs (the peak above the memory in use before it)
+    tracemalloc.start()
+    churn = 0
+    for _ in range(count):
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        response = await execute(packet)
+        churn += tracemalloc.get_traced_memory()[1] - current
+        if response is not None: release(response)
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return {
+        "us_per_command": duration * 1e6 / count,
+        "churn_per_command": churn / count,
+        "retained": retained,
+    }
+
+def main():
+    log_format = "[%(asctime)s %(filename)s::%(funcName)s():%(lineno)s]%(levelname)s: %(message)s"
+    logging.basicConfig(level=logging.WARNING, format=log_format)
+
+    parser = argparse.ArgumentParser(description="Benchmark the decoding, dispatching and encoding of robot commands.")
+    parser.add_argument("-c", "--command", choices=sorted(_COMMANDS.keys()) + ["all"], default="all",
+        help="The command to execute. Default is 'all'.")
+    parser.add_argument("-n", "--count", type=int, default=10000,
+        help="The number of times to execute each command. Default is 10000.")
+    args = parser.parse_args()
+
+    # Keep the firmware quiet
+    harness.setup()
+    import picolog
+    picolog.basicConfig(level=picolog.WARNING)
+
+    async def benchmark_all() -> dict:
+        # The simulated hardware only has enough state machines for one robot, so the commands share it
+        robot = harness.SimRobot()
+        commands = sorted(_COMMANDS.keys()) if args.command == "all" else [args.command]
+        return {command: await benchmark(robot, command, args.count) for command in commands}
+
+    for command, result in harness.run(benchmark_all()).items():
+        print(f"  {command:<20} {result['us_per_command']:7.2f}us per command, "
+              f"{result['churn_per_command']:7.1f} bytes allocated per command (CPython), "
+              f"{result['retained']} bytes retained after {args.count} commands")
+
+if __name__ == "__main__":
+    main()
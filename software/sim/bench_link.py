@@ -0,0 +1,151 @@
+#************************************************************************
+#
+#   bench_link.py
+#
+#   Protocol benchmark (linux AsyncCommandsTx to the simulated robot over a loopback link)
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import argparse
+import asyncio
+import logging
+import time
+import harness
+from loopback_link import LoopbackLink, C2P, P2C
+
+# Commands that can be benchmarked (AsyncCommandsTx method and arguments)
+_COMMANDS = {
+    "heading": ("heading",),
+    "position": ("position",),
+    "penup": ("penup",),
+    "eyes": ("eyes", 1, 0, 64, 0),
+    "forward": ("forward", 1.0),
+}
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+async def benchmark(link: LoopbackLink, command: str, count: int, window: int, motion_queue: bool) -> dict:
+    robot = harness.SimRobot()
+    link.install()
+
+    from async_commands_tx import AsyncCommandsTx
+    commands_tx = AsyncCommandsTx(max_in_flight = window)
+
+    loop = asyncio.get_running_loop()
+    tasks = [
+        asyncio.create_task(robot.run()),
+        asyncio.create_task(commands_tx.run()),
+    ]
+
+    # Wait for the central to connect
+    while not commands_tx.connected:
+        await asyncio.sleep(0.1)
+    await commands_tx.motors(True)
+    if motion_queue:
+        await commands_tx.motion_queue(True)
+
+    method, *arguments = _COMMANDS[command]
+    slots = asyncio.Semaphore(window)
+    latencies = []
+    failures = 0
+
+    async def send():
+        nonlocal failures
+        async with slots:
+            start = loop.time()
+            # A lost packet makes AsyncCommandsTx drop the connection, so wait for the central to reconnect
+            while not commands_tx.connected:
+                await asyncio.sleep(0.1)
+            result = await getattr(commands_tx, method)(*arguments)
+            latencies.append(loop.time() - start)
+            if not (result[0] if isinstance(result, tuple) else result):
+                failures += 1
+
+    wall_start = time.perf_counter()
+    start = loop.time()
+    await asyncio.gather(*[send() for _ in range(count)])
+    duration = loop.time() - start
+    wall_time = time.perf_counter() - wall_start
+
+    for task in tasks:
+        task.cancel()
+
+    return {
+        "duration": duration,
+        "wall_time": wall_time,
+        "commands_per_second": count / duration if duration > 0 else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "maximum": max(latencies),
+        "failures": failures,
+    }
+
+def main():
+    log_format = "[%(asctime)s %(filename)s::%(funcName)s():%(lineno)s]%(levelname)s: %(message)s"
+    logging.basicConfig(level=logging.WARNING, format=log_format)
+
+    parser = argparse.ArgumentParser(description="Benchmark the BLE command protocol against the simulated robot.")
+    parser.add_argument("-c", "--command", choices=sorted(_COMMANDS.keys()), default="heading",
+        help="The command to send. Default is 'heading'.")
+    parser.add_argument("-n", "--count", type=int, default=200,
+        help="The number of commands to send. Default is 200.")
+    parser.add_argument("-w", "--window", type=int, choices=range(1, 33), default=1, metavar="{1-32}",
+        help="Number of commands in flight at once (1-32). Default is 1.")
+    parser.add_argument("-q", "--queue", action="store_true",
+        help="Enable the robot's motion queue.")
+    parser.add_argument("-i", "--interval", type=float, default=30.0,
+        help="Connection interval in ms. Default is 30.")
+    parser.add_argument("-l", "--latency", type=float, default=0.0,
+        help="Fixed latency in ms. Default is 0.")
+    parser.add_argument("-j", "--jitter", type=float, default=0.0,
+        help="Maximum random jitter in ms. Default is 0.")
+    parser.add_argument("-p", "--loss", type=float, default=0.0,
+        help="Packet loss probability (0.0-1.0). Default is 0.")
+    parser.add_argument("-e", "--events", type=int, default=0,
+        help="Maximum packets per connection event in each direction (0 = no limit). Default is 0.")
+    parser.add_argument("-m", "--mtu", type=int, default=23,
+        help="The central's ATT MTU (23 gives one packet per write or notification). Default is 23.")
+    parser.add_argument("-s", "--seed", type=int, default=1,
+        help="Random seed for the jitter and loss. Default is 1.")
+    args = parser.parse_args()
+
+    # Keep the firmware quiet
+    harness.setup()
+    import picolog
+    picolog.basicConfig(level=picolog.WARNING)
+
+    link = LoopbackLink(args.interval, args.latency, args.jitter, args.loss, args.events, args.mtu, seed=args.seed)
+    result = harness.run(benchmark(link, args.command, args.count, args.window, args.queue))
+
+    print(f"{link}")
+    print(f"  {args.count} x '{args.command}' with a window of {args.window}: {result['duration']:.3f}s virtual "
+          f"in {result['wall_time']:.3f}s, {result['commands_per_second']:.1f} commands/s, {result['failures']} failed")
+    print(f"  Latency: p50 = {result['p50'] * 1000:.1f}ms, p95 = {result['p95'] * 1000:.1f}ms, "
+          f"p99 = {result['p99'] * 1000:.1f}ms, maximum = {result['maximum'] * 1000:.1f}ms")
+    print(f"  C2P: {link.statistics[C2P]}")
+    print(f"  P2C: {link.statistics[P2C]}")
+
+if __name__ == "__main__":
+    main()
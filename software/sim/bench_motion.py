@@ -0,0 +1,120 @@
+#************************************************************************
+#
+#   bench_motion.py
+#
+#   Motion profile benchmark (runs the firmware's DiffDrive on the virtual clock)
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import argparse
+import logging
+import time
+import harness
+
+# Test patterns (a list of DiffDrive method names and arguments)
+_PATTERNS = {
+    "square": [("drive_forward", 100000), ("turn_right", 90)] * 4,
+    "circles": [("circle", 50000, 360), ("circle", 200000, 360)],
+    "star": [("drive_forward", 150000), ("turn_right", 144)] * 5,
+    "short": [("drive_forward", 2000), ("turn_left", 5)] * 20,
+}
+
+def run_pattern(pattern: list, use_dma: bool, intervals_per_second: int, linear: tuple, rotational: tuple) -> dict:
+    robot = harness.SimRobot(use_dma, intervals_per_second)
+    diff_drive = robot.diff_drive
+    diff_drive.set_enable(True)
+    diff_drive.set_linear_velocity(*linear)
+    diff_drive.set_rotational_velocity(*rotational)
+
+    left_sm = robot.left_state_machine
+    right_sm = robot.right_state_machine
+    left_sm.trace = []
+    right_sm.trace = []
+
+    wall_start = time.perf_counter()
+    for method, *arguments in pattern:
+        getattr(diff_drive, method)(*arguments)
+        # Let the planner catch up when it's full (as the control task would)
+        while diff_drive.planner_full:
+            harness.clock.advance(harness.clock.next_event_ns - harness.clock.now_ns)
+    harness.clock.run_until_idle()
+    wall_time = time.perf_counter() - wall_start
+
+    # The largest difference between the start of matching segments (the wheels are coupled,
+    # so their segments should start together)
+    skew_ns = 0
+    for left, right in zip(left_sm.trace, right_sm.trace):
+        skew_ns = max(skew_ns, abs(left[0] - right[0]))
+
+    return {
+        "virtual_s": harness.clock.now,
+        "wall_s": wall_time,
+        "left_steps": robot.left_steps,
+        "right_steps": robot.right_steps,
+        "segments": left_sm.segments + right_sm.segments,
+        "moves": diff_drive.moves_completed,
+        "skew_us": skew_ns / 1000,
+    }
+
+def main():
+    log_format = "[%(asctime)s %(filename)s::%(funcName)s():%(lineno)s]%(levelname)s: %(message)s"
+    logging.basicConfig(level=logging.INFO, format=log_format)
+
+    parser = argparse.ArgumentParser(description="Benchmark the robot's motion profiles on the virtual clock.")
+    parser.add_argument(
+        "-p", "--pattern",
+        choices=sorted(_PATTERNS.keys()),
+        default="square",
+        help="The pattern to drive. Default is 'square'."
+    )
+    parser.add_argument(
+        "-i", "--intervals",
+        type=int,
+        default=0,
+        help="Stepper profile intervals per second (0 = the steppers' default)."
+    )
+    parser.add_argument(
+        "-j", "--jerk",
+        type=float,
+        default=0,
+        help="Linear and rotational jerk in um/s^3 (0 = trapezoidal profiles)."
+    )
+    args = parser.parse_args()
+
+    # Keep the firmware quiet
+    harness.setup()
+    import picolog
+    picolog.basicConfig(level=picolog.WARNING)
+
+    linear = (200000, 40000, args.jerk)
+    rotational = (100000, 40000, args.jerk)
+
+    print(f"Pattern '{args.pattern}' ({len(_PATTERNS[args.pattern])} moves)")
+    for use_dma in (False, True):
+        result = run_pattern(_PATTERNS[args.pattern], use_dma, args.intervals, linear, rotational)
+        print(f"  {'DMA' if use_dma else 'IRQ'}: {result['virtual_s']:.3f}s virtual in {result['wall_s']:.3f}s "
+              f"({result['virtual_s'] / max(result['wall_s'], 1e-9):.0f}x real-time), "
+              f"steps L/R = {result['left_steps']}/{result['right_steps']}, segments = {result['segments']}, "
+              f"moves = {result['moves']}, max wheel skew = {result['skew_us']:.1f}us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#************************************************************************
+#
+#   bleak/__init__.py
+#
+#   Emulation of the bleak library (connects to the simulated robot)
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# The linux BleCentral runs unmodified against the simulated robot. Scanning finds the robot
+# whilst the firmware is advertising, and the connection's packets are carried by a
+# loopback link (see loopback_link.py) which adds the connection interval, latency, jitter
+# and packet loss.
+
+import asyncio
+import aioble
+
+from bleak.exc import BleakError
+from bleak.backends.scanner import AdvertisementData
+
+# The link used by new connections (an ideal link is created if none has been installed)
+_link = None
+
+def set_link(link):
+    """Set the link used by new connections"""
+    global _link
+    _link = link
+
+def get_link():
+    """The link used by new connections"""
+    global _link
+    if _link is None:
+        from loopback_link import LoopbackLink
+        _link = LoopbackLink()
+    return _link
+
+class BLEDevice:
+    def __init__(self, address: str, name: str):
+        self.address = address
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f"BLEDevice({self.address}, {self.name})"
+
+class BleakScanner:
+    # The simulated robot's address
+    _ROBOT_ADDRESS = "56:54:32:53:49:4D"
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    @classmethod
+    async def discover(cls, timeout: float = 5.0, return_adv: bool = False, **kwargs):
+        # The scan runs for the whole timeout (as with a real scan)
+        await asyncio.sleep(timeout)
+        name = aioble.advertised_name()
+        if name is None:
+            return {} if return_adv else []
+
+        device = BLEDevice(BleakScanner._ROBOT_ADDRESS, name)
+        if not return_adv:
+            return [device]
+        manufacturer = aioble.advertised_manufacturer()
+        advertisement = AdvertisementData(name, {manufacturer[0]: bytes(manufacturer[1])} if manufacturer else {})
+        return {device.address: (device, advertisement)}
+
+    async def find_device_by_name(self, name: str, timeout: float = 10.0, **kwargs):
+        loop = asyncio.get_running_loop()
+        end_time = loop.time() + timeout
+        while aioble.advertised_name() != name:
+            if loop.time() >= end_time:
+                return None
+            await asyncio.sleep(0.1)
+        return BLEDevice(BleakScanner._ROBOT_ADDRESS, name)
+
+class BleakClient:
+    def __init__(self, address_or_ble_device, timeout: float = 10.0, **kwargs):
+        self.address = getattr(address_or_ble_device, "address", address_or_ble_device)
+        self._link = get_link()
+        self._connected = False
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.disconnect()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connected and self._link.is_connected
+
+    @property
+    def mtu_size(self) -> int:
+        return self._link.connection_mtu
+
+    async def connect(self, **kwargs) -> bool:
+        await self._link.connect()
+        self._connected = True
+        return True
+
+    async def disconnect(self) -> bool:
+        if self._connected:
+            self._link.disconnect()
+            self._connected = False
+        return True
+
+    async def start_notify(self, char_specifier, callback, **kwargs):
+        if not self.is_connected:
+            raise BleakError("BleakClient::start_notify - Not connected")
+        self._link.set_notify_handler(str(char_specifier), callback)
+
+    async def stop_notify(self, char_specifier):
+        self._link.set_notify_handler(str(char_specifier), None)
+
+    async def read_gatt_char(self, char_specifier, **kwargs) -> bytearray:
+        if not self.is_connected:
+            raise BleakError("BleakClient::read_gatt_char - Not connected")
+        try:
+            return bytearray(await self._link.read(str(char_specifier)))
+        except ValueError as e:
+            raise BleakError(str(e))
+
+    async def write_gatt_char(self, char_specifier, data, response: bool = False):
+        if not self.is_connected:
+            raise BleakError("BleakClient::write_gatt_char - Not connected")
+        if len(data) > self.mtu_size - 3:
+            raise BleakError(f"BleakClient::write_gatt_char - {len(data)} bytes is longer than the MTU allows")
+        self._link.write(str(char_specifier), bytes(data))
+        # Let the other tasks run (as the real write does whilst the packet is queued)
+        await asyncio.sleep(0)
@@ -0,0 +1,35 @@
+#************************************************************************
+#
+#   bleak/backends/characteristic.py
+#
+#   Emulation of the bleak library's GATT characteristic
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+class BleakGATTCharacteristic:
+    def __init__(self, uuid: str, handle: int = 0, properties: list = None):
+        self.uuid = uuid
+        self.handle = handle
+        self.properties = properties if properties is not None else []
+
+    def __repr__(self) -> str:
+        return f"BleakGATTCharacteristic({self.uuid}, {self.handle})"
@@ -0,0 +1,36 @@
+#************************************************************************
+#
+#   bleak/backends/scanner.py
+#
+#   Emulation of the bleak library's advertisement data
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+class AdvertisementData:
+    def __init__(self, local_name: str = None, manufacturer_data: dict = None, service_uuids: list = None, rssi: int = -60):
+        self.local_name = local_name
+        self.manufacturer_data = manufacturer_data if manufacturer_data is not None else {}
+        self.service_uuids = service_uuids if service_uuids is not None else []
+        self.rssi = rssi
+
+    def __repr__(self) -> str:
+        return f"AdvertisementData(local_name={self.local_name}, manufacturer_data={self.manufacturer_data})"
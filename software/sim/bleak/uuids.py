@@ -0,0 +1,39 @@
+#************************************************************************
+#
+#   bleak/uuids.py
+#
+#   Emulation of the bleak library's UUID helpers
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# The Bluetooth base UUID (16-bit UUIDs are inserted into the first group)
+_BASE_UUID = "0000{:04x}-0000-1000-8000-00805f9b34fb"
+
+def normalize_uuid_16(uuid: int) -> str:
+    return _BASE_UUID.format(uuid)
+
+def uuid_16(uuid: str):
+    """The 16-bit value of a normalised UUID (None if it isn't based on the Bluetooth base UUID)"""
+    uuid = uuid.lower()
+    if len(uuid) == 36 and uuid[:4] == "0000" and uuid[8:] == _BASE_UUID.format(0)[8:]:
+        return int(uuid[4:8], 16)
+    return None
@@ -0,0 +1,51 @@
+#************************************************************************
+#
+#   bluetooth.py
+#
+#   Emulation of MicroPython's bluetooth module
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+class UUID:
+    """A Bluetooth UUID (16-bit, 128-bit or a string)"""
+
+    def __init__(self, value):
+        if isinstance(value, UUID):
+            value = value._value
+        self._value = value
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, UUID) and self._value == other._value
+
+    def __hash__(self) -> int:
+        return hash(self._value)
+
+    def __repr__(self) -> str:
+        if isinstance(self._value, int):
+            return f"UUID({hex(self._value)})"
+        return f"UUID({self._value!r})"
+
+FLAG_READ = 0x0002
+FLAG_WRITE_NO_RESPONSE = 0x0004
+FLAG_WRITE = 0x0008
+FLAG_NOTIFY = 0x0010
+FLAG_INDICATE = 0x0020
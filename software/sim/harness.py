@@ -0,0 +1,265 @@
+#************************************************************************
+#
+#   harness.py
+#
+#   Host-runnable robot firmware harness
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Usage:
+#     import harness
+#     harness.setup()
+#     robot = harness.SimRobot()
+#     robot.diff_drive.drive_forward(100000)
+#     harness.clock.run_until_idle()
+#
+# setup() puts the emulated MicroPython modules (machine, rp2, neopixel, aioble...) ahead of
+# the robot firmware on the path, so the firmware's modules are imported unmodified. The
+# firmware's asyncio tasks run on the virtual clock (see virtual_clock.py). The linux
+# central (CommandsTx and BleCentral) is also importable and connects to the simulated
+# robot through the bleak stand-in (see loopback_link.py).
+
+import os
+import sys
+import logging
+
+import virtual_clock
+from virtual_clock import clock
+
+# The robot firmware (the simulator's modules are found first)
+_SIM_PATH = os.path.dirname(os.path.abspath(__file__))
+_ROBOT_PATH = os.path.join(os.path.dirname(_SIM_PATH), "robot")
+_LINUX_PATH = os.path.join(os.path.dirname(_SIM_PATH), "linux")
+
+# GPIO hardware mapping (see robot/main.py)
+GPIO_LEDS = 7
+GPIO_PEN = 16
+GPIO_SDA0 = 8
+GPIO_SCL0 = 9
+GPIO_SDA1 = 10
+GPIO_SCL1 = 11
+GPIO_LM_STEP = 2
+GPIO_RM_STEP = 3
+GPIO_LM_DIR = 4
+GPIO_RM_DIR = 5
+GPIO_ENABLE = 6
+GPIO_M0 = 12
+GPIO_M1 = 13
+GPIO_M2 = 14
+
+_is_setup = False
+
+def setup(log_level: int = None):
+    """
+    Make the robot firmware importable on the host.
+    Args:
+        log_level (int): Optional picolog level for the firmware (picolog.DEBUG, picolog.INFO...).
+    """
+
+    global _is_setup
+    if not _is_setup:
+        if _SIM_PATH not in sys.path:
+            sys.path.insert(0, _SIM_PATH)
+        for path in (_ROBOT_PATH, _LINUX_PATH):
+            if path not in sys.path:
+                sys.path.append(path)
+
+        virtual_clock.install()
+
+        # MicroPython's const is also a built-in (some of the firmware uses it without importing it)
+        import builtins
+        import micropython
+        builtins.const = micropython.const
+
+        import pio_models
+        pio_models.register()
+        _is_setup = True
+        logging.debug(f"harness::setup - Robot firmware imported from {_ROBOT_PATH}")
+
+    if log_level is not None:
+        import picolog
+        picolog.basicConfig(level=log_level)
+
+def reset():
+    """
+    Reset the virtual clock and the emulated hardware (so a new SimRobot starts from a clean state).
+    Note: If the event loop is running the clock keeps its time (the loop's timers depend on it).
+    """
+
+    import asyncio
+    import rp2
+    import machine
+    import aioble
+    import bleak
+    from stepper import Stepper
+    try:
+        asyncio.get_running_loop()
+        clock.reset(clock.now_ns)
+    except RuntimeError:
+        clock.reset()
+    rp2.reset()
+    machine.detach_i2c_devices()
+    aioble.reset()
+    bleak.set_link(None)
+
+    # The steppers claim the state-machines in order as they are created
+    Stepper._sm_counter = 0
+
+class SimRobot:
+    """
+    The robot's firmware objects, created and connected together as they are by robot/main.py.
+    The I2C buses have a simulated 24LC16 EEPROM and INA260 power monitor attached.
+
+    Attributes:
+        diff_drive, commands, control, telemetry, log_stream, ble_peripheral, pen, led_fx, eeprom, ina260, configuration, config_journal:
+            The firmware objects.
+        eeprom_device, ina260_device: The simulated I2C devices.
+        power_low_event (asyncio.Event): Set by the power monitor when the battery is low.
+        power_restored_event (asyncio.Event): Set by the power monitor when the power low event is cleared.
+    """
+
+    def __init__(self, use_dma: bool = True, intervals_per_second: int = 0, eeprom_contents: bytes = None, turtle_id: int = None,
+        led_state_machine: int = 2):
+        """
+        Create the firmware objects.
+        Args:
+            use_dma (bool): Stream the stepper profiles to the PIO using DMA (as main.py does).
+            intervals_per_second (int): Stepper profile update rate (0 = the steppers' default).
+            eeprom_contents (bytes): Optional initial EEPROM image (default is erased).
+            turtle_id (int): Optional turtle ID (0-7) to use instead of the one in the EEPROM's configuration.
+            led_state_machine (int): PIO state-machine driving the LEDs (-1 = the neopixel module, as main.py's option).
+        """
+
+        setup()
+        reset()
+
+        import asyncio
+        import machine
+        import i2c_devices
+        from machine import I2C, Pin
+        from pen import Pen
+        from ina260 import Ina260
+        from eeprom import Eeprom
+        from configuration import Configuration
+        from config_journal import ConfigJournal
+        from ble_peripheral import BlePeripheral
+        from led_fx import LedFx
+        from diffdrive import DiffDrive
+        from commands_rx import CommandsRx
+        from control import Control
+        from telemetry import Telemetry
+        from log_stream import LogStream
+
+        # Attach the simulated devices to the internal I2C bus
+        self.eeprom_device = i2c_devices.Eeprom24LC16(0x50, eeprom_contents)
+        for address in self.eeprom_device.addresses:
+            machine.attach_i2c_device(0, address, self.eeprom_device)
+        self.ina260_device = i2c_devices.Ina260()
+        machine.attach_i2c_device(0, 0x40, self.ina260_device)
+
+        self.pen = Pen(Pin(GPIO_PEN))
+        self.pen.up()
+
+        i2c_internal = I2C(0, scl=Pin(GPIO_SCL0), sda=Pin(GPIO_SDA0), freq=400000)
+        self.ina260 = Ina260(i2c_internal, 0x40)
+        self.power_low_event = asyncio.Event()
+        self.power_restored_event = asyncio.Event()
+        self.eeprom = Eeprom(i2c_internal, 0x50)
+
+        self.led_fx = LedFx(5, GPIO_LEDS, led_state_machine)
+        self.diff_drive = DiffDrive(GPIO_ENABLE, GPIO_M0, GPIO_M1, GPIO_M2, GPIO_LM_STEP, GPIO_LM_DIR, GPIO_RM_STEP, GPIO_RM_DIR,
+            use_dma, intervals_per_second)
+
+        self.configuration = Configuration()
+        self.config_journal = ConfigJournal(self.eeprom)
+        if not self.config_journal.load(self.configuration):
+            self.config_journal.save(self.configuration)
+        if turtle_id is not None:
+            # Note: The control task reloads the configuration from the EEPROM when it starts
+            self.configuration.turtle_id = turtle_id
+            self.config_journal.save(self.configuration)
+
+        self.ble_peripheral = BlePeripheral(self.configuration)
+        self.commands = CommandsRx(self.pen, self.ina260, self.config_journal, self.led_fx, self.diff_drive, self.configuration)
+        self.telemetry = Telemetry(self.ble_peripheral, self.diff_drive, self.ina260, self.pen)
+        self.log_stream = LogStream(self.ble_peripheral)
+        self.control = Control(self.ble_peripheral, self.commands, self.power_low_event, self.telemetry, self.log_stream,
+            self.power_restored_event)
+
+    @property
+    def left_steps(self) -> int:
+        """The number of step pulses generated for the left motor"""
+        return self.diff_drive._left_step_pin.pulses
+
+    @property
+    def right_steps(self) -> int:
+        """The number of step pulses generated for the right motor"""
+        return self.diff_drive._right_step_pin.pulses
+
+    @property
+    def led_frame(self) -> list:
+        """The colours (red, green, blue) last written to the LEDs"""
+        if self.led_fx._use_pio:
+            return list(getattr(self.led_fx.neopixel._sm, "ws2812_frame", []))
+        return list(self.led_fx.neopixel.frame)
+
+    @property
+    def left_state_machine(self):
+        """The emulated PIO state-machine generating the left motor's step pulses"""
+        return self.diff_drive._left_stepper.pulse_generator._sm
+
+    @property
+    def right_state_machine(self):
+        """The emulated PIO state-machine generating the right motor's step pulses"""
+        return self.diff_drive._right_stepper.pulse_generator._sm
+
+    async def run(self):
+        """The firmware's tasks (BLE peripheral, control, LED effects, telemetry and logging) as started by main.py"""
+        import asyncio
+        import picolog
+        tasks = [
+            asyncio.create_task(self.ble_peripheral.run()),
+            asyncio.create_task(self.control.run()),
+            asyncio.create_task(self.led_fx.run()),
+            asyncio.create_task(self.telemetry.run()),
+            asyncio.create_task(self.log_stream.run()),
+            asyncio.create_task(picolog.run()),
+        ]
+        await asyncio.gather(*tasks)
+
+def run(coroutine, timeout: float = None, real_time: bool = False):
+    """
+    Run a coroutine on the virtual clock.
+    Args:
+        coroutine: The coroutine to run.
+        timeout (float): Optional limit in virtual seconds (asyncio.TimeoutError is raised if it's reached).
+        real_time (bool): Run the clock at real-time (needed if the coroutine uses real I/O such as sockets).
+    Returns:
+        The coroutine's result.
+    """
+
+    import asyncio
+    setup()
+    virtual_clock.install(real_time)
+    if timeout is not None:
+        coroutine = asyncio.wait_for(coroutine, timeout)
+    return asyncio.run(coroutine)
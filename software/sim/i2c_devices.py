@@ -0,0 +1,154 @@
+#************************************************************************
+#
+#   i2c_devices.py
+#
+#   Simulated I2C devices (24LC16 EEPROM and INA260 power monitor)
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+class Eeprom24LC16:
+    """
+    A 24LC16 2K byte EEPROM. The device responds to 8 addresses (the base address plus
+    the block number) and each block holds 256 bytes. Writes wrap within a 16 byte page
+    and reads continue across the whole memory (as with the real device).
+
+    Setting write_limit simulates the power being cut: once that many page writes have been
+    made the next page write is torn (only the first half of its bytes are written) and any
+    later writes are ignored.
+    """
+
+    size = 2048
+    page_size = 16
+
+    def __init__(self, base_address: int = 0x50, contents: bytes = None):
+        self.base_address = base_address
+        self.memory = bytearray(contents) if contents is not None else bytearray([0xFF] * self.size)
+        self._pointer = 0
+        self.writes = 0
+        self.write_limit = None
+
+    @property
+    def addresses(self) -> list:
+        """The I2C addresses the EEPROM responds to"""
+        return [self.base_address + block for block in range(self.size // 256)]
+
+    def i2c_write(self, address: int, data: bytes, stop: bool):
+        if len(data) == 0:
+            return
+        self._pointer = ((address - self.base_address) << 8) | data[0]
+
+        # Page write (the address wraps within the page)
+        page = self._pointer & ~(self.page_size - 1)
+        data = data[1:]
+        if len(data) == 0:
+            return
+        if self.write_limit is not None:
+            if self.writes > self.write_limit:
+                return
+            if self.writes == self.write_limit:
+                data = data[:len(data) // 2]
+        for byte in data:
+            self.memory[self._pointer] = byte
+            self._pointer = page + ((self._pointer + 1) & (self.page_size - 1))
+        self.writes += 1
+
+    def i2c_read(self, address: int, nbytes: int) -> bytes:
+        data = bytearray(nbytes)
+        for index in range(nbytes):
+            data[index] = self.memory[self._pointer]
+            self._pointer = (self._pointer + 1) % self.size
+        return data
+
+class Ina260:
+    """
+    An INA260 power monitor. The measurements are set with set_measurement() and read
+    back from the current, voltage and power registers in the device's units.
+    The bus under-voltage alert (BUL) is checked whenever the measurement changes; in latch
+    mode the alert flag (AFF) stays set until the mask/enable register is read.
+    """
+
+    _REGISTER_CONFIG = 0x00
+    _REGISTER_CURRENT = 0x01
+    _REGISTER_VOLTAGE = 0x02
+    _REGISTER_POWER = 0x03
+    _REGISTER_MASK = 0x06
+    _REGISTER_ALERT = 0x07
+    _REGISTER_MANU = 0xFE
+    _REGISTER_DIE = 0xFF
+
+    _MASK_BUL = 0x1000
+    _MASK_AFF = 0x0010
+    _MASK_LEN = 0x0001
+
+    def __init__(self, voltage_mV: float = 14800.0, current_mA: float = 250.0):
+        self._registers = {
+            Ina260._REGISTER_CONFIG: 0x6127,
+            Ina260._REGISTER_MANU: 0x5449,
+            Ina260._REGISTER_DIE: 0x2270,
+        }
+        self._pointer = 0
+        self.reads = 0
+        self.set_measurement(voltage_mV, current_mA)
+
+    def set_measurement(self, voltage_mV: float, current_mA: float):
+        """Set the measured bus voltage (mV) and current (mA)"""
+        self._registers[Ina260._REGISTER_VOLTAGE] = int(voltage_mV / 1.25) & 0xFFFF
+        self._registers[Ina260._REGISTER_CURRENT] = int(current_mA / 1.25) & 0xFFFF
+        self._registers[Ina260._REGISTER_POWER] = int(abs(voltage_mV * current_mA) / 10000.0) & 0xFFFF
+        self.__update_alert()
+
+    def __update_alert(self):
+        mask = self._registers.get(Ina260._REGISTER_MASK, 0)
+        alert = bool(mask & Ina260._MASK_BUL) and \
+            self._registers[Ina260._REGISTER_VOLTAGE] < self._registers.get(Ina260._REGISTER_ALERT, 0)
+        if alert:
+            mask |= Ina260._MASK_AFF
+        elif not mask & Ina260._MASK_LEN:
+            mask &= ~Ina260._MASK_AFF
+        self._registers[Ina260._REGISTER_MASK] = mask
+
+    def i2c_write(self, address: int, data: bytes, stop: bool):
+        if len(data) == 0:
+            return
+        self._pointer = data[0]
+        if len(data) >= 3:
+            value = (data[1] << 8) | data[2]
+            if self._pointer == Ina260._REGISTER_CONFIG and value & 0x8000:
+                # Reset bit - restore the default configuration
+                value = 0x6127
+                self._registers[Ina260._REGISTER_MASK] = 0
+                self._registers[Ina260._REGISTER_ALERT] = 0
+            if self._pointer == Ina260._REGISTER_MASK:
+                # The flag bits are read-only
+                value = (value & ~Ina260._MASK_AFF) | (self._registers.get(Ina260._REGISTER_MASK, 0) & Ina260._MASK_AFF)
+            self._registers[self._pointer] = value
+            if self._pointer in (Ina260._REGISTER_MASK, Ina260._REGISTER_ALERT):
+                self.__update_alert()
+
+    def i2c_read(self, address: int, nbytes: int) -> bytes:
+        self.reads += 1
+        value = self._registers.get(self._pointer, 0)
+        if self._pointer == Ina260._REGISTER_MASK:
+            # Reading the mask/enable register clears a latched alert (it's set again by the next reading if the fault remains)
+            self._registers[Ina260._REGISTER_MASK] = value & ~Ina260._MASK_AFF
+            self.__update_alert()
+        return value.to_bytes(2, "big")[:nbytes]
@@ -0,0 +1,227 @@
+#************************************************************************
+#
+#   loopback_link.py
+#
+#   In-process BLE link between the linux central and the simulated robot
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import asyncio
+import collections
+import math
+import random
+import logging
+
+import aioble
+import bluetooth
+from bleak.uuids import uuid_16
+from bleak.backends.characteristic import BleakGATTCharacteristic
+
+# Directions
+C2P = 0 # Central to peripheral (writes)
+P2C = 1 # Peripheral to central (notifications)
+
+class LinkStatistics:
+    """Packet counts for one direction of the link"""
+
+    def __init__(self):
+        self.sent = 0
+        self.delivered = 0
+        self.lost = 0
+        self.total_delay = 0.0
+        self.maximum_delay = 0.0
+
+    @property
+    def average_delay(self) -> float:
+        return self.total_delay / self.delivered if self.delivered > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return (f"sent = {self.sent}, delivered = {self.delivered}, lost = {self.lost}, "
+            f"delay = {self.average_delay * 1000:.2f}ms average, {self.maximum_delay * 1000:.2f}ms maximum")
+
+class LoopbackLink:
+    """
+    A BLE link between the linux central (through the bleak stand-in) and the simulated
+    robot's aioble peripheral, running on the virtual clock.
+
+    Packets are only exchanged at connection events, which happen once every connection
+    interval. A packet is carried by the first connection event after it has been sent
+    (plus the latency and a random jitter) and a reply can't be sent in the same connection
+    event as the packet it is replying to. Packets in each direction are delivered in order.
+
+    Attributes:
+        statistics (list): LinkStatistics for each direction (C2P and P2C).
+    """
+
+    def __init__(self, connection_interval_ms: float = 30.0, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 loss: float = 0.0, packets_per_event: int = 0, mtu: int = 23, seed: int = None):
+        """
+        Args:
+            connection_interval_ms (float): The connection interval (0 = packets are not held for a connection event).
+            latency_ms (float): A fixed delay added to every packet.
+            jitter_ms (float): The maximum random delay added to every packet.
+            loss (float): The probability of a packet being lost (0.0 to 1.0).
+            packets_per_event (int): The maximum number of packets in each direction per connection event (0 = no limit).
+            mtu (int): The central's ATT MTU (the connection uses the smaller of it and the robot's).
+            seed (int): Seed for the jitter and loss (so runs can be repeated).
+        """
+
+        if connection_interval_ms < 0 or latency_ms < 0 or jitter_ms < 0:
+            raise ValueError("LoopbackLink::__init__ - Intervals and delays cannot be negative")
+        if loss < 0.0 or loss > 1.0:
+            raise ValueError("LoopbackLink::__init__ - Loss must be between 0.0 and 1.0")
+
+        self.connection_interval = connection_interval_ms / 1000
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.loss = loss
+        self.packets_per_event = packets_per_event
+        self.mtu = mtu
+        self._random = random.Random(seed)
+
+        self._connection = None
+        self._anchor = 0.0
+        self._notify_handlers = {}
+        self._last_delivery = [0.0, 0.0]
+        self._last_event = [0, 0]
+        self._event_packets = [{}, {}]
+        self._in_flight = [collections.deque(), collections.deque()]
+        self.statistics = [LinkStatistics(), LinkStatistics()]
+
+    def install(self):
+        """Use this link for the bleak stand-in's connections"""
+        import bleak
+        bleak.set_link(self)
+        return self
+
+    @property
+    def is_connected(self) -> bool:
+        return self._connection is not None and self._connection.is_connected()
+
+    @property
+    def connection_mtu(self) -> int:
+        """The ATT MTU agreed by the central and the robot (the central's MTU when not connected)"""
+        return self._connection.mtu if self._connection is not None else self.mtu
+
+    async def connect(self):
+        """Connect to the simulated robot (waits until it's advertising)"""
+        self._connection = await aioble.central_connect(mtu = self.mtu)
+        self._connection.notify_handler = self.__notified
+        self._anchor = asyncio.get_running_loop().time()
+        self._last_delivery = [self._anchor, self._anchor]
+        self._last_event = [0, 0]
+        self._event_packets = [{}, {}]
+        self._in_flight = [collections.deque(), collections.deque()]
+        logging.debug(f"LoopbackLink::connect - Connected with a connection interval of {self.connection_interval * 1000}ms")
+        return self._connection
+
+    def disconnect(self):
+        if self._connection is not None:
+            aioble.central_disconnect(self._connection)
+            self._connection = None
+
+    def set_notify_handler(self, uuid: str, handler):
+        """Set the central's handler for notifications from a characteristic (None to remove it)"""
+        characteristic = self.__find_characteristic(uuid)
+        if handler is None:
+            self._notify_handlers.pop(characteristic, None)
+        else:
+            self._notify_handlers[characteristic] = (BleakGATTCharacteristic(uuid.lower()), handler)
+
+    def write(self, uuid: str, data: bytes):
+        """Send a write from the central to the robot's characteristic"""
+        characteristic = self.__find_characteristic(uuid)
+        connection = self._connection
+        self.__send(C2P, lambda: characteristic.central_write(connection, data) if connection.is_connected() else None)
+
+    async def read(self, uuid: str) -> bytes:
+        """Read the value of the robot's characteristic (takes a round trip over the link)"""
+        characteristic = self.__find_characteristic(uuid)
+        await asyncio.sleep(2 * max(self.connection_interval, self.latency))
+        return characteristic.read()
+
+    def __notified(self, characteristic, data: bytes):
+        # Notification sent by the robot (carried to the central's handler)
+        if characteristic not in self._notify_handlers:
+            return
+        gatt_characteristic, handler = self._notify_handlers[characteristic]
+        self.__send(P2C, lambda: handler(gatt_characteristic, bytearray(data)) if self.is_connected else None)
+
+    def __send(self, direction: int, deliver):
+        loop = asyncio.get_running_loop()
+        statistics = self.statistics[direction]
+        statistics.sent += 1
+        if self.loss > 0 and self._random.random() < self.loss:
+            statistics.lost += 1
+            return
+
+        now = loop.time()
+        delivery_time = self.__delivery_time(direction, now + self.latency + self._random.uniform(0, self.jitter))
+        delay = delivery_time - now
+        statistics.delivered += 1
+        statistics.total_delay += delay
+        statistics.maximum_delay = max(statistics.maximum_delay, delay)
+
+        # Note: The loop's timers don't keep their order when they're due at the same time, so the
+        # packets are delivered from a queue (the delivery times never go backwards)
+        in_flight = self._in_flight[direction]
+        in_flight.append(deliver)
+        loop.call_at(delivery_time, self.__deliver_next, in_flight)
+
+    def __deliver_next(self, in_flight: collections.deque):
+        in_flight.popleft()()
+
+    def __delivery_time(self, direction: int, ready_time: float) -> float:
+        if self.connection_interval > 0:
+            # The first connection event after the packet is ready (a packet that's ready at a
+            # connection event waits for the next one). Packets are delivered in order, so a
+            # packet can't be carried by an earlier event than the packet before it
+            # Note: The small margin stops rounding errors putting a packet that's ready at an event into that event
+            event = math.floor((ready_time - self._anchor) / self.connection_interval + 1e-6) + 1
+            event = max(event, self._last_event[direction])
+            if self.packets_per_event > 0:
+                packets = self._event_packets[direction]
+                while packets.get(event, 0) >= self.packets_per_event:
+                    event += 1
+                packets[event] = packets.get(event, 0) + 1
+                # Forget the past connection events
+                for old_event in [old for old in packets if old < event]:
+                    del packets[old_event]
+            self._last_event[direction] = event
+            return self._anchor + event * self.connection_interval
+
+        # Without connection events the packets are still delivered in order
+        self._last_delivery[direction] = max(ready_time, self._last_delivery[direction])
+        return self._last_delivery[direction]
+
+    def __find_characteristic(self, uuid: str):
+        value = uuid_16(uuid)
+        target = bluetooth.UUID(value if value is not None else uuid)
+        for service in aioble.services():
+            for characteristic in service.characteristics:
+                if characteristic.uuid == target:
+                    return characteristic
+        raise ValueError(f"LoopbackLink::__find_characteristic - The robot has no characteristic {uuid}")
+
+    def __repr__(self) -> str:
+        return (f"LoopbackLink(interval = {self.connection_interval * 1000}ms, latency = {self.latency * 1000}ms, "
+            f"jitter = {self.jitter * 1000}ms, loss = {self.loss}, packets per event = {self.packets_per_event})")
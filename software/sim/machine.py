@@ -0,0 +1,211 @@
+#************************************************************************
+#
+#   machine.py
+#
+#   Emulation of MicroPython's machine module
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import rp2
+from virtual_clock import clock
+
+# PIO register addresses (see robot/pulse_generator.py)
+_PIO0_BASE = 0x50200000
+_PIO1_BASE = 0x50300000
+_PIO_CTRL = 0x000
+_ATOMIC_SET = 0x2000
+
+# The simulated board's unique ID
+_UNIQUE_ID = b"\x56\x54\x32\x53\x49\x4d\x00\x01"
+
+class Pin:
+    """A GPIO pin (the level is stored and pulses generated by a PIO state-machine are counted)"""
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, id, mode: int = -1, pull: int = -1, value: int = None):
+        self._id = id
+        self._mode = mode
+        self._value = 0 if value is None else int(bool(value))
+        self.pulses = 0
+
+    def init(self, mode: int = -1, pull: int = -1, value: int = None):
+        self._mode = mode
+        if value is not None:
+            self._value = int(bool(value))
+
+    def value(self, value = None):
+        if value is None:
+            return self._value
+        self._value = int(bool(value))
+
+    def __call__(self, value = None):
+        return self.value(value)
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+    def toggle(self):
+        self._value ^= 1
+
+    def pulse(self, count: int):
+        """Record pulses generated on the pin (called by the PIO models)"""
+        self.pulses += count
+
+    @property
+    def id(self):
+        return self._id
+
+    def __repr__(self):
+        return f"Pin({self._id})"
+
+class PWM:
+    """A PWM output (the settings are stored)"""
+
+    def __init__(self, pin: Pin, freq: int = 1000, duty_u16: int = 0):
+        self._pin = pin
+        self._freq = freq
+        self._duty_u16 = duty_u16
+
+    def freq(self, value: int = None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty_u16(self, value: int = None):
+        if value is None:
+            return self._duty_u16
+        self._duty_u16 = value
+
+    def duty_ns(self, value: int = None):
+        if value is None:
+            return (self._duty_u16 * 1000000000) // (65535 * self._freq)
+        self._duty_u16 = (value * 65535 * self._freq) // 1000000000
+
+    def deinit(self):
+        self._duty_u16 = 0
+
+class I2C:
+    """
+    An I2C bus. Devices are attached to a bus ID (see attach_i2c_device) and every I2C
+    object created for that bus talks to them. Addressing a missing device raises
+    OSError (ENODEV) like the real bus.
+    """
+
+    _devices = {}
+
+    def __init__(self, id: int, scl: Pin = None, sda: Pin = None, freq: int = 400000, timeout: int = 50000):
+        self._id = id
+        self._freq = freq
+
+    def __device(self, address: int):
+        device = I2C._devices.get(self._id, {}).get(address)
+        if device is None:
+            raise OSError(19, f"I2C::{self._id} - No device at address {hex(address)}")
+        return device
+
+    def scan(self) -> list:
+        return sorted(I2C._devices.get(self._id, {}).keys())
+
+    def writeto(self, address: int, buffer, stop: bool = True) -> int:
+        self.__device(address).i2c_write(address, bytes(buffer), stop)
+        return len(buffer)
+
+    def readfrom(self, address: int, nbytes: int, stop: bool = True) -> bytes:
+        return bytes(self.__device(address).i2c_read(address, nbytes))
+
+    def readfrom_into(self, address: int, buffer, stop: bool = True):
+        buffer[:] = self.readfrom(address, len(buffer), stop)
+
+    def writeto_mem(self, address: int, memaddr: int, buffer, addrsize: int = 8):
+        self.writeto(address, memaddr.to_bytes(addrsize // 8, "big") + bytes(buffer))
+
+    def readfrom_mem(self, address: int, memaddr: int, nbytes: int, addrsize: int = 8) -> bytes:
+        self.writeto(address, memaddr.to_bytes(addrsize // 8, "big"), False)
+        return self.readfrom(address, nbytes)
+
+    def readfrom_mem_into(self, address: int, memaddr: int, buffer, addrsize: int = 8):
+        buffer[:] = self.readfrom_mem(address, memaddr, len(buffer), addrsize)
+
+def attach_i2c_device(bus_id: int, address: int, device):
+    """
+    Attach a simulated device to an I2C bus.
+    Args:
+        bus_id (int): The I2C bus ID (0 or 1).
+        address (int): The 7-bit address the device responds to.
+        device: An object with i2c_write(address, data, stop) and i2c_read(address, nbytes) methods.
+    """
+
+    I2C._devices.setdefault(bus_id, {})[address] = device
+
+def detach_i2c_devices():
+    """Remove all of the simulated I2C devices"""
+    I2C._devices.clear()
+
+class _Mem32:
+    # Register access (only the PIO CTRL register is emulated, other writes are stored)
+    def __init__(self):
+        self._registers = {}
+
+    def __getitem__(self, address: int) -> int:
+        return self._registers.get(address, 0)
+
+    def __setitem__(self, address: int, value: int):
+        for pio_id, base in ((0, _PIO0_BASE), (1, _PIO1_BASE)):
+            if address == base + _ATOMIC_SET + _PIO_CTRL:
+                rp2.pio_ctrl_set(pio_id, value)
+                return
+        self._registers[address] = value & 0xFFFFFFFF
+
+mem32 = _Mem32()
+
+# Interrupt handlers are only called between the simulated hardware events, so they can't
+# interrupt the code that disables them (disable_irq and enable_irq do nothing)
+def disable_irq() -> int:
+    return 1
+
+def enable_irq(state: int = 1):
+    pass
+
+def unique_id() -> bytes:
+    return _UNIQUE_ID
+
+def freq(hz: int = None) -> int:
+    return 125000000
+
+def idle():
+    # Let the hardware catch up with the next event
+    event_ns = clock.next_event_ns
+    if event_ns is not None:
+        clock.advance(event_ns - clock.now_ns)
+
+def reset():
+    raise SystemExit("machine::reset - The firmware requested a reset")
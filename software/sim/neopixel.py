@@ -0,0 +1,54 @@
+#************************************************************************
+#
+#   neopixel.py
+#
+#   Emulation of MicroPython's neopixel module
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+class NeoPixel:
+    """A string of WS2812b LEDs (the last frame written is kept in the frame attribute)"""
+
+    def __init__(self, pin, n: int, bpp: int = 3, timing: int = 1):
+        self.pin = pin
+        self.n = n
+        self.bpp = bpp
+        self._pixels = [(0,) * bpp for _ in range(n)]
+        self.frame = list(self._pixels)
+        self.writes = 0
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __setitem__(self, index: int, value):
+        self._pixels[index] = tuple(value)
+
+    def __getitem__(self, index: int):
+        return self._pixels[index]
+
+    def fill(self, value):
+        for index in range(self.n):
+            self._pixels[index] = tuple(value)
+
+    def write(self):
+        self.frame = list(self._pixels)
+        self.writes += 1
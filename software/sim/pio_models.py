@@ -0,0 +1,84 @@
+#************************************************************************
+#
+#   pio_models.py
+#
+#   Models of the robot's PIO programs
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import rp2
+from virtual_clock import clock
+
+class PulseGeneratorModel:
+    """
+    Model of the pulse_generator PIO program (see robot/pulse_generator.py).
+    Each segment is two words: the number of pulses and the number of delay cycles.
+    The cycle counts follow the program's instructions:
+        pull, mov, pull, mov, irq, jmp      6 cycles per segment
+        idle loop (zero pulses)             delay + 1 cycles
+        set, ondelay, mov, set, offdelay,
+        mov, jmp (per pulse)                (2 * (delay + 1)) + 5 cycles
+        jmp start (after the pulses)        1 cycle
+    The pulses are counted on the state-machine's set_base pin.
+    """
+
+    words_per_segment = 2
+
+    def run(self, sm, words) -> int:
+        pulses, delay = words
+        pin = sm.options.get("set_base")
+        if pin is not None and pulses > 0:
+            pin.pulse(pulses)
+
+        if pulses == 0:
+            return 6 + delay + 1
+        return 6 + pulses * ((2 * (delay + 1)) + 5) + 1
+
+class Ws2812Model:
+    """
+    Model of the ws2812 PIO program (see robot/led_fx.py).
+    Each segment is one pixel (24 bits in GRB order at the top of the word) and each bit
+    takes 10 cycles. A gap between pixels (the WS2812b reset time) starts a new frame; the
+    pixels of the latest frame are kept as (red, green, blue) in the state-machine's
+    ws2812_frame attribute.
+    """
+
+    words_per_segment = 1
+
+    # Pixels starting further apart than this are in different frames
+    _RESET_NS = 50000 + 30000
+
+    def run(self, sm, words) -> int:
+        word = words[0]
+        now_ns = clock.now_ns
+        last_ns = getattr(sm, "_ws2812_last_ns", None)
+        if last_ns is None or now_ns - last_ns > Ws2812Model._RESET_NS:
+            sm.ws2812_frame = []
+            sm.ws2812_frames = getattr(sm, "ws2812_frames", 0) + 1
+        sm._ws2812_last_ns = now_ns
+        sm.ws2812_frame.append(((word >> 16) & 0xFF, (word >> 24) & 0xFF, (word >> 8) & 0xFF))
+        return 24 * 10
+
+def register():
+    """Register the models for all of the robot's PIO programs"""
+    rp2.register_program_model("pulse_generator", PulseGeneratorModel())
+    rp2.register_program_model("ws2812", Ws2812Model())
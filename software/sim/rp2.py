@@ -0,0 +1,359 @@
+#************************************************************************
+#
+#   rp2.py
+#
+#   Emulation of MicroPython's rp2 module (PIO state-machines and DMA)
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# PIO programs are not interpreted instruction by instruction (the delay loops would make
+# that far slower than real-time). Instead each program has a model, registered against
+# the program's name, which takes the words pulled from the TX FIFO and returns the number
+# of PIO cycles the program takes to process them (see pio_models.py).
+
+from virtual_clock import clock
+
+# The depth of the TX FIFO in 32-bit words (the FIFOs are not joined)
+_TX_FIFO_DEPTH = 4
+
+# Registered PIO program models (program name -> model)
+_program_models = {}
+
+# State-machines by MicroPython ID (0-3 are PIO 0, 4-7 are PIO 1)
+_state_machines = {}
+
+class PIO:
+    """The PIO constants used by the asm_pio decorator"""
+    OUT_LOW = 0
+    OUT_HIGH = 1
+    IN_LOW = 0
+    IN_HIGH = 1
+    SHIFT_LEFT = 0
+    SHIFT_RIGHT = 1
+    JOIN_NONE = 0
+    JOIN_TX = 1
+    JOIN_RX = 2
+    IRQ_SM0 = 0x100
+    IRQ_SM1 = 0x200
+    IRQ_SM2 = 0x400
+    IRQ_SM3 = 0x800
+
+    def __init__(self, pio_id: int):
+        if pio_id < 0 or pio_id > 1:
+            raise ValueError("PIO::__init__ - PIO ID must be 0 or 1")
+        self._pio_id = pio_id
+
+    def state_machine(self, sm_id: int, program = None, **kwargs):
+        return StateMachine(self._pio_id * 4 + sm_id, program, **kwargs)
+
+def asm_pio(**kwargs):
+    """
+    Decorator for PIO programs. The program body is not assembled; the model registered
+    for the program (by name) is used when a state-machine runs it.
+    """
+
+    def decorator(program):
+        program.pio_options = kwargs
+        return program
+    return decorator
+
+def register_program_model(name: str, model):
+    """
+    Register the model for a PIO program.
+    Args:
+        name (str): The name of the decorated program function.
+        model: An object with words_per_segment (int) and a run(sm, words) method which returns
+               the number of PIO cycles taken to process the words.
+    """
+
+    _program_models[name] = model
+
+def reset():
+    """Forget all of the state-machines and DMA channels (used when the simulation is restarted)"""
+    _state_machines.clear()
+    DMA._channels = 0
+
+def state_machine(sm_id: int):
+    """Get the emulated state-machine with the given MicroPython ID"""
+    return _state_machines[sm_id]
+
+def pio_ctrl_set(pio_id: int, value: int):
+    """
+    Emulate an atomic set of the PIO CTRL register. Bits 0-3 enable the state-machines and
+    bits 8-11 restart their clock dividers (so the state-machines start on the same edge).
+    """
+
+    for index in range(4):
+        if value & (1 << index):
+            sm = _state_machines.get(pio_id * 4 + index)
+            if sm is not None:
+                sm.active(1)
+
+class StateMachine:
+    """
+    An emulated PIO state-machine with a TX FIFO and an IRQ flag.
+    The program's model decides how many words make up a segment and how long the segment
+    takes. The state-machine pulls a segment as soon as it is idle and the words are in the
+    FIFO, sets its IRQ flag and is then busy for the duration of the segment.
+    """
+
+    def __init__(self, sm_id: int, program = None, freq: int = 125000000, **kwargs):
+        if sm_id < 0 or sm_id > 7:
+            raise ValueError("StateMachine::__init__ - State-machine ID must be 0-7")
+
+        self._id = sm_id
+        self._fifo = []
+        self._active = False
+        self._busy = False
+        self._done_ns = 0
+        self._remaining_ns = 0
+        self._event = None
+        self._handler = None
+        self._irq_flag = False
+        self._dma = []
+
+        self._program = program
+        self._model = None
+        self.init(program, freq, **kwargs)
+
+        # Totals (used by benchmarks and regression checks)
+        self.segments = 0
+        self.busy_ns = 0
+        self.trace = None # Set to a list to record (start_ns, words, cycles) for every segment
+
+        _state_machines[sm_id] = self
+
+    def init(self, program = None, freq: int = 125000000, **kwargs):
+        self._program = program
+        self._freq = freq
+        self._options = kwargs
+        self._model = None
+        if program is not None:
+            name = program.__name__
+            if name not in _program_models:
+                raise ValueError(f"StateMachine::init - No model registered for PIO program {name}")
+            self._model = _program_models[name]
+
+    @property
+    def id(self) -> int:
+        return self._id
+
+    @property
+    def options(self) -> dict:
+        """The keyword arguments given when the state-machine was initialised (such as set_base)"""
+        return self._options
+
+    @property
+    def is_busy(self) -> bool:
+        """True if the state-machine is part way through a segment"""
+        return self._busy
+
+    def active(self, value = None):
+        if value is None:
+            return self._active
+
+        if value and not self._active:
+            self._active = True
+            if self._busy:
+                # Resume the segment that was interrupted
+                self._done_ns = clock.now_ns + self._remaining_ns
+                self._event = clock.schedule(self._done_ns, self.__segment_done)
+            else:
+                self.__pull()
+        elif not value and self._active:
+            self._active = False
+            if self._busy:
+                self._remaining_ns = max(self._done_ns - clock.now_ns, 0)
+                self._event.cancel()
+        return self._active
+
+    def put(self, value, shift: int = 0):
+        # Note: Like the real state-machine, put blocks (here the clock is moved on) until there is space
+        values = value if isinstance(value, (list, tuple, bytes, bytearray)) or hasattr(value, "typecode") else [value]
+        for word in values:
+            while len(self._fifo) >= _TX_FIFO_DEPTH:
+                if not self._active or clock.next_event_ns is None:
+                    raise RuntimeError(f"StateMachine::put - TX FIFO of state-machine {self._id} is full and it is not running")
+                clock.advance(clock.next_event_ns - clock.now_ns)
+            self._fifo.append((word >> shift) & 0xFFFFFFFF)
+            self.__pull()
+
+    def tx_fifo(self) -> int:
+        return len(self._fifo)
+
+    def rx_fifo(self) -> int:
+        return 0
+
+    def restart(self):
+        self._fifo.clear()
+        self._busy = False
+        self._irq_flag = False
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def irq(self, handler = None, trigger: int = 0, hard: bool = False):
+        self._handler = handler
+        if handler is not None and self._irq_flag:
+            # The flag was set whilst the interrupt was disabled, so the handler is called straight away
+            self._irq_flag = False
+            clock.irq(handler, self)
+
+    def _attach_dma(self, dma):
+        # Called by a DMA channel paced by this state-machine's TX FIFO request signal
+        if dma not in self._dma:
+            self._dma.append(dma)
+
+    def _can_accept(self) -> bool:
+        return len(self._fifo) < _TX_FIFO_DEPTH
+
+    def _push(self, word: int):
+        self._fifo.append(word & 0xFFFFFFFF)
+        self.__pull()
+
+    def __pull(self):
+        # Start the next segment if the state-machine is waiting for one
+        if not self._active or self._busy or self._model is None:
+            return
+        words_needed = self._model.words_per_segment
+        if len(self._fifo) < words_needed:
+            return
+
+        words = self._fifo[:words_needed]
+        del self._fifo[:words_needed]
+        cycles = self._model.run(self, words)
+        duration_ns = (cycles * 1000000000) // self._freq
+
+        if self.trace is not None:
+            self.trace.append((clock.now_ns, tuple(words), cycles))
+        self.segments += 1
+        self.busy_ns += duration_ns
+
+        # The program signals the CPU once the words have been pulled
+        if self._handler is not None:
+            clock.irq(self._handler, self)
+        else:
+            self._irq_flag = True
+
+        self._busy = True
+        self._done_ns = clock.now_ns + duration_ns
+        self._event = clock.schedule(self._done_ns, self.__segment_done)
+
+        # Space in the FIFO raises the DMA request signal
+        for dma in self._dma:
+            dma._service()
+
+    def __segment_done(self):
+        self._busy = False
+        self._event = None
+        self.__pull()
+
+class DMA:
+    """
+    An emulated DMA channel. Transfers to a state-machine are paced by its TX FIFO (as with
+    the PIO's DREQ signal) and transfers to a buffer complete straight away. The interrupt
+    handler is called once the transfer is complete (unless irq_quiet is set).
+    """
+
+    _channels = 0
+
+    def __init__(self):
+        if DMA._channels >= 12:
+            raise RuntimeError("DMA::__init__ - No free DMA channels")
+        DMA._channels += 1
+        self._channel = DMA._channels - 1
+        self._handler = None
+        self._active = False
+        self._quiet = True
+        self._read = None
+        self._write = None
+        self._count = 0
+        self._position = 0
+        self._servicing = False
+
+    @property
+    def channel(self) -> int:
+        return self._channel
+
+    def pack_ctrl(self, default = None, **kwargs) -> dict:
+        ctrl = dict(default) if default is not None else {"size": 2, "inc_read": True, "inc_write": True, "irq_quiet": True, "treq_sel": 0x3F}
+        ctrl.update(kwargs)
+        return ctrl
+
+    def unpack_ctrl(self, ctrl: dict) -> dict:
+        return dict(ctrl)
+
+    def irq(self, handler = None, hard: bool = False):
+        self._handler = handler
+
+    def active(self, value = None):
+        if value is None:
+            return self._active
+        self._active = bool(value)
+        if self._active:
+            self._service()
+        return self._active
+
+    @property
+    def count(self) -> int:
+        return self._count - self._position
+
+    def config(self, read = None, write = None, count: int = 0, ctrl = None, trigger: bool = False):
+        if self._active:
+            raise RuntimeError("DMA::config - Channel is busy")
+        ctrl = ctrl if ctrl is not None else self.pack_ctrl()
+        self._read = read
+        self._write = write
+        self._count = count
+        self._position = 0
+        self._quiet = ctrl.get("irq_quiet", True)
+        if isinstance(write, StateMachine):
+            write._attach_dma(self)
+        if trigger:
+            self.active(1)
+
+    def close(self):
+        self._active = False
+        self._handler = None
+
+    def _service(self):
+        # Move as many words as the destination will accept
+        # Note: Pushing a word can start a segment, which services the channel again
+        if not self._active or self._servicing:
+            return
+        if isinstance(self._write, StateMachine):
+            self._servicing = True
+            try:
+                while self._position < self._count and self._write._can_accept():
+                    word = self._read[self._position]
+                    self._position += 1
+                    self._write._push(word)
+            finally:
+                self._servicing = False
+        else:
+            self._write[:self._count] = self._read[:self._count]
+            self._position = self._count
+
+        if self._position >= self._count and self._active:
+            self._active = False
+            if not self._quiet and self._handler is not None:
+                clock.irq(self._handler, self)
@@ -0,0 +1,79 @@
+#************************************************************************
+#
+#   sim_server.py
+#
+#   Simulated robot served on a TCP or Unix socket (for the socket transport)
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Runs the simulated robot in real-time behind vt2_bridge, so the linux tools can drive it
+# using the socket transport. For example:
+#
+#   python3 sim_server.py -l tcp:localhost:8910
+#   python3 ../linux/vt2_demo.py -m floor -t tcp:localhost:8910
+
+import argparse
+import logging
+import harness
+from loopback_link import LoopbackLink
+
+async def serve(link: LoopbackLink, host: str = None, port: int = None, path: str = None):
+    import asyncio
+    from ble_central import BleCentral
+    from vt2_bridge import Bridge
+
+    robot = harness.SimRobot()
+    link.install()
+    bridge = Bridge(BleCentral())
+    await asyncio.gather(robot.run(), bridge.serve(host=host, port=port, path=path))
+
+def main():
+    log_format = "[%(asctime)s %(filename)s::%(funcName)s():%(lineno)s]%(levelname)s: %(message)s"
+    logging.basicConfig(level=logging.INFO, format=log_format)
+
+    parser = argparse.ArgumentParser(description="Serve the simulated robot on a TCP or Unix socket.")
+    parser.add_argument("-l", "--listen", default="tcp:localhost:8910",
+        help="Where to listen for a client: 'tcp:<host>:<port>' or 'unix:<path>'. Default is 'tcp:localhost:8910'.")
+    parser.add_argument("-i", "--interval", type=float, default=30.0,
+        help="BLE connection interval in ms. Default is 30.")
+    args = parser.parse_args()
+
+    # Keep the firmware quiet
+    harness.setup()
+    import picolog
+    picolog.basicConfig(level=picolog.WARNING)
+
+    link = LoopbackLink(args.interval)
+    kind, _, address = args.listen.partition(":")
+    try:
+        if kind == "unix":
+            harness.run(serve(link, path=address), real_time=True)
+        elif kind == "tcp":
+            host, _, port = address.rpartition(":")
+            harness.run(serve(link, host=host or "localhost", port=int(port)), real_time=True)
+        else:
+            print("Unsupported listen address. Please use 'tcp:<host>:<port>' or 'unix:<path>'.")
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#************************************************************************
+#
+#   test_config_journal.py
+#
+#   Regression tests for the configuration journal
+#   Valiant Turtle 2 - Simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Usage (from software/sim):
+#     python -m pytest test_config_journal.py
+#
+# The journal is written to the simulated 24LC16 EEPROM (see i2c_devices.py), which can cut
+# the power part way through a save.
+
+import struct
+import harness
+
+def new_robot(eeprom_contents: bytes = None):
+    harness.setup()
+    import picolog
+    picolog.basicConfig(level=picolog.WARNING)
+    return harness.SimRobot(eeprom_contents=eeprom_contents)
+
+def reload(robot):
+    """Load the configuration from the robot's EEPROM as it would be after a restart"""
+    from configuration import Configuration
+    from config_journal import ConfigJournal
+    configuration = Configuration()
+    journal = ConfigJournal(robot.eeprom)
+    return journal.load(configuration), configuration, journal
+
+def test_save_and_load():
+    robot = new_robot()
+    robot.configuration.wheel_calibration_um = 51123
+    assert robot.config_journal.save(robot.configuration)
+
+    # Saving an unchanged configuration doesn't write to the EEPROM
+    writes = robot.eeprom_device.writes
+    assert not robot.config_journal.save(robot.configuration)
+    assert robot.eeprom_device.writes == writes
+
+    loaded, configuration, journal = reload(robot)
+    assert loaded
+    assert configuration.wheel_calibration_um == 51123
+    assert journal.slot == robot.config_journal.slot
+
+def test_torn_write_keeps_previous_record():
+    # Cutting the power part way through every page of a save leaves the previous record in use
+    robot = new_robot()
+    robot.configuration.wheel_calibration_um = 51000
+    robot.config_journal.save(robot.configuration)
+    image = bytes(robot.eeprom_device.memory)
+
+    for page_writes in range(3):
+        robot = new_robot(image)
+        robot.eeprom_device.write_limit = robot.eeprom_device.writes + page_writes
+        robot.configuration.wheel_calibration_um = 52000
+        robot.config_journal.save(robot.configuration)
+
+        loaded, configuration, journal = reload(robot)
+        assert loaded
+        assert configuration.wheel_calibration_um == 51000, page_writes
+
+def test_journal_wraps():
+    # Saving more records than there are slots reuses the oldest slots and keeps the newest record
+    robot = new_robot()
+    for value in range(100):
+        robot.configuration.turtle_id = value % 8
+        robot.configuration.wheel_calibration_um = 50000 + value
+        robot.config_journal.save(robot.configuration)
+
+    loaded, configuration, journal = reload(robot)
+    assert loaded
+    assert configuration.wheel_calibration_um == 50099
+    assert journal.slot == robot.config_journal.slot
+    assert journal.sequence == robot.config_journal.sequence
+
+def legacy_image(wheel_calibration_um: int, turtle_id: int) -> bytes:
+    """An EEPROM holding a configuration saved in the original (version 4) format"""
+    image = struct.pack("<10q", 4, 200000, 4000, 100000, 4000, wheel_calibration_um, 0, turtle_id, 0, 0)
+    return image + b"\xff" * (2048 - len(image))
+
+def test_torn_write_keeps_legacy_record():
+    # The first record after loading the original format is written past it, so cutting the power part way
+    # through the save leaves the original configuration in use
+    for page_writes in range(3):
+        robot = new_robot(legacy_image(51500, 3))
+        assert robot.configuration.turtle_id == 3
+        robot.eeprom_device.write_limit = robot.eeprom_device.writes + page_writes
+        robot.configuration.turtle_id = 5
+        robot.config_journal.save(robot.configuration)
+
+        loaded, configuration, journal = reload(robot)
+        assert loaded
+        assert configuration.wheel_calibration_um == 51500, page_writes
+        assert configuration.turtle_id == 3, page_writes
+
+    # Once saved, the journalled record is used
+    robot = new_robot(legacy_image(51500, 3))
+    robot.configuration.turtle_id = 5
+    assert robot.config_journal.save(robot.configuration)
+    loaded, configuration, journal = reload(robot)
+    assert loaded
+    assert configuration.turtle_id == 5
+    assert journal.slot >= 2
@@ -0,0 +1,99 @@
+#************************************************************************
+#
+#   test_control.py
+#
+#   Regression tests for the robot's command handling
+#   Valiant Turtle 2 - Simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Usage (from software/sim):
+#     python -m pytest test_control.py
+#
+# The packets are written straight to the simulated robot (rather than through CommandsTx)
+# so the tests can send exactly what an older central would.
+
+import asyncio
+import struct
+import harness
+from loopback_link import LoopbackLink
+
+# The robot's command characteristics
+_TX_P2C_UUID = "0000fba0-0000-1000-8000-00805f9b34fb"
+_RX_C2P_UUID = "0000fba1-0000-1000-8000-00805f9b34fb"
+
+def exchange(packets: list, expected: int = None, timeout: float = 10.0) -> dict:
+    """
+    Start the simulated robot, write each packet to it and wait for a response to every one
+    (or for the expected number of responses).
+    Returns:
+        dict: The response to each packet, indexed by sequence ID.
+    """
+
+    harness.setup()
+    import picolog
+    picolog.basicConfig(level=picolog.WARNING)
+    robot = harness.SimRobot()
+    responses = {}
+
+    async def run():
+        link = LoopbackLink(30.0).install()
+        robot_task = asyncio.create_task(robot.run())
+        await link.connect()
+
+        def notified(characteristic, data: bytearray):
+            if data[0] != 0:
+                responses[data[0]] = bytes(data)
+            # Central answers every notification (a NOP as there is nothing else to send)
+            link.write(_RX_C2P_UUID, bytes(20))
+        link.set_notify_handler(_TX_P2C_UUID, notified)
+
+        for packet in packets:
+            link.write(_RX_C2P_UUID, packet)
+        while len(responses) < (len(packets) if expected is None else expected):
+            await asyncio.sleep(0.01)
+        robot_task.cancel()
+
+    harness.run(run(), timeout)
+    return responses
+
+def test_short_velocity_command():
+    # Centrals from before the jerk parameter send set_linear_velocity without it (and without
+    # padding), the robot must treat the missing jerk as 0 and carry on handling commands
+    harness.setup()
+    import protocol_peripheral as protocol
+    responses = exchange([
+        struct.pack("<BBii", 5, protocol.SET_LINEAR_VELOCITY, 150, 300),
+        struct.pack("<BB", 6, protocol.GET_LINEAR_VELOCITY),
+    ])
+
+    assert 5 in responses
+    assert struct.unpack_from("<iii", responses[6], 1) == (150, 300, 0)
+
+def test_malformed_frame_rejected():
+    # A frame that isn't a whole number of packets is rejected (none of its packets are used)
+    # and the robot carries on handling commands
+    harness.setup()
+    import protocol_peripheral as protocol
+    frame = struct.pack("<BB", 7, protocol.HEADING).ljust(20, b"\0") + struct.pack("<BB", 8, protocol.HEADING)
+    responses = exchange([frame, struct.pack("<BB", 9, protocol.HEADING)], expected=1)
+    assert 7 not in responses and 8 not in responses
+    assert 9 in responses
@@ -0,0 +1,144 @@
+#************************************************************************
+#
+#   test_drawing.py
+#
+#   Regression tests for the drawing optimisers
+#   Valiant Turtle 2 - Simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Usage (from software/sim):
+#     python -m pytest test_drawing.py
+#
+# The drawings are recorded (and the optimised drawings rendered) with the DrawingRecorder, so
+# no robot is needed.
+
+import math
+import harness
+
+harness.setup()
+from stroke_optimizer import DrawingRecorder
+from turtle_program import ProgramRecorder
+
+def point(position: tuple) -> tuple:
+    return round(position[0], 3), round(position[1], 3)
+
+def ink(drawing) -> set:
+    """The lines and arcs drawn with the pen down (whichever way round they were drawn, and with
+    the lines along the same bearing in a stroke merged)"""
+    marks = set()
+    for stroke in drawing.strokes:
+        line = None
+        for segment in stroke.segments + [None]:
+            if line is not None and (segment is None or segment.is_arc or segment.start != line[1]
+                    or not math.isclose(segment.start_heading, line[2], abs_tol=1e-6)):
+                marks.add(frozenset((point(line[0]), point(line[1]))))
+                line = None
+            if segment is None:
+                break
+            if segment.is_arc:
+                marks.add((frozenset((point(segment.start), point(segment.end))), round(abs(segment.radius), 3), segment.extent))
+            elif line is None:
+                line = [segment.start, segment.end, segment.start_heading]
+            else:
+                line[1] = segment.end
+    return marks
+
+def dashes(t):
+    # A row of dashes drawn from alternate ends of the page
+    for row in range(6):
+        t.penup()
+        t.setposition(0 if row % 2 else 200, row * 20)
+        t.pendown()
+        t.setheading(0)
+        t.forward(40)
+        t.penup()
+        t.setposition(100, row * 20)
+        t.pendown()
+        t.circle(10, 180)
+
+def test_optimised_drawing_draws_the_same_with_less_travel():
+    recorder = DrawingRecorder()
+    dashes(recorder)
+    drawing = recorder.drawing
+    optimised = drawing.optimised()
+
+    assert optimised.travel()[0] < drawing.travel()[0]
+    assert len(optimised.strokes) == len(drawing.strokes)
+
+    # Rendering the optimised drawing draws the same lines and arcs and ends in the same pose
+    rendered = DrawingRecorder()
+    optimised.render(rendered)
+    assert ink(rendered.drawing) == ink(drawing)
+    assert point(rendered.position()) == point(recorder.position())
+    assert math.isclose(rendered.heading(), recorder.heading(), abs_tol=1e-6)
+
+def polygons(t):
+    # Circles drawn as polygons in short steps with redundant turns and pen changes
+    t.pendown()
+    t.pendown()
+    for _ in range(3):
+        for _ in range(12):
+            t.forward(5)
+            t.forward(5)
+            t.left(10)
+            t.left(20)
+        t.penup()
+        t.right(90)
+        t.left(90)
+        t.forward(30)
+        t.pendown()
+    t.circle(20, 0)
+
+def replayed(program) -> DrawingRecorder:
+    recorder = DrawingRecorder()
+    program.replay(recorder)
+    return recorder
+
+def test_compacted_program_draws_the_same_with_fewer_commands():
+    recorder = ProgramRecorder()
+    polygons(recorder)
+    program = recorder.program
+    original = replayed(program)
+
+    for goto in (False, True):
+        compacted = program.optimised(goto=goto)
+        assert len(compacted) < len(program) * 0.6, goto
+
+        result = replayed(compacted)
+        assert ink(result.drawing) == ink(original.drawing), goto
+        assert point(result.position()) == point(original.position()), goto
+        assert math.isclose(result.heading(), original.heading(), abs_tol=1e-6), goto
+
+def test_recorders_draw_polygons_the_same():
+    # Both recorders draw a circle with steps as the same polygon (the program records its moves and turns)
+    recorder = DrawingRecorder()
+    program_recorder = ProgramRecorder()
+    for t in (recorder, program_recorder):
+        t.pendown()
+        t.circle(30, 270, 9)
+        t.circle(-15, 90, 4)
+    assert ("circle", (30, 270)) not in program_recorder.program.ops
+
+    replayed_program = replayed(program_recorder.program)
+    assert ink(replayed_program.drawing) == ink(recorder.drawing)
+    assert point(replayed_program.position()) == point(recorder.position())
+    assert point(program_recorder.position()) == point(recorder.position())
@@ -0,0 +1,117 @@
+#************************************************************************
+#
+#   test_motion.py
+#
+#   Regression tests for the robot's motion profiles
+#   Valiant Turtle 2 - Simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Usage (from software/sim):
+#     python -m pytest test_motion.py
+#
+# The moves are given straight to DiffDrive and run on the virtual clock (as bench_motion.py does).
+
+import harness
+
+# Linear and rotational velocities (um/s, um/s^2) as used by bench_motion.py
+_SPEED = 200000
+_ACCELERATION = 40000
+
+# The largest difference allowed between the profile timings at different interval rates (the 16 Hz
+# profile changes speed in coarser steps, which can move each ramp by up to one of its intervals)
+_RATE_TOLERANCE_S = 2 / 16
+
+def new_robot(use_dma: bool = True, intervals_per_second: int = 0, jerk: float = 0):
+    """A simulated robot with the motors enabled and the test velocities set"""
+    harness.setup()
+    import picolog
+    picolog.basicConfig(level=picolog.WARNING)
+    robot = harness.SimRobot(use_dma, intervals_per_second)
+    robot.diff_drive.set_enable(True)
+    robot.diff_drive.set_linear_velocity(_SPEED, _ACCELERATION, jerk)
+    robot.diff_drive.set_rotational_velocity(_SPEED // 2, _ACCELERATION, jerk)
+    return robot
+
+def drive(robot, moves: list) -> float:
+    """Give the moves (DiffDrive method names and arguments) to the robot and return the time taken (in seconds)"""
+    diff_drive = robot.diff_drive
+    start = harness.clock.now
+    for method, *arguments in moves:
+        getattr(diff_drive, method)(*arguments)
+        # Let the planner catch up when it's full (as the control task would)
+        while diff_drive.planner_full:
+            harness.clock.advance(harness.clock.next_event_ns - harness.clock.now_ns)
+    harness.clock.run_until_idle()
+    return harness.clock.now - start
+
+def test_profile_time_independent_of_interval_rate():
+    # The acceleration (and jerk) are scaled by the interval rate, so a move takes the same time at
+    # the default rates with and without DMA
+    for jerk in (0, 400000):
+        for distance_um in (100000, 1000000):
+            slow = drive(new_robot(False, 16, jerk), [("drive_forward", distance_um)])
+            fast = drive(new_robot(True, 128, jerk), [("drive_forward", distance_um)])
+            assert abs(slow - fast) <= _RATE_TOLERANCE_S, (jerk, distance_um, slow, fast)
+
+def queued_steps(robot) -> list:
+    """Record the steps of each move given to the motion planner (left and right wheel)"""
+    diff_drive = robot.diff_drive
+    moves = []
+    queue_move = diff_drive._DiffDrive__queue_move
+    def record(move):
+        moves.append((int(round(move.left_steps)), int(round(move.right_steps))))
+        queue_move(move)
+    diff_drive._DiffDrive__queue_move = record
+    return moves
+
+def test_planned_moves_land_on_step_count():
+    # Every move finishes exactly on its step count at both interval rates, both for the wheel that
+    # generates the profile and for the wheel that follows it (arcs move the wheels different distances)
+    patterns = (
+        [("drive_forward", 123456)],
+        [("drive_forward", 1000), ("turn_left", 3), ("drive_backward", 777)],
+        [("circle", 50000, 270), ("circle", 200000, 45), ("circle", -80000, 90)],
+        [("drive_forward", 30000)] * 6,
+    )
+    for use_dma, intervals_per_second in ((False, 16), (True, 128)):
+        for jerk in (0, 400000):
+            for pattern in patterns:
+                robot = new_robot(use_dma, intervals_per_second, jerk)
+                moves = queued_steps(robot)
+                drive(robot, pattern)
+                assert len(moves) > 0
+                assert robot.left_steps == sum(left for left, right in moves), (intervals_per_second, jerk, pattern)
+                assert robot.right_steps == sum(right for left, right in moves), (intervals_per_second, jerk, pattern)
+                assert robot.diff_drive.moves_completed == len(moves)
+
+def test_blended_moves_keep_moving():
+    # Consecutive moves in the same direction are blended (the junction speeds between them are
+    # planned with the acceleration the steppers actually use), so they take about as long as one
+    # move of the same length and much less time than stopping between the moves
+    for use_dma, intervals_per_second in ((False, 16), (True, 128)):
+        for jerk in (0, 400000):
+            blended = drive(new_robot(use_dma, intervals_per_second, jerk), [("drive_forward", 30000)] * 6)
+            single = drive(new_robot(use_dma, intervals_per_second, jerk), [("drive_forward", 180000)])
+            robot = new_robot(use_dma, intervals_per_second, jerk)
+            stopping = sum(drive(robot, [("drive_forward", 30000)]) for _ in range(6))
+            assert blended < single * 1.25, (intervals_per_second, jerk, blended, single)
+            assert blended < stopping * 0.75, (intervals_per_second, jerk, blended, stopping)
@@ -0,0 +1,224 @@
+#************************************************************************
+#
+#   test_protocol.py
+#
+#   Regression tests for the central's command protocol
+#   Valiant Turtle 2 - Simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+# Usage (from software/sim):
+#     python -m pytest test_protocol.py
+#
+# AsyncCommandsTx talks to the simulated robot through the loopback BLE link (as bench_link.py does).
+
+import asyncio
+import harness
+from loopback_link import LoopbackLink
+
+def setup():
+    harness.setup()
+    import picolog
+    picolog.basicConfig(level=picolog.WARNING)
+
+def packet(seq_id: int, value: int = 0) -> bytes:
+    return bytes([seq_id, value]) + bytes(18)
+
+def test_router_routes_by_sequence():
+    # Each response goes to the command with its sequence ID, whatever order they arrive in
+    setup()
+    from response_router import ResponseRouter
+
+    async def run():
+        router = ResponseRouter()
+        futures = {seq_id: router.expect(seq_id) for seq_id in (3, 4, 5)}
+        for seq_id in (5, 3, 4):
+            assert router.route(packet(seq_id, seq_id * 10))
+        for seq_id, future in futures.items():
+            assert future.result()[1] == seq_id * 10
+            router.finish(seq_id)
+        assert router.pending == 0
+
+    harness.run(run())
+
+def test_router_late_and_orphan_responses():
+    # A command that gave up waiting keeps its sequence ID until the late response arrives, and a
+    # response that no command is waiting for is kept as an orphan
+    setup()
+    from response_router import ResponseRouter
+
+    async def run():
+        router = ResponseRouter()
+        router.expect(7)
+        router.finish(7)
+        assert router.in_use(7)
+
+        assert not router.route(packet(7))
+        assert router.late_count == 1
+        assert not router.in_use(7)
+
+        assert not router.route(packet(9))
+        assert router.orphan_count == 1
+        assert 9 in router.orphans
+
+    harness.run(run())
+
+def run_window(window: int, count: int) -> tuple:
+    """Send queries to the simulated robot with a window of commands in flight (over a link with a
+    large enough MTU for several packets per connection event). Returns the number of successful
+    commands, the most in flight at once and the time taken"""
+    setup()
+    robot = harness.SimRobot()
+    LoopbackLink(30.0, mtu=185).install()
+    from async_commands_tx import AsyncCommandsTx
+
+    async def run():
+        commands_tx = AsyncCommandsTx(max_in_flight=window)
+        tasks = [asyncio.create_task(robot.run()), asyncio.create_task(commands_tx.run())]
+        await commands_tx.wait_for_connection()
+
+        # Count the commands in flight as each one is sent
+        most_in_flight = 0
+        add_to_c2p_queue = commands_tx.transport.add_to_c2p_queue
+        def send(data):
+            nonlocal most_in_flight
+            most_in_flight = max(most_in_flight, commands_tx.in_flight)
+            add_to_c2p_queue(data)
+        commands_tx.transport.add_to_c2p_queue = send
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await asyncio.gather(*[commands_tx.heading() for _ in range(count)])
+        duration = loop.time() - start
+        for task in tasks:
+            task.cancel()
+        return sum(1 for result in results if result[0]), most_in_flight, duration
+
+    return harness.run(run(), 60)
+
+def test_window_limits_commands_in_flight():
+    # No more than the window of commands are sent at once, and a larger window gets the same
+    # commands through in less time
+    successes, most_in_flight, serial_time = run_window(1, 12)
+    assert successes == 12
+    assert most_in_flight <= 1
+
+    successes, most_in_flight, pipelined_time = run_window(4, 12)
+    assert successes == 12
+    assert most_in_flight <= 4
+    assert pipelined_time < serial_time / 2
+
+def test_queued_moves_report_completed_pose():
+    # Moves accepted into the robot's motion queue have no pose until they complete, and
+    # wait_for_completion returns the pose the robot reports once they have
+    setup()
+    robot = harness.SimRobot()
+    LoopbackLink(30.0).install()
+    from async_commands_tx import AsyncCommandsTx
+
+    async def run():
+        commands_tx = AsyncCommandsTx()
+        tasks = [asyncio.create_task(robot.run()), asyncio.create_task(commands_tx.run())]
+        await commands_tx.wait_for_connection()
+
+        assert await commands_tx.motors(True)
+        assert await commands_tx.motion_queue(True)
+        assert await commands_tx.forward(10) == (True, None, None, None)
+        assert await commands_tx.left(90) == (True, None, None, None)
+        result = await commands_tx.wait_for_completion(30)
+        for task in tasks:
+            task.cancel()
+        return result
+
+    assert harness.run(run(), 60) == (True, 10.0, 0.0, 90.0)
+
+def test_queries_answered_whilst_moves_queued():
+    # A query doesn't wait behind the moves in the robot's motion queue
+    setup()
+    robot = harness.SimRobot()
+    LoopbackLink(30.0).install()
+    from async_commands_tx import AsyncCommandsTx
+
+    async def run():
+        commands_tx = AsyncCommandsTx()
+        tasks = [asyncio.create_task(robot.run()), asyncio.create_task(commands_tx.run())]
+        await commands_tx.wait_for_connection()
+
+        assert await commands_tx.motors(True)
+        assert await commands_tx.motion_queue(True)
+        assert (await commands_tx.forward(500))[0]
+        assert (await commands_tx.forward(500))[0]
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        success, _, _, _ = await commands_tx.power()
+        query_time = loop.time() - start
+        queued = commands_tx.queued_commands
+        for task in tasks:
+            task.cancel()
+        return success, query_time, queued
+
+    success, query_time, queued = harness.run(run(), 60)
+    assert success
+    assert queued > 0
+    assert query_time < 0.5
+
+def test_lost_command_times_out_whilst_others_respond():
+    # Each command has its own timeout, so a command whose packet is lost gives up on time even
+    # though the robot keeps answering the commands sent after it
+    setup()
+    robot = harness.SimRobot()
+    LoopbackLink(30.0).install()
+    from async_commands_tx import AsyncCommandsTx
+
+    async def run():
+        commands_tx = AsyncCommandsTx(max_in_flight=4)
+        commands_tx._short_timeout = 0.5
+        tasks = [asyncio.create_task(robot.run()), asyncio.create_task(commands_tx.run())]
+        await commands_tx.wait_for_connection()
+
+        # Lose the first command sent
+        add_to_c2p_queue = commands_tx.transport.add_to_c2p_queue
+        lost = []
+        def send(data):
+            if len(lost) == 0:
+                lost.append(data[0])
+                return
+            add_to_c2p_queue(data)
+        commands_tx.transport.add_to_c2p_queue = send
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async def lost_heading():
+            result = await commands_tx.heading()
+            return result, loop.time() - start
+        async def other_headings():
+            return [await commands_tx.heading() for _ in range(40)]
+
+        (result, duration), others = await asyncio.gather(lost_heading(), other_headings())
+        for task in tasks:
+            task.cancel()
+        return result, duration, others
+
+    result, duration, others = harness.run(run(), 60)
+    assert result == (False, 0.0)
+    assert duration < 1.0
+    assert others[0][0]
@@ -0,0 +1,77 @@
+#************************************************************************
+#
+#   test_telemetry.py
+#
+#   Regression tests for the telemetry frames
+#   Valiant Turtle 2 - Simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+
+# Usage (from software/sim):
+#     python -m pytest test_telemetry.py
+#
+# The frames are built by the simulated robot's Telemetry and decoded by the central's TelemetryFrame.
+
+import harness
+
+def new_robot():
+    harness.setup()
+    import picolog
+    picolog.basicConfig(level=picolog.WARNING)
+    robot = harness.SimRobot()
+    robot.diff_drive.set_enable(True)
+    return robot
+
+def decode(robot):
+    from telemetry_rx import TelemetryFrame
+    return TelemetryFrame(robot.telemetry.frame())
+
+def test_frame_reports_pose_reached():
+    # Whilst moving the frame reports how far the robot has got (not where the queued moves end)
+    robot = new_robot()
+    robot.diff_drive.turn_left(90)
+    robot.diff_drive.drive_forward(200000)
+    robot.diff_drive.circle(50000, 90)
+
+    positions = []
+    while robot.diff_drive.is_moving:
+        harness.clock.advance(50000000)
+        frame = decode(robot)
+        positions.append((frame.x_mm, frame.y_mm, frame.heading))
+    assert len(positions) > 10
+
+    # The robot heads along the y axis before turning on the arc, so y rises steadily whilst the heading stays at 90
+    driving = [y for x, y, heading in positions if heading == 90.0]
+    assert driving == sorted(driving)
+    assert 0 < driving[len(driving) // 2] < 200
+
+    frame = decode(robot)
+    assert (frame.x_mm, frame.y_mm, frame.heading) == (-50, 250, 180.0)
+    assert not frame.moving
+
+def test_frame_reports_charging_current():
+    # The current is signed (negative when the battery is charging)
+    robot = new_robot()
+    robot.ina260_device.set_measurement(16000.0, -500.0)
+    frame = decode(robot)
+    assert frame.current_mA == -500
+    assert frame.power_mW == 8000
@@ -0,0 +1,330 @@
+#************************************************************************
+#
+#   virtual_clock.py
+#
+#   Virtual clock and asyncio event loop
+#   Valiant Turtle 2 - Robot firmware simulator
+#   Copyright (C) 2024 Simon Inns
+#
+#   This file is part of Valiant Turtle 2
+#
+#   This is free software: you can redistribute it and/or
+#   modify it under the terms of the GNU General Public License as
+#   published by the Free Software Foundation, either version 3 of the
+#   License, or (at your option) any later version.
+#
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+#
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#   Email: simon.inns@gmail.com
+#
+#************************************************************************
+
+import asyncio
+import heapq
+import math
+import selectors
+import time
+import logging
+
+class VirtualClock:
+    """
+    A simulated clock shared by the emulated hardware and the asyncio event loop.
+
+    Time only moves forward when the event loop would otherwise wait (or when advance()
+    is called directly), so the firmware runs as fast as the host allows whilst seeing
+    the same timing as it would on the robot.
+
+    Hardware events (such as a state-machine finishing a segment) are scheduled at a
+    point in virtual time. Interrupt handlers are not called from inside the hardware
+    events; like MicroPython's soft IRQs they are queued and called between events,
+    so a handler is never re-entered by the hardware it is driving.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self, time_ns: int = 0):
+        """Reset the clock (to zero by default) and discard all scheduled events and pending interrupts"""
+        self._now_ns = time_ns
+        self._events = []
+        self._sequence = 0
+        self._pending_irqs = []
+        self._in_irq = False
+
+    @property
+    def now_ns(self) -> int:
+        """The virtual time in nanoseconds"""
+        return self._now_ns
+
+    @property
+    def now(self) -> float:
+        """The virtual time in seconds"""
+        return self._now_ns / 1e9
+
+    @property
+    def next_event_ns(self):
+        """The virtual time of the next scheduled event (None if nothing is scheduled)"""
+        while self._events and self._events[0][2].cancelled:
+            heapq.heappop(self._events)
+        return self._events[0][0] if self._events else None
+
+    def schedule(self, time_ns: int, callback, *args):
+        """
+        Schedule a hardware event.
+        Args:
+            time_ns (int): The virtual time of the event (events in the past happen straight away).
+            callback (callable): The function to call.
+        Returns:
+            VirtualEvent: The event (which can be cancelled).
+        """
+
+        event = VirtualEvent(callback, args)
+        self._sequence += 1
+        heapq.heappush(self._events, (max(time_ns, self._now_ns), self._sequence, event))
+        return event
+
+    def irq(self, handler, *args):
+        """Queue an interrupt handler to be called once the current event has been processed"""
+        self._pending_irqs.append((handler, args))
+
+    def run_irqs(self):
+        """Call the queued interrupt handlers (including any queued whilst they run)"""
+        if self._in_irq:
+            return
+        self._in_irq = True
+        try:
+            while self._pending_irqs:
+                handler, args = self._pending_irqs.pop(0)
+                handler(*args)
+        finally:
+            self._in_irq = False
+
+    def advance(self, duration_ns: int, wake=None) -> bool:
+        """
+        Move the clock forward, processing the hardware events (and interrupts) on the way.
+        Args:
+            duration_ns (int): How far to move the clock.
+            wake (callable): Optional function returning True to stop early (for example, once an
+                             interrupt has woken a task). The clock stops at the time of the event.
+        Returns:
+            bool: True if the clock stopped early.
+        """
+
+        end_ns = self._now_ns + max(duration_ns, 0)
+        self.run_irqs()
+        if wake is not None and wake():
+            return True
+
+        while True:
+            event_ns = self.next_event_ns
+            if event_ns is None or event_ns > end_ns:
+                break
+
+            _, _, event = heapq.heappop(self._events)
+            self._now_ns = event_ns
+            event.callback(*event.args)
+            self.run_irqs()
+
+            if wake is not None and wake():
+                return True
+
+        self._now_ns = end_ns
+        return False
+
+    def run_until_idle(self, limit_ns: int = None) -> bool:
+        """
+        Process hardware events until nothing else is scheduled.
+        Args:
+            limit_ns (int): Optional virtual time at which to give up.
+        Returns:
+            bool: True if the hardware is idle, False if the limit was reached first.
+        """
+
+        self.run_irqs()
+        while True:
+            event_ns = self.next_event_ns
+            if event_ns is None:
+                return True
+            if limit_ns is not None and event_ns > limit_ns:
+                self._now_ns = max(self._now_ns, limit_ns)
+                return False
+            self.advance(event_ns - self._now_ns)
+
+class VirtualEvent:
+    """A scheduled hardware event"""
+
+    def __init__(self, callback, args):
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+# The clock used by all of the emulated hardware
+clock = VirtualClock()
+
+class _VirtualSelector(selectors.BaseSelector):
+    # A selector that never waits for I/O - instead the virtual clock is moved on by the
+    # timeout (and the loop is woken early if the hardware wakes a task)
+    #
+    # In real-time mode the selector waits for real I/O (using the default selector) and the
+    # clock is moved on by the real time taken, so the simulation can talk to other programs
+    def __init__(self, real_time: bool = False):
+        self._map = {}
+        self._selector = selectors.DefaultSelector() if real_time else None
+        self.loop = None
+
+    def register(self, fileobj, events, data=None):
+        if self._selector is not None:
+            return self._selector.register(fileobj, events, data)
+        fd = fileobj if isinstance(fileobj, int) else fileobj.fileno()
+        key = selectors.SelectorKey(fileobj, fd, events, data)
+        self._map[fd] = key
+        return key
+
+    def unregister(self, fileobj):
+        if self._selector is not None:
+            return self._selector.unregister(fileobj)
+        fd = fileobj if isinstance(fileobj, int) else fileobj.fileno()
+        return self._map.pop(fd)
+
+    def select(self, timeout=None):
+        if self._selector is not None:
+            return self.__select_real_time(timeout)
+
+        if timeout is None:
+            # Nothing is scheduled by the event loop, so wait for the hardware to wake a task
+            clock.run_irqs()
+            while not self.__woken():
+                event_ns = clock.next_event_ns
+                if event_ns is None:
+                    raise RuntimeError("VirtualEventLoop::select - Every task is waiting and no hardware events are scheduled")
+                clock.advance(event_ns - clock.now_ns, self.__woken)
+        else:
+            # Round up so the loop's timer is always due once the clock has moved on
+            clock.advance(math.ceil(timeout * 1e9), self.__woken)
+        return []
+
+    def __select_real_time(self, timeout):
+        clock.run_irqs()
+        if self.__woken():
+            timeout = 0
+
+        # Don't wait past the next hardware event
+        event_ns = clock.next_event_ns
+        if event_ns is not None:
+            event_timeout = max(event_ns - clock.now_ns, 0) / 1e9
+            timeout = event_timeout if timeout is None else min(timeout, event_timeout)
+
+        start_ns = time.monotonic_ns()
+        ready = self._selector.select(timeout)
+        elapsed_ns = time.monotonic_ns() - start_ns
+
+        # Make sure the loop's timer (or the hardware event) is due once the clock has moved on
+        if not ready and timeout is not None:
+            elapsed_ns = max(elapsed_ns, math.ceil(timeout * 1e9))
+        clock.advance(elapsed_ns, self.__woken)
+        return ready
+
+    def __woken(self) -> bool:
+        return len(self.loop._ready) > 0
+
+    def close(self):
+        self._map.clear()
+        if self._selector is not None:
+            self._selector.close()
+
+    def get_map(self):
+        return self._selector.get_map() if self._selector is not None else self._map
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    """
+    An asyncio event loop that runs on the virtual clock.
+    Sleeps and timeouts complete as soon as nothing else can run, so the firmware's
+    tasks run faster than real-time (there is no real I/O in the simulation).
+
+    With real_time set the loop waits for real I/O (such as sockets) and the virtual
+    clock follows the real time instead.
+    """
+
+    def __init__(self, real_time: bool = False):
+        selector = _VirtualSelector(real_time)
+        super().__init__(selector)
+        selector.loop = self
+
+    def time(self) -> float:
+        return clock.now
+
+class VirtualEventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    """Event loop policy so asyncio.run() (as used by the firmware's main) creates a virtual loop"""
+
+    def __init__(self, real_time: bool = False):
+        super().__init__()
+        self._real_time = real_time
+
+    def new_event_loop(self):
+        return VirtualEventLoop(self._real_time)
+
+class ThreadSafeFlag:
+    """
+    MicroPython's asyncio.ThreadSafeFlag (set from interrupt handlers, wait() clears the flag).
+    Interrupt handlers are called from the event loop in the simulation, so an Event is enough.
+    """
+
+    def __init__(self):
+        self._event = asyncio.Event()
+
+    def set(self):
+        self._event.set()
+
+    def clear(self):
+        self._event.clear()
+
+    async def wait(self):
+        await self._event.wait()
+        self._event.clear()
+
+# MicroPython's ticks counters wrap at 2^30
+_TICKS_PERIOD = 1 << 30
+
+def _ticks_ms() -> int:
+    return (clock.now_ns // 1000000) & (_TICKS_PERIOD - 1)
+
+def _ticks_us() -> int:
+    return (clock.now_ns // 1000) & (_TICKS_PERIOD - 1)
+
+def _ticks_diff(ticks1: int, ticks2: int) -> int:
+    return ((ticks1 - ticks2 + _TICKS_PERIOD // 2) & (_TICKS_PERIOD - 1)) - _TICKS_PERIOD // 2
+
+def _ticks_add(ticks: int, delta: int) -> int:
+    return (ticks + delta) & (_TICKS_PERIOD - 1)
+
+async def _sleep_ms(ms: int):
+    await asyncio.sleep(ms / 1000)
+
+async def _wait_for_ms(aw, timeout_ms: int):
+    return await asyncio.wait_for(aw, timeout_ms / 1000)
+
+def install(real_time: bool = False):
+    """
+    Add MicroPython's asyncio and time extensions and make asyncio.run() use the virtual clock.
+    Note: The time module's ticks functions follow the virtual clock (the rest of the module is unchanged).
+    Args:
+        real_time (bool): Run the clock at real-time (so the simulation can use real I/O).
+    """
+    asyncio.ThreadSafeFlag = ThreadSafeFlag
+    asyncio.sleep_ms = _sleep_ms
+    asyncio.wait_for_ms = _wait_for_ms
+    time.ticks_ms = _ticks_ms
+    time.ticks_us = _ticks_us
+    time.ticks_diff = _ticks_diff
+    time.ticks_add = _ticks_add
+    asyncio.set_event_loop_policy(VirtualEventLoopPolicy(real_time))
+    logging.debug("virtual_clock::install - asyncio is using the virtual clock")